@@ -3,8 +3,10 @@ Pulp (gofer) plugin.
 Contains recurring actions and remote classes.
 """
 
+import json
 import os
 
+from collections import defaultdict
 from time import sleep
 from gettext import gettext as _
 from logging import getLogger
@@ -24,7 +26,8 @@ from pulp.agent.lib.dispatcher import Dispatcher
 from pulp.agent.lib.conduit import Conduit as HandlerConduit
 from pulp.bindings.server import PulpConnection
 from pulp.bindings.bindings import Bindings
-from pulp.bindings.exceptions import NotFoundException
+from pulp.bindings.exceptions import (BadRequestException, ConflictException,
+                                      NotFoundException)
 from pulp.client.consumer.config import read_config
 
 
@@ -45,6 +48,9 @@ plugin = Plugin.find(__name__)
 # registration status
 registered = False
 
+# the last profile sent for each (consumer_id, type_id) and the hash the server stored for it
+sent_profiles = {}
+
 
 class ValidateRegistrationFailed(Exception):
     """
@@ -499,9 +505,78 @@ class Profile(object):
                 continue
 
             details = profile_report['details']
-            http = bindings.profile.send(consumer_id, type_id, details)
+            http = self._send(bindings, consumer_id, type_id, details)
 
             msg = _('profile (%(t)s), reported: %(r)s')
             log.info(msg, {'t': type_id, 'r': http.response_code})
 
         return report.dict()
+
+    @staticmethod
+    def _send(bindings, consumer_id, type_id, profile):
+        """
+        Send a content profile to the server.
+        When a list based profile was sent before, only the entries added and removed
+        since then are sent. The full profile is sent when the server rejects the changes.
+        :param bindings: The pulp bindings.
+        :type bindings: PulpBindings
+        :param consumer_id: The consumer ID.
+        :type consumer_id: str
+        :param type_id: The profile (content) type ID.
+        :type type_id: str
+        :param profile: The content profile.
+        :type profile: object
+        :return: The http response.
+        :rtype: pulp.bindings.responses.Response
+        """
+        key = (consumer_id, type_id)
+        last = sent_profiles.pop(key, None)
+        http = None
+        if last is not None and isinstance(profile, list):
+            last_profile, base_hash = last
+            added, removed = Profile._diff(last_profile, profile)
+            try:
+                http = bindings.profile.send_delta(consumer_id, type_id, base_hash, added, removed)
+            except (BadRequestException, ConflictException, NotFoundException), e:
+                msg = _('profile (%(t)s) changes rejected, sending full profile: %(r)s')
+                log.info(msg, {'t': type_id, 'r': str(e)})
+        if http is None:
+            http = bindings.profile.send(consumer_id, type_id, profile)
+        try:
+            sent_profiles[key] = (profile, http.response_body['profile_hash'])
+        except (TypeError, KeyError):
+            # without the stored hash, the next profile is sent in full
+            pass
+        return http
+
+    @staticmethod
+    def _diff(old, new):
+        """
+        Compare two list based profiles by value.
+        :param old: The previously sent profile.
+        :type old: list
+        :param new: The current profile.
+        :type new: list
+        :return: tuple of (added, removed) entries.
+        :rtype: tuple
+        """
+        def key(entry):
+            return json.dumps(entry, separators=(',', ':'), sort_keys=True)
+
+        remaining = defaultdict(int)
+        for entry in old:
+            remaining[key(entry)] += 1
+        added = []
+        for entry in new:
+            k = key(entry)
+            if remaining[k]:
+                remaining[k] -= 1
+            else:
+                added.append(entry)
+        removed = []
+        for entry in old:
+            k = key(entry)
+            if remaining[k]:
+                remaining[k] -= 1
+                removed.append(entry)
+        return added, removed
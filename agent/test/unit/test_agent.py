@@ -5,6 +5,7 @@ from gofer.messaging.auth import ValidationFailed
 from M2Crypto import RSA, BIO
 from mock import patch, Mock
 
+from pulp.bindings.exceptions import ConflictException
 from pulp.common.config import Config
 from pulp.devel.unit.util import SideEffect
 
@@ -877,3 +878,70 @@ class TestProfile(PluginTest):
         # validation
         mock_dispatcher().profile.assert_called_with(mock_conduit())
         mock_bindings().profile.send.assert_called_once_with(TEST_CN, 'BB', 5678)
+
+    def test_send_full_first(self):
+        bindings = Mock()
+        bindings.profile.send.return_value = Mock(response_body={'profile_hash': 'h1'})
+
+        # test
+        http = self.plugin.Profile._send(bindings, TEST_CN, 'rpm', [{'name': 'zsh'}])
+
+        # validation
+        bindings.profile.send.assert_called_once_with(TEST_CN, 'rpm', [{'name': 'zsh'}])
+        self.assertFalse(bindings.profile.send_delta.called)
+        self.assertEqual(http, bindings.profile.send.return_value)
+        self.assertEqual(self.plugin.sent_profiles[(TEST_CN, 'rpm')], ([{'name': 'zsh'}], 'h1'))
+
+    def test_send_delta(self):
+        bindings = Mock()
+        bindings.profile.send_delta.return_value = Mock(response_body={'profile_hash': 'h2'})
+        self.plugin.sent_profiles[(TEST_CN, 'rpm')] = ([{'name': 'zsh'}, {'name': 'vim'}], 'h1')
+
+        # test
+        profile = [{'name': 'vim'}, {'name': 'bash'}]
+        http = self.plugin.Profile._send(bindings, TEST_CN, 'rpm', profile)
+
+        # validation
+        bindings.profile.send_delta.assert_called_once_with(
+            TEST_CN, 'rpm', 'h1', [{'name': 'bash'}], [{'name': 'zsh'}])
+        self.assertFalse(bindings.profile.send.called)
+        self.assertEqual(http, bindings.profile.send_delta.return_value)
+        self.assertEqual(self.plugin.sent_profiles[(TEST_CN, 'rpm')], (profile, 'h2'))
+
+    def test_send_delta_rejected(self):
+        bindings = Mock()
+        bindings.profile.send_delta.side_effect = ConflictException({})
+        bindings.profile.send.return_value = Mock(response_body={'profile_hash': 'h3'})
+        self.plugin.sent_profiles[(TEST_CN, 'rpm')] = ([{'name': 'zsh'}], 'h1')
+
+        # test
+        profile = [{'name': 'bash'}]
+        http = self.plugin.Profile._send(bindings, TEST_CN, 'rpm', profile)
+
+        # validation
+        bindings.profile.send.assert_called_once_with(TEST_CN, 'rpm', profile)
+        self.assertEqual(http, bindings.profile.send.return_value)
+        self.assertEqual(self.plugin.sent_profiles[(TEST_CN, 'rpm')], (profile, 'h3'))
+
+    def test_send_not_list(self):
+        bindings = Mock()
+        bindings.profile.send.return_value = Mock(response_body={'profile_hash': 'h2'})
+        self.plugin.sent_profiles[(TEST_CN, 'puppet')] = ({'a': 1}, 'h1')
+
+        # test
+        self.plugin.Profile._send(bindings, TEST_CN, 'puppet', {'a': 2})
+
+        # validation
+        bindings.profile.send.assert_called_once_with(TEST_CN, 'puppet', {'a': 2})
+        self.assertFalse(bindings.profile.send_delta.called)
+
+    def test_diff(self):
+        old = [{'name': 'a'}, {'name': 'b'}, {'name': 'b'}]
+        new = [{'name': 'b'}, {'name': 'c'}]
+
+        # test
+        added, removed = self.plugin.Profile._diff(old, new)
+
+        # validation
+        self.assertEqual(added, [{'name': 'c'}])
+        self.assertEqual(removed, [{'name': 'a'}, {'name': 'b'}])
@@ -173,6 +173,30 @@ class ProfilesAPI(PulpAPI):
         data = {'content_type': content_type, 'profile': profile}
         return self.server.POST(path, data)
 
+    def send_delta(self, id, content_type, base_hash, added, removed):
+        """
+        Send the changes to a profile since it was last sent.
+
+        :param id:           the consumer ID
+        :type  id:           str
+        :param content_type: the profile (content) type ID
+        :type  content_type: str
+        :param base_hash:    the hash of the profile on the server that the changes are based on
+        :type  base_hash:    str
+        :param added:        entries added to the profile
+        :type  added:        list
+        :param removed:      entries removed from the profile
+        :type  removed:      list
+        :return:             response with the updated profile in the response_body
+        :rtype:              pulp.bindings.responses.Response
+
+        :raise ConflictException: if the profile on the server no longer has the base hash
+        :raise NotFoundException: if the consumer or the profile does not exist
+        """
+        path = self.BASE_PATH % id + content_type + '/'
+        data = {'base_hash': base_hash, 'added': added, 'removed': removed}
+        return self.server.PUT(path, data)
+
 
 class ConsumerHistoryAPI(PulpAPI):
     """
@@ -1,3 +1,4 @@
+import copy
 from gettext import gettext as _
 
 
@@ -100,6 +101,36 @@ class Task(object):
             for task in spawned_tasks:
                 self.spawned_tasks.append(Task(task))
 
+        # Incremented by the server each time the task is updated
+        self.revision = response_body.get('revision')
+
+    def merge_changes(self, changes):
+        """
+        Create a new Task from this one with the given changes applied. Attributes that are not
+        present in the changes keep their current values.
+
+        :param changes: The de-serialized response from Pulp's task changes API, containing only
+                        the fields of the task that changed
+        :type  changes: dict
+
+        :return: a new task reflecting the changes
+        :rtype:  Task
+        """
+        merged = copy.copy(self)
+        merged.spawned_tasks = list(self.spawned_tasks)
+
+        if '_href' in changes:
+            merged.href = changes['_href']
+        for attribute in ('task_id', 'tags', 'start_time', 'finish_time', 'state',
+                          'progress_report', 'result', 'exception', 'traceback', 'error',
+                          'worker_name', 'revision'):
+            if attribute in changes:
+                setattr(merged, attribute, changes[attribute])
+        if 'spawned_tasks' in changes:
+            merged.spawned_tasks = [Task(task) for task in changes['spawned_tasks'] or []]
+
+        return merged
+
     def is_waiting(self):
         """
         Indicates if the task has been accepted but has not yet been able to
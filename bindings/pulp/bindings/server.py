@@ -1,8 +1,12 @@
 from types import NoneType
 import base64
+import errno
+import httplib
 import locale
 import logging
 import os
+import socket
+import threading
 import urllib
 try:
     import oauth2 as oauth
@@ -19,6 +23,13 @@ from pulp.common.constants import DEFAULT_CA_PATH
 from pulp.common.util import ensure_utf_8, encode_unicode
 
 
+# Requests that can be sent again if a reused connection fails, whether or not the server got them
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+
+# Errors writing a request that mean the server had already closed the connection
+STALE_CONNECTION_ERRNOS = (errno.EPIPE, errno.ECONNRESET)
+
+
 class PulpConnection(object):
     """
     Stub for invoking methods against the Pulp server. By default, the
@@ -260,20 +271,33 @@ class HTTPSServerWrapper(object):
     This abstraction is used to simplify mocking. In this implementation, the
     intricacies (read: ugliness) of invoking and getting the response from
     the HTTPConnection class are hidden in favor of a simpler API to mock.
+
+    Connections are kept open after each request and reused by later requests to avoid
+    a TLS handshake per call. Idle connections and the SSL context are kept for each set of
+    connection settings and credentials, and the TLS session of the last connection is used to
+    resume the session when a new connection is needed. The wrapper may be shared by threads.
     """
 
+    # The maximum number of idle connections kept open for each set of connection settings
+    MAX_IDLE_CONNECTIONS = 10
+
     def __init__(self, pulp_connection):
         """
         :param pulp_connection: A pulp connection object.
         :type pulp_connection: PulpConnection
         """
         self.pulp_connection = pulp_connection
+        self._lock = threading.RLock()
+        # all keyed by the value of _pool_key()
+        self._contexts = {}
+        self._idle = {}
+        self._sessions = {}
 
     def request(self, method, url, body):
         """
         Make the request against the Pulp server, returning a tuple of (status_code, respose_body).
-        This method creates a new connection each time since HTTPSConnection has problems
-        reusing a connection for multiple calls (as claimed by a prior comment in this module).
+        An idle connection is reused when one is available. If the server has closed a reused
+        connection, the request is retried on a new connection when it is safe to send it again.
 
         :param method: The HTTP method to be used for the request (GET, POST, etc.)
         :type  method: str
@@ -289,34 +313,10 @@ class HTTPSServerWrapper(object):
         """
         headers = dict(self.pulp_connection.headers)  # copy so we don't affect the calling method
 
-        # Despite the confusing name, 'sslv23' configures m2crypto to use any available protocol in
-        # the underlying openssl implementation.
-        ssl_context = SSL.Context('sslv23')
-        # This restricts the protocols we are willing to do by configuring m2 not to do SSLv2.0 or
-        # SSLv3.0. EL 5 does not have support for TLS > v1.0, so we have to leave support for
-        # TLSv1.0 enabled.
-        ssl_context.set_options(m2.SSL_OP_NO_SSLv2 | m2.SSL_OP_NO_SSLv3)
-
-        if self.pulp_connection.verify_ssl:
-            ssl_context.set_verify(SSL.verify_peer, depth=100)
-            # We need to stat the ca_path to see if it exists (error if it doesn't), and if so
-            # whether it is a file or a directory. m2crypto has different directives depending on
-            # which type it is.
-            if os.path.isfile(self.pulp_connection.ca_path):
-                ssl_context.load_verify_locations(cafile=self.pulp_connection.ca_path)
-            elif os.path.isdir(self.pulp_connection.ca_path):
-                ssl_context.load_verify_locations(capath=self.pulp_connection.ca_path)
-            else:
-                # If it's not a file and it's not a directory, it's not a valid setting
-                raise exceptions.MissingCAPathException(self.pulp_connection.ca_path)
-        ssl_context.set_session_timeout(self.pulp_connection.timeout)
-
         if self.pulp_connection.username and self.pulp_connection.password:
             raw = ':'.join((self.pulp_connection.username, self.pulp_connection.password))
             encoded = base64.b64encode(raw)
             headers['Authorization'] = 'Basic ' + encoded
-        elif self.pulp_connection.cert_filename:
-            ssl_context.load_cert(self.pulp_connection.cert_filename)
 
         # oauth configuration. This block is only True if oauth is not None, so it won't run on RHEL
         # 5.
@@ -340,6 +340,186 @@ class HTTPSServerWrapper(object):
         proxy_requested = self.pulp_connection.proxy_host and self.pulp_connection.proxy_port
 
         if proxy_requested:
+            request_url = 'https://%s:%d%s' % (self.pulp_connection.host,
+                                               self.pulp_connection.port, url)
+        else:
+            request_url = url
+
+        key = self._pool_key()
+        ssl_context = self._ssl_context(key)
+
+        while True:
+            connection, reused = self._acquire(key, ssl_context)
+            sent = False
+            try:
+                # Request against the server
+                connection.request(method, request_url, body=body, headers=headers)
+                sent = True
+                response = connection.getresponse()
+            except (SSL.SSLError, httplib.HTTPException, socket.error), err:
+                self._close(connection)
+                if reused and self._is_retriable(method, err, sent):
+                    # the server closed the idle connection
+                    self._discard(key)
+                    continue
+                if isinstance(err, SSL.SSLError):
+                    self._raise_ssl_error(err)
+                raise
+            break
+
+        # the server has started to respond, so the request is never sent again from here on
+        try:
+            response_body = response.read()
+        except (SSL.SSLError, httplib.HTTPException, socket.error), err:
+            self._close(connection)
+            if isinstance(err, SSL.SSLError):
+                self._raise_ssl_error(err)
+            raise
+
+        self._release(key, connection, response)
+
+        # Attempt to deserialize the body (should pass unless the server is busted)
+        try:
+            response_body = json.loads(response_body)
+        except Exception:
+            pass
+        return response.status, response_body
+
+    @staticmethod
+    def _is_retriable(method, err, sent):
+        """
+        Determine whether a request that failed on a reused connection may be sent again on a new
+        connection. The server may already have received a request that failed, so only requests
+        that are safe to repeat are retried, unless the failure shows that the idle connection
+        was closed before the server read the request.
+
+        :param method: The HTTP method of the request
+        :type  method: str
+        :param err:    The error raised by the request
+        :type  err:    Exception
+        :param sent:   True if the request was sent and the error was raised waiting for the
+                       response
+        :type  sent:   bool
+        :return:       True if the request may be sent again
+        :rtype:        bool
+        """
+        if method.upper() in IDEMPOTENT_METHODS:
+            return True
+        if isinstance(err, httplib.BadStatusLine):
+            # the connection was closed without the server sending any of a response
+            return True
+        return (not sent and isinstance(err, socket.error) and
+                err.errno in STALE_CONNECTION_ERRNOS)
+
+    def _raise_ssl_error(self, err):
+        """
+        Translate an SSL error raised by a request to an exception of the bindings, and raise it.
+
+        :param err: The error raised by the request
+        :type  err: M2Crypto.SSL.SSLError
+        """
+        # Translate stale login certificate to an auth exception
+        if 'sslv3 alert certificate expired' == str(err):
+            raise exceptions.ClientCertificateExpiredException(
+                self.pulp_connection.cert_filename)
+        elif 'certificate verify failed' in str(err):
+            raise exceptions.CertificateVerificationException()
+        else:
+            raise exceptions.ConnectionException(None, str(err), None)
+
+    def _pool_key(self):
+        """
+        Get the key used to pool connections and SSL contexts. Connections are only shared by
+        requests made with the same connection settings and credentials.
+
+        :return: A tuple of the settings that affect the connection.
+        :rtype:  tuple
+        """
+        pulp_connection = self.pulp_connection
+        cert_filename = None
+        cert_mtime = None
+        if not (pulp_connection.username and pulp_connection.password):
+            cert_filename = pulp_connection.cert_filename
+            if cert_filename:
+                # reload the certificate when it has been replaced (e.g. a new login)
+                try:
+                    cert_mtime = os.path.getmtime(cert_filename)
+                except OSError:
+                    pass
+        return (pulp_connection.host, pulp_connection.port, pulp_connection.proxy_host,
+                pulp_connection.proxy_port, pulp_connection.verify_ssl, pulp_connection.ca_path,
+                pulp_connection.timeout, pulp_connection.username, cert_filename, cert_mtime)
+
+    def _ssl_context(self, key):
+        """
+        Get the SSL context for the specified key, building it on first use.
+
+        :param key: A key returned by _pool_key()
+        :type  key: tuple
+        :return: The SSL context
+        :rtype:  M2Crypto.SSL.Context
+        """
+        with self._lock:
+            ssl_context = self._contexts.get(key)
+            if ssl_context is None:
+                ssl_context = self._build_ssl_context()
+                self._contexts[key] = ssl_context
+            return ssl_context
+
+    def _build_ssl_context(self):
+        """
+        Build an SSL context using the connection settings and credentials.
+
+        :return: A new SSL context
+        :rtype:  M2Crypto.SSL.Context
+        :raises exceptions.MissingCAPathException: if the CA path is not a file or directory
+        """
+        # Despite the confusing name, 'sslv23' configures m2crypto to use any available protocol in
+        # the underlying openssl implementation.
+        ssl_context = SSL.Context('sslv23')
+        # This restricts the protocols we are willing to do by configuring m2 not to do SSLv2.0 or
+        # SSLv3.0. EL 5 does not have support for TLS > v1.0, so we have to leave support for
+        # TLSv1.0 enabled.
+        ssl_context.set_options(m2.SSL_OP_NO_SSLv2 | m2.SSL_OP_NO_SSLv3)
+
+        if self.pulp_connection.verify_ssl:
+            ssl_context.set_verify(SSL.verify_peer, depth=100)
+            # We need to stat the ca_path to see if it exists (error if it doesn't), and if so
+            # whether it is a file or a directory. m2crypto has different directives depending on
+            # which type it is.
+            if os.path.isfile(self.pulp_connection.ca_path):
+                ssl_context.load_verify_locations(cafile=self.pulp_connection.ca_path)
+            elif os.path.isdir(self.pulp_connection.ca_path):
+                ssl_context.load_verify_locations(capath=self.pulp_connection.ca_path)
+            else:
+                # If it's not a file and it's not a directory, it's not a valid setting
+                raise exceptions.MissingCAPathException(self.pulp_connection.ca_path)
+        ssl_context.set_session_timeout(self.pulp_connection.timeout)
+
+        if not (self.pulp_connection.username and self.pulp_connection.password) and \
+                self.pulp_connection.cert_filename:
+            ssl_context.load_cert(self.pulp_connection.cert_filename)
+
+        return ssl_context
+
+    def _acquire(self, key, ssl_context):
+        """
+        Get an idle connection for the specified key or create a new one.
+
+        :param key: A key returned by _pool_key()
+        :type  key: tuple
+        :param ssl_context: The SSL context used by new connections
+        :type  ssl_context: M2Crypto.SSL.Context
+        :return: A 2-tuple of the connection and whether it has been used before
+        :rtype:  tuple
+        """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+            session = self._sessions.get(key)
+
+        if self.pulp_connection.proxy_host and self.pulp_connection.proxy_port:
             connection = httpslib.ProxyHTTPSConnection(self.pulp_connection.proxy_host,
                                                        self.pulp_connection.proxy_port,
                                                        ssl_context=ssl_context)
@@ -347,31 +527,59 @@ class HTTPSServerWrapper(object):
             connection = httpslib.HTTPSConnection(self.pulp_connection.host,
                                                   self.pulp_connection.port,
                                                   ssl_context=ssl_context)
+        if session is not None:
+            # resume the TLS session of a previous connection to skip the full handshake
+            connection.set_session(session)
+        return connection, False
 
-        try:
-            # Request against the server
-            if proxy_requested:
-                request_url = 'https://%s:%d%s' % (self.pulp_connection.host,
-                                                   self.pulp_connection.port, url)
-            else:
-                request_url = url
-            connection.request(method, request_url, body=body, headers=headers)
-            response = connection.getresponse()
-        except SSL.SSLError, err:
-            # Translate stale login certificate to an auth exception
-            if 'sslv3 alert certificate expired' == str(err):
-                raise exceptions.ClientCertificateExpiredException(
-                    self.pulp_connection.cert_filename)
-            elif 'certificate verify failed' in str(err):
-                raise exceptions.CertificateVerificationException()
-            else:
-                raise exceptions.ConnectionException(None, str(err), None)
+    def _release(self, key, connection, response):
+        """
+        Return a connection to the pool after its response has been read. The connection is
+        closed instead when the server will close it or enough connections are idle.
+
+        :param key: A key returned by _pool_key()
+        :type  key: tuple
+        :param connection: The connection used for the request
+        :type  connection: M2Crypto.httpslib.HTTPSConnection
+        :param response: The response that has been read
+        :type  response: httplib.HTTPResponse
+        """
+        with self._lock:
+            if connection.sock is not None:
+                self._sessions[key] = connection.get_session()
+            idle = self._idle.setdefault(key, [])
+            if not getattr(response, 'will_close', True) and \
+                    len(idle) < self.MAX_IDLE_CONNECTIONS:
+                idle.append(connection)
+                return
+        self._close(connection)
+
+    def _discard(self, key):
+        """
+        Close the idle connections for the specified key. Used when a reused connection turns
+        out to be closed by the server, in which case the others likely are too.
 
-        # Attempt to deserialize the body (should pass unless the server is busted)
-        response_body = response.read()
+        :param key: A key returned by _pool_key()
+        :type  key: tuple
+        """
+        with self._lock:
+            idle = self._idle.pop(key, [])
+        for connection in idle:
+            self._close(connection)
 
-        try:
-            response_body = json.loads(response_body)
-        except Exception:
-            pass
-        return response.status, response_body
+    @staticmethod
+    def _close(connection):
+        """
+        Close the socket of a connection. M2Crypto's HTTPSConnection.close() does not close the
+        socket, so it is closed here.
+
+        :param connection: A connection
+        :type  connection: M2Crypto.httpslib.HTTPSConnection
+        """
+        sock = connection.sock
+        connection.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except Exception:
+                pass
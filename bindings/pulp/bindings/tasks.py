@@ -43,6 +43,36 @@ class TasksAPI(PulpAPI):
         response.response_body = Task(response.response_body)
         return response
 
+    def get_task_changes(self, task, timeout=None):
+        """
+        Waits for the given task to change on the server and retrieves the changes. The server
+        holds the request open until the task's revision differs from the one in the given task,
+        the task is complete, or the timeout expires.
+
+        :param task:    the most recent known state of the task
+        :type  task:    pulp.bindings.responses.Task
+        :param timeout: maximum number of seconds the server should wait for a change; None to use
+                        the server's default
+        :type  timeout: int or float
+
+        :return: response with the given task updated with its changes in the response_body
+        :rtype:  Response
+
+        :raise NotFoundException: if there is no task with the given ID, or the server does not
+                                  support waiting for task changes
+        """
+        path = '/v2/tasks/%s/changes/' % task.task_id
+        queries = []
+        if task.revision is not None:
+            queries.append(('revision', task.revision))
+        if timeout is not None:
+            queries.append(('timeout', timeout))
+
+        response = self.server.GET(path, queries=queries)
+
+        response.response_body = task.merge_changes(response.response_body)
+        return response
+
     def get_all_tasks(self, tags=()):
         """
         Retrieves all tasks in the system. If tags are specified, only tasks
@@ -18,6 +18,19 @@ class UploadAPI(PulpAPI):
         return self.server.PUT(url, data, ensure_encoding=False,
                                log_request_body=False)
 
+    def get_upload(self, upload_id):
+        """
+        Retrieves the ranges of the given upload received by the server and the
+        checksum of the data received from the start of the file.
+
+        :param upload_id: identifies the upload request
+        :type  upload_id: str
+        :return:          response whose body contains the status of the upload
+        :rtype:           pulp.bindings.responses.Response
+        """
+        url = '/v2/content/uploads/%s/' % upload_id
+        return self.server.GET(url)
+
     def list_all_uploads(self):
         url = '/v2/content/uploads/'
         return self.server.GET(url)
@@ -27,7 +40,7 @@ class UploadAPI(PulpAPI):
         return self.server.DELETE(url)
 
     def import_upload(self, upload_id, repo_id, unit_type_id, unit_key, unit_metadata,
-                      override_config=None):
+                      override_config=None, upload_checksum=None):
         url = '/v2/repositories/%s/actions/import_upload/' % repo_id
         body = {
             'upload_id': upload_id,
@@ -36,4 +49,6 @@ class UploadAPI(PulpAPI):
             'unit_metadata': unit_metadata,
             'override_config': override_config,
         }
+        if upload_checksum is not None:
+            body['upload_checksum'] = upload_checksum
         return self.server.POST(url, body)
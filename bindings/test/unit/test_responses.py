@@ -147,3 +147,27 @@ class TestTask(unittest.TestCase):
 
         expected_representation = u'Task: 9efb5da2-ff42-4633-9355-81385bd43310 State: finished'
         self.assertEqual(representation, expected_representation)
+
+    def test_merge_changes(self):
+        """
+        Test that merge_changes() applies only the changed fields to a copy of the task.
+        """
+        a_task = responses.Task({u'task_id': u'9efb5da2', u'state': u'running',
+                                 u'tags': [u'pulp:action:sync'], u'revision': 3,
+                                 u'progress_report': {u'some': u'data'}})
+
+        merged = a_task.merge_changes({u'task_id': u'9efb5da2', u'state': u'finished',
+                                       u'revision': 4, u'result': {u'some': u'return data'},
+                                       u'spawned_tasks': [{u'task_id': u'37506910'}]})
+
+        self.assertEqual(merged.state, u'finished')
+        self.assertEqual(merged.revision, 4)
+        self.assertEqual(merged.result, {u'some': u'return data'})
+        self.assertEqual(merged.tags, [u'pulp:action:sync'])
+        self.assertEqual(merged.progress_report, {u'some': u'data'})
+        self.assertEqual(len(merged.spawned_tasks), 1)
+        self.assertEqual(merged.spawned_tasks[0].task_id, u'37506910')
+        # the original task is left untouched
+        self.assertEqual(a_task.state, u'running')
+        self.assertEqual(a_task.revision, 3)
+        self.assertEqual(a_task.spawned_tasks, [])
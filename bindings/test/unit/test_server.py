@@ -1,8 +1,11 @@
 """
 This module contains tests for the pulp.bindings.server module.
 """
+import errno
+import httplib
 import locale
 import logging
+import socket
 import unittest
 
 from M2Crypto import m2, SSL
@@ -173,6 +176,196 @@ class TestHTTPSServerWrapper(unittest.TestCase):
         load_verify_locations.assert_called_once_with(cafile=ca_path)
 
 
+class TestHTTPSServerWrapperPool(unittest.TestCase):
+    """
+    This class contains tests for the connection pooling done by the HTTPSServerWrapper class.
+    """
+    def setUp(self):
+        conn = server.PulpConnection('host', verify_ssl=False)
+        self.wrapper = server.HTTPSServerWrapper(conn)
+
+    @staticmethod
+    def connection(will_close=False, side_effect=None):
+        response = mock.MagicMock(status=200, will_close=will_close)
+        response.read.return_value = '{}'
+        connection = mock.MagicMock()
+        connection.getresponse.return_value = response
+        connection.request.side_effect = side_effect
+        return connection
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_reuses_connection(self, HTTPSConnection, Context):
+        """
+        Test that a kept-alive connection and the SSL context are reused by the next request.
+        """
+        connection = self.connection()
+        HTTPSConnection.return_value = connection
+
+        self.wrapper.request('GET', '/awesome/api/', '')
+        status, body = self.wrapper.request('GET', '/awesome/api/', '')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {})
+        self.assertEqual(Context.call_count, 1)
+        self.assertEqual(HTTPSConnection.call_count, 1)
+        self.assertEqual(connection.request.call_count, 2)
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_will_close(self, HTTPSConnection, Context):
+        """
+        Test that a connection the server will close is not reused, and that its TLS session is
+        used to resume the session on the next connection.
+        """
+        connections = [self.connection(will_close=True), self.connection(will_close=True)]
+        sock = connections[0].sock
+        HTTPSConnection.side_effect = connections
+
+        self.wrapper.request('GET', '/awesome/api/', '')
+        self.wrapper.request('GET', '/awesome/api/', '')
+
+        self.assertEqual(HTTPSConnection.call_count, 2)
+        sock.close.assert_called_once_with()
+        self.assertEqual(connections[0].sock, None)
+        self.assertFalse(connections[0].set_session.called)
+        connections[1].set_session.assert_called_once_with(
+            connections[0].get_session.return_value)
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_reconnects(self, HTTPSConnection, Context):
+        """
+        Test that the request is retried on a new connection when the server closed the idle one.
+        """
+        stale = self.connection()
+        sock = stale.sock
+        fresh = self.connection()
+        HTTPSConnection.side_effect = [stale, fresh]
+        self.wrapper.request('GET', '/awesome/api/', '')
+        stale.request.side_effect = httplib.BadStatusLine('')
+
+        status, body = self.wrapper.request('POST', '/awesome/api/', 'x')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(HTTPSConnection.call_count, 2)
+        sock.close.assert_called_once_with()
+        fresh.request.assert_called_once_with('POST', '/awesome/api/', body='x',
+                                              headers=mock.ANY)
+
+    def _reused_connection(self, HTTPSConnection):
+        """
+        Make a request so that its connection is idle in the pool, and return it. A new
+        connection is returned by HTTPSConnection next.
+
+        :return: the idle connection and the next new connection
+        :rtype:  tuple
+        """
+        stale = self.connection()
+        fresh = self.connection()
+        HTTPSConnection.side_effect = [stale, fresh]
+        self.wrapper.request('GET', '/awesome/api/', '')
+        return stale, fresh
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_reconnects_reset_on_send(self, HTTPSConnection, Context):
+        """
+        Test that a POST is retried when the idle connection was reset before it was sent.
+        """
+        stale, fresh = self._reused_connection(HTTPSConnection)
+        stale.request.side_effect = socket.error(errno.EPIPE, 'Broken pipe')
+
+        status, body = self.wrapper.request('POST', '/awesome/api/', 'x')
+
+        self.assertEqual(status, 200)
+        fresh.request.assert_called_once_with('POST', '/awesome/api/', body='x',
+                                              headers=mock.ANY)
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_post_not_retried_after_send(self, HTTPSConnection, Context):
+        """
+        Test that a POST that fails waiting for the response on a reused connection is not sent
+        again, as the server may have received it.
+        """
+        for err in (socket.timeout('timed out'), socket.error(errno.ECONNRESET, 'reset'),
+                    httplib.IncompleteRead('')):
+            stale, fresh = self._reused_connection(HTTPSConnection)
+            stale.getresponse.side_effect = err
+
+            self.assertRaises(type(err), self.wrapper.request, 'POST', '/awesome/api/', 'x')
+            self.assertEqual(stale.request.call_count, 2)
+            self.assertFalse(fresh.request.called)
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_post_not_retried_on_read(self, HTTPSConnection, Context):
+        """
+        Test that a POST that fails reading the response on a reused connection is not sent again.
+        """
+        stale, fresh = self._reused_connection(HTTPSConnection)
+        sock = stale.sock
+        stale.getresponse.return_value.read.side_effect = socket.error(errno.ECONNRESET, 'reset')
+
+        self.assertRaises(socket.error, self.wrapper.request, 'POST', '/awesome/api/', 'x')
+        self.assertFalse(fresh.request.called)
+        sock.close.assert_called_once_with()
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_get_not_retried_on_read(self, HTTPSConnection, Context):
+        """
+        Test that no request is sent again once the server has started to respond.
+        """
+        stale, fresh = self._reused_connection(HTTPSConnection)
+        stale.getresponse.return_value.read.side_effect = socket.timeout('timed out')
+
+        self.assertRaises(socket.timeout, self.wrapper.request, 'GET', '/awesome/api/', '')
+        self.assertFalse(fresh.request.called)
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_get_retried_after_send(self, HTTPSConnection, Context):
+        """
+        Test that a GET that fails waiting for the response on a reused connection is retried.
+        """
+        stale, fresh = self._reused_connection(HTTPSConnection)
+        stale.getresponse.side_effect = socket.timeout('timed out')
+
+        status, body = self.wrapper.request('GET', '/awesome/api/', '')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(fresh.request.call_count, 1)
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_new_connection_error(self, HTTPSConnection, Context):
+        """
+        Test that errors on a new connection are not retried.
+        """
+        HTTPSConnection.return_value = self.connection(side_effect=httplib.BadStatusLine(''))
+
+        self.assertRaises(httplib.BadStatusLine, self.wrapper.request, 'GET', '/awesome/api/', '')
+        self.assertEqual(HTTPSConnection.call_count, 1)
+
+    @mock.patch('pulp.bindings.server.SSL.Context', autospec=True)
+    @mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+    def test_request_credentials_changed(self, HTTPSConnection, Context):
+        """
+        Test that connections and SSL contexts are not shared by different credentials.
+        """
+        HTTPSConnection.side_effect = [self.connection(), self.connection()]
+
+        self.wrapper.request('GET', '/awesome/api/', '')
+        self.wrapper.pulp_connection.username = 'admin'
+        self.wrapper.pulp_connection.password = 'admin'
+        self.wrapper.request('GET', '/awesome/api/', '')
+
+        self.assertEqual(Context.call_count, 2)
+        self.assertEqual(HTTPSConnection.call_count, 2)
+
+
 class TestPulpConnection(unittest.TestCase):
     """
     This class contains tests for the PulpConnection object.
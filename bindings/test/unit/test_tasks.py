@@ -76,6 +76,38 @@ class TestGetAllTasks(unittest.TestCase):
             self.assertTrue(isinstance(task, responses.Task))
 
 
+class TestGetTaskChanges(unittest.TestCase):
+    def setUp(self):
+        self.server = mock.MagicMock()
+        self.api = tasks.TasksAPI(self.server)
+
+    def test_with_revision(self):
+        self.server.GET.return_value.response_body = {'task_id': 'abc', 'state': 'finished',
+                                                      'revision': 5}
+        task = responses.Task({'task_id': 'abc', 'state': 'running', 'revision': 4,
+                               'tags': ['pulp:action:sync']})
+
+        ret = self.api.get_task_changes(task, timeout=10).response_body
+
+        self.server.GET.assert_called_once_with('/v2/tasks/abc/changes/',
+                                                queries=[('revision', 4), ('timeout', 10)])
+        self.assertTrue(isinstance(ret, responses.Task))
+        self.assertEqual(ret.state, 'finished')
+        self.assertEqual(ret.revision, 5)
+        self.assertEqual(ret.tags, ['pulp:action:sync'])
+
+    def test_without_revision(self):
+        self.server.GET.return_value.response_body = copy.deepcopy(TASKS[0])
+        task = responses.Task({'task_id': TASKS[0]['task_id']})
+
+        ret = self.api.get_task_changes(task).response_body
+
+        self.server.GET.assert_called_once_with(
+            '/v2/tasks/%s/changes/' % TASKS[0]['task_id'], queries=[])
+        self.assertEqual(ret.state, TASKS[0]['state'])
+        self.assertEqual(ret.worker_name, TASKS[0]['worker_name'])
+
+
 class TestPurgeTasks(unittest.TestCase):
     def setUp(self):
         self.server = mock.MagicMock()
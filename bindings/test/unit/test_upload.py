@@ -38,3 +38,24 @@ class TestUploadAPI(unittest.TestCase):
         self.api.server.POST.assert_called_once_with('/v2/repositories/%s/actions/import_upload/'
                                                      % 'repo_id', expected_body)
         self.assertEqual(ret, self.api.server.POST.return_value)
+
+    def test_import_upload_with_upload_checksum(self):
+        self.api.import_upload('upload_id', 'repo_id', 'unit_type_id', unit_key={},
+                               unit_metadata={}, upload_checksum='0a1b2c3d')
+        expected_body = {
+            'upload_id': 'upload_id',
+            'unit_type_id': 'unit_type_id',
+            'unit_key': {},
+            'unit_metadata': {},
+            'override_config': None,
+            'upload_checksum': '0a1b2c3d',
+        }
+
+        self.api.server.POST.assert_called_once_with('/v2/repositories/%s/actions/import_upload/'
+                                                     % 'repo_id', expected_body)
+
+    def test_get_upload(self):
+        ret = self.api.get_upload('upload_id')
+
+        self.api.server.GET.assert_called_once_with('/v2/content/uploads/upload_id/')
+        self.assertEqual(ret, self.api.server.GET.return_value)
@@ -7,6 +7,7 @@ from pulp.bindings.exceptions import PulpServerException
 from pulp.client import parsers
 from pulp.client.extensions.extensions import PulpCliSection, PulpCliFlag, PulpCliOption
 from pulp.common.constants import CALL_COMPLETE_STATES, CALL_CANCELED_STATE
+from pulp.common.plugins import reporting_constants
 
 
 # Guidance for render_document_list on how to display task info
@@ -16,6 +17,8 @@ TASK_LIST_DOC_ORDER = ['operations', 'resources', 'state', 'start_time', 'finish
                        'worker_name']
 # This constant set is used for purging the completed tasks from the collection.
 VALID_STATES = set(filter(lambda state: state != CALL_CANCELED_STATE, CALL_COMPLETE_STATES))
+# Units used to display the number of bytes read and written by task steps
+BYTE_UNITS = ('B', 'KiB', 'MiB', 'GiB', 'TiB')
 
 
 def initialize(context):
@@ -44,6 +47,8 @@ class BaseTasksSection(PulpCliSection):
                                    'shown. Example: "running,waiting,canceled,successful,failed". '
                                    'Do not include spaces.'), aliases=['-s'], required=False,
                                  parse_func=parsers.csv)
+    timings_flag = PulpCliFlag('--timings', _('if specified, the time taken and resources used by '
+                                              'each step of the task are shown'))
 
     def __init__(self, context, name, description):
         PulpCliSection.__init__(self, name, description)
@@ -65,6 +70,7 @@ class BaseTasksSection(PulpCliSection):
             'displays more detailed information about a specific task'), self.details
         )
         self.details_command.create_option('--task-id', _('identifies the task'), required=True)
+        self.details_command.add_option(self.timings_flag)
 
     def list(self, **kwargs):
         """
@@ -144,6 +150,85 @@ class BaseTasksSection(PulpCliSection):
 
         self.context.prompt.render_document(task_doc, order=TASK_DETAILS_DOC_ORDER)
 
+        if kwargs.get(self.timings_flag.keyword):
+            self.render_step_timings(task.progress_report)
+
+    def render_step_timings(self, progress_report):
+        """
+        Displays the tree of steps in a task's progress report with the time taken and resources
+        used by each step. The figures for a step include those of its child steps.
+
+        :param progress_report: progress report of a task, keyed by the plugin reporting progress
+        :type  progress_report: dict
+        """
+        self.context.prompt.render_title(_('Step Timings'))
+
+        lines = []
+        for report_id in sorted(progress_report or {}):
+            steps = progress_report[report_id]
+            # only reports from the step framework list their steps
+            if isinstance(steps, list):
+                lines.append(report_id)
+                self._step_timing_lines(steps, 1, lines)
+
+        if not lines:
+            self.context.prompt.render_paragraph(_('No step timings are available for this task.'))
+            return
+        for line in lines:
+            self.context.prompt.write(line, skip_wrap=True)
+        self.context.prompt.render_spacer()
+
+    @classmethod
+    def _step_timing_lines(cls, steps, depth, lines):
+        """
+        Appends a line describing each step, and then each of its child steps, to lines.
+
+        :param steps: step progress reports
+        :type  steps: list of dict
+        :param depth: how deeply the steps are nested
+        :type  depth: int
+        :param lines: lines to be displayed
+        :type  lines: list of str
+        """
+        for step in steps:
+            name = step.get(reporting_constants.PROGRESS_DESCRIPTION_KEY) or \
+                step.get(reporting_constants.PROGRESS_STEP_TYPE_KEY)
+            state = step.get(reporting_constants.PROGRESS_STATE_KEY)
+            line = '%s%s [%s]' % ('  ' * depth, name, state)
+            metrics = step.get(reporting_constants.PROGRESS_METRICS_KEY)
+            if metrics:
+                line += _(': %(wall).3fs, %(cpu).3fs CPU, %(read)s read, %(written)s written') % {
+                    'wall': metrics[reporting_constants.METRICS_WALL_TIME_KEY],
+                    'cpu': metrics[reporting_constants.METRICS_CPU_TIME_KEY],
+                    'read': cls._format_bytes(metrics[reporting_constants.METRICS_BYTES_READ_KEY]),
+                    'written': cls._format_bytes(
+                        metrics[reporting_constants.METRICS_BYTES_WRITTEN_KEY])}
+                rate = metrics.get(reporting_constants.METRICS_ITEMS_PER_SECOND_KEY)
+                if rate:
+                    line += _(', %(rate).1f items/sec') % {'rate': rate}
+            lines.append(line)
+            cls._step_timing_lines(step.get(reporting_constants.PROGRESS_SUB_STEPS_KEY, []),
+                                   depth + 1, lines)
+
+    @staticmethod
+    def _format_bytes(count):
+        """
+        :param count: a number of bytes
+        :type  count: int
+
+        :return: the number of bytes in the largest unit in which it is at least 1
+        :rtype:  str
+        """
+        for unit in BYTE_UNITS[:-1]:
+            if count < 1024:
+                break
+            count /= 1024.0
+        else:
+            unit = BYTE_UNITS[-1]
+        if unit == BYTE_UNITS[0]:
+            return '%d %s' % (count, unit)
+        return '%.1f %s' % (count, unit)
+
     def cancel(self, **kwargs):
         """
         Attempts to cancel a task. Only unstarted tasks and those that support
@@ -277,6 +277,45 @@ class AllTasksTests(base_builtins.PulpClientTests):
         # to the user.
         self.assertTrue(len(self.recorder.lines) > 0)
 
+    def test_details_timings(self):
+        # Setup
+        report = copy.copy(EXAMPLE_CALL_REPORT)
+        report['state'] = 'finished'
+        report['progress_report'] = {
+            'yum_distributor': [{
+                'step_type': 'rpms', 'description': 'Publishing RPMs', 'state': 'FINISHED',
+                'metrics': {'wall_time': 12.5, 'cpu_time': 10.25, 'bytes_read': 0,
+                            'bytes_written': 3 * 1024 * 1024, 'items_per_second': 40.0},
+                'sub_steps': [{
+                    'step_type': 'symlinks', 'description': '', 'state': 'FINISHED',
+                    'metrics': {'wall_time': 2.0, 'cpu_time': 1.0, 'bytes_read': 512,
+                                'bytes_written': 2048, 'items_per_second': None}}]
+            }],
+            'other': {'state': 'FINISHED'}
+        }
+        self.server_mock.request.return_value = (200, report)
+
+        # Test
+        self.all_tasks_section.details(**{'task-id': report['task_id'], 'timings': True})
+
+        # Verify
+        self.assertTrue('yum_distributor\n' in self.recorder.lines)
+        self.assertTrue('  Publishing RPMs [FINISHED]: 12.500s, 10.250s CPU, 0 B read, 3.0 MiB '
+                        'written, 40.0 items/sec\n' in self.recorder.lines)
+        self.assertTrue('    symlinks [FINISHED]: 2.000s, 1.000s CPU, 512 B read, 2.0 KiB '
+                        'written\n' in self.recorder.lines)
+
+    def test_details_timings_unavailable(self):
+        # Setup
+        report = copy.copy(EXAMPLE_CALL_REPORT)
+        self.server_mock.request.return_value = (200, report)
+
+        # Test
+        self.all_tasks_section.details(**{'task-id': report['task_id'], 'timings': True})
+
+        # Verify
+        self.assertTrue('No step timings are available for this task.\n' in self.recorder.lines)
+
     def test_details_task_not_found(self):
         # Setup
         self.server_mock.request.return_value = (404, {})
@@ -6,6 +6,7 @@ import time
 from gettext import gettext as _
 
 from pulp.client.extensions.extensions import PulpCliCommand, PulpCliFlag
+from pulp.bindings.exceptions import NotFoundException
 from pulp.bindings.responses import Task
 
 # Returned from the poll command if one or more of the tasks in the given list
@@ -22,6 +23,10 @@ DESC_BACKGROUND = _('if specified, the client process will end immediately (the
                     'continue to run on the server)')
 FLAG_BACKGROUND = PulpCliFlag('--bg', DESC_BACKGROUND)
 
+# Maximum number of seconds the server is asked to hold a request open while waiting for a task
+# to change. This is kept short so the spinners are still refreshed while a task is idle.
+CHANGES_TIMEOUT_IN_SECONDS = 5
+
 
 class PollingCommand(PulpCliCommand):
     """
@@ -32,8 +37,15 @@ class PollingCommand(PulpCliCommand):
     If the poll_frequency_in_seconds is not specified, it will be loaded from
     the configuration under output -> poll_frequency_in_seconds.
 
+    Rather than repeatedly retrieving the full task, the command asks the server to wait for
+    the task to change and to return only the changes. If the server does not support this,
+    the command falls back to polling at the configured frequency.
+
     :ivar context: the client context
     :type context: pulp.client.extensions.core.ClientContext
+    :ivar wait_for_changes: if True, the server is asked to wait for task changes; this is
+                            disabled automatically if the server does not support it
+    :type wait_for_changes: bool
     """
 
     def __init__(self, name, description, method, context, poll_frequency_in_seconds=None):
@@ -64,6 +76,8 @@ class PollingCommand(PulpCliCommand):
         # list of tasks we already know about
         self.known_tasks = set()
 
+        self.wait_for_changes = True
+
     def poll(self, task_list, user_input):
         """
         Entry point to begin polling on the tasks in the given list. Each task will be polled
@@ -210,10 +224,7 @@ class PollingCommand(PulpCliCommand):
                     first_run = False
                 self.progress(task, running_spinner)
 
-            time.sleep(self.poll_frequency_in_seconds)
-
-            response = self.context.server.tasks.get_task(task.task_id)
-            task = response.response_body
+            task = self._next_task_state(task)
 
         # One final call to update the progress with the end state. It's possible the run state
         # was never hit in the loop above, so we check for first_run again for the missing blank
@@ -225,6 +236,33 @@ class PollingCommand(PulpCliCommand):
 
         return task
 
+    def _next_task_state(self, task):
+        """
+        Retrieves the next state of the given task. If supported by the server, this waits on
+        the server for the task to change; otherwise the task is retrieved again after sleeping
+        for the poll frequency.
+
+        :param task: the most recent known state of the task
+        :type  task: pulp.bindings.responses.Task
+
+        :return: the next state of the task
+        :rtype:  pulp.bindings.responses.Task
+        """
+        if self.wait_for_changes:
+            try:
+                response = self.context.server.tasks.get_task_changes(
+                    task, timeout=CHANGES_TIMEOUT_IN_SECONDS)
+                return response.response_body
+            except NotFoundException:
+                # Either the server predates the task changes API or the task is gone; in the
+                # latter case the regular retrieval below will raise the error.
+                self.wait_for_changes = False
+
+        time.sleep(self.poll_frequency_in_seconds)
+
+        response = self.context.server.tasks.get_task(task.task_id)
+        return response.response_body
+
     def task_header(self, task):
         """
         Displays information to the user to indicate which task is about to be tracked.
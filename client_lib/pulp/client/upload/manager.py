@@ -9,11 +9,29 @@ import copy
 import errno
 import os
 import pickle
+import Queue
+import sys
+import threading
+import time
+import zlib
 
+from pulp.bindings.exceptions import RequestException
 from pulp.common.lock import LockFile
 
 
-DEFAULT_CHUNKSIZE = 1048576  # 1 MB per upload call
+DEFAULT_CHUNKSIZE = 1048576  # 1 MB per upload call to start with
+MAX_CHUNKSIZE = 16777216  # 16 MB is the most the chunk size grows to
+DEFAULT_CONCURRENCY = 4  # number of upload calls in flight at once
+
+# Number of seconds each upload call should take; the chunk size is doubled while calls take
+# less than half of this and halved while they take more than twice this
+SEGMENT_TIME = 2
+
+# Number of seconds between saves of the tracker file while an upload runs
+TRACKER_SAVE_INTERVAL = 5
+
+# Number of bytes read at a time when checksumming data that isn't uploaded
+CHECKSUM_BLOCK_SIZE = 1048576
 
 
 class ManagerUninitializedException(Exception):
@@ -71,7 +89,8 @@ class UploadManager(object):
     on disk state files.
     """
 
-    def __init__(self, upload_working_dir, bindings, chunk_size=DEFAULT_CHUNKSIZE):
+    def __init__(self, upload_working_dir, bindings, chunk_size=DEFAULT_CHUNKSIZE,
+                 concurrency=DEFAULT_CONCURRENCY, max_chunk_size=MAX_CHUNKSIZE):
         """
         @param upload_working_dir: directory in which to store client-side files
                to track upload requests; if it doesn't exist it will be created
@@ -81,13 +100,22 @@ class UploadManager(object):
         @param bindings: server bindings from the client context
         @type  bindings: Bindings
 
-        @param chunk_size: size in bytes of data to upload on each call to the
-               server
+        @param chunk_size: size in bytes of data to upload on the first calls to
+               the server; it is never reduced below this value
         @type  chunk_size: int
+
+        @param concurrency: number of upload calls to the server in flight at once
+        @type  concurrency: int
+
+        @param max_chunk_size: size in bytes up to which the data uploaded on
+               each call grows while calls complete quickly
+        @type  max_chunk_size: int
         """
         self.upload_working_dir = upload_working_dir
         self.bindings = bindings
         self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.max_chunk_size = max_chunk_size
 
         # Internal state
         self.tracker_files = {}
@@ -183,16 +211,22 @@ class UploadManager(object):
         """
         Begins or resumes the upload process for the given upload request.
         This call will not return until the upload is complete. The other
-        expected exit point is a KeyboardError to kill the process. The
-        client-side on disk tracker files will store the current offset and
-        resume the upload from where it left off on the next call to this method.
+        expected exit point is a KeyboardError to kill the process.
+
+        The file is uploaded in segments, several of which are in flight at
+        once. The size of the segments starts at chunk_size and adapts to how
+        long each upload call takes. When resuming, the server is asked which
+        ranges of the file it already has so only the missing ranges are sent;
+        servers that cannot report this resume from the offset stored in the
+        client-side on disk tracker file. A CRC32 of the entire file is
+        calculated along the way and sent with the import call so the server
+        can verify the data it received.
 
         The callback_func is used to get feedback on the upload process. After
         each successful upload segment call to the server, this function
-        will be invoked with the new offset in the file and the file size
-        (intended to be fed into a progress indicator). As this is called
-        after each upload segment call, the granularity at which it is called
-        depends on the chunk_size value for this instance.
+        will be invoked with the number of bytes of the file the server has
+        received and the file size (intended to be fed into a progress
+        indicator).
 
         The callback_func should have a signature of (int, int).
 
@@ -231,27 +265,22 @@ class UploadManager(object):
             # Flag the upload request as running so other processes don't
             # attempt to run it as well
             tracker_file.is_running = True
+            resuming = getattr(tracker_file, 'is_started', tracker_file.offset)
+            tracker_file.is_started = True
             tracker_file.save()
 
             source_file_size = os.path.getsize(tracker_file.source_filename)
+            received = []
+            if resuming:
+                received = self._received_ranges(tracker_file, source_file_size)
 
-            f = open(tracker_file.source_filename, 'r')
-            while True:
-                # Load the chunk to upload
-                f.seek(tracker_file.offset)
-                data = f.read(self.chunk_size)
-                if not data:
-                    break
-
-                # Server request
-                self.bindings.uploads.upload_segment(upload_id, tracker_file.offset, data)
-
-                # Status update and callback notification
-                tracker_file.offset = min(tracker_file.offset + self.chunk_size, source_file_size)
-                tracker_file.save()
-
-                callback_func(tracker_file.offset, source_file_size)
+            reader = SegmentReader(tracker_file.source_filename, received, source_file_size)
+            try:
+                self._upload_segments(tracker_file, reader, received, callback_func)
+            finally:
+                reader.close()
 
+            tracker_file.upload_checksum = reader.checksum
             tracker_file.is_finished_uploading = True
         finally:
             # Regardless of how this ends, it's no longer running, so make sure
@@ -281,9 +310,12 @@ class UploadManager(object):
         if tracker.source_filename and not tracker.is_finished_uploading:
             raise IncompleteUploadException()
 
+        # trackers saved by older versions have no checksum
+        upload_checksum = getattr(tracker, 'upload_checksum', None)
+
         response = self.bindings.uploads.import_upload(
             upload_id, tracker.repo_id, tracker.unit_type_id, tracker.unit_key,
-            tracker.unit_metadata, tracker.override_config)
+            tracker.unit_metadata, tracker.override_config, upload_checksum)
 
         return response
 
@@ -369,6 +401,180 @@ class UploadManager(object):
         self._uncache_tracker_file(tracker)
         tracker.delete()
 
+    def _received_ranges(self, tracker_file, source_file_size):
+        """
+        Determines which ranges of the source file the server has already
+        received. Servers that cannot report the ranges they received are
+        assumed to have everything up to the offset in the tracker file.
+
+        @param tracker_file: tracker for the upload
+        @type  tracker_file: UploadTracker
+
+        @param source_file_size: size of the file being uploaded
+        @type  source_file_size: int
+
+        @return: sorted list of disjoint (start, end) offset pairs
+        @rtype:  list
+        """
+        try:
+            response = self.bindings.uploads.get_upload(tracker_file.upload_id)
+            ranges = response.response_body['ranges']
+        except (RequestException, KeyError):
+            return [(0, tracker_file.offset or 0)]
+
+        return [(start, min(end, source_file_size)) for start, end in ranges
+                if start < source_file_size]
+
+    def _upload_segments(self, tracker_file, reader, received, callback_func):
+        """
+        Uploads the segments produced by the reader using a pool of worker
+        threads, keeping up to concurrency upload calls in flight. The offset
+        in the tracker file is advanced as the contiguous range of the file
+        received by the server grows and the tracker is saved periodically.
+
+        @param tracker_file: tracker for the upload
+        @type  tracker_file: UploadTracker
+
+        @param reader: reader producing the segments to upload
+        @type  reader: SegmentReader
+
+        @param received: ranges of the file already received by the server
+        @type  received: list
+
+        @param callback_func: optional method to be called after each upload
+               call to the server
+        @type  callback_func: func
+        """
+        segments = Queue.Queue()
+        results = Queue.Queue()
+        workers = []
+        for i in range(max(self.concurrency, 1)):
+            worker = threading.Thread(target=self._upload_worker,
+                                      args=(tracker_file.upload_id, segments, results))
+            worker.setDaemon(True)
+            worker.start()
+            workers.append(worker)
+
+        # Ends of the ranges the server has, keyed by their start, that are not
+        # yet part of the contiguous range at the start of the file
+        completed = dict(received)
+        tracker_file.offset = 0
+        while tracker_file.offset in completed:
+            tracker_file.offset = completed.pop(tracker_file.offset)
+
+        uploaded = sum(end - start for start, end in received)
+        chunk_size = self.chunk_size
+        in_flight = 0
+        last_saved = time.time()
+
+        try:
+            while True:
+                if in_flight < len(workers):
+                    segment = reader.read(chunk_size)
+                    if segment is not None:
+                        segments.put(segment)
+                        in_flight += 1
+                        continue
+
+                if not in_flight:
+                    break
+
+                offset, end, elapsed, exc_info = self._next_result(results)
+                in_flight -= 1
+                if exc_info is not None:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+
+                # Status update and callback notification
+                completed[offset] = end
+                while tracker_file.offset in completed:
+                    tracker_file.offset = completed.pop(tracker_file.offset)
+                uploaded += end - offset
+
+                if time.time() - last_saved >= TRACKER_SAVE_INTERVAL:
+                    tracker_file.save()
+                    last_saved = time.time()
+
+                chunk_size = self._adapt_chunk_size(chunk_size, elapsed)
+
+                if callback_func is not None:
+                    callback_func(uploaded, reader.file_size)
+        finally:
+            # Drop anything not yet sent and stop the workers
+            try:
+                while True:
+                    segments.get_nowait()
+            except Queue.Empty:
+                pass
+            for worker in workers:
+                segments.put(None)
+
+    def _upload_worker(self, upload_id, segments, results):
+        """
+        Target of the upload worker threads. Uploads segments taken from the
+        segments queue until None is taken and reports the outcome of each
+        upload call to the results queue as a tuple of the start and end of
+        the segment, the number of seconds the call took and the exception
+        info if it failed.
+
+        @param upload_id: identifies the upload request
+        @type  upload_id: str
+
+        @param segments: queue of (offset, data) tuples to upload
+        @type  segments: Queue.Queue
+
+        @param results: queue to which the outcome of each upload call is put
+        @type  results: Queue.Queue
+        """
+        while True:
+            segment = segments.get()
+            if segment is None:
+                return
+            offset, data = segment
+            started = time.time()
+            try:
+                self.bindings.uploads.upload_segment(upload_id, offset, data)
+            except Exception:
+                results.put((offset, offset + len(data), None, sys.exc_info()))
+            else:
+                results.put((offset, offset + len(data), time.time() - started, None))
+
+    @staticmethod
+    def _next_result(results):
+        """
+        Waits for the next result of an upload call. The wait is done in short
+        intervals so the main thread remains responsive to KeyboardInterrupt.
+
+        @param results: queue of upload call outcomes
+        @type  results: Queue.Queue
+
+        @return: the next outcome
+        @rtype:  tuple
+        """
+        while True:
+            try:
+                return results.get(True, 1)
+            except Queue.Empty:
+                pass
+
+    def _adapt_chunk_size(self, chunk_size, elapsed):
+        """
+        Adjusts the chunk size so upload calls take about SEGMENT_TIME seconds.
+
+        @param chunk_size: current chunk size
+        @type  chunk_size: int
+
+        @param elapsed: number of seconds the last upload call took
+        @type  elapsed: float
+
+        @return: the chunk size to use for the next upload call
+        @rtype:  int
+        """
+        if elapsed < SEGMENT_TIME / 2.0:
+            return max(min(chunk_size * 2, self.max_chunk_size), chunk_size)
+        if elapsed > SEGMENT_TIME * 2:
+            return max(chunk_size / 2, self.chunk_size)
+        return chunk_size
+
     def _tracker_filename(self, upload_id):
         return os.path.join(self.upload_working_dir, upload_id)
 
@@ -397,8 +603,9 @@ class UploadTracker(object):
         # Upload call information
         self.upload_id = None
         self.location = None  # URL to the upload request on the server
-        self.offset = None  # start of next chunk to upload
+        self.offset = None  # end of the data uploaded from the start of the file
         self.source_filename = None  # path on disk to the file to upload
+        self.upload_checksum = None  # CRC32 of the file calculated while uploading
 
         # Import call information
         self.repo_id = None
@@ -408,6 +615,7 @@ class UploadTracker(object):
 
         # State information
         self.is_running = False
+        self.is_started = False
         self.is_finished_uploading = False
 
     def save(self):
@@ -450,3 +658,87 @@ class UploadTracker(object):
         f.close()
 
         return status_file
+
+
+class SegmentReader(object):
+    """
+    Reads the segments of a file that the server has not yet received, in
+    order, calculating a CRC32 of the entire file along the way. Ranges the
+    server already has are read only to checksum them.
+    """
+
+    def __init__(self, filename, received, file_size):
+        """
+        @param filename: full path to the file being uploaded
+        @type  filename: str
+
+        @param received: sorted list of disjoint (start, end) ranges of the
+               file already received by the server
+        @type  received: list
+
+        @param file_size: size of the file
+        @type  file_size: int
+        """
+        self.file_size = file_size
+        self.position = 0
+        self.crc = 0
+        self.received = list(received)
+        self.fp = open(filename, 'rb')
+
+    @property
+    def checksum(self):
+        """
+        @return: hex digest of the CRC32 of the data read so far
+        @rtype:  str
+        """
+        return '%08x' % (self.crc & 0xffffffff)
+
+    def read(self, chunk_size):
+        """
+        Reads the next segment to upload.
+
+        @param chunk_size: maximum size of the segment
+        @type  chunk_size: int
+
+        @return: (offset, data) tuple; None once the whole file has been read
+        @rtype:  tuple
+        """
+        while self.received and self.received[0][0] <= self.position:
+            start, end = self.received.pop(0)
+            self._skip(end)
+
+        if self.received:
+            end = self.received[0][0]
+        else:
+            end = self.file_size
+
+        if self.position >= end:
+            return None
+
+        offset = self.position
+        self.fp.seek(offset)
+        data = self.fp.read(min(chunk_size, end - offset))
+        if not data:
+            return None
+        self.crc = zlib.crc32(data, self.crc)
+        self.position += len(data)
+        return offset, data
+
+    def close(self):
+        self.fp.close()
+
+    def _skip(self, end):
+        """
+        Checksums the data between the current position and end without
+        returning it.
+
+        @param end: offset at which to stop
+        @type  end: int
+        """
+        self.fp.seek(self.position)
+        while self.position < end:
+            data = self.fp.read(min(CHECKSUM_BLOCK_SIZE, end - self.position))
+            if not data:
+                break
+            self.crc = zlib.crc32(data, self.crc)
+            self.position += len(data)
@@ -1,5 +1,6 @@
 import mock
 
+from pulp.bindings.exceptions import NotFoundException
 from pulp.bindings.responses import (
     Task, STATE_WAITING, STATE_CANCELED, STATE_ERROR, STATE_FINISHED,
     STATE_RUNNING, STATE_SKIPPED, STATE_ACCEPTED)
@@ -43,6 +44,7 @@ class PollingCommandTests(base.PulpClientTests):
         # Setup
         sim = TaskSimulator()
         sim.install(self.bindings)
+        self.command.wait_for_changes = False
 
         task_id = '123'
         state_progression = [STATE_WAITING,
@@ -75,6 +77,59 @@ class PollingCommandTests(base.PulpClientTests):
         self.assertEqual(1, len(completed_tasks))
         self.assertEqual(STATE_FINISHED, completed_tasks[0].state)
 
+    @mock.patch('time.sleep')
+    def test_poll_single_task_waits_for_changes(self, mock_sleep):
+        """
+        Task Count: 1
+        Statuses: None; normal progression of waiting to running to completed
+        Result: Success
+
+        The server is asked to wait for each change, so the client never sleeps.
+        """
+
+        # Setup
+        sim = TaskSimulator()
+        sim.install(self.bindings)
+        sim.get_task_changes = mock.MagicMock(side_effect=sim.get_task_changes)
+
+        state_progression = [STATE_WAITING, STATE_RUNNING, STATE_FINISHED]
+        sim.add_task_states('123', state_progression)
+
+        # Test
+        task_list = sim.get_all_tasks().response_body
+        completed_tasks = self.command.poll(task_list, {})
+
+        # Verify
+        self.assertEqual(0, mock_sleep.call_count)
+        self.assertEqual(2, sim.get_task_changes.call_count)
+        self.assertEqual(sim.get_task_changes.call_args[1], {'timeout': 5})
+        self.assertTrue(self.command.wait_for_changes)
+        self.assertEqual(STATE_FINISHED, completed_tasks[0].state)
+
+    @mock.patch('time.sleep')
+    def test_poll_single_task_changes_not_supported(self, mock_sleep):
+        """
+        If the server does not support waiting for task changes, polling is used instead.
+        """
+
+        # Setup
+        sim = TaskSimulator()
+        sim.install(self.bindings)
+        sim.get_task_changes = mock.MagicMock(side_effect=NotFoundException({}))
+
+        state_progression = [STATE_WAITING, STATE_RUNNING, STATE_RUNNING, STATE_FINISHED]
+        sim.add_task_states('123', state_progression)
+
+        # Test
+        task_list = sim.get_all_tasks().response_body
+        completed_tasks = self.command.poll(task_list, {})
+
+        # Verify
+        self.assertEqual(1, sim.get_task_changes.call_count)
+        self.assertEqual(3, mock_sleep.call_count)
+        self.assertFalse(self.command.wait_for_changes)
+        self.assertEqual(STATE_FINISHED, completed_tasks[0].state)
+
     def test_poll_task_list(self):
         """
         Task Count: 3
@@ -3,6 +3,7 @@ import math
 import os
 import shutil
 import unittest
+import zlib
 
 import mock
 
@@ -236,6 +237,8 @@ class UploadManagerTests(unittest.TestCase):
     def test_upload_multiple_passes(self):
         # Setup
         self.upload_manager.chunk_size = 100
+        self.upload_manager.max_chunk_size = 100
+        self.upload_manager.concurrency = 1
         self.upload_manager.initialize()
         upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
                                                           {'k': 'v'}, 'm-1')
@@ -289,6 +292,118 @@ class UploadManagerTests(unittest.TestCase):
         tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
         self.assertEqual(rpm_size, tracker.offset)
 
+    def test_upload_parallel(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.max_chunk_size = 100
+        self.upload_manager.concurrency = 4
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        mock_callback = mock.Mock()
+
+        # Test
+        self.upload_manager.upload(upload_id, mock_callback)
+
+        # Verify
+        contents = open(TEST_RPM_FILENAME, 'rb').read()
+        segments = sorted(c[0][1:] for c in self.mock_upload_bindings.upload_segment.call_args_list)
+        self.assertEqual(contents, ''.join(data for offset, data in segments))
+        self.assertEqual([i * 100 for i in range(len(segments))],
+                         [offset for offset, data in segments])
+
+        progress = [c[0][0] for c in mock_callback.call_args_list]
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(len(contents), progress[-1])
+
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        self.assertEqual(len(contents), tracker.offset)
+        self.assertEqual('%08x' % (zlib.crc32(contents) & 0xffffffff), tracker.upload_checksum)
+        self.assertTrue(tracker.is_finished_uploading)
+        self.assertFalse(tracker.is_running)
+
+    def test_upload_adapts_chunk_size(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.max_chunk_size = 400
+        self.upload_manager.concurrency = 1
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+
+        # Test
+        self.upload_manager.upload(upload_id, mock.Mock())
+
+        # Verify
+        sizes = [len(c[0][2]) for c in self.mock_upload_bindings.upload_segment.call_args_list]
+        self.assertEqual([100, 200, 400, 400], sizes[:4])
+
+        self.assertEqual(200, self.upload_manager._adapt_chunk_size(400, 60))
+        self.assertEqual(100, self.upload_manager._adapt_chunk_size(100, 60))
+        self.assertEqual(200, self.upload_manager._adapt_chunk_size(200, upload_util.SEGMENT_TIME))
+
+    def test_upload_resume_missing_ranges(self):
+        # Setup
+        self.upload_manager.chunk_size = 1000
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        tracker.is_started = True
+        tracker.offset = 100
+        contents = open(TEST_RPM_FILENAME, 'rb').read()
+        size = len(contents)
+        body = {'ranges': [[0, 100], [150, size - 10]]}
+        self.mock_upload_bindings.get_upload.return_value = Response(200, body)
+        mock_callback = mock.Mock()
+
+        # Test
+        self.upload_manager.upload(upload_id, mock_callback)
+
+        # Verify
+        self.mock_upload_bindings.get_upload.assert_called_once_with(upload_id)
+        segments = sorted(c[0][1:] for c in self.mock_upload_bindings.upload_segment.call_args_list)
+        self.assertEqual([(100, contents[100:150]), (size - 10, contents[size - 10:])], segments)
+        self.assertEqual(size, mock_callback.call_args_list[-1][0][0])
+
+        self.assertEqual(size, tracker.offset)
+        self.assertEqual('%08x' % (zlib.crc32(contents) & 0xffffffff), tracker.upload_checksum)
+
+    def test_upload_resume_older_server(self):
+        # Setup
+        self.upload_manager.chunk_size = upload_util.DEFAULT_CHUNKSIZE
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        tracker.is_started = True
+        tracker.offset = 100
+        self.mock_upload_bindings.get_upload.side_effect = NotFoundException({})
+
+        # Test
+        self.upload_manager.upload(upload_id, mock.Mock())
+
+        # Verify
+        contents = open(TEST_RPM_FILENAME, 'rb').read()
+        self.assertEqual(1, self.mock_upload_bindings.upload_segment.call_count)
+        self.assertEqual((upload_id, 100, contents[100:]),
+                         self.mock_upload_bindings.upload_segment.call_args[0])
+        self.assertEqual('%08x' % (zlib.crc32(contents) & 0xffffffff), tracker.upload_checksum)
+
+    def test_upload_segment_failure(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.max_chunk_size = 100
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        self.mock_upload_bindings.upload_segment.side_effect = ValueError()
+
+        # Test
+        self.assertRaises(ValueError, self.upload_manager.upload, upload_id, mock.Mock())
+
+        # Verify
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        self.assertEqual(0, tracker.offset)
+        self.assertFalse(tracker.is_finished_uploading)
+        self.assertFalse(tracker.is_running)
+        self.assertTrue(tracker.is_started)
+
     def test_upload_concurrent_upload(self):
         # Setup
         self.upload_manager.initialize()
@@ -392,6 +507,7 @@ class UploadManagerTests(unittest.TestCase):
         self.assertEqual(args[2], 't')
         self.assertEqual(args[3], {'k': 'v'})
         self.assertEqual(args[4], 'm')
+        self.assertEqual(args[6], None)
 
     def test_import_upload_incomplete_upload(self):
         # Setup
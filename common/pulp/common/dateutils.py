@@ -11,15 +11,27 @@ from gettext import gettext as _
 
 import isodate
 from isodate.duration import fquotmod, max_days_in_month
+from isodate.isotzinfo import build_tzinfo
 
 
 _iso8601_delimiter = re.compile(r'(--|/)')
 _iso8601_recurrences = re.compile(r'^R(?P<num>\d+)$')
 
+# the complete extended format used by format_iso8601_datetime, optionally with fractional
+# seconds; any other format is left to isodate
+_iso8601_datetime = re.compile(r'^(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{1,6}))?'
+                               r'(Z|[+-]\d\d:\d\d)?$')
+
+# the number of parsed intervals that are remembered; schedules parse the same few constantly
+INTERVAL_CACHE_SIZE = 256
+_interval_cache = {}
+
 _VALID_DELTA_KEYS = ('years', 'months', 'weeks', 'days', 'hours', 'minutes', 'seconds')
 
 SECONDS_IN_A_DAY = 86400
 
+_ZERO = datetime.timedelta(0)
+
 
 def local_tz():
     """
@@ -172,6 +184,13 @@ def parse_iso8601_datetime(datetime_str):
     @param datetime_str: iso8601 datetime string to parse
     @rtype: datetime.datetime instance
     """
+    match = _iso8601_datetime.match(datetime_str)
+    if match is not None:
+        try:
+            return _build_datetime(*match.groups())
+        except ValueError:
+            # out of range values; let isodate report them
+            pass
     try:
         return isodate.parse_datetime(datetime_str)
     except (ValueError, isodate.ISO8601Error):
@@ -179,6 +198,23 @@ def parse_iso8601_datetime(datetime_str):
         raise isodate.ISO8601Error(msg), None, sys.exc_info()[2]
 
 
+def _build_datetime(year, month, day, hour, minute, second, fraction, tz):
+    """
+    Build a datetime from the fields of a datetime string in the complete
+    extended format, the same way isodate would.
+    @rtype: datetime.datetime instance
+    """
+    microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+    if tz is None:
+        tzinfo = None
+    elif tz == 'Z':
+        tzinfo = isodate.UTC
+    else:
+        tzinfo = build_tzinfo(tz, tz[0], int(tz[1:3]), int(tz[4:6]))
+    return datetime.datetime(int(year), int(month), int(day), int(hour), int(minute),
+                             int(second), microsecond, tzinfo)
+
+
 def parse_iso8601_datetime_or_date(value):
     """
     Parse an iso8601 string into either a datetime even if it only contains
@@ -215,6 +251,8 @@ def parse_iso8601_duration(duration_str):
 def parse_iso8601_interval(interval_str):
     """
     Parse an iso8601 time interval string.
+    The most recently parsed intervals are remembered, so the returned values
+    must not be modified.
     @type interval_str: str
     @param interval_str: iso8601 time interval string to parse
     @rtype: tuple of (int or None, datetime.datetime or None, datetime.timedelta)
@@ -222,6 +260,24 @@ def parse_iso8601_interval(interval_str):
              interval or None if not present, and number of recurrences of the
              interval or None if notpresent
     """
+    try:
+        return _interval_cache[interval_str]
+    except KeyError:
+        pass
+    interval = _parse_iso8601_interval(interval_str)
+    if len(_interval_cache) >= INTERVAL_CACHE_SIZE:
+        _interval_cache.clear()
+    _interval_cache[interval_str] = interval
+    return interval
+
+
+def _parse_iso8601_interval(interval_str):
+    """
+    Parse an iso8601 time interval string without consulting the cache.
+    @type interval_str: str
+    @param interval_str: iso8601 time interval string to parse
+    @rtype: tuple of (int or None, datetime.datetime or None, datetime.timedelta)
+    """
     # iso8601 supports a number of different time interval formats, however,
     # only one is really useful to pulp:
     # <recurrences>/<start time>/<interval duration>
@@ -278,6 +334,18 @@ def format_iso8601_datetime(dt):
     @rtype: str
     @return: iso8601 representation of the passed in datetime instance
     """
+    if isinstance(dt, datetime.datetime):
+        # format naive and UTC datetimes directly, as isodate would
+        offset = dt.utcoffset()
+        if offset is None:
+            tz = ''
+        elif offset == _ZERO and dt.dst() == _ZERO:
+            tz = 'Z'
+        else:
+            tz = None
+        if tz is not None:
+            return '%04d-%02d-%02dT%02d:%02d:%02d%s' % (dt.year, dt.month, dt.day, dt.hour,
+                                                        dt.minute, dt.second, tz)
     return isodate.strftime(dt, isodate.DT_EXT_COMPLETE)
 
 
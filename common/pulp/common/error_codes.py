@@ -128,6 +128,9 @@ PLP0049 = Error(
     _('Worker terminated abnormally while processing task %(task_id)s.  '
       'Check the logs for details'),
     ['task_id'])
+PLP0050 = Error("PLP0050", _("The %(content_type)s profile for consumer %(consumer_id)s no longer "
+                             "matches the base hash %(base_hash)s; the full profile must be sent."),
+                ['consumer_id', 'content_type', 'base_hash'])
 
 # Create a section for general validation errors (PLP1000 - PLP2999)
 # Validation problems should be reported with a general PLP1000 error with a more specific
@@ -13,6 +13,13 @@ PROGRESS_DETAILS_KEY = u'details'
 PROGRESS_STATE_KEY = u'state'
 PROGRESS_ERROR_DETAILS_KEY = u'error_details'
 PROGRESS_SUB_STEPS_KEY = u'sub_steps'
+PROGRESS_METRICS_KEY = u'metrics'
+
+METRICS_WALL_TIME_KEY = u'wall_time'
+METRICS_CPU_TIME_KEY = u'cpu_time'
+METRICS_BYTES_READ_KEY = u'bytes_read'
+METRICS_BYTES_WRITTEN_KEY = u'bytes_written'
+METRICS_ITEMS_PER_SECOND_KEY = u'items_per_second'
 
 STATE_NOT_STARTED = u'NOT_STARTED'
 STATE_RUNNING = u'IN_PROGRESS'
@@ -0,0 +1,59 @@
+"""
+Microbenchmarks for the ISO8601 functions in pulp.common.dateutils.
+
+Each function is timed against the isodate implementation it used to delegate
+every call to. Run it from the common directory:
+
+    python test/benchmarks/bench_dateutils.py [--number N]
+"""
+
+from optparse import OptionParser
+import timeit
+
+import isodate
+
+from pulp.common import dateutils
+
+
+DATETIME_STR = '2016-03-14T15:09:26Z'
+FRACTION_STR = '2016-03-14T15:09:26.535897+01:00'
+DATETIME = dateutils.parse_iso8601_datetime(DATETIME_STR)
+INTERVAL_STR = '2016-03-14T15:09:26Z/PT1H'
+
+# name, new implementation, previous implementation
+BENCHMARKS = [
+    ('parse datetime',
+     lambda: dateutils.parse_iso8601_datetime(DATETIME_STR),
+     lambda: isodate.parse_datetime(DATETIME_STR)),
+    ('parse datetime with fraction and offset',
+     lambda: dateutils.parse_iso8601_datetime(FRACTION_STR),
+     lambda: isodate.parse_datetime(FRACTION_STR)),
+    ('format datetime',
+     lambda: dateutils.format_iso8601_datetime(DATETIME),
+     lambda: isodate.strftime(DATETIME, isodate.DT_EXT_COMPLETE)),
+    ('parse interval',
+     lambda: dateutils.parse_iso8601_interval(INTERVAL_STR),
+     lambda: dateutils._parse_iso8601_interval(INTERVAL_STR)),
+]
+
+
+def run(number):
+    """
+    Time each benchmark and print the time per call of both implementations.
+
+    :param number: the number of calls timed for each implementation
+    :type  number: int
+    """
+    print '%-42s %12s %12s %8s' % ('benchmark', 'new (us)', 'old (us)', 'speedup')
+    for name, new, old in BENCHMARKS:
+        new_time = min(timeit.repeat(new, number=number, repeat=3)) / number * 1e6
+        old_time = min(timeit.repeat(old, number=number, repeat=3)) / number * 1e6
+        print '%-42s %12.2f %12.2f %7.1fx' % (name, new_time, old_time, old_time / new_time)
+
+
+if __name__ == '__main__':
+    parser = OptionParser()
+    parser.add_option('--number', type='int', default=20000,
+                      help='number of calls timed for each implementation')
+    options, args = parser.parse_args()
+    run(options.number)
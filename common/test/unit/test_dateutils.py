@@ -125,6 +125,47 @@ class ISO8601Tester(unittest.TestCase):
         self.assertEqual(t1, t2)
         self.assertEqual(r1, r2)
 
+    def test_datetime_matches_isodate(self):
+        for s in ('2016-01-02T03:04:05', '2016-01-02T03:04:05Z', '2016-01-02T03:04:05.5Z',
+                  '2016-01-02T03:04:05.123456+05:30', '2016-01-02T03:04:05-00:30',
+                  '0016-01-02T03:04:05+00:00', '20160102T030405Z', '2016-01-02T03:04Z',
+                  '2016-01-02T03:04:05.1234567Z'):
+            expected = isodate.parse_datetime(s)
+            parsed = dateutils.parse_iso8601_datetime(s)
+            self.assertEqual(parsed, expected, s)
+            self.assertEqual(parsed.utcoffset(), expected.utcoffset(), s)
+            self.assertEqual(dateutils.format_iso8601_datetime(parsed),
+                             isodate.strftime(expected, isodate.DT_EXT_COMPLETE))
+
+    def test_datetime_format_with_offsets(self):
+        for dt in (datetime.datetime(2016, 1, 2, 3, 4, 5, tzinfo=_StdZone(-5)),
+                   datetime.datetime(2016, 1, 2, 3, 4, 5, tzinfo=_DayZone(0)),
+                   datetime.datetime(2016, 1, 2, 3, 4, 5, 6, tzinfo=_StdZone(0))):
+            self.assertEqual(dateutils.format_iso8601_datetime(dt),
+                             isodate.strftime(dt, isodate.DT_EXT_COMPLETE))
+
+    def test_datetime_invalid(self):
+        for s in ('2016-13-02T03:04:05Z', '2016-01-02T25:04:05Z', 'not a date'):
+            self.assertRaises(isodate.ISO8601Error, dateutils.parse_iso8601_datetime, s)
+
+    def test_interval_cached(self):
+        dateutils._interval_cache.clear()
+        s = '2014-11-05T00:23:00Z/PT2M'
+        parsed = dateutils.parse_iso8601_interval(s)
+        self.assertTrue(dateutils.parse_iso8601_interval(s) is parsed)
+        self.assertEqual(parsed, dateutils._parse_iso8601_interval(s))
+
+    def test_interval_cache_bounded(self):
+        dateutils._interval_cache.clear()
+        for n in range(dateutils.INTERVAL_CACHE_SIZE + 1):
+            dateutils.parse_iso8601_interval('PT%dM' % (n + 1))
+        self.assertTrue(len(dateutils._interval_cache) <= dateutils.INTERVAL_CACHE_SIZE)
+
+    def test_interval_invalid_not_cached(self):
+        dateutils._interval_cache.clear()
+        self.assertRaises(isodate.ISO8601Error, dateutils.parse_iso8601_interval, 'R2/R3/PT1H')
+        self.assertEqual(dateutils._interval_cache, {})
+
 
 class TestParseDatetimeOrDate(unittest.TestCase):
     def test_value_error(self):
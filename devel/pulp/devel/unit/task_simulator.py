@@ -123,6 +123,17 @@ class TaskSimulator(object):
 
         return response
 
+    def get_task_changes(self, task, timeout=None):
+        """
+        Returns the next state for the given task, as if the server had waited for it to change.
+
+        :return: response object as if the bindings had contacted the server
+        :rtype:  pulp.bindings.response.Response
+
+        :raises ValueError: if no states are defined for the given task ID
+        """
+        return self.get_task(task.task_id)
+
     def get_all_tasks(self, tags=()):
         """
         Returns the next state for all tasks that match the given tags, if any. The index
@@ -1,4 +1,6 @@
 from pulp_node import constants
+from pulp_node import manifest
+from pulp_node.spool import Spool, SortedSpool
 
 
 class UniqueKey(object):
@@ -31,57 +33,216 @@ class UniqueKey(object):
 class UnitInventory(object):
     """
     The unit inventory contains both the parent and child inventory
-    of content units associated with a specific repository.  Each is contained
-    within a dictionary keyed by {UnitKey} to ensure uniqueness.
+    of content units associated with a specific repository.  Neither is held
+    in memory.  Both are written to disk sorted by unit_uid() and compared
+    using a sorted merge.  The results of the comparison are also written to disk.
+    :ivar base_URL: The base URL for downloading parent units.
+    :type base_URL: str
+    :ivar parent_only: The UnitRef of units contained in the parent inventory
+        but not contained in the child inventory.
+    :type parent_only: Spool
+    :ivar child_only: The units contained in the child inventory
+        but not contained in the parent inventory.
+    :type child_only: Spool
+    :ivar updated: The UnitRef of units updated on the parent.
+    :type updated: Spool
     """
 
     @staticmethod
-    def _import_parent_units(units):
-        _units = {}
-        for unit, ref in units:
-            unit.pop('metadata', None)
-            key = UniqueKey(unit)
-            _units[key] = (unit, ref)
-        return _units
+    def _sorted_parent_units(units, tmp_dir):
+        records = (
+            (manifest.unit_uid(unit), unit.get(constants.LAST_UPDATED, 0), ref)
+            for unit, ref in units)
+        return SortedSpool(records, tmp_dir=tmp_dir)
 
     @staticmethod
-    def _import_child_units(units):
-        _units = {}
+    def _sorted_child_units(units, tmp_dir):
+        spool = SortedSpool(tmp_dir=tmp_dir)
         for unit in units:
             unit.pop('metadata', None)
-            key = UniqueKey(unit)
-            _units[key] = unit
-        return _units
+            spool.append((manifest.unit_uid(unit), unit.get(constants.LAST_UPDATED, 0), unit))
+        return spool
+
+    @staticmethod
+    def _unique(records):
+        """
+        Filter out records with the same uid as the previous (sorted) record.
+        """
+        last = None
+        for record in records:
+            if record[0] != last:
+                last = record[0]
+                yield record
+
+    @staticmethod
+    def _merge(parent_units, child_units):
+        """
+        Merge the sorted parent and child units.
+        :return: A generator of: (parent_record, child_record).
+            Either is None when the unit is only contained in the other inventory.
+        :rtype: generator
+        """
+        parent_units = UnitInventory._unique(parent_units)
+        child_units = UnitInventory._unique(child_units)
+        parent = next(parent_units, None)
+        child = next(child_units, None)
+        while parent is not None or child is not None:
+            if child is None or (parent is not None and parent[0] < child[0]):
+                yield parent, None
+                parent = next(parent_units, None)
+            elif parent is None or child[0] < parent[0]:
+                yield None, child
+                child = next(child_units, None)
+            else:
+                yield parent, child
+                parent = next(parent_units, None)
+                child = next(child_units, None)
 
-    def __init__(self, base_URL, parent_units, child_units):
+    def __init__(self, base_URL, parent_units, child_units, tmp_dir=None):
         """
         :param base_URL: The base URL for downloading parent units.
-        :param parent_units: The content units in the parent node.
+        :param parent_units: The content units in the parent node as (unit, ref).
+            Each unit must contain at least the type_id, unit_key and last_updated.
         :type parent_units: iterable
         :param child_units: The content units in the child node.
         :type child_units: iterable
+        :param tmp_dir: The directory in which temporary files are created.
+            The system default is used when not specified.
+        :type tmp_dir: str
         """
         self.base_URL = base_URL
-        self.parent_units = self._import_parent_units(parent_units)
-        self.child_units = self._import_child_units(child_units)
+        self.parent_only = Spool(tmp_dir)
+        self.child_only = Spool(tmp_dir)
+        self.updated = Spool(tmp_dir)
+        parent_units = self._sorted_parent_units(parent_units, tmp_dir)
+        child_units = self._sorted_child_units(child_units, tmp_dir)
+        try:
+            for parent, child in self._merge(parent_units, child_units):
+                if child is None:
+                    self.parent_only.append(parent[2])
+                    continue
+                if parent is None:
+                    self.child_only.append(child[2])
+                    continue
+                if parent[1] > child[1]:
+                    self.updated.append(parent[2])
+        finally:
+            parent_units.close()
+            child_units.close()
 
     def units_on_parent_only(self):
         """
         Listing of units contained in the parent inventory
         but not contained in the child inventory.
-        :return: List of (unit, ref).
-        :rtype: list
+        :return: Iterable of (unit, ref).
+        :rtype: Listing
         """
-        return [r for k, r in self.parent_units.items() if k not in self.child_units]
+        return Listing(self.parent_only)
 
     def units_on_child_only(self):
         """
         Listing of units contained in the child inventory
         but not contained in the parent inventory.
+        :return: Iterable of units that need to be purged.
+        :rtype: Spool
+        """
+        return self.child_only
+
+    def updated_units(self):
+        """
+        Listing of units updated on the parent.
+        :return: Iterable of (unit, ref).
+        :rtype: Listing
+        """
+        return Listing(self.updated)
+
+
+class Listing(object):
+    """
+    A listing of parent units read from the units file as they are iterated.
+    :ivar refs: The UnitRef of each listed unit.
+    :type refs: Spool
+    """
+
+    def __init__(self, refs):
+        """
+        :param refs: The UnitRef of each listed unit.
+        :type refs: Spool
+        """
+        self.refs = refs
+
+    def __iter__(self):
+        for ref in self.refs:
+            unit = ref.fetch()
+            unit.pop('metadata', None)
+            yield unit, ref
+
+    def __len__(self):
+        return len(self.refs)
+
+
+class DeltaInventory(object):
+    """
+    The delta inventory contains the content units changed on the parent
+    since the revision last synchronized by the child.  It is used in place
+    of the UnitInventory when the child can synchronize incrementally and
+    provides the same listings.  When a unit changed in more than one delta,
+    the last change wins.
+    :ivar base_URL: The base URL for downloading parent units.
+    :type base_URL: str
+    :ivar changes: The last change for each unit keyed by {UniqueKey}.
+        Each is: (action, unit, ref).
+    :type changes: dict
+    :ivar find_child_unit: Used to find a unit in the child inventory
+        by type_id and unit_key.
+    :type find_child_unit: callable
+    """
+
+    def __init__(self, base_URL, deltas, find_child_unit):
+        """
+        :param base_URL: The base URL for downloading parent units.
+        :type base_URL: str
+        :param deltas: An ordered list of iterables of (unit, ref).
+            Each unit is annotated with the delta action.
+        :type deltas: list
+        :param find_child_unit: Used to find a unit in the child inventory.
+            Called as find_child_unit(type_id, unit_key) and returns the unit
+            as a dict including the unit_id or None when not found.
+        :type find_child_unit: callable
+        """
+        self.base_URL = base_URL
+        self.changes = {}
+        self.find_child_unit = find_child_unit
+        for units in deltas:
+            for unit, ref in units:
+                unit.pop('metadata', None)
+                action = unit.pop(manifest.DELTA_ACTION)
+                self.changes[UniqueKey(unit)] = (action, unit, ref)
+
+    def _units(self, action):
+        return [(u, r) for a, u, r in self.changes.values() if a == action]
+
+    def units_on_parent_only(self):
+        """
+        Listing of units added on the parent.
+        :return: List of (unit, ref).
+        :rtype: list
+        """
+        return self._units(manifest.ADDED)
+
+    def units_on_child_only(self):
+        """
+        Listing of units removed on the parent that are contained
+        in the child inventory.
         :return: List of units that need to be purged.
         :rtype: list
         """
-        return [u for k, u in self.child_units.items() if k not in self.parent_units]
+        units = []
+        for unit, ref in self._units(manifest.REMOVED):
+            child_unit = self.find_child_unit(unit['type_id'], unit['unit_key'])
+            if child_unit is not None:
+                units.append(child_unit)
+        return units
 
     def updated_units(self):
         """
@@ -89,13 +250,4 @@ class UnitInventory(object):
         :return: List of (unit, ref).
         :rtype: list
         """
-        updated = []
-        for key, (unit, ref) in self.parent_units.items():
-            child_unit = self.child_units.get(key)
-            if child_unit is None:
-                continue
-            parent_last_updated = unit.get(constants.LAST_UPDATED, 0)
-            child_last_updated = child_unit.get(constants.LAST_UPDATED, 0)
-            if parent_last_updated > child_last_updated:
-                updated.append((unit, ref))
-        return updated
+        return self._units(manifest.CHANGED)
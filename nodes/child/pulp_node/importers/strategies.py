@@ -18,8 +18,8 @@ from pulp.server.content.sources.container import ContentContainer
 from pulp_node import constants
 from pulp_node import pathlib
 from pulp_node.conduit import NodesConduit
-from pulp_node.manifest import Manifest, RemoteManifest
-from pulp_node.importers.inventory import UnitInventory
+from pulp_node.manifest import Manifest, RemoteManifest, LINEAGE, REVISION
+from pulp_node.importers.inventory import UnitInventory, DeltaInventory
 from pulp_node.importers.download import ContentDownloadListener
 from pulp_node.error import (NodeError, GetChildUnitsError, GetParentUnitsError, AddUnitError,
                              DeleteUnitError, InvalidManifestError, CaughtException)
@@ -50,6 +50,8 @@ class Request(object):
     :type repo_id: str
     :ivar working_dir: The absolute path to a directory to be used as temporary storage.
     :type working_dir: str
+    :ivar manifest: The parent manifest used to build the inventory.
+    :type manifest: pulp_node.manifest.Manifest
     """
 
     def __init__(self, cancel_event, conduit, config, downloader, progress, summary, repo):
@@ -78,6 +80,7 @@ class Request(object):
         self.summary = summary
         self.repo_id = repo.id
         self.working_dir = repo.working_dir
+        self.manifest = None
 
     def started(self):
         """
@@ -119,6 +122,8 @@ class ImporterStrategy(object):
             _log.exception(request.repo_id)
             request.summary.errors.append(CaughtException(e, request.repo_id))
 
+        self._record_revision(request)
+
     def _synchronize(self, request):
         """
         Specific strategies defined by subclasses.
@@ -151,6 +156,104 @@ class ImporterStrategy(object):
 
     # --- protected ---------------------------------------------------------------------
 
+    def _inventory(self, request):
+        """
+        Build the inventory used to synchronize.
+        The delta inventory is used when possible and the full
+        unit inventory is built otherwise.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        :return: The built inventory.
+        :rtype: UnitInventory|DeltaInventory
+        """
+        inventory = self._delta_inventory(request)
+        if inventory is None:
+            inventory = self._unit_inventory(request)
+        return inventory
+
+    def _delta_inventory(self, request):
+        """
+        Build the delta inventory using the deltas published since the revision
+        last applied by the child.  Any problem building the delta inventory results
+        in falling back to the full unit inventory.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        :return: The built inventory or None when a full synchronization is needed.
+        :rtype: DeltaInventory
+        """
+        try:
+            scratchpad = request.conduit.get_scratchpad() or {}
+            applied = scratchpad.get(constants.APPLIED_REVISION)
+            if not applied:
+                return None
+            request.progress.begin_manifest_download()
+            url = request.config.get(constants.MANIFEST_URL_KEYWORD)
+            manifest = RemoteManifest(url, request.downloader, request.working_dir)
+            manifest.fetch()
+            if not manifest.is_valid():
+                return None
+            chain = manifest.find_deltas(applied[LINEAGE], applied[REVISION])
+            if chain is None:
+                _log.info(_('Revision %(r)s not in published deltas; full sync needed') %
+                          {'r': applied[REVISION]})
+                return None
+            deltas = []
+            for delta in chain:
+                manifest.fetch_delta(delta)
+                deltas.append(manifest.get_delta_units(delta))
+
+            def find_child_unit(type_id, unit_key):
+                return self._find_child_unit(request, type_id, unit_key)
+
+            base_URL = manifest.publishing_details[constants.BASE_URL]
+            inventory = DeltaInventory(base_URL, deltas, find_child_unit)
+        except Exception:
+            _log.exception(_('Delta synchronization of %(r)s failed; full sync needed') %
+                           {'r': request.repo_id})
+            return None
+        request.manifest = manifest
+        return inventory
+
+    def _find_child_unit(self, request, type_id, unit_key):
+        """
+        Find a unit in the child inventory.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        :param type_id: The unit type ID.
+        :type type_id: str
+        :param unit_key: The unit key.
+        :type unit_key: dict
+        :return: The unit or None when not found.
+        :rtype: dict
+        """
+        unit = request.conduit.find_unit_by_unit_key(type_id, unit_key)
+        if unit is None:
+            return None
+        return dict(type_id=type_id, unit_key=unit_key, unit_id=unit.id)
+
+    def _record_revision(self, request):
+        """
+        Record the published revision applied by the synchronization in the
+        importer scratchpad.  The revision is only recorded when the synchronization
+        completed without errors.  Otherwise, the recorded revision is cleared so
+        the next synchronization is a full synchronization.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        """
+        try:
+            manifest = request.manifest
+            applied = None
+            if manifest is not None and manifest.lineage and \
+                    not request.summary.errors and not request.cancelled():
+                applied = {LINEAGE: manifest.lineage, REVISION: manifest.revision}
+            scratchpad = request.conduit.get_scratchpad() or {}
+            if scratchpad.get(constants.APPLIED_REVISION) == applied:
+                return
+            scratchpad[constants.APPLIED_REVISION] = applied
+            request.conduit.set_scratchpad(scratchpad)
+        except Exception:
+            _log.exception(request.repo_id)
+
     def _unit_inventory(self, request):
         """
         Build the unit inventory.
@@ -198,9 +301,10 @@ class ImporterStrategy(object):
             raise GetParentUnitsError(request.repo_id)
 
         # build the inventory
-        parent_units = manifest.get_units()
+        request.manifest = manifest
+        parent_units = manifest.get_index()
         base_URL = manifest.publishing_details[constants.BASE_URL]
-        inventory = UnitInventory(base_URL, parent_units, child_units)
+        inventory = UnitInventory(base_URL, parent_units, child_units, request.working_dir)
         return inventory
 
     def _reset_storage_path(self, unit):
@@ -374,13 +478,14 @@ class Mirror(ImporterStrategy):
         """
         Performs the following steps:
           1. Read the (parent) manifest.
-          2. Fetch the child units associated with the repository.
+          2. Fetch the child units associated with the repository or the
+             deltas published since the last synchronization.
           3. Add missing units.
           4. Delete units specified in the child but not in the parent.
         :param request: A synchronization request.
         :type request: SyncRequest
         """
-        unit_inventory = self._unit_inventory(request)
+        unit_inventory = self._inventory(request)
         self._add_units(request, unit_inventory)
         self._update_units(request, unit_inventory)
         self._delete_units(request, unit_inventory)
@@ -398,12 +503,13 @@ class Additive(ImporterStrategy):
         """
         Performs the following steps:
           1. Read the (parent) manifest.
-          2. Fetch the child units associated with the repository.
+          2. Fetch the child units associated with the repository or the
+             deltas published since the last synchronization.
           3. Add missing units.
         :param request: A synchronization request.
         :type request: SyncRequest
         """
-        unit_inventory = self._unit_inventory(request)
+        unit_inventory = self._inventory(request)
         self._add_units(request, unit_inventory)
         self._update_units(request, unit_inventory)
 
@@ -1,5 +1,5 @@
 from pulp.plugins.types.database import type_units_collection
-from pulp.plugins.util.misc import paginate
+from pulp.plugins.util.misc import paginate, DEFAULT_PAGE_SIZE
 from pulp.server.controllers.units import get_unit_key_fields_for_type
 from pulp.server.db.model.repository import RepoContentUnit
 from pulp.server.config import config as pulp_conf
@@ -16,21 +16,16 @@ class NodesConduit(object):
         :return: unit iterator
         :rtype: UnitsIterator
         """
-        unit_ids = {}
-        associations = {}
-        collection = RepoContentUnit.get_collection()
-        for association in collection.find({'repo_id': repo_id}):
-            unit_id = association['unit_id']
-            type_id = association['unit_type_id']
-            associations[unit_id] = association
-            id_list = unit_ids.setdefault(type_id, [])
-            id_list.append(unit_id)
-        return UnitsIterator(associations, unit_ids)
+        return UnitsIterator(repo_id)
 
 
 class UnitsIterator(object):
     """
     Provides a memory efficient iterator of associated content units.
+
+    The repository's unit associations are read a page at a time and the units of each
+    page are fetched before the next page is read, so only one page of associations is
+    held in memory.
     """
 
     @staticmethod
@@ -83,32 +78,64 @@ class UnitsIterator(object):
                 cursor = collection.find(query)
                 yield cursor
 
-    def get_units(self, associations, unit_ids):
+    @staticmethod
+    def association_pages(repo_id, page_size):
+        """
+        Get a generator of pages of the repository's unit associations, ordered by ID.
+        Each page is read with a separate query, so no cursor is held open between pages.
+
+        :param repo_id: The repository ID used to query the associations.
+        :type repo_id: str
+        :param page_size: The maximum number of associations in each page.
+        :type page_size: int
+        :return: Lists of unit association DB records.
+        :rtype: generator
+        """
+        collection = RepoContentUnit.get_collection()
+        fields = {'unit_id': 1, 'unit_type_id': 1}
+        query = {'repo_id': repo_id}
+        while True:
+            page = list(collection.find(query, projection=fields).sort('_id', 1).limit(page_size))
+            if not page:
+                return
+            yield page
+            query = {'repo_id': repo_id, '_id': {'$gt': page[-1]['_id']}}
+
+    def get_units(self, repo_id, page_size):
         """
         Get units generator.
 
-        :param associations: A dictionary of unit associates keyed by type_id.
-        :type associations: dict
-        :param unit_ids: A dictionary of unit_ids keyed by type_id.
-        :type unit_ids: dict
+        :param repo_id: The repository ID used to query the units.
+        :type repo_id: str
+        :param page_size: The number of associations read at a time.
+        :type page_size: int
         :return: A composite association and unit.
         :rtype: generator
         """
-        for cursor in UnitsIterator.open_cursors(unit_ids):
-            for unit in cursor:
-                unit_id = unit['_id']
-                association = associations[unit_id]
-                yield self.associated_unit(association, unit)
+        for page in UnitsIterator.association_pages(repo_id, page_size):
+            unit_ids = {}
+            associations = {}
+            for association in page:
+                unit_id = association['unit_id']
+                type_id = association['unit_type_id']
+                associations[unit_id] = association
+                id_list = unit_ids.setdefault(type_id, [])
+                id_list.append(unit_id)
+            for cursor in UnitsIterator.open_cursors(unit_ids):
+                for unit in cursor:
+                    unit_id = unit['_id']
+                    association = associations[unit_id]
+                    yield self.associated_unit(association, unit)
 
-    def __init__(self, associations, unit_ids):
+    def __init__(self, repo_id, page_size=DEFAULT_PAGE_SIZE):
         """
-        :param associations: A dictionary of unit associates keyed by type_id.
-        :type associations: dict
-        :param unit_ids: A dictionary of unit_ids keyed by type_id.
-        :type unit_ids: dict
+        :param repo_id: The repository ID used to query the units.
+        :type repo_id: str
+        :param page_size: The number of associations read at a time.
+        :type page_size: int
         """
-        self.length = len(associations)
-        self.unit_generator = self.get_units(associations, unit_ids)
+        self.length = RepoContentUnit.get_collection().find({'repo_id': repo_id}).count()
+        self.unit_generator = self.get_units(repo_id, page_size)
 
     def next(self):
         return self.unit_generator.next()
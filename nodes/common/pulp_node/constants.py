@@ -60,6 +60,10 @@ LAST_UPDATED = 'last_updated'
 # This replaced publishing links to each unit file individually.
 CONTENT_PATH = 'pulp/nodes/'
 
+# The importer scratchpad key used to record the published revision
+# last applied by the child.  Used for incremental (delta) synchronization.
+APPLIED_REVISION = 'applied_revision'
+
 
 # --- consumer notes ---------------------------------------------------------
 
@@ -19,16 +19,20 @@ json encoded file.  For performance reasons, the unit files are compressed.
 import os
 import gzip
 import errno
+import shutil
 
 from logging import getLogger
+from threading import RLock
 
 from nectar.request import DownloadRequest
 from nectar.listener import AggregatingEventListener
 
 from pulp.server.compat import json
 
+from pulp_node import constants
 from pulp_node import pathlib
 from pulp_node.error import ManifestDownloadError
+from pulp_node.spool import SortedSpool
 
 
 log = getLogger(__name__)
@@ -40,6 +44,10 @@ MANIFEST_VERSION = 2
 MANIFEST_FILE_NAME = 'manifest.json'
 UNITS_FILE_NAME = 'units.json.gz'
 
+# The index lists each unit in the units file sorted by unit_uid() along
+# with its last_updated, offset and length within the uncompressed file.
+UNITS_INDEX_FILE_NAME = 'units-index.json.gz'
+
 ID = 'id'
 VERSION = 'version'
 PUBLISHING_DETAILS = 'publishing_details'
@@ -48,6 +56,22 @@ UNITS = 'units'
 UNITS_PATH = 'path'
 UNITS_TOTAL = 'total'
 UNITS_SIZE = 'size'
+UNITS_INDEX = 'index'
+LINEAGE = 'lineage'
+REVISION = 'revision'
+DELTAS = 'deltas'
+DELTA_FROM = 'from'
+
+# Delta files list the units changed between consecutive publishes.
+# Each unit in a delta file is annotated with the change.
+DELTA_FILE_NAME = 'units-delta-%d.json.gz'
+DELTA_ACTION = 'delta_action'
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+# The number of delta files kept in the published manifest.
+MAX_DELTAS = 10
 
 
 # --- utils -----------------------------------------------------------------------------
@@ -76,6 +100,42 @@ def unzip(path, destination, bfrlen=65535):
         fp_in.close()
 
 
+def unit_uid(unit):
+    """
+    Get a string that uniquely identifies a unit by type and unit key.
+    :param unit: A content unit.
+    :type unit: dict
+    :return: The unique identifier.
+    :rtype: str
+    """
+    return json.dumps([unit[constants.TYPE_ID], unit[constants.UNIT_KEY]], sort_keys=True)
+
+
+def read_units(path):
+    """
+    Read the json encoded units in a (compressed) units file.
+    :param path: The path to a units file.
+    :type path: str
+    :return: A generator of units.
+    :rtype: generator
+    :raise IOError: on I/O errors.
+    :raise ValueError: json decoding errors
+    """
+    if path.endswith('.gz'):
+        fp = gzip.open(path)
+    else:
+        fp = open(path)
+    try:
+        while True:
+            json_unit = fp.readline()
+            if json_unit:
+                yield json.loads(json_unit)
+            else:
+                break
+    finally:
+        fp.close()
+
+
 # --- manifest --------------------------------------------------------------------------
 
 
@@ -90,6 +150,14 @@ class Manifest(object):
     :type total_units: int
     :param publishing_details: Details of how units have been published.
     :type publishing_details: dict
+    :ivar lineage: Identifies a series of publishes. Revisions are only comparable
+        within the same lineage.
+    :type lineage: str
+    :ivar revision: The publish revision, incremented by each publish in the lineage.
+    :type revision: int
+    :ivar deltas: The delta files published with the manifest. Each describes
+        the units changed between revision DELTA_FROM and the next one.
+    :type deltas: list
     """
 
     def __init__(self, path, manifest_id=None):
@@ -104,6 +172,9 @@ class Manifest(object):
         self.version = MANIFEST_VERSION
         self.units = {UNITS_PATH: None, UNITS_TOTAL: 0, UNITS_SIZE: 0}
         self.publishing_details = {}
+        self.lineage = None
+        self.revision = 0
+        self.deltas = []
         if os.path.isdir(path):
             path = pathlib.join(path, MANIFEST_FILE_NAME)
         self.path = path
@@ -118,7 +189,10 @@ class Manifest(object):
             ID: self.id,
             VERSION: self.version,
             UNITS: self.units,
-            PUBLISHING_DETAILS: self.publishing_details
+            PUBLISHING_DETAILS: self.publishing_details,
+            LINEAGE: self.lineage,
+            REVISION: self.revision,
+            DELTAS: self.deltas
         }
         with open(self.path, 'w+') as fp:
             json.dump(state, fp, indent=2)
@@ -138,6 +212,9 @@ class Manifest(object):
         self.version = d.get(VERSION, 0)
         self.units = d.get(UNITS, {UNITS_PATH: None, UNITS_TOTAL: 0, UNITS_SIZE: 0})
         self.publishing_details = d.get(PUBLISHING_DETAILS, {})
+        self.lineage = d.get(LINEAGE)
+        self.revision = d.get(REVISION, 0)
+        self.deltas = d.get(DELTAS, [])
 
     def get_units(self):
         """
@@ -155,6 +232,91 @@ class Manifest(object):
         else:
             return []
 
+    def get_index(self):
+        """
+        Get the content units referenced in the manifest sorted by unit_uid().
+        When the units index has been published, it is used and each unit
+        contains only the type_id, unit_key and last_updated.  The complete
+        unit is read using the UnitRef.  Otherwise, the (unsorted) units
+        are read from the units file.
+        :return: An iterator of (unit, UnitRef).
+        :rtype: iterable
+        :raise IOError: on I/O errors.
+        :raise ValueError: json decoding errors
+        """
+        index_path = self.index_path()
+        if not index_path:
+            return self.get_units()
+        if not self.units[UNITS_TOTAL]:
+            return []
+        path = self.unzip_units(self.units_path())
+        return IndexIterator(index_path, path)
+
+    def index_path(self):
+        """
+        Get the absolute path to the associated units index file.
+        :return: The path or None when no index has been published.
+        :rtype: str
+        """
+        index = self.units.get(UNITS_INDEX)
+        if index:
+            return pathlib.join(os.path.dirname(self.path), index)
+
+    def find_deltas(self, lineage, revision):
+        """
+        Find the chain of deltas needed to bring units published at the
+        specified revision up to the revision of this manifest.
+        :param lineage: The lineage of the revision.
+        :type lineage: str
+        :param revision: A previously published revision.
+        :type revision: int
+        :return: The deltas in the order they must be applied or None when the
+            chain is broken and the full units file must be used.
+        :rtype: list
+        """
+        if not self.lineage or lineage != self.lineage or revision > self.revision:
+            return None
+        deltas = dict((d[DELTA_FROM], d) for d in self.deltas)
+        chain = []
+        for n in range(revision, self.revision):
+            delta = deltas.get(n)
+            if delta is None:
+                return None
+            chain.append(delta)
+        return chain
+
+    def delta_path(self, delta):
+        """
+        Get the absolute path to a delta file.
+        :param delta: A delta listed in the manifest.
+        :type delta: dict
+        :return: The absolute path.
+        :rtype: str
+        """
+        return pathlib.join(os.path.dirname(self.path), delta[UNITS_PATH])
+
+    def get_delta_units(self, delta):
+        """
+        Get the content units changed in a delta.
+        Each unit is annotated with the DELTA_ACTION.
+        :param delta: A delta listed in the manifest.
+        :type delta: dict
+        :return: An iterator of (unit, UnitRef).
+        :rtype: iterable
+        :raise IOError: on I/O errors.
+        :raise ValueError: json decoding errors
+        """
+        total = delta[UNITS_TOTAL]
+        if not total:
+            return []
+        path = self.delta_path(delta)
+        if path.endswith('.gz'):
+            destination = path[:-3]
+            unzip(path, destination)
+            os.unlink(path)
+            path = destination
+        return UnitIterator(path, total)
+
     def units_published(self, unit_writer):
         """
         Update the manifest publishing information.
@@ -163,6 +325,8 @@ class Manifest(object):
         """
         self.units[UNITS_TOTAL] = unit_writer.total_units
         self.units[UNITS_SIZE] = unit_writer.bytes_written
+        if unit_writer.index_path:
+            self.units[UNITS_INDEX] = os.path.basename(unit_writer.index_path)
 
     def published(self, details):
         """
@@ -187,13 +351,17 @@ class Manifest(object):
     def has_valid_units(self):
         """
         Validate the associated units file by comparing the size of the
-        units file to units_size in the manifest.
+        units file to units_size in the manifest.  The units index must
+        also exist when one has been published.
         :return: True if valid.
         :rtype: bool
         """
         try:
             path = self.units_path()
             size = os.path.getsize(path)
+            index_path = self.index_path()
+            if index_path and not os.path.exists(index_path):
+                return False
             return size == self.units[UNITS_SIZE]
         except OSError, e:
             if e.errno != errno.ENOENT:
@@ -276,7 +444,7 @@ class RemoteManifest(Manifest):
 
     def fetch_units(self):
         """
-        Fetch the units file referenced in the manifest.
+        Fetch the units file and units index referenced in the manifest.
         :raise ManifestDownloadError: on downloading errors.
         :raise HTTPError: on URL errors.
         :raise ValueError: on json decoding errors
@@ -284,14 +452,35 @@ class RemoteManifest(Manifest):
         base_url = self.url.rsplit('/', 1)[0]
         url = pathlib.join(base_url, UNITS_FILE_NAME)
         destination = pathlib.join(os.path.dirname(self.path), UNITS_FILE_NAME)
-        request = DownloadRequest(str(url), destination)
+        requests = [DownloadRequest(str(url), destination)]
+        index_path = self.index_path()
+        if index_path:
+            url = pathlib.join(base_url, os.path.basename(index_path))
+            requests.append(DownloadRequest(str(url), index_path))
         listener = AggregatingEventListener()
         self.downloader.event_listener = listener
-        self.downloader.download([request])
+        self.downloader.download(requests)
         if listener.failed_reports:
             report = listener.failed_reports[0]
             raise ManifestDownloadError(self.url, report.error_msg)
 
+    def fetch_delta(self, delta):
+        """
+        Fetch a delta file referenced in the manifest.
+        :param delta: A delta listed in the manifest.
+        :type delta: dict
+        :raise ManifestDownloadError: on downloading errors.
+        """
+        base_url = self.url.rsplit('/', 1)[0]
+        url = pathlib.url_join(base_url, delta[UNITS_PATH])
+        request = DownloadRequest(str(url), self.delta_path(delta))
+        listener = AggregatingEventListener()
+        self.downloader.event_listener = listener
+        self.downloader.download([request])
+        if listener.failed_reports:
+            report = listener.failed_reports[0]
+            raise ManifestDownloadError(url, report.error_msg)
+
 
 class UnitWriter(object):
     """
@@ -306,13 +495,22 @@ class UnitWriter(object):
     :type total_units: int
     :ivar bytes_written: The total number of bytes written.
     :type bytes_written: int
+    :ivar offset: The (uncompressed) offset of the next unit written.
+    :type offset: int
+    :ivar index_path: The absolute path to the units index file written on close.
+        None when no index is written.
+    :type index_path: str
+    :ivar index: The index records sorted as units are written.
+    :type index: SortedSpool
     """
 
-    def __init__(self, path):
+    def __init__(self, path, index=False):
         """
         :param path: The absolute path to a file or directory.
             When a directory is specified, the standard file name is appended.
         :type path: str
+        :param index: Write the units index file.
+        :type index: bool
         :raise IOError: on I/O errors
         """
         if os.path.isdir(path):
@@ -321,6 +519,13 @@ class UnitWriter(object):
         self.fp = gzip.open(path, 'wb')
         self.total_units = 0
         self.bytes_written = 0
+        self.offset = 0
+        self.index_path = None
+        self.index = None
+        if index:
+            dir_path = os.path.dirname(path)
+            self.index_path = pathlib.join(dir_path, UNITS_INDEX_FILE_NAME)
+            self.index = SortedSpool(tmp_dir=dir_path)
 
     @property
     def closed(self):
@@ -349,6 +554,17 @@ class UnitWriter(object):
         json_unit = json.dumps(unit)
         self.fp.write(json_unit)
         self.fp.write('\n')
+        length = len(json_unit) + 1
+        if self.index is not None:
+            entry = [
+                unit[constants.TYPE_ID],
+                unit[constants.UNIT_KEY],
+                unit.get(constants.LAST_UPDATED),
+                self.offset,
+                length
+            ]
+            self.index.append((unit_uid(unit), entry))
+        self.offset += length
 
     def close(self):
         """
@@ -359,8 +575,25 @@ class UnitWriter(object):
         if not self.closed:
             self.fp.close()
             self.bytes_written = os.path.getsize(self.path)
+            self._write_index()
         return self.total_units
 
+    def _write_index(self):
+        """
+        Write the sorted units index file.
+        :raise IOError: on I/O errors.
+        """
+        if self.index is None:
+            return
+        fp = gzip.open(self.index_path, 'wb')
+        try:
+            for uid, entry in self.index:
+                fp.write(json.dumps(entry))
+                fp.write('\n')
+        finally:
+            fp.close()
+            self.index.close()
+
     def __enter__(self):
         return self
 
@@ -369,6 +602,103 @@ class UnitWriter(object):
         return False
 
 
+class DeltaWriter(object):
+    """
+    Writes a delta file listing the units changed since the previous publish.
+    The units published previously are read from the previous units file and
+    compared with the units as they are published.
+    :ivar revision: The previous revision the delta is relative to.
+    :type revision: int
+    :ivar previous: The last_updated of previously published units keyed by unit_uid().
+    :type previous: dict
+    :ivar writer: Writes the annotated units.
+    :type writer: UnitWriter
+    """
+
+    def __init__(self, dir_path, revision, previous_units):
+        """
+        :param dir_path: The absolute path to the directory in which the delta is written.
+        :type dir_path: str
+        :param revision: The previous revision the delta is relative to.
+        :type revision: int
+        :param previous_units: The units published in the previous revision.
+        :type previous_units: iterable
+        :raise IOError: on I/O errors
+        """
+        self.revision = revision
+        self.previous = {}
+        for unit in previous_units:
+            self.previous[unit_uid(unit)] = unit.get(constants.LAST_UPDATED)
+        self.writer = UnitWriter(pathlib.join(dir_path, DELTA_FILE_NAME % revision))
+
+    def add(self, unit):
+        """
+        Compare a published unit with the previous publish and write it
+        to the delta file when it was added or changed.
+        :param unit: A published content unit.
+        :type unit: dict
+        :raise IOError: on I/O errors.
+        """
+        uid = unit_uid(unit)
+        if uid not in self.previous:
+            action = ADDED
+        elif self.previous.pop(uid) != unit.get(constants.LAST_UPDATED):
+            action = CHANGED
+        else:
+            return
+        unit = dict(unit)
+        unit[DELTA_ACTION] = action
+        self.writer.add(unit)
+
+    def close(self):
+        """
+        Write the units that were published previously but not
+        this time as removed, and close the delta file.
+        :return: The delta to be listed in the manifest.
+        :rtype: dict
+        """
+        if not self.writer.closed:
+            for uid in self.previous:
+                type_id, unit_key = json.loads(uid)
+                unit = {constants.TYPE_ID: type_id, constants.UNIT_KEY: unit_key}
+                unit[DELTA_ACTION] = REMOVED
+                self.writer.add(unit)
+            self.previous = {}
+            self.writer.close()
+        return {
+            DELTA_FROM: self.revision,
+            UNITS_PATH: os.path.basename(self.writer.path),
+            UNITS_TOTAL: self.writer.total_units,
+            UNITS_SIZE: self.writer.bytes_written,
+        }
+
+
+def copy_deltas(manifest, dir_path, revision):
+    """
+    Copy the delta files listed in a previously published manifest
+    into the specified directory, dropping the deltas older than MAX_DELTAS
+    revisions before the specified revision.
+    :param manifest: A previously published manifest.
+    :type manifest: Manifest
+    :param dir_path: The absolute path to the directory being published.
+    :type dir_path: str
+    :param revision: The revision being published.
+    :type revision: int
+    :return: The deltas copied.
+    :rtype: list
+    """
+    copied = []
+    for delta in manifest.deltas:
+        if delta[DELTA_FROM] < revision - MAX_DELTAS:
+            continue
+        path = manifest.delta_path(delta)
+        if not os.path.exists(path):
+            continue
+        shutil.copy(path, pathlib.join(dir_path, delta[UNITS_PATH]))
+        copied.append(delta)
+    return copied
+
+
 class UnitIterator:
     """
     Used to iterate content units inventory file associated with a manifest.
@@ -411,6 +741,47 @@ class UnitIterator:
         return self.total_units
 
 
+class IndexIterator(object):
+    """
+    Used to iterate the units index file associated with a manifest.
+    Each entry is used to build a (unit, UnitRef) where the unit contains
+    only the type_id, unit_key and last_updated.
+    """
+
+    @staticmethod
+    def get_units(index_path, path):
+        fp = gzip.open(index_path)
+        try:
+            while True:
+                json_entry = fp.readline()
+                if not json_entry:
+                    break
+                type_id, unit_key, last_updated, offset, length = json.loads(json_entry)
+                unit = {
+                    constants.TYPE_ID: type_id,
+                    constants.UNIT_KEY: unit_key,
+                    constants.LAST_UPDATED: last_updated
+                }
+                yield (unit, UnitRef(path, offset, length))
+        finally:
+            fp.close()
+
+    def __init__(self, index_path, path):
+        """
+        :param index_path: The absolute path to the units index file.
+        :type index_path: str
+        :param path: The absolute path to the (uncompressed) units file.
+        :type path: str
+        """
+        self.unit_generator = IndexIterator.get_units(index_path, path)
+
+    def next(self):
+        return self.unit_generator.next()
+
+    def __iter__(self):
+        return self
+
+
 class UnitRef(object):
     """
     Reference to a unit within the downloaded units file.
@@ -422,6 +793,10 @@ class UnitRef(object):
     :type length: int
     """
 
+    # The most recently used units file as: (signature, file).
+    _file = (None, None)
+    _lock = RLock()
+
     def __init__(self, path, offset, length):
         """
         :param path: The absolute path to the units file.
@@ -443,7 +818,32 @@ class UnitRef(object):
         :raise IOError: on I/O errors.
         :raise ValueError: json decoding errors
         """
-        with open(self.path) as fp:
+        with UnitRef._lock:
+            fp = UnitRef._open(self.path)
             fp.seek(self.offset)
             json_unit = fp.read(self.length)
-            return json.loads(json_unit)
+        return json.loads(json_unit)
+
+    @staticmethod
+    def _open(path):
+        """
+        Get an open file for the units file at the specified path.
+        Units are fetched in large numbers from the same file so the
+        most recently used file is kept open.  It is reopened when the file
+        at the path has been replaced.
+        Must be called with the lock held.
+        :param path: The absolute path to the units file.
+        :type path: str
+        :return: The open file.
+        :rtype: file
+        :raise IOError: on I/O errors.
+        """
+        stat = os.stat(path)
+        signature = (path, stat.st_ino, stat.st_mtime, stat.st_size)
+        signature_in, fp = UnitRef._file
+        if signature_in != signature:
+            if fp is not None:
+                fp.close()
+            fp = open(path)
+            UnitRef._file = (signature, fp)
+        return fp
@@ -0,0 +1,144 @@
+# Copyright (c) 2016 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Provides disk-backed collections of records used to process inventories of
+content units too large to be held in memory.
+"""
+
+import heapq
+import cPickle as pickle
+
+from tempfile import TemporaryFile
+
+
+# The number of records sorted in memory before being written to disk.
+CHUNK_SIZE = 10000
+
+
+class Spool(object):
+    """
+    An append-only collection of records stored in an anonymous temporary file.
+    Records are pickled and may be any picklable object.  Only one iteration
+    of a spool may be in progress at a time.
+    :ivar fp: The temporary file.
+    :type fp: file
+    :ivar total: The number of records in the spool.
+    :type total: int
+    """
+
+    def __init__(self, tmp_dir=None):
+        """
+        :param tmp_dir: The directory in which the temporary file is created.
+            The system default is used when not specified.
+        :type tmp_dir: str
+        """
+        self.fp = TemporaryFile(dir=tmp_dir)
+        self.total = 0
+
+    def append(self, record):
+        """
+        Append a record.
+        :param record: A picklable record.
+        """
+        pickle.dump(record, self.fp, pickle.HIGHEST_PROTOCOL)
+        self.total += 1
+
+    def close(self):
+        """
+        Close and delete the temporary file.
+        """
+        self.fp.close()
+
+    def __iter__(self):
+        fp = self.fp
+        fp.flush()
+        fp.seek(0)
+        for n in xrange(self.total):
+            yield pickle.load(fp)
+
+    def __len__(self):
+        return self.total
+
+
+class SortedSpool(object):
+    """
+    A collection of records sorted by natural order that is not held in memory.
+    Records are accumulated in memory in chunks of up to chunk_size records.  Each
+    chunk is sorted and written to its own spool.  Iterating the sorted spool
+    merges the chunks.  Memory use is bounded by the chunk size.
+    :ivar tmp_dir: The directory in which temporary files are created.
+    :type tmp_dir: str
+    :ivar chunk_size: The number of records sorted in memory.
+    :type chunk_size: int
+    :ivar chunk: The records not yet written to disk.
+    :type chunk: list
+    :ivar chunks: The sorted chunks written to disk.
+    :type chunks: list
+    :ivar total: The number of records in the spool.
+    :type total: int
+    """
+
+    def __init__(self, records=(), tmp_dir=None, chunk_size=CHUNK_SIZE):
+        """
+        :param records: An optional iterable of records to be added.
+        :type records: iterable
+        :param tmp_dir: The directory in which temporary files are created.
+            The system default is used when not specified.
+        :type tmp_dir: str
+        :param chunk_size: The number of records sorted in memory.
+        :type chunk_size: int
+        """
+        self.tmp_dir = tmp_dir
+        self.chunk_size = chunk_size
+        self.chunk = []
+        self.chunks = []
+        self.total = 0
+        for record in records:
+            self.append(record)
+
+    def append(self, record):
+        """
+        Add a record.
+        :param record: A picklable record.
+        """
+        self.chunk.append(record)
+        self.total += 1
+        if len(self.chunk) >= self.chunk_size:
+            self._spill()
+
+    def close(self):
+        """
+        Close and delete the temporary files.
+        """
+        for spool in self.chunks:
+            spool.close()
+        self.chunks = []
+        self.chunk = []
+
+    def _spill(self):
+        """
+        Sort the chunk held in memory and write it to disk.
+        """
+        self.chunk.sort()
+        spool = Spool(self.tmp_dir)
+        for record in self.chunk:
+            spool.append(record)
+        self.chunks.append(spool)
+        self.chunk = []
+
+    def __iter__(self):
+        if self.chunk:
+            self._spill()
+        return heapq.merge(*self.chunks)
+
+    def __len__(self):
+        return self.total
@@ -18,7 +18,8 @@ from logging import getLogger
 
 from pulp_node import constants
 from pulp_node import pathlib
-from pulp_node.manifest import Manifest, UnitWriter
+from pulp_node import manifest as _manifest
+from pulp_node.manifest import Manifest, UnitWriter, DeltaWriter
 
 
 log = getLogger(__name__)
@@ -121,17 +122,55 @@ class FilePublisher(Publisher):
         pathlib.mkdir(parent_path)
         self.tmp_dir = mkdtemp(dir=parent_path)
 
-        with UnitWriter(self.tmp_dir) as writer:
+        previous = self.previous_manifest()
+        delta_writer = None
+        if previous is not None:
+            previous_units = _manifest.read_units(previous.units_path())
+            delta_writer = DeltaWriter(self.tmp_dir, previous.revision, previous_units)
+
+        with UnitWriter(self.tmp_dir, index=True) as writer:
             for unit in units:
                 self.publish_unit(unit)
                 writer.add(unit)
+                if delta_writer is not None:
+                    delta_writer.add(unit)
         manifest_id = str(uuid4())
         manifest = Manifest(self.tmp_dir, manifest_id)
         manifest.units_published(writer)
+        if previous is None:
+            manifest.lineage = str(uuid4())
+        else:
+            manifest.lineage = previous.lineage
+            manifest.revision = previous.revision + 1
+            manifest.deltas = _manifest.copy_deltas(previous, self.tmp_dir, manifest.revision)
+            manifest.deltas.append(delta_writer.close())
         manifest.write()
         self.staged = True
         return manifest.path
 
+    def previous_manifest(self):
+        """
+        Read the manifest committed by the previous publish.
+        Deltas can only be published when the previous manifest has a lineage and
+        its units file is still present in the publish directory.
+        :return: The previous manifest or None when not found or not usable.
+        :rtype: Manifest
+        """
+        path = pathlib.join(self.publish_dir, _manifest.MANIFEST_FILE_NAME)
+        if not os.path.exists(path):
+            return None
+        try:
+            manifest = Manifest(path)
+            manifest.read()
+        except (IOError, ValueError), e:
+            log.warn('previous manifest at %s not usable: %s', path, e)
+            return None
+        if not manifest.lineage:
+            return None
+        if manifest.units[_manifest.UNITS_TOTAL] and not os.path.exists(manifest.units_path()):
+            return None
+        return manifest
+
     def publish_unit(self, unit):
         """
         Publish the file associated with the unit into the publish directory.
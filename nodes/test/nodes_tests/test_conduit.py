@@ -11,6 +11,7 @@
 
 from base import ServerTests
 from operator import itemgetter
+from unittest import TestCase
 
 import mock
 
@@ -23,7 +24,7 @@ from pulp.server.db.model.content import ContentType
 
 from pulp_node import constants
 from pulp_node.importers.http.importer import NodesHttpImporter
-from pulp_node.conduit import NodesConduit
+from pulp_node.conduit import NodesConduit, UnitsIterator
 
 
 # --- constants ---------------------------------------------------------------
@@ -117,3 +118,36 @@ class QueryTests(ServerTests):
             self.assertEqual(unit_key['N'], n)
             self.assertEqual(u['storage_path'], create_storage_path(unit_id))
             n += 1
+
+    def test_query_pages(self):
+        num_units = 5
+        units_created = populate(num_units)
+        units = UnitsIterator(REPO_ID, page_size=3)
+        self.assertEqual(len(units), len(units_created))
+        unit_ids = sorted(u['unit_id'] for u in units)
+        self.assertEqual(unit_ids, sorted(create_unit_id(t, n) for n, t in enumerate(
+            t for t in ALL_TYPES for x in range(num_units))))
+
+
+class AssociationPagesTests(TestCase):
+
+    @mock.patch('pulp_node.conduit.RepoContentUnit.get_collection')
+    def test_pages(self, get_collection):
+        pages = [
+            [{'_id': 1, 'unit_id': 'a', 'unit_type_id': TYPE_A},
+             {'_id': 2, 'unit_id': 'b', 'unit_type_id': TYPE_B}],
+            [{'_id': 3, 'unit_id': 'c', 'unit_type_id': TYPE_A}],
+            [],
+        ]
+        find = get_collection.return_value.find
+        find.return_value.sort.return_value.limit.side_effect = pages
+
+        result = list(UnitsIterator.association_pages(REPO_ID, 2))
+
+        self.assertEqual(result, pages[:2])
+        queries = [c[0][0] for c in find.call_args_list]
+        self.assertEqual(queries, [{'repo_id': REPO_ID},
+                                   {'repo_id': REPO_ID, '_id': {'$gt': 2}},
+                                   {'repo_id': REPO_ID, '_id': {'$gt': 3}}])
+        find.return_value.sort.assert_called_with('_id', 1)
+        find.return_value.sort.return_value.limit.assert_called_with(2)
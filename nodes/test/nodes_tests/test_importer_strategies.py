@@ -9,9 +9,9 @@ from mock import Mock, patch
 from pulp.plugins.model import Unit
 from pulp.server.config import config as pulp_conf
 
-from pulp_node import constants, error
+from pulp_node import constants, error, manifest as _manifest
 from pulp_node.importers import strategies
-from pulp_node.importers.inventory import UnitInventory
+from pulp_node.importers.inventory import UnitInventory, DeltaInventory
 from pulp_node.importers.reports import SummaryReport, ProgressListener
 from pulp_node.reports import RepositoryProgress
 
@@ -25,9 +25,14 @@ class TestConduit:
             Unit('T', {1: 3}, {2: 2}, 'path_3'),
         ]
 
+    def get_scratchpad(self):
+        return None
+
     save_unit = Mock()
     remove_unit = Mock()
     set_progress = Mock()
+    set_scratchpad = Mock()
+    find_unit_by_unit_key = Mock(return_value=None)
 
 
 class CancelEvent(object):
@@ -53,6 +58,8 @@ class TestManifest:
     def __init__(self, units):
         self.units = [(u, TestUnitRef(u)) for u in units]
         self.publishing_details = {constants.BASE_URL: BASE_URL}
+        self.lineage = None
+        self.revision = 0
 
     def get_units(self):
         return self.units
@@ -261,3 +268,128 @@ class TestBase(TestCase):
         for name, strategy in strategies.STRATEGIES.items():
             self.assertEqual(strategies.find_strategy(name), strategy)
         self.assertRaises(strategies.StrategyUnsupported, strategies.find_strategy, '---')
+
+    def test_delta_inventory(self):
+        # Setup
+        added = dict(type_id='T', unit_key={'n': 1}, metadata={})
+        changed = dict(type_id='T', unit_key={'n': 2}, metadata={})
+        removed = dict(type_id='T', unit_key={'n': 3}, metadata={})
+        gone = dict(type_id='T', unit_key={'n': 4}, metadata={})
+        delta_1 = [
+            dict(added, delta_action=_manifest.ADDED),
+            dict(removed, delta_action=_manifest.ADDED),
+            dict(gone, delta_action=_manifest.ADDED),
+        ]
+        delta_2 = [
+            dict(changed, delta_action=_manifest.CHANGED),
+            dict(removed, delta_action=_manifest.REMOVED),
+            dict(gone, delta_action=_manifest.REMOVED),
+        ]
+        deltas = [[(u, TestUnitRef(u)) for u in d] for d in (delta_1, delta_2)]
+        child_units = {3: dict(removed, unit_id='abc')}
+
+        def find_child_unit(type_id, unit_key):
+            return child_units.get(unit_key['n'])
+
+        # Test
+        inventory = DeltaInventory(BASE_URL, deltas, find_child_unit)
+        # Verify
+        self.assertEqual([u['unit_key'] for u, r in inventory.units_on_parent_only()],
+                         [added['unit_key']])
+        self.assertEqual([u['unit_key'] for u, r in inventory.updated_units()],
+                         [changed['unit_key']])
+        self.assertEqual(inventory.units_on_child_only(), [child_units[3]])
+
+    @patch('pulp_node.importers.strategies.ImporterStrategy._unit_inventory')
+    @patch('pulp_node.manifest.RemoteManifest.fetch')
+    def test_inventory_nothing_applied(self, mock_fetch, mock_unit_inventory):
+        # Setup
+        request = self.request()
+        # Test
+        strategy = strategies.ImporterStrategy()
+        inventory = strategy._inventory(request)
+        # Verify
+        self.assertFalse(mock_fetch.called)
+        self.assertEqual(inventory, mock_unit_inventory.return_value)
+
+    @patch('pulp_node.importers.strategies.ImporterStrategy._unit_inventory')
+    @patch('pulp_node.manifest.RemoteManifest.fetch_delta')
+    @patch('pulp_node.manifest.RemoteManifest.fetch')
+    def test_inventory_chain_broken(self, mock_fetch, mock_fetch_delta, mock_unit_inventory):
+        # Setup
+        request = self.request()
+        applied = {_manifest.LINEAGE: 'abc', _manifest.REVISION: 1}
+        request.conduit.get_scratchpad = Mock(
+            return_value={constants.APPLIED_REVISION: applied})
+        # Test
+        strategy = strategies.ImporterStrategy()
+        inventory = strategy._inventory(request)
+        # Verify
+        self.assertTrue(mock_fetch.called)
+        self.assertFalse(mock_fetch_delta.called)
+        self.assertEqual(inventory, mock_unit_inventory.return_value)
+
+    @patch('pulp_node.importers.strategies.ImporterStrategy._add_units')
+    @patch('pulp_node.importers.strategies.ImporterStrategy._update_units')
+    @patch('pulp_node.importers.strategies.ImporterStrategy._delta_inventory')
+    def test_mirror_delta(self, mock_delta_inventory, *unused):
+        # Setup
+        request = self.request()
+        request.conduit.remove_unit = Mock()
+        removed = dict(type_id='T', unit_key={'n': 1}, delta_action=_manifest.REMOVED)
+        found = Mock(id='abc')
+        request.conduit.find_unit_by_unit_key = Mock(return_value=found)
+        request.manifest = Mock(lineage='xyz', revision=3)
+        strategy = strategies.Mirror()
+        mock_delta_inventory.return_value = DeltaInventory(
+            BASE_URL,
+            [[(removed, TestUnitRef(removed))]],
+            lambda t, k: strategy._find_child_unit(request, t, k))
+        # Test
+        strategy.synchronize(request)
+        # Verify
+        request.conduit.find_unit_by_unit_key.assert_called_once_with('T', {'n': 1})
+        self.assertEqual(request.conduit.remove_unit.call_count, 1)
+        self.assertEqual(request.conduit.remove_unit.call_args[0][0].id, 'abc')
+        applied = {_manifest.LINEAGE: 'xyz', _manifest.REVISION: 3}
+        request.conduit.set_scratchpad.assert_called_with({constants.APPLIED_REVISION: applied})
+
+    def test_record_revision_errors(self):
+        # Setup
+        request = self.request()
+        applied = {_manifest.LINEAGE: 'abc', _manifest.REVISION: 1}
+        request.conduit.get_scratchpad = Mock(
+            return_value={constants.APPLIED_REVISION: applied})
+        request.conduit.set_scratchpad = Mock()
+        request.manifest = Mock(lineage='abc', revision=2)
+        request.summary.errors.append(UNIT_ERROR)
+        # Test
+        strategy = strategies.ImporterStrategy()
+        strategy._record_revision(request)
+        # Verify
+        request.conduit.set_scratchpad.assert_called_once_with({constants.APPLIED_REVISION: None})
+
+    def test_unit_inventory(self):
+        # Setup
+        parent_units = [
+            dict(type_id='T', unit_key={'n': 3}, last_updated=1),
+            dict(type_id='T', unit_key={'n': 1}, last_updated=2),
+            dict(type_id='T', unit_key={'n': 2}, last_updated=1),
+        ]
+        child_units = [
+            dict(unit_id='1', type_id='T', unit_key={'n': 1}, last_updated=1, metadata={}),
+            dict(unit_id='2', type_id='T', unit_key={'n': 2}, last_updated=1, metadata={}),
+            dict(unit_id='4', type_id='T', unit_key={'n': 4}, last_updated=1, metadata={}),
+        ]
+        manifest = TestManifest(parent_units)
+        # Test
+        inventory = UnitInventory(BASE_URL, manifest.get_units(), child_units, self.tmp_dir)
+        # Verify
+        parent_only = list(inventory.units_on_parent_only())
+        self.assertEqual(len(inventory.units_on_parent_only()), 1)
+        self.assertEqual(parent_only[0][0]['unit_key'], {'n': 3})
+        updated = list(inventory.updated_units())
+        self.assertEqual(len(updated), 1)
+        self.assertEqual(updated[0][0]['unit_key'], {'n': 1})
+        child_only = list(inventory.units_on_child_only())
+        self.assertEqual([u['unit_id'] for u in child_only], ['4'])
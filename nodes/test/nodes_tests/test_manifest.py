@@ -120,3 +120,91 @@ class TestManifest(TestCase):
             _unit = ref.fetch()
             self.assertEqual(unit, _unit)
         self.verify(units, units_in)
+
+    def test_delta_round_trip(self):
+        # Setup
+        previous = [
+            dict(type_id='T', unit_key={'n': 1}, last_updated=1),
+            dict(type_id='T', unit_key={'n': 2}, last_updated=1),
+            dict(type_id='T', unit_key={'n': 3}, last_updated=1),
+        ]
+        units = [
+            dict(type_id='T', unit_key={'n': 1}, last_updated=1),
+            dict(type_id='T', unit_key={'n': 2}, last_updated=2),
+            dict(type_id='T', unit_key={'n': 4}, last_updated=1),
+        ]
+        writer = manifest.DeltaWriter(self.tmp_dir, 0, previous)
+        for u in units:
+            writer.add(u)
+        delta = writer.close()
+        m = manifest.Manifest(self.tmp_dir, self.MANIFEST_ID)
+        m.lineage = 'abc'
+        m.revision = 1
+        m.deltas = [delta]
+        m.write()
+        # Test
+        downloader = LocalFileDownloader(DownloaderConfig())
+        working_dir = os.path.join(self.tmp_dir, 'working_dir')
+        os.makedirs(working_dir)
+        url = 'file://%s' % m.path
+        m = manifest.RemoteManifest(url, downloader, working_dir)
+        m.fetch()
+        chain = m.find_deltas('abc', 0)
+        for d in chain:
+            m.fetch_delta(d)
+        # Verify
+        self.assertEqual(m.revision, 1)
+        self.assertEqual(chain, [delta])
+        self.assertEqual(delta[manifest.UNITS_TOTAL], 3)
+        actions = {}
+        for unit, ref in m.get_delta_units(delta):
+            self.assertEqual(unit, ref.fetch())
+            actions[unit['unit_key']['n']] = unit[manifest.DELTA_ACTION]
+        self.assertEqual(
+            actions, {2: manifest.CHANGED, 3: manifest.REMOVED, 4: manifest.ADDED})
+
+    def test_find_deltas(self):
+        m = manifest.Manifest(self.tmp_dir, self.MANIFEST_ID)
+        m.lineage = 'abc'
+        m.revision = 3
+        m.deltas = [{manifest.DELTA_FROM: n} for n in range(1, 3)]
+        # Test
+        self.assertEqual(m.find_deltas('abc', 3), [])
+        self.assertEqual(m.find_deltas('abc', 1), m.deltas)
+        self.assertEqual(m.find_deltas('abc', 2), m.deltas[1:])
+        # deltas dropped
+        self.assertEqual(m.find_deltas('abc', 0), None)
+        # revision from the future
+        self.assertEqual(m.find_deltas('abc', 4), None)
+        # republished from scratch
+        self.assertEqual(m.find_deltas('xyz', 2), None)
+
+    def test_index(self):
+        # Setup
+        units = []
+        for n in reversed(range(0, self.NUM_UNITS)):
+            unit = dict(unit_id=n, type_id='T', unit_key={'n': n}, last_updated=n, metadata={})
+            units.append(unit)
+        writer = manifest.UnitWriter(self.tmp_dir, index=True)
+        for u in units:
+            writer.add(u)
+        writer.close()
+        m = manifest.Manifest(self.tmp_dir, self.MANIFEST_ID)
+        m.units_published(writer)
+        m.write()
+        # Test
+        downloader = LocalFileDownloader(DownloaderConfig())
+        working_dir = os.path.join(self.tmp_dir, 'working_dir')
+        os.makedirs(working_dir)
+        url = 'file://%s' % m.path
+        m = manifest.RemoteManifest(url, downloader, working_dir)
+        m.fetch()
+        m.fetch_units()
+        index = list(m.get_index())
+        # Verify
+        self.assertEqual(m.units[manifest.UNITS_INDEX], manifest.UNITS_INDEX_FILE_NAME)
+        self.assertTrue(m.has_valid_units())
+        self.assertEqual(len(index), self.NUM_UNITS)
+        for n, (unit, ref) in enumerate(index):
+            self.assertEqual(unit, dict(type_id='T', unit_key={'n': n}, last_updated=n))
+            self.assertEqual(ref.fetch(), units[self.NUM_UNITS - n - 1])
@@ -9,7 +9,8 @@ from nectar.downloaders.local import LocalFileDownloader
 
 from pulp_node import constants, pathlib
 from pulp_node.distributors.http.publisher import HttpPublisher
-from pulp_node.manifest import RemoteManifest
+from pulp_node import manifest as _manifest
+from pulp_node.manifest import Manifest, RemoteManifest
 
 
 class TestHttp(TestCase):
@@ -136,3 +137,39 @@ class TestHttp(TestCase):
             p.publish(units)
         # verify
         self.assertFalse(os.path.exists(p.tmp_dir))
+
+    def test_publish_delta(self):
+        # setup
+        units = self.populate()
+        repo_id = 'test_repo'
+        base_url = 'file://'
+        publish_dir = os.path.join(self.tmpdir, 'nodes/repos')
+        repo_publish_dir = os.path.join(publish_dir, repo_id)
+        virtual_host = (publish_dir, publish_dir)
+        with HttpPublisher(base_url, virtual_host, repo_id, repo_publish_dir) as p:
+            p.publish(units)
+            p.commit()
+        first = Manifest(p.manifest_path())
+        first.read()
+        # test
+        units = units[1:]
+        units[0][constants.LAST_UPDATED] = 10
+        with HttpPublisher(base_url, virtual_host, repo_id, repo_publish_dir) as p:
+            p.publish(units)
+            p.commit()
+        # verify
+        self.assertEqual(first.revision, 0)
+        self.assertEqual(first.deltas, [])
+        self.assertTrue(first.lineage)
+        manifest = Manifest(p.manifest_path())
+        manifest.read()
+        self.assertEqual(manifest.lineage, first.lineage)
+        self.assertEqual(manifest.revision, 1)
+        self.assertEqual(manifest.find_deltas(first.lineage, 0), manifest.deltas)
+        delta = manifest.deltas[0]
+        self.assertEqual(delta[_manifest.DELTA_FROM], 0)
+        self.assertEqual(delta[_manifest.UNITS_TOTAL], 2)
+        actions = {}
+        for unit, ref in manifest.get_delta_units(delta):
+            actions[unit['unit_key']['n']] = unit[_manifest.DELTA_ACTION]
+        self.assertEqual(actions, {0: _manifest.REMOVED, 1: _manifest.CHANGED})
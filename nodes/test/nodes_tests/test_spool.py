@@ -0,0 +1,37 @@
+import random
+from unittest import TestCase
+
+from pulp_node.spool import Spool, SortedSpool
+
+
+class TestSpool(TestCase):
+
+    def test_append(self):
+        records = [('b', 1), ('a', {'x': 1}), ('c', None)]
+        spool = Spool()
+        for record in records:
+            spool.append(record)
+        self.assertEqual(len(spool), 3)
+        self.assertEqual(list(spool), records)
+        # iterated again
+        self.assertEqual(list(spool), records)
+        spool.close()
+
+
+class TestSortedSpool(TestCase):
+
+    def test_sorted(self):
+        records = [(n, str(n)) for n in range(100)]
+        shuffled = list(records)
+        random.shuffle(shuffled)
+        spool = SortedSpool(shuffled, chunk_size=7)
+        self.assertEqual(len(spool), 100)
+        self.assertEqual(len(spool.chunks), 14)
+        self.assertEqual(list(spool), records)
+        spool.close()
+        self.assertEqual(spool.chunks, [])
+
+    def test_empty(self):
+        spool = SortedSpool()
+        self.assertEqual(len(spool), 0)
+        self.assertEqual(list(spool), [])
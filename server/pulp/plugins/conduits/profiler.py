@@ -17,8 +17,16 @@ _logger = logging.getLogger(__name__)
 
 class ProfilerConduit(MultipleRepoUnitsMixin):
 
-    def __init__(self):
+    def __init__(self, cache_repo_units=False):
+        """
+        :param cache_repo_units: keep the units returned by get_repo_units() in memory, so that
+                                 repeated requests for the same units do not query the database
+                                 again. Used when calculating applicability of many profiles
+                                 against the same repository.
+        :type  cache_repo_units: bool
+        """
         MultipleRepoUnitsMixin.__init__(self, ProfilerConduitException)
+        self._repo_units = {} if cache_repo_units else None
 
     def get_bindings(self, consumer_id):
         """
@@ -51,10 +59,29 @@ class ProfilerConduit(MultipleRepoUnitsMixin):
                                        in the result
         :type additional_unit_fields: list of str
 
-        :return: list of unit instances
+        :return: list of unit instances; when units are cached, the instances are shared between
+                 calls and must not be modified
         :rtype:  list of pulp.plugins.model.Unit
         """
         additional_unit_fields = additional_unit_fields or []
+        if self._repo_units is None:
+            return self._get_repo_units(repo_id, content_type_id, additional_unit_fields,
+                                        only_unit_fields)
+
+        key = (repo_id, content_type_id, tuple(additional_unit_fields),
+               None if only_unit_fields is None else tuple(only_unit_fields))
+        if key not in self._repo_units:
+            self._repo_units[key] = self._get_repo_units(repo_id, content_type_id,
+                                                         additional_unit_fields, only_unit_fields)
+        return list(self._repo_units[key])
+
+    def _get_repo_units(self, repo_id, content_type_id, additional_unit_fields, only_unit_fields):
+        """
+        Query the database for units, see get_repo_units().
+
+        :return: list of unit instances
+        :rtype:  list of pulp.plugins.model.Unit
+        """
         try:
             if only_unit_fields is None:
                 unit_key_fields = units_controller.get_unit_key_fields_for_type(content_type_id)
@@ -3,7 +3,6 @@ import glob
 import gzip
 import logging
 import os
-import shutil
 import traceback
 
 
@@ -14,7 +13,7 @@ from pulp.server.exceptions import PulpCodedValidationException, PulpCodedExcept
 from pulp.server.util import CHECKSUM_FUNCTIONS
 
 _LOG = logging.getLogger(__name__)
-BUFFER_SIZE = 1024
+BUFFER_SIZE = 64 * 1024
 
 
 class MetadataFileContext(object):
@@ -309,14 +308,16 @@ class FastForwardXmlFileContext(XmlFileContext):
         self.fast_forward = False
         self.search_tag = search_tag
         self.existing_file = None
+        self.original_file_handle = None
         self.xml_generator = None
 
     def _open_metadata_file_handle(self):
         """
         Open the metadata file handle, creating any missing parent directories.
 
-        If the file already exists, this will copy it to a new name and open it as an input
-        for filtering/modification.
+        If the file already exists, it is opened as an input to be streamed into the new file.
+        A file with the same name as the new one is first renamed so that it is not overwritten
+        before it has been read.
         """
         # Figure out if we are fast forwarding a file
         # find the primary file
@@ -334,96 +335,78 @@ class FastForwardXmlFileContext(XmlFileContext):
                 self.existing_file = existing_file_name
                 self.fast_forward = True
         elif not self.checksum_type and os.path.exists(self.metadata_file_path):
-            self.existing_file = file_name
+            # move the file so that we can still read it while the new one is written
+            self.existing_file = 'original.%s' % file_name
+            os.rename(self.metadata_file_path, os.path.join(working_dir, self.existing_file))
             self.fast_forward = True
 
         if self.fast_forward:
-            # move the file so that we can still process it if the name is the same
-            if self.existing_file:
-                new_file_name = 'original.%s' % self.existing_file
-                shutil.copy(os.path.join(working_dir, self.existing_file),
-                            os.path.join(working_dir, new_file_name))
-                self.existing_file = new_file_name
-
             self.existing_file = os.path.join(working_dir, self.existing_file)
-
-            # Open the file, unzip if necessary so that seek operations can be performed
-            self.original_file_handle = None
+            # the file is only read sequentially, so compressed files are decompressed as they
+            # are read
             if self.existing_file.endswith('.gz'):
-                non_compressed_file = self.existing_file[:self.existing_file.rfind('.gz')]
-                with open(os.path.join(working_dir, non_compressed_file), 'wb') as plain_handle:
-                    gzip_handle = gzip.open(os.path.join(working_dir, self.existing_file), 'rb')
-                    try:
-                        content = gzip_handle.read(BUFFER_SIZE)
-                        while content:
-                            plain_handle.write(content)
-                            content = gzip_handle.read(BUFFER_SIZE)
-                    finally:
-                        if gzip_handle:
-                            gzip_handle.close()
-                # clean up the zipped file
-                os.unlink(self.existing_file)
-                self.existing_file = non_compressed_file
-
-            self.original_file_handle = open(os.path.join(working_dir, self.existing_file), 'r')
+                self.original_file_handle = gzip.open(self.existing_file, 'rb')
+            else:
+                self.original_file_handle = open(self.existing_file, 'r')
 
         super(FastForwardXmlFileContext, self)._open_metadata_file_handle()
 
     def _write_file_header(self):
         """
-        Write out the beginning of the file only if we are not in fast forward mode.
+        Write out the beginning of the file, followed by the existing content when in fast
+        forward mode.
 
         No fast forward will happen if search_tag attribute is None or not found.
         """
         super(FastForwardXmlFileContext, self)._write_file_header()
         if self.fast_forward and self.search_tag is not None:
-            start_tag = '<%s' % self.search_tag
-            end_tag = '</%s' % self.root_tag
-
-            # Find the start offset
-            content = ''
-            index = -1
-            while index < 0:
-                content_buffer = self.original_file_handle.read(BUFFER_SIZE)
-                if not content_buffer:
-                    # The search tag was never found, This is an empty file where no FF is necessary
-                    msg = _('When attempting to fast forward the file %(file)s, the search tag '
-                            '%(tag)s was not found so the assumption is that no fast forward is to '
-                            'take place.')
-                    _LOG.debug(msg, {'file': self.metadata_file_path, 'tag': start_tag})
-                    return
-                content += content_buffer
-                index = content.find(start_tag)
-            start_offset = index
-
-            # Find the end offset
-            content = ''
-            index = -1
-            self.original_file_handle.seek(0, os.SEEK_END)
-            while index < 0:
-                amount_to_read = min(BUFFER_SIZE, self.original_file_handle.tell())
-                self.original_file_handle.seek(-amount_to_read, os.SEEK_CUR)
-                content_buffer = self.original_file_handle.read(amount_to_read)
-                if not content_buffer:
-                    raise Exception(_('Error: %(tag)s not found in the xml file.')
-                                    % {'tag': end_tag})
-                bytes_read = len(content_buffer)
-                self.original_file_handle.seek(-bytes_read, os.SEEK_CUR)
-                content = content_buffer + content
-                index = content.rfind(end_tag)
-            end_offset = self.original_file_handle.tell() + index
-
-            # stream out the content
-            self.original_file_handle.seek(start_offset)
-            bytes_to_read = end_offset - start_offset
+            self._copy_existing_content()
+
+    def _copy_existing_content(self):
+        """
+        Stream the content of the existing file from the first search tag up to the end tag of
+        the root element into the new file in a single pass, so that more content can be
+        appended. Only as much of the existing file as is needed to find the tags is held in
+        memory.
+        """
+        start_tag = '<%s' % self.search_tag
+        end_tag = '</%s' % self.root_tag
+
+        # Find the start offset, keeping enough of what was read to find a tag split between
+        # reads
+        content = ''
+        while True:
             content_buffer = self.original_file_handle.read(BUFFER_SIZE)
-            while bytes_to_read > 0:
-                buffer_size = len(content_buffer)
-                if buffer_size > bytes_to_read:
-                    content_buffer = content_buffer[:bytes_to_read]
-                self.metadata_file_handle.write(content_buffer)
-                bytes_to_read -= buffer_size
-                content_buffer = self.original_file_handle.read(BUFFER_SIZE)
+            if not content_buffer:
+                # The search tag was never found, This is an empty file where no FF is necessary
+                msg = _('When attempting to fast forward the file %(file)s, the search tag '
+                        '%(tag)s was not found so the assumption is that no fast forward is to '
+                        'take place.')
+                _LOG.debug(msg, {'file': self.metadata_file_path, 'tag': start_tag})
+                return
+            content += content_buffer
+            index = content.find(start_tag)
+            if index >= 0:
+                content = content[index:]
+                break
+            content = content[-(len(start_tag) - 1):]
+
+        # Stream out the content up to the last end tag. What follows the last end tag found so
+        # far is held back, as is enough to find a tag split between reads.
+        keep = len(end_tag) - 1
+        while content_buffer:
+            index = content.rfind(end_tag)
+            if index > 0:
+                self.metadata_file_handle.write(content[:index])
+                content = content[index:]
+            elif index < 0 and len(content) > keep:
+                self.metadata_file_handle.write(content[:-keep])
+                content = content[-keep:]
+            content_buffer = self.original_file_handle.read(BUFFER_SIZE)
+            content += content_buffer
+
+        if not content.startswith(end_tag):
+            raise Exception(_('Error: %(tag)s not found in the xml file.') % {'tag': end_tag})
 
     def _close_metadata_file_handle(self):
         """
@@ -431,9 +414,10 @@ class FastForwardXmlFileContext(XmlFileContext):
         was generated
         """
         super(FastForwardXmlFileContext, self)._close_metadata_file_handle()
-        # Close & remove the existing file that was copied
+        # Close the existing file and remove it if it was renamed
         if self.fast_forward:
             if not self._is_closed(self.original_file_handle):
                 self.original_file_handle.close()
-            # We will always have renamed the original file so remove it
-            os.unlink(self.existing_file)
+            # files with a checksum in their names are preserved
+            if not self.checksum_type:
+                os.unlink(self.existing_file)
@@ -5,6 +5,7 @@ import hashlib
 import itertools
 import logging
 import os
+import resource
 import shutil
 import sys
 import tarfile
@@ -49,6 +50,81 @@ def _post_order(step):
     yield step
 
 
+class StepMetrics(object):
+    """
+    Measures the resources used by a step while it processes.
+
+    CPU time and I/O are measured for the whole process, so they include the work of any other
+    threads running at the same time, such as those of a downloader. I/O is counted as it reaches
+    storage, so reads served from the page cache are not included.
+
+    :ivar wall_time: seconds spent processing
+    :type wall_time: float
+    :ivar cpu_time: seconds of user and system CPU time used while processing
+    :type cpu_time: float
+    :ivar bytes_read: bytes read from storage while processing
+    :type bytes_read: int
+    :ivar bytes_written: bytes written to storage while processing
+    :type bytes_written: int
+    """
+
+    # getrusage() counts I/O in blocks of 512 bytes
+    BLOCK_SIZE = 512
+
+    def __init__(self):
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._started = None
+
+    def _sample(self):
+        """
+        :return: the current time and the CPU time and I/O used by the process so far
+        :rtype:  tuple
+        """
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return (time.time(), usage.ru_utime + usage.ru_stime, usage.ru_inblock * self.BLOCK_SIZE,
+                usage.ru_oublock * self.BLOCK_SIZE)
+
+    def start(self):
+        """
+        Start measuring.
+        """
+        self._started = self._sample()
+
+    def stop(self):
+        """
+        Stop measuring and add what was used since measuring started to the totals.
+        """
+        if self._started is not None:
+            self.wall_time, self.cpu_time, self.bytes_read, self.bytes_written = self._totals()
+            self._started = None
+
+    def _totals(self):
+        """
+        :return: the totals, including what has been used so far if measuring has started
+        :rtype:  list
+        """
+        totals = [self.wall_time, self.cpu_time, self.bytes_read, self.bytes_written]
+        if self._started is not None:
+            for index, (current, started) in enumerate(zip(self._sample(), self._started)):
+                totals[index] += current - started
+        return totals
+
+    def to_dict(self):
+        """
+        :return: the totals, including what has been used so far if measuring has started, keyed
+                 by the METRICS reporting constants
+        :rtype:  dict
+        """
+        wall_time, cpu_time, bytes_read, bytes_written = self._totals()
+        return {reporting_constants.METRICS_WALL_TIME_KEY: wall_time,
+                reporting_constants.METRICS_CPU_TIME_KEY: cpu_time,
+                reporting_constants.METRICS_BYTES_READ_KEY: bytes_read,
+                reporting_constants.METRICS_BYTES_WRITTEN_KEY: bytes_written}
+
+
 class Step(object):
     """
     Base class for step processing. The only tie to the platform is an assumption of
@@ -110,6 +186,7 @@ class Step(object):
         self.non_halting_exceptions = non_halting_exceptions or []
         self.exceptions = []
         self.disable_reporting = disable_reporting
+        self.metrics = StepMetrics()
 
     def add_child(self, step):
         """
@@ -223,6 +300,7 @@ class Step(object):
             return
 
         self.state = reporting_constants.STATE_RUNNING
+        self.metrics.start()
 
         try:
             try:
@@ -281,6 +359,8 @@ class Step(object):
                     pass
                 parent = parent.parent
             raise
+        finally:
+            self.metrics.stop()
 
         self.state = reporting_constants.STATE_COMPLETE
 
@@ -352,6 +432,9 @@ class Step(object):
         """
         Return the machine readable progress report for this task
 
+        The metrics of each step include those of its child steps, except for the rate at which
+        the step processed its own items.
+
         :returns: The machine readable progress report for this task
         :rtype: dict
         """
@@ -371,14 +454,26 @@ class Step(object):
             reporting_constants.PROGRESS_DESCRIPTION_KEY: self.description,
             reporting_constants.PROGRESS_DETAILS_KEY: self.progress_details
         }
+        metrics = self.metrics.to_dict()
+        wall_time = metrics[reporting_constants.METRICS_WALL_TIME_KEY]
         if self.children:
             child_reports = []
             for step in self.children:
                 child_reports.extend(step.get_progress_report())
+            for child_report in child_reports:
+                child_metrics = child_report.get(reporting_constants.PROGRESS_METRICS_KEY, {})
+                for key in metrics:
+                    metrics[key] += child_metrics.get(key, 0)
             report[reporting_constants.PROGRESS_SUB_STEPS_KEY] = child_reports
-            # Root object is just a list of reports, this should be the object at some point
-            if self.parent is None:
-                return child_reports
+        for key in (reporting_constants.METRICS_WALL_TIME_KEY,
+                    reporting_constants.METRICS_CPU_TIME_KEY):
+            metrics[key] = round(metrics[key], 3)
+        metrics[reporting_constants.METRICS_ITEMS_PER_SECOND_KEY] = \
+            round(total_processed / wall_time, 3) if wall_time else None
+        report[reporting_constants.PROGRESS_METRICS_KEY] = metrics
+        # Root object is just a list of reports, this should be the object at some point
+        if self.children and self.parent is None:
+            return child_reports
 
         return [report]
 
@@ -1198,13 +1293,10 @@ class SaveUnitsStep(PluginStep):
     """
     Base class for steps that save/associate units with a repository
 
-    Any step that saves units to the database should use this step in order to ensure that
-    the repo unit counts are udpated properly.
+    The repo unit counts are updated as units are associated with the repository, so this step
+    no longer needs to rebuild them. It is kept for the steps that subclass it.
     """
 
-    def finalize(self):
-        repo_controller.rebuild_content_unit_counts(self.get_repo().repo_obj)
-
 
 class GetLocalUnitsStep(SaveUnitsStep):
     """
@@ -32,6 +32,11 @@ CELERYBEAT_SCHEDULE = {
         'schedule': timedelta(days=30),
         'args': tuple(),
     },
+    'deliver_events': {
+        'task': 'pulp.server.event.dispatch.deliver_events',
+        'schedule': timedelta(seconds=config.getint('events', 'dispatch_interval')),
+        'args': tuple(),
+    },
     'download_deferred_content': {
         'task': 'pulp.server.controllers.repository.queue_download_deferred',
         'schedule': timedelta(minutes=config.getint('lazy', 'download_interval')),
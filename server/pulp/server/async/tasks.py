@@ -25,6 +25,7 @@ from pulp.server.async.celery_instance import celery, RESOURCE_MANAGER_QUEUE, \
 from pulp.server.exceptions import PulpException, MissingResource, \
     NoWorkers, PulpCodedException, error_codes
 from pulp.server.config import config
+from pulp.server.db import profiler
 from pulp.server.db.model import Worker, ReservedResource, TaskStatus, \
     ResourceManagerLock, CeleryBeatLock
 from pulp.server.managers.repo import _common as common_utils
@@ -682,6 +683,8 @@ class Task(PulpTask, ReservedTaskMixin):
         if config.getboolean('profiling', 'enabled') is True:
             self.pr = cProfile.Profile()
             self.pr.enable()
+        if not self.request.called_directly and profiler.is_enabled():
+            profiler.start(self.request.id)
 
         return super(Task, self).__call__(*args, **kwargs)
 
@@ -731,6 +734,7 @@ class Task(PulpTask, ReservedTaskMixin):
                 task_status['spawned_tasks'] = [retval.task_id, ]
                 task_status['result'] = None
 
+            self._handle_query_profile(task_status)
             task_status.save()
             self._handle_cProfile(task_id)
             common_utils.delete_working_directory()
@@ -766,10 +770,23 @@ class Task(PulpTask, ReservedTaskMixin):
             if not isinstance(exc, PulpException):
                 exc = PulpException(str(exc))
             task_status['error'] = exc.to_dict()
+            self._handle_query_profile(task_status)
             task_status.save()
             self._handle_cProfile(task_id)
             common_utils.delete_working_directory()
 
+    def _handle_query_profile(self, task_status):
+        """
+        If MongoDB query profiling is enabled, stop the profiler and store its summary on the
+        task status.
+
+        :param task_status: the status of the task, which is saved by the caller
+        :type  task_status: pulp.server.db.model.TaskStatus
+        """
+        query_profile = profiler.stop()
+        if query_profile is not None:
+            task_status['query_profile'] = query_profile.summary()
+
     def _handle_cProfile(self, task_id):
         """
         If cProfiling is enabled, stop the profiler and write out the data.
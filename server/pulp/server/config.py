@@ -63,6 +63,9 @@ _default_values = {
         'repo_group_publish_history': '60',
         'task_status_history': '7',
         'task_result_history': '3',
+        'batch_size': '1000',
+        'batch_pause': '0',
+        'max_rate': '0',
     },
     'database': {
         'name': 'pulp_database',
@@ -84,6 +87,12 @@ _default_values = {
         'enabled': 'false',
         'from': 'pulp@localhost',
     },
+    'events': {
+        'dispatch_interval': '60',
+        'dispatch_concurrency': '5',
+        'retry_delay': '30',
+        'max_attempts': '10',
+    },
     'oauth': {
         'enabled': 'true',
         'oauth_key': '',
@@ -104,6 +113,7 @@ _default_values = {
         'topic_exchange': 'amq.topic',
         'event_notifications_enabled': 'false',
         'event_notification_url': 'qpid://localhost:5672/',
+        'agent_concurrency': '10',
     },
     'security': {
         'cacert': '/etc/pki/pulp/ca.crt',
@@ -122,7 +132,8 @@ _default_values = {
         'log_type': 'syslog',
         'key_url': '/pulp/gpg',
         'ks_url': '/pulp/ks',
-        'working_directory': '/var/cache/pulp'
+        'working_directory': '/var/cache/pulp',
+        'response_cache_size': '0'
     },
     'tasks': {
         'broker_url': 'qpid://localhost/',
@@ -139,11 +150,14 @@ _default_values = {
         'redirect_path': '/streamer/',
         'https_retrieval': 'true',
         'download_interval': '30',
-        'download_concurrency': '5'
+        'download_concurrency': '5',
+        'direct_download': 'false'
     },
     'profiling': {
         'enabled': 'false',
-        'directory': '/var/lib/pulp/c_profiles'
+        'directory': '/var/lib/pulp/c_profiles',
+        'mongo_queries': 'false',
+        'slow_query_threshold': '0',
     }
 }
 
@@ -1,11 +1,36 @@
 import os
 import errno
+import fcntl
+import logging
 import shutil
 import tempfile
 
 from hashlib import sha256
 
+import selinux
+
+from pulp.plugins.util.verification import VerificationException, verify_checksum
 from pulp.server.config import config
+from pulp.server.util import CHECKSUM_FUNCTIONS, InvalidChecksumType
+
+
+_logger = logging.getLogger(__name__)
+
+# Strategies used by FileStorage.put() to place a file into storage, cheapest first.
+RENAME = 'rename'
+HARDLINK = 'hardlink'
+REFLINK = 'reflink'
+COPY = 'copy'
+
+# The linux ioctl used to clone a file's extents on copy-on-write filesystems (btrfs, xfs).
+FICLONE = 0x40049409
+
+# Errors meaning the cheaper strategy is unavailable and the next one should be tried.
+UNSUPPORTED_ERRORS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP, errno.ENOTTY,
+                      errno.EINVAL, errno.ENOSYS, errno.EEXIST)
+
+# The number of bytes read and written at a time when a file must be copied.
+COPY_BUFFER_SIZE = 1024 * 1024
 
 
 def mkdir(path):
@@ -105,13 +130,21 @@ class FileStorage(ContentStorage):
             digest[0:2],
             digest[2:])
 
-    def put(self, unit, path, location=None):
+    def put(self, unit, path, location=None, move=False, checksum_type=None, checksum=None):
         """
         Put the content defined by the content unit into storage.
-        The file at the specified *path* is transferred into storage:
-         - Copy file to the temporary file at its final directory.
-         - If possible, verify size of the file to make sure that file is not corrupted.
-         - Do atomic rename.
+        The file at the specified *path* is placed in a temporary file at its final
+        directory using the cheapest strategy that works:
+         - rename, when *move* is set and the file is on the same filesystem.
+         - hardlink, when the file is in Pulp's working directory and on the same filesystem.
+         - reflink, when the filesystem supports copy-on-write clones.
+         - copy, in a single pass that counts the bytes and computes the checksum.
+        The temporary file is then verified and atomically renamed into place, and the
+        SELinux context of a renamed or hardlinked file is restored for its new location.
+
+        Only files in the working directory, such as downloads, are hardlinked, because
+        Pulp owns them. They share their data with the stored file, so they must be
+        replaced or removed rather than modified in place.
 
         :param unit: The content unit to be stored.
         :type unit: pulp.sever.db.model.ContentUnit
@@ -120,6 +153,17 @@ class FileStorage(ContentStorage):
         :param location: The (optional) location within the path
             where the content is to be stored.
         :type location: str
+        :param move: The file at *path* is owned by the caller and may be moved into storage.
+        :type move: bool
+        :param checksum_type: The (optional) algorithm of *checksum*, such as sha256.
+        :type checksum_type: str
+        :param checksum: The (optional) expected checksum, verified whichever strategy is
+            used. A copied file is verified as it is copied, others once they are placed.
+        :type checksum: str
+        :return: The strategy used to place the file: rename, hardlink, reflink or copy.
+        :rtype: str
+        :raises VerificationException: if the size or checksum does not match.
+        :raises InvalidChecksumType: if the checksum type is not supported.
         """
         destination = unit.storage_path
         if location:
@@ -131,7 +175,15 @@ class FileStorage(ContentStorage):
         # going to use.
         os.close(fd)
 
-        shutil.copy(path, temp_destination)
+        try:
+            strategy = self._place(path, temp_destination, move, checksum_type, checksum)
+            if strategy != COPY and checksum_type and checksum:
+                with open(temp_destination, 'rb') as fp:
+                    verify_checksum(fp, checksum_type, checksum)
+        except Exception:
+            if os.path.lexists(temp_destination):
+                os.remove(temp_destination)
+            raise
 
         try:
             unit.verify_size(temp_destination)
@@ -143,6 +195,113 @@ class FileStorage(ContentStorage):
             raise
 
         os.rename(temp_destination, destination)
+        if strategy in (RENAME, HARDLINK) and selinux.is_selinux_enabled():
+            # The file keeps the context of where it was created, rather than the context
+            # of the storage directory.
+            selinux.restorecon(destination.encode('utf-8'))
+        _logger.debug('%s placed in storage at %s using %s.', path, destination, strategy)
+        return strategy
+
+    def _place(self, path, temp_destination, move, checksum_type, checksum):
+        """
+        Place the file at *path* at *temp_destination*, which already exists, using the
+        cheapest strategy that works.
+
+        :param path: The absolute path to the file to be stored.
+        :type path: str
+        :param temp_destination: The temporary file to be replaced.
+        :type temp_destination: str
+        :param move: The file at *path* may be moved.
+        :type move: bool
+        :param checksum_type: The (optional) algorithm of *checksum*.
+        :type checksum_type: str
+        :param checksum: The (optional) checksum verified when the file is copied.
+        :type checksum: str
+        :return: The strategy used.
+        :rtype: str
+        """
+        if move:
+            try:
+                os.rename(path, temp_destination)
+                return RENAME
+            except OSError, e:
+                if e.errno not in UNSUPPORTED_ERRORS:
+                    raise
+
+        if self._in_working_directory(path):
+            try:
+                # link() will not replace the temporary file, so it's removed first.
+                os.remove(temp_destination)
+                os.link(path, temp_destination)
+                return HARDLINK
+            except OSError, e:
+                if e.errno not in UNSUPPORTED_ERRORS:
+                    raise
+
+        with open(path, 'rb') as source:
+            with open(temp_destination, 'wb') as target:
+                try:
+                    fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+                    strategy = REFLINK
+                except IOError, e:
+                    if e.errno not in UNSUPPORTED_ERRORS:
+                        raise
+                    self._copy(source, target, checksum_type, checksum)
+                    strategy = COPY
+        shutil.copymode(path, temp_destination)
+        return strategy
+
+    @staticmethod
+    def _in_working_directory(path):
+        """
+        Determine whether the file at *path* is within Pulp's working directory.
+
+        :param path: The absolute path to a file.
+        :type path: str
+        :return: True if the file is within the working directory.
+        :rtype: bool
+        """
+        working_dir = os.path.realpath(config.get('server', 'working_directory'))
+        return os.path.realpath(path).startswith(os.path.join(working_dir, ''))
+
+    @staticmethod
+    def _copy(source, target, checksum_type, checksum):
+        """
+        Copy the source file to the target in a single pass, verifying the number of bytes
+        copied and, when provided, the checksum of the bytes as they are copied.
+
+        :param source: The open file being copied.
+        :type source: file
+        :param target: The open file being written.
+        :type target: file
+        :param checksum_type: The (optional) algorithm of *checksum*.
+        :type checksum_type: str
+        :param checksum: The (optional) expected checksum.
+        :type checksum: str
+        :raises VerificationException: if the size or checksum does not match.
+        :raises InvalidChecksumType: if the checksum type is not supported.
+        """
+        expected_size = os.fstat(source.fileno()).st_size
+        digest = None
+        if checksum_type and checksum:
+            try:
+                digest = CHECKSUM_FUNCTIONS[checksum_type]()
+            except KeyError:
+                raise InvalidChecksumType('Unknown checksum type [%s]' % checksum_type)
+        size = 0
+        while True:
+            buf = source.read(COPY_BUFFER_SIZE)
+            if not buf:
+                break
+            target.write(buf)
+            size += len(buf)
+            if digest is not None:
+                digest.update(buf)
+
+        if size != expected_size:
+            raise VerificationException(size)
+        if digest is not None and digest.hexdigest() != checksum:
+            raise VerificationException(digest.hexdigest())
 
     def get(self, unit):
         """
@@ -1,10 +1,12 @@
 from gettext import gettext as _
 from itertools import chain, izip_longest
 import copy
+import hashlib
 import logging
 import os
 import socket
 import sys
+import threading
 import time
 from urlparse import urlunsplit
 import uuid
@@ -32,6 +34,7 @@ from pulp.plugins.util.verification import VerificationException, verify_checksu
 from pulp.server import exceptions as pulp_exceptions
 from pulp.server.async.tasks import (PulpTask, register_sigterm_handler, Task, TaskResult,
                                      get_current_task_id)
+from pulp.server.compat import json, json_util
 from pulp.server.config import config as pulp_conf
 from pulp.server.constants import PULP_STREAM_REQUEST_HEADER
 from pulp.server.content.sources.constants import MAX_CONCURRENT, HEADERS, SSL_VALIDATION
@@ -57,6 +60,14 @@ UNIT_ID = 'unit_id'
 TYPE_ID = 'type_id'
 UNIT_FILES = 'unit_files'
 REQUEST = 'request'
+UNIT = 'unit'
+
+# The number of content units whose deferred entries, database documents and catalog entries
+# are looked up together when building lazy download requests.
+DOWNLOAD_BATCH_SIZE = 100
+
+# The number of units that may finish downloading before they are marked as downloaded in bulk.
+FINALIZE_BATCH_SIZE = 100
 
 
 def get_associated_unit_ids(repo_id, unit_type, repo_content_unit_q=None):
@@ -303,10 +314,18 @@ def has_all_units_downloaded(repo_id):
 
 def rebuild_content_unit_counts(repository):
     """
-    Update the content_unit_counts field on a Repository.
+    Recalculate the content_unit_counts field on a Repository from its unit associations.
+
+    The counts are kept up to date as units are associated with and removed from the repository,
+    so this is only needed to verify and repair them. Any difference from the recorded counts is
+    logged.
 
     :param repository: The repository to update
     :type repository: pulp.server.db.model.Repository
+
+    :return: the number of units of each type that the recorded count was missing; negative
+             if the recorded count was too high. Empty if the counts were correct.
+    :rtype:  dict
     """
     db = connection.get_database()
 
@@ -320,13 +339,63 @@ def rebuild_content_unit_counts(repository):
     for result in q:
         counts[result['_id']] = result['sum']
 
-    repository.content_unit_counts = counts
-    repository.save()
+    recorded = repository.content_unit_counts or {}
+    drift = {}
+    for unit_type_id in set(counts) | set(recorded):
+        difference = counts.get(unit_type_id, 0) - recorded.get(unit_type_id, 0)
+        if difference:
+            drift[unit_type_id] = difference
+    if drift:
+        msg = _('Correcting the content unit counts of repository [%(r)s], which were off by '
+                '%(d)s')
+        _logger.warning(msg % {'r': repository.repo_id, 'd': drift})
+
+    if counts != recorded:
+        repository.content_unit_counts = counts
+        repository.save()
+    return drift
+
+
+def queue_verify_content_unit_counts(repo_id):
+    """
+    Dispatch the task to verify and repair the content unit counts of a repository.
+
+    :param repo_id: id of the repository
+    :type  repo_id: str
+
+    :return: A task result containing the task ID of the queued task
+    :rtype:  celery.result.AsyncResult
+    """
+    task_tags = [
+        tags.resource_tag(tags.RESOURCE_REPOSITORY_TYPE, repo_id),
+        tags.action_tag('verify_content_unit_counts')
+    ]
+    return verify_content_unit_counts.apply_async_with_reservation(
+        tags.RESOURCE_REPOSITORY_TYPE, repo_id, [repo_id], tags=task_tags)
+
+
+@celery.task(base=Task, name='pulp.server.tasks.repository.verify_content_unit_counts')
+def verify_content_unit_counts(repo_id):
+    """
+    Verify the content unit counts of a repository against its unit associations and repair them
+    if they are wrong.
+
+    :param repo_id: id of the repository
+    :type  repo_id: str
+
+    :return: the number of units of each type that the recorded count was missing; negative
+             if the recorded count was too high. Empty if the counts were correct.
+    :rtype:  dict
+    """
+    repo_obj = model.Repository.objects.get_repo_or_missing_resource(repo_id)
+    return rebuild_content_unit_counts(repo_obj)
 
 
 def associate_single_unit(repository, unit):
     """
-    Associate a single unit to a repository.
+    Associate a single unit to a repository, counting it in the repository's content unit counts
+    if it was not already associated. The repository's content revision is incremented when the
+    association is created, or when the unit has been saved since it was last associated.
 
     :param repository: The repository to update.
     :type repository: pulp.server.db.model.Repository
@@ -339,16 +408,22 @@ def associate_single_unit(repository, unit):
         repo_id=repository.repo_id,
         unit_id=unit.id,
         unit_type_id=unit._content_type_id)
-    qs.update_one(
+    # the association as it was before this update; None if it has just been created
+    previous = qs.only('updated').modify(
         set_on_insert__created=formatted_datetime,
         set__updated=formatted_datetime,
         upsert=True)
+    if previous is None:
+        update_unit_count(repository.repo_id, unit._content_type_id, 1)
+    elif unit._last_updated > dateutils.datetime_to_utc_timestamp(
+            dateutils.parse_iso8601_datetime(previous.updated)):
+        update_content_revision(repository.repo_id)
 
 
 def disassociate_units(repository, unit_iterable):
     """
     Disassociate all units in the iterable from the repository.
-    Update `last_unit_removed` timestamp for the repository if needed.
+    Update the content unit counts and `last_unit_removed` timestamp for the repository if needed.
 
     :param repository: The repository to update.
     :type repository: pulp.server.db.model.Repository
@@ -358,11 +433,16 @@ def disassociate_units(repository, unit_iterable):
     # track if units are removed so last_unit_removed is only updated when units are removed
     units_removed = 0
     for unit_group in paginate(unit_iterable):
-        unit_id_list = [unit.id for unit in unit_group]
-        qs = model.RepositoryContentUnit.objects(
-            repo_id=repository.repo_id, unit_id__in=unit_id_list)
-        # queryset delete returns the number of records deleted
-        units_removed += qs.delete()
+        unit_ids_by_type = {}
+        for unit in unit_group:
+            unit_ids_by_type.setdefault(unit._content_type_id, []).append(unit.id)
+        for unit_type_id, unit_id_list in unit_ids_by_type.items():
+            qs = model.RepositoryContentUnit.objects(
+                repo_id=repository.repo_id, unit_type_id=unit_type_id, unit_id__in=unit_id_list)
+            # queryset delete returns the number of records deleted
+            removed = qs.delete()
+            update_unit_count(repository.repo_id, unit_type_id, -removed)
+            units_removed += removed
 
     if units_removed:
         update_last_unit_removed(repository.repo_id)
@@ -657,6 +737,8 @@ def update_unit_count(repo_id, unit_type_id, delta):
 
     example: {'rpm': 12, 'srpm': 3}
 
+    The repo's content revision is incremented along with the count.
+
     :param repo_id: identifies the repo
     :type  repo_id: str
     :param unit_type_id: identifies the unit type to update
@@ -666,37 +748,62 @@ def update_unit_count(repo_id, unit_type_id, delta):
 
     :raises pulp_exceptions.PulpExecutionException: if there is an error in the update
     """
-    atomic_inc_key = 'inc__content_unit_counts__{unit_type_id}'.format(unit_type_id=unit_type_id)
+    count_field = 'content_unit_counts__{unit_type_id}'.format(unit_type_id=unit_type_id)
     if delta:
         try:
-            model.Repository.objects(repo_id=repo_id).update_one(**{atomic_inc_key: delta})
+            model.Repository.objects(repo_id=repo_id).update_one(
+                **{'inc__' + count_field: delta, 'inc__content_revision': 1})
+            if delta < 0:
+                # Remove the type once its last unit is removed, as rebuilding the counts would
+                model.Repository.objects(**{'repo_id': repo_id, count_field + '__lte': 0}).\
+                    update_one(**{'unset__' + count_field: True})
         except OperationError:
             message = 'There was a problem updating repository %s' % repo_id
             raise pulp_exceptions.PulpExecutionException(message), None, sys.exc_info()[2]
 
 
+def update_content_revision(repo_id):
+    """
+    Increments the content revision of the repository, which changes whenever the content of the
+    repository changes. Publishes are skipped while the revision that was last published is
+    current.
+
+    :param repo_id: identifies the repo
+    :type  repo_id: str
+    """
+    model.Repository.objects(repo_id=repo_id).update_one(inc__content_revision=1)
+
+
 def update_last_unit_added(repo_id):
     """
-    Updates the UTC date record on the repository for the time the last unit was added.
+    Updates the UTC date record on the repository for the time the last unit was added, and
+    increments its content revision.
 
     :param repo_id: identifies the repo
     :type  repo_id: str
+
+    :raises pulp_exceptions.MissingResource: if the repository does not exist
     """
-    repo_obj = model.Repository.objects.get_repo_or_missing_resource(repo_id)
-    repo_obj.last_unit_added = dateutils.now_utc_datetime_with_tzinfo()
-    repo_obj.save()
+    now = dateutils.now_utc_datetime_with_tzinfo()
+    if not model.Repository.objects(repo_id=repo_id).update_one(set__last_unit_added=now,
+                                                                inc__content_revision=1):
+        raise pulp_exceptions.MissingResource(repository=repo_id)
 
 
 def update_last_unit_removed(repo_id):
     """
-    Updates the UTC date record on the repository for the time the last unit was removed.
+    Updates the UTC date record on the repository for the time the last unit was removed, and
+    increments its content revision.
 
     :param repo_id: identifies the repo
     :type  repo_id: str
+
+    :raises pulp_exceptions.MissingResource: if the repository does not exist
     """
-    repo_obj = model.Repository.objects.get_repo_or_missing_resource(repo_id)
-    repo_obj.last_unit_removed = dateutils.now_utc_datetime_with_tzinfo()
-    repo_obj.save()
+    now = dateutils.now_utc_datetime_with_tzinfo()
+    if not model.Repository.objects(repo_id=repo_id).update_one(set__last_unit_removed=now,
+                                                                inc__content_revision=1):
+        raise pulp_exceptions.MissingResource(repository=repo_id)
 
 
 def update_last_unit_added_for_unit(unit_id, unit_type_id):
@@ -719,7 +826,8 @@ def update_last_unit_added_for_unit(unit_id, unit_type_id):
         unit_id=unit_id,
         unit_type_id=unit_type_id)
     repo_ids = [assoc.repo_id for assoc in repo_units]
-    model.Repository.objects(repo_id__in=repo_ids).update(last_unit_added=now)
+    model.Repository.objects(repo_id__in=repo_ids).update(last_unit_added=now,
+                                                          inc__content_revision=1)
 
 
 @celery.task(base=PulpTask, name='pulp.server.tasks.repository.sync_with_auto_publish')
@@ -849,8 +957,6 @@ def sync(repo_id, sync_config_override=None, scheduled_call_id=None):
         model.Importer.objects(repo_id=repo_obj.repo_id).update(set__last_sync=sync_end_timestamp)
         # Add a sync history entry for this run
         sync_result_collection.save(sync_result)
-        # Ensure counts are updated
-        rebuild_content_unit_counts(repo_obj)
         if sync_result['added_count'] > 0:
             update_last_unit_added(repo_obj.repo_id)
         if sync_result['removed_count'] > 0:
@@ -1168,21 +1274,19 @@ def check_publish(repo_obj, dist_id, dist_inst, transfer_repo, conduit, call_con
     force_full = call_config.get('force_full', False)
     predistributor_id = call_config.get('predistributor_id')
     config_override = call_config.override_config
+    config_hash = _publish_config_hash(call_config)
     last_published = conduit.last_publish()
-    last_unit_removed = repo_obj.last_unit_removed
     dist = model.Distributor.objects.get_or_404(repo_id=repo_obj.repo_id,
                                                 distributor_id=dist_id)
+    content_changed = config_changed = True
     if last_published:
-        the_timestamp = dateutils.format_iso8601_datetime(last_published)
-        last_updated = model.RepositoryContentUnit.objects(repo_id=repo_obj.repo_id,
-                                                           updated__gte=the_timestamp).count()
-        if not last_updated:
-            # There is no newer RepositoryContentUnit than last publish;
-            # however, a unit shared between multiple repos could still have been mutated,
-            # in which case it will be reflected in last_unit_added.
-            last_updated = repo_obj.last_unit_added and repo_obj.last_unit_added > last_published
-        units_removed = last_unit_removed is not None and last_unit_removed > last_published
-        dist_updated = dist.last_updated > last_published
+        if dist.last_published_revision is not None:
+            content_changed = dist.last_published_revision != repo_obj.content_revision
+            config_changed = dist.last_published_config_hash != config_hash
+        else:
+            content_changed, config_changed = _changed_since_publish(repo_obj, dist,
+                                                                     last_published,
+                                                                     config_override)
 
     skip_for_predistributor = False
     if predistributor_id:
@@ -1198,31 +1302,35 @@ def check_publish(repo_obj, dist_id, dist_inst, transfer_repo, conduit, call_con
         skip_for_predistributor = published_after_predistributor or not \
             predistributor_last_published
 
-    same_override = dist.last_override_config == config_override
-    if not same_override:
+    if dist.last_override_config != config_override:
         # Use raw pymongo not to fire the signal hander
         model.Distributor.objects(
             repo_id=repo_obj.repo_id,
             distributor_id=dist_id).update(set__last_override_config=config_override)
 
     # Check if content has not changed since last publish and a predistributor is not defined.
-    unchanged_content_and_no_predistributor = last_published and not last_updated and \
-        not units_removed and not predistributor_id
+    unchanged_content_and_no_predistributor = last_published and not content_changed and \
+        not predistributor_id
     # We want to skip based on predistributor conditions. We also want to skip if repository
     # content has not changed since last publish and no predistributor is defined. We want to not
     # skip if 'force_full' is configured or the distributor config has changed since last publish.
     if (skip_for_predistributor and not last_published) or\
-            (last_published and not force_full and not dist_updated and same_override and
+            (last_published and not force_full and not config_changed and
                 (skip_for_predistributor or unchanged_content_and_no_predistributor)):
 
         publish_result_coll = RepoPublishResult.get_collection()
         publish_start_timestamp = _now_timestamp()
         publish_end_timestamp = _now_timestamp(string=False)
 
+        updates = {'set__last_publish': publish_end_timestamp}
+        if unchanged_content_and_no_predistributor:
+            # What was last published is still current
+            updates['set__last_published_revision'] = repo_obj.content_revision
+            updates['set__last_published_config_hash'] = config_hash
         # Use raw pymongo not to fire the signal hander
         model.Distributor.objects(
             repo_id=repo_obj.repo_id,
-            distributor_id=dist_id).update(set__last_publish=publish_end_timestamp)
+            distributor_id=dist_id).update(**updates)
 
         result_code = RepoPublishResult.RESULT_SKIPPED
         _logger.debug('publish skipped for repo [%s] with distributor ID [%s]' % (
@@ -1247,6 +1355,56 @@ def check_publish(repo_obj, dist_id, dist_inst, transfer_repo, conduit, call_con
     return result
 
 
+def _changed_since_publish(repo_obj, dist, last_published, config_override):
+    """
+    Check whether the content of a repository or the configuration of a distributor has changed
+    since the distributor last published, for distributors that last published before content
+    revisions were recorded.
+
+    :param repo_obj: repository object
+    :type  repo_obj: pulp.server.db.model.Repository
+    :param dist: the distributor
+    :type  dist: pulp.server.db.model.Distributor
+    :param last_published: the time the distributor last published
+    :type  last_published: datetime.datetime
+    :param config_override: the override config for this publish
+    :type  config_override: dict
+
+    :return: whether the content has changed, and whether the configuration has changed
+    :rtype:  tuple
+    """
+    the_timestamp = dateutils.format_iso8601_datetime(last_published)
+    content_changed = model.RepositoryContentUnit.objects(repo_id=repo_obj.repo_id,
+                                                          updated__gte=the_timestamp).count()
+    if not content_changed:
+        # There is no newer RepositoryContentUnit than last publish;
+        # however, a unit shared between multiple repos could still have been mutated,
+        # in which case it will be reflected in last_unit_added.
+        content_changed = repo_obj.last_unit_added and repo_obj.last_unit_added > last_published
+    last_unit_removed = repo_obj.last_unit_removed
+    units_removed = last_unit_removed is not None and last_unit_removed > last_published
+    config_changed = dist.last_updated > last_published or \
+        dist.last_override_config != config_override
+    return bool(content_changed or units_removed), config_changed
+
+
+def _publish_config_hash(call_config):
+    """
+    Compute a digest of the distributor configuration and the override configuration used for a
+    publish, so that a change to either can be detected without comparing timestamps.
+
+    :param call_config: the configuration of the publish
+    :type  call_config: pulp.plugins.config.PluginCallConfiguration
+
+    :return: hex digest of the configuration
+    :rtype:  str
+    """
+    config = {'config': call_config.repo_plugin_config,
+              'override_config': call_config.override_config}
+    return hashlib.sha256(json.dumps(config, sort_keys=True,
+                                     default=json_util.default)).hexdigest()
+
+
 def _get_distributor_instance_and_config(repo_id, distributor_id):
     """
     For a given repository and distributor, retrieve the instance of the distributor and its
@@ -1327,9 +1485,12 @@ def _do_publish(repo_obj, dist_id, dist_inst, transfer_repo, conduit, call_confi
         repo_id=repo_obj.repo_id, distributor_id=dist_id)
 
     if not publish_report.canceled_flag:
-        # Use raw pymongo not to fire the signal hander
+        # Record the content revision the publish started from, so that changes made while it
+        # ran are published next time. Use raw pymongo not to fire the signal hander.
         model.Distributor.objects(repo_id=repo_obj.repo_id, distributor_id=dist_id).\
-            update(set__last_publish=publish_end_timestamp)
+            update(set__last_publish=publish_end_timestamp,
+                   set__last_published_revision=repo_obj.content_revision,
+                   set__last_published_config_hash=_publish_config_hash(call_config))
 
     # Add a publish entry
     summary = publish_report.summary
@@ -1456,13 +1617,8 @@ def download_repo(repo_id, verify_all_units=False):
     :type  verify_all_units: bool
     """
     task_description = _('Download Repository Content')
-    if verify_all_units:
-        repo_unit_querysets = get_mongoengine_unit_querysets(repo_id)
-        missing_content_units = chain(*repo_unit_querysets)
-    else:
-        missing_content_units = find_units_not_downloaded(repo_id)
-
-    download_requests = _create_download_requests(missing_content_units)
+    content_units = _find_units_to_download(repo_id, verify_all_units)
+    download_requests = _create_download_requests(content_units)
     download_step = LazyUnitDownloadStep(
         _('background_download'),
         task_description,
@@ -1473,82 +1629,199 @@ def download_repo(repo_id, verify_all_units=False):
 
 def _get_deferred_content_units():
     """
-    Retrieve a list of units that have been added to the DeferredDownload collection.
+    Retrieve the units that have been added to the DeferredDownload collection.
+
+    The entries are read in pages and the units for each page are loaded with one query per
+    content type rather than one query per entry.
 
     :return: A generator of content units that correspond to DeferredDownload entries.
     :rtype:  generator of pulp.server.db.model.FileContentUnit
     """
-    for deferred_download in model.DeferredDownload.objects.filter():
-        try:
-            unit_model = plugin_api.get_unit_model_by_id(deferred_download.unit_type_id)
+    deferred_qs = model.DeferredDownload.objects.only('unit_id', 'unit_type_id')
+    for page in _paginate_by_id(deferred_qs, DOWNLOAD_BATCH_SIZE):
+        unit_ids_by_type = {}
+        for deferred_download in page:
+            unit_ids = unit_ids_by_type.setdefault(deferred_download.unit_type_id, set())
+            unit_ids.add(deferred_download.unit_id)
+
+        for unit_type_id, unit_ids in unit_ids_by_type.items():
+            unit_model = plugin_api.get_unit_model_by_id(unit_type_id)
             if unit_model is None:
                 _logger.error(_('Unable to find the model object for the {type} type.').format(
-                    type=deferred_download.unit_type_id))
-            else:
-                unit = unit_model.objects.filter(id=deferred_download.unit_id).get()
+                    type=unit_type_id))
+                continue
+
+            found_ids = set()
+            # read in full so no cursor is left open while the units are downloaded
+            for unit in list(unit_model.objects.filter(id__in=list(unit_ids))):
+                found_ids.add(unit.id)
                 yield unit
-        except DoesNotExist:
+
             # This is normal if the content unit in question has been purged during an
             # orphan cleanup.
-            _logger.debug(_('Unable to find the {type}:{id} content unit.').format(
-                type=deferred_download.unit_type_id, id=deferred_download.unit_id))
+            for unit_id in unit_ids - found_ids:
+                _logger.debug(_('Unable to find the {type}:{id} content unit.').format(
+                    type=unit_type_id, id=unit_id))
+
+
+def _find_units_to_download(repo_id, verify_all_units):
+    """
+    Find the content units of a repository whose files should be downloaded.
+
+    :param repo_id:          The ID of the repository.
+    :type  repo_id:          str
+    :param verify_all_units: When `True`, all units in the repository are returned, otherwise
+                             only file units that have not been downloaded are.
+    :type  verify_all_units: bool
+
+    :return: A generator of content units, read a page at a time.
+    :rtype:  generator of pulp.server.db.model.ContentUnit
+    """
+    unit_models = get_repo_unit_models(repo_id)
+    if not verify_all_units:
+        unit_models = [m for m in unit_models if issubclass(m, model.FileContentUnit)]
+
+    for unit_model in unit_models:
+        associations = model.RepositoryContentUnit.objects(
+            repo_id=repo_id, unit_type_id=unit_model._content_type_id.default).only('unit_id')
+        for page in _paginate_by_id(associations, DOWNLOAD_BATCH_SIZE):
+            units = unit_model.objects(id__in=[association.unit_id for association in page])
+            if not verify_all_units:
+                units = units(downloaded=False)
+            for unit in list(units):
+                yield unit
+
+
+def _paginate_by_id(queryset, page_size):
+    """
+    Read the results of a query a page at a time in order of their IDs. Each page is read in
+    full before it is returned, so no cursor is held open while the caller works through it.
+    MongoDB closes cursors that have been idle for 10 minutes, which downloads easily outlast.
+
+    :param queryset:  The query to read.
+    :type  queryset:  mongoengine.queryset.QuerySet
+    :param page_size: The maximum number of documents in a page.
+    :type  page_size: int
+
+    :return: A generator of lists of documents.
+    :rtype:  generator of list
+    """
+    filters = {}
+    while True:
+        page = list(queryset.filter(**filters).order_by('id').limit(page_size))
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        filters = {'id__gt': page[-1].id}
+
+
+def _get_catalog_entries(content_units):
+    """
+    Find the catalog entry to download each file of the given content units from, using one
+    query per content type. When a file has several entries, the one with the lowest revision
+    is used.
+
+    :param content_units: The content units to find catalog entries for.
+    :type  content_units: iterable of pulp.server.db.model.FileContentUnit
+
+    :return: The catalog entries keyed by (unit type ID, unit ID, file path).
+    :rtype:  dict
+    """
+    unit_ids_by_type = {}
+    for content_unit in content_units:
+        unit_ids_by_type.setdefault(content_unit.type_id, set()).add(content_unit.id)
+
+    catalog_entries = {}
+    for unit_type_id, unit_ids in unit_ids_by_type.items():
+        qs = model.LazyCatalogEntry.objects.filter(
+            unit_type_id=unit_type_id,
+            unit_id__in=list(unit_ids)
+        )
+        for catalog_entry in qs.order_by('revision'):
+            key = (unit_type_id, catalog_entry.unit_id, catalog_entry.path)
+            catalog_entries.setdefault(key, catalog_entry)
+    return catalog_entries
+
+
+def _direct_download_enabled():
+    """
+    Determine whether lazy content is downloaded directly from the upstream sources
+    rather than through the Pulp Streamer.
+
+    :return: True if the ``direct_download`` setting in the ``lazy`` section is enabled.
+    :rtype:  bool
+
+    :raises PulpCodedTaskException: if the setting is not a boolean.
+    """
+    try:
+        return parse_bool(pulp_conf.get('lazy', 'direct_download'))
+    except Unparsable:
+        raise PulpCodedTaskException(error_codes.PLP1014, section='lazy', key='direct_download',
+                                     reason=_('The value is not boolean'))
 
 
 def _create_download_requests(content_units):
     """
-    Make a list of Nectar DownloadRequests for the given content units using
-    the lazy catalog.
+    Generate Nectar DownloadRequests for the given content units using the lazy catalog.
 
-    :param content_units: The content units to build a list of DownloadRequests for.
-    :type  content_units: list of pulp.server.db.model.FileContentUnit
+    The content units are consumed in pages so the catalog entries for each page can be
+    found together, and the requests are generated as the downloader asks for them rather
+    than being built up front.
 
-    :return: A list of DownloadRequests; each request includes a ``data``
+    :param content_units: The content units to build DownloadRequests for.
+    :type  content_units: iterable of pulp.server.db.model.FileContentUnit
+
+    :return: A generator of DownloadRequests; each request includes a ``data``
              instance variable which is a dict containing the FileContentUnit,
              the list of files in the unit, and the downloaded file's storage
              path.
-    :rtype:  list of nectar.request.DownloadRequest
+    :rtype:  generator of nectar.request.DownloadRequest
     """
-    requests = []
     working_dir = common_utils.get_working_directory()
-    signing_key = Key.load(pulp_conf.get('authentication', 'rsa_key'))
-
-    for content_unit in content_units:
-        # All files in the unit; every request for a unit has a reference to this dict.
-        unit_files = {}
-        unit_working_dir = os.path.join(working_dir, content_unit.id)
-        for file_path in content_unit.list_files():
-            qs = model.LazyCatalogEntry.objects.filter(
-                unit_id=content_unit.id,
-                unit_type_id=content_unit.type_id,
-                path=file_path
-            )
-            catalog_entry = qs.order_by('revision').first()
-            if catalog_entry is None:
-                continue
-            signed_url = _get_streamer_url(catalog_entry, signing_key)
+    direct_download = _direct_download_enabled()
+    if not direct_download:
+        signing_key = Key.load(pulp_conf.get('authentication', 'rsa_key'))
+
+    for page in paginate(content_units, DOWNLOAD_BATCH_SIZE):
+        catalog_entries = _get_catalog_entries(page)
+        for content_unit in page:
+            # All files in the unit; every request for a unit has a reference to this dict.
+            unit_files = {}
+            unit_working_dir = os.path.join(working_dir, content_unit.id)
+            for file_path in content_unit.list_files():
+                catalog_entry = catalog_entries.get(
+                    (content_unit.type_id, content_unit.id, file_path))
+                if catalog_entry is None:
+                    continue
+                if direct_download:
+                    url = catalog_entry.url
+                else:
+                    url = _get_streamer_url(catalog_entry, signing_key)
 
-            temporary_destination = os.path.join(
-                unit_working_dir,
-                os.path.basename(catalog_entry.path)
-            )
-            mkdir(unit_working_dir)
-            unit_files[temporary_destination] = {
-                CATALOG_ENTRY: catalog_entry,
-                PATH_DOWNLOADED: None,
-            }
-
-            request = DownloadRequest(signed_url, temporary_destination)
-            # For memory reasons, only hold onto the id and type_id so we can reload the unit
-            # once it's successfully downloaded.
-            request.data = {
-                TYPE_ID: content_unit.type_id,
-                UNIT_ID: content_unit.id,
-                UNIT_FILES: unit_files,
-                REQUEST: request
-            }
-            requests.append(request)
-
-    return requests
+                temporary_destination = os.path.join(
+                    unit_working_dir,
+                    os.path.basename(catalog_entry.path)
+                )
+                mkdir(unit_working_dir)
+                unit_files[temporary_destination] = {
+                    CATALOG_ENTRY: catalog_entry,
+                    PATH_DOWNLOADED: None,
+                }
+
+                request = DownloadRequest(url, temporary_destination)
+                # The unit is carried with the request so it doesn't need to be reloaded
+                # once the file is downloaded. Since requests are generated as the
+                # downloader consumes them, only the units being downloaded are held.
+                request.data = {
+                    TYPE_ID: content_unit.type_id,
+                    UNIT_ID: content_unit.id,
+                    UNIT: content_unit,
+                    UNIT_FILES: unit_files,
+                    REQUEST: request
+                }
+                yield request
 
 
 def _get_streamer_url(catalog_entry, signing_key):
@@ -1583,10 +1856,12 @@ def _get_streamer_url(catalog_entry, signing_key):
 class LazyUnitDownloadStep(DownloadEventListener):
     """
     A Step that downloads all the given requests. The downloader is configured
-    to download from the Pulp Streamer components.
+    to download from the Pulp Streamer components, unless direct downloads are
+    enabled, in which case each importer's downloader fetches the files from the
+    upstream sources.
 
     :ivar download_requests: The download requests the step will process.
-    :type download_requests: list of nectar.request.DownloadRequest
+    :type download_requests: iterable of nectar.request.DownloadRequest
     :ivar download_config:   The keyword args used to initialize the Nectar
                              downloader configuration.
     :type download_config:   dict
@@ -1598,11 +1873,13 @@ class LazyUnitDownloadStep(DownloadEventListener):
         """
         Initializes a Step that downloads all the download requests provided.
 
-        :param download_requests:   List of download requests to process.
-        :type  download_requests:   list of nectar.request.DownloadRequest
+        :param download_requests:   Download requests to process. These may be generated
+                                    while the downloads are in progress.
+        :type  download_requests:   iterable of nectar.request.DownloadRequest
         """
         self.description = step_description
-        self.download_requests = download_requests
+        self.download_requests = self._count_requests(download_requests)
+        self.direct_download = _direct_download_enabled()
         self.download_config = {
             MAX_CONCURRENT: int(pulp_conf.get('lazy', 'download_concurrency')),
             HEADERS: {PULP_STREAM_REQUEST_HEADER: 'true'},
@@ -1612,6 +1889,9 @@ class LazyUnitDownloadStep(DownloadEventListener):
             DownloaderConfig(**self.download_config),
             self
         )
+        self.importer_downloaders = {}
+        # The number of files placed into storage with each strategy, such as rename or copy.
+        self.storage_strategies = {}
 
         self.uuid = str(uuid.uuid4())
         self.description = step_description
@@ -1621,19 +1901,157 @@ class LazyUnitDownloadStep(DownloadEventListener):
         self.progress_successes = 0
         self.progress_failures = 0
         self.error_details = []
-        self.total_units = len(download_requests)
+        self.total_units = 0
         self.last_report_time = 0
         self.last_reported_state = self.state
         self.timestamp = str(time.time())
         self.task_id = get_current_task_id()
 
+        # Units that started or finished downloading, waiting to be written in bulk.
+        self._lock = threading.Lock()
+        self._started_units = {}
+        self._downloaded_units = {}
+        self._downloaded_count = 0
+
+    def _count_requests(self, download_requests):
+        """
+        Count the download requests as they are handed to the downloader, since the total
+        isn't known until they have all been generated.
+
+        :param download_requests: The download requests to count.
+        :type  download_requests: iterable of nectar.request.DownloadRequest
+
+        :return: A generator of the same download requests.
+        :rtype:  generator of nectar.request.DownloadRequest
+        """
+        for request in download_requests:
+            self.total_units += 1
+            yield request
+
     def start(self):
         """
         Start the download process.
         """
         self.state = reporting_constants.STATE_RUNNING
         self.report()
-        self.downloader.download(self.download_requests)
+        try:
+            if self.direct_download:
+                self._download_direct()
+            else:
+                self.downloader.download(self.download_requests)
+        finally:
+            self.finalize_units()
+
+        _logger.debug(_('Files placed into storage by strategy: {strategies}').format(
+            strategies=self.storage_strategies))
+        if self.progress_failures > 0:
+            self.state = reporting_constants.STATE_FAILED
+        else:
+            self.state = reporting_constants.STATE_COMPLETE
+        self.report()
+
+    def _download_direct(self):
+        """
+        Download the requests straight from the upstream sources. The requests are grouped
+        by the importer that created their catalog entries, and each group is downloaded
+        with that importer's downloader so its feed configuration is honored.
+        """
+        for page in paginate(self.download_requests, DOWNLOAD_BATCH_SIZE):
+            requests_by_importer = {}
+            for request in page:
+                catalog_entry = request.data[UNIT_FILES][request.destination][CATALOG_ENTRY]
+                requests_by_importer.setdefault(catalog_entry.importer_id, []).append(request)
+
+            for importer_id, requests in requests_by_importer.items():
+                try:
+                    downloader = self._get_importer_downloader(importer_id, requests[0].url)
+                except plugin_exceptions.PluginNotFound:
+                    _logger.error(_('Unable to find the importer {id} to download '
+                                    '{count} files from.').format(id=importer_id,
+                                                                  count=len(requests)))
+                    for request in requests:
+                        request.data[UNIT_FILES][request.destination][PATH_DOWNLOADED] = False
+                        self.progress_failures += 1
+                    self.report()
+                    continue
+                downloader.download(requests)
+
+    def _get_importer_downloader(self, importer_id, url):
+        """
+        Get the downloader configured by the given importer, creating it the first time
+        it's needed.
+
+        :param importer_id: The document ID of the importer that created the catalog entries.
+        :type  importer_id: str
+        :param url:         A URL the downloader will fetch, used to pick the downloader type.
+        :type  url:         str
+
+        :return: The configured downloader, reporting its events to this step.
+        :rtype:  nectar.downloaders.base.Downloader
+
+        :raises pulp.plugins.loader.exceptions.PluginNotFound: if the importer is not found.
+        """
+        downloader = self.importer_downloaders.get(importer_id)
+        if downloader is None:
+            importer, config, importer_model = get_importer_by_id(importer_id)
+            importer_model.config = config.flatten()
+            downloader = importer.get_downloader_for_db_importer(
+                importer_model, url, working_dir=common_utils.get_working_directory())
+            downloader.event_listener = self
+            self.importer_downloaders[importer_id] = downloader
+        return downloader
+
+    def finalize_units(self):
+        """
+        Write the pending bookkeeping for the units processed so far: remove their
+        DeferredDownload entries and mark the units whose files have all been
+        downloaded as downloaded, using one query per content type.
+        """
+        with self._lock:
+            started_units, self._started_units = self._started_units, {}
+            downloaded_units, self._downloaded_units = self._downloaded_units, {}
+            self._downloaded_count = 0
+
+        for unit_type_id, unit_ids in started_units.items():
+            query_set = model.DeferredDownload.objects.filter(
+                unit_type_id=unit_type_id,
+                unit_id__in=list(unit_ids)
+            )
+            query_set.delete()
+
+        for unit_type_id, unit_ids in downloaded_units.items():
+            _logger.debug(_('Marking {count} content units of type {type} as downloaded.').format(
+                count=len(unit_ids), type=unit_type_id))
+            unit_model = plugin_api.get_unit_model_by_id(unit_type_id)
+            unit_model.objects.filter(id__in=list(unit_ids)).update(set__downloaded=True)
+
+    def _unit_started(self, data):
+        """
+        Record that downloading a unit has started, so its DeferredDownload entry is removed.
+
+        :param data: The data dict of a download request for the unit.
+        :type  data: dict
+        """
+        with self._lock:
+            self._started_units.setdefault(data[TYPE_ID], set()).add(data[UNIT_ID])
+
+    def _file_finished(self, data):
+        """
+        Mark the entire unit as downloaded if all of its files have been downloaded. Units
+        are marked in bulk once enough of them have finished.
+
+        :param data: The data dict of the download request that finished.
+        :type  data: dict
+        """
+        download_flags = [entry[PATH_DOWNLOADED] for entry in data[UNIT_FILES].values()]
+        if not all(download_flags):
+            return
+        with self._lock:
+            self._downloaded_units.setdefault(data[TYPE_ID], set()).add(data[UNIT_ID])
+            self._downloaded_count += 1
+            finalize = self._downloaded_count >= FINALIZE_BATCH_SIZE
+        if finalize:
+            self.finalize_units()
 
     def report(self):
         """
@@ -1642,9 +2060,6 @@ class LazyUnitDownloadStep(DownloadEventListener):
         progress reporting system when that has been implemented.
         """
         total_processed = self.progress_successes + self.progress_failures
-        if self.total_units == total_processed:
-            self.state = reporting_constants.STATE_COMPLETE
-
         if self.progress_failures > 0:
             self.state = reporting_constants.STATE_FAILED
 
@@ -1687,11 +2102,7 @@ class LazyUnitDownloadStep(DownloadEventListener):
         _logger.debug(_('Starting download of {url}.').format(url=report.url))
 
         # Remove the deferred entry now that the download has started.
-        query_set = model.DeferredDownload.objects.filter(
-            unit_id=report.data[UNIT_ID],
-            unit_type_id=report.data[TYPE_ID]
-        )
-        query_set.delete()
+        self._unit_started(report.data)
 
         try:
             # If the file exists and the checksum is valid, don't download it
@@ -1714,16 +2125,7 @@ class LazyUnitDownloadStep(DownloadEventListener):
             # It's either missing or incorrect, so download it
             pass
 
-        unit_model = plugin_api.get_unit_model_by_id(report.data[TYPE_ID])
-        unit_qs = unit_model.objects.filter(id=report.data[UNIT_ID])
-
-        # Mark the entire unit as downloaded, if necessary.
-        download_flags = [entry[PATH_DOWNLOADED] for entry in
-                          report.data[UNIT_FILES].values()]
-        if all(download_flags):
-            _logger.debug(_('Marking content located at {path} as downloaded.').format(
-                path=path_entry[CATALOG_ENTRY].path))
-            unit_qs.update_one(set__downloaded=True)
+        self._file_finished(report.data)
 
     def download_succeeded(self, report):
         """
@@ -1736,14 +2138,7 @@ class LazyUnitDownloadStep(DownloadEventListener):
         :param report: the report associated with the download request.
         :type  report: nectar.report.DownloadReport
         """
-        # Reload the content unit
-        unit_model = plugin_api.get_unit_model_by_id(report.data[TYPE_ID])
-        unit_qs = unit_model.objects.filter(id=report.data[UNIT_ID])
-        content_unit = unit_qs.only(
-            '_content_type_id',
-            'id', '_last_updated',
-            '_storage_path',
-        ).get()
+        content_unit = report.data[UNIT]
         path_entry = report.data[UNIT_FILES][report.destination]
 
         # Validate the file and update the progress.
@@ -1755,14 +2150,18 @@ class LazyUnitDownloadStep(DownloadEventListener):
                 catalog_entry.checksum
             )
 
+            # The downloaded file is in this task's working directory, so it can be moved
+            # into storage rather than copied.
             if len(report.data[UNIT_FILES]) == 1:
-                content_unit.import_content(report.destination)
+                strategy = content_unit.import_content(report.destination, move=True)
             else:
                 relative_path = os.path.relpath(
                     catalog_entry.path,
                     content_unit.storage_path,
                 )
-                content_unit.import_content(report.destination, location=relative_path)
+                strategy = content_unit.import_content(report.destination, location=relative_path,
+                                                       move=True)
+            self.storage_strategies[strategy] = self.storage_strategies.get(strategy, 0) + 1
             self.progress_successes += 1
             path_entry[PATH_DOWNLOADED] = True
         except (InvalidChecksumType, VerificationException, IOError), e:
@@ -1772,13 +2171,7 @@ class LazyUnitDownloadStep(DownloadEventListener):
             self.progress_failures += 1
         self.report()
 
-        # Mark the entire unit as downloaded, if necessary.
-        download_flags = [entry[PATH_DOWNLOADED] for entry in
-                          report.data[UNIT_FILES].values()]
-        if all(download_flags):
-            _logger.debug(_('Marking content unit {type}:{id} as downloaded.').format(
-                type=content_unit.type_id, id=content_unit.id))
-            unit_qs.update_one(set__downloaded=True)
+        self._file_finished(report.data)
 
     def download_failed(self, report):
         """
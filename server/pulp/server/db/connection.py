@@ -24,6 +24,7 @@ from pulp.common import error_codes
 
 from pulp.server import config
 from pulp.server.compat import wraps
+from pulp.server.db import profiler
 from pulp.server.exceptions import PulpCodedException, PulpException
 
 import semantic_version
@@ -64,6 +65,9 @@ def initialize(name=None, seeds=None, max_pool_size=None, replica_set=None, max_
     try:
         connection_kwargs = {}
 
+        # command listeners only apply to connections made after they are registered
+        profiler.install()
+
         if name is None:
             name = config.config.get('database', 'name')
 
@@ -249,6 +253,49 @@ class UnsafeRetry(object):
                 except AttributeError:
                     pass
 
+    @classmethod
+    def decorate_class(cls, klass, full_name):
+        """
+        Decorate the PyMongo methods of a class, so its instances don't need to be decorated
+        one at a time. Methods inherited from a class that was already decorated are
+        decorated again with the given name rather than being wrapped twice.
+
+        The class is marked as decorated whether or not the feature is turned on, so callers
+        can check the marker with is_class_decorated() and only call this once per class.
+
+        :param klass: class that implements PyMongo methods.
+        :type  klass: type
+        :param full_name: Collection of the class, used for logging
+        :type  full_name: str
+        """
+        unsafe_autoretry = config.config.getboolean('database', 'unsafe_autoretry')
+        if unsafe_autoretry:
+            for m in cls._decorated_methods:
+                method = getattr(klass, m, None)
+                # only plain methods are decorated; class and static methods are skipped
+                if method is None or getattr(method, 'im_self', True) is not None:
+                    continue
+                function = method.im_func
+                function = getattr(function, '_unsafe_retry_wrapped', function)
+                retry = cls.retry_decorator(full_name)(function)
+                retry._unsafe_retry_wrapped = function
+                setattr(klass, m, retry)
+        klass._unsafe_retry_class = klass
+
+    @staticmethod
+    def is_class_decorated(klass):
+        """
+        Determine whether decorate_class() has been called for exactly this class. Being a
+        subclass of a decorated class does not count, since the subclass may override the
+        decorated methods.
+
+        :param klass: class that implements PyMongo methods.
+        :type  klass: type
+        :return: True if the class has been decorated
+        :rtype:  bool
+        """
+        return klass.__dict__.get('_unsafe_retry_class') is klass
+
     @staticmethod
     def retry_decorator(full_name=None):
         """
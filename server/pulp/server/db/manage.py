@@ -55,6 +55,10 @@ def parse_args():
     parser.add_option('--dry-run', action='store_true', dest='dry_run', default=False,
                       help=_('Perform a dry run with no changes made. Returns 1 if there are '
                              'migrations to apply.'))
+    parser.add_option('--workers', action='store', dest='workers', type='int',
+                      default=models.DEFAULT_WORKERS,
+                      help=_('Number of threads used to apply migrations that are applied in '
+                             'chunks. Defaults to %d.') % models.DEFAULT_WORKERS)
     options, args = parser.parse_args()
     if args:
         parser.error(_('Unknown arguments: %s') % ', '.join(args))
@@ -172,7 +176,8 @@ def migrate_database(options):
                     # We pass in !options.test to stop the apply_migration method from updating the
                     # package's current version when the --test flag is set
                     migration_package.apply_migration(migration,
-                                                      update_current_version=not options.test)
+                                                      update_current_version=not options.test,
+                                                      workers=options.workers)
                     message = _('Migration to %(p)s version %(v)s complete in %(t).3f seconds.')
                     message = message % {'p': migration_package.name,
                                          't': migration_package.duration,
@@ -211,6 +216,8 @@ def ensure_database_indexes():
     model.ResourceManagerLock.ensure_indexes()
     model.LazyCatalogEntry.ensure_indexes()
     model.DeferredDownload.ensure_indexes()
+    model.EventDelivery.ensure_indexes()
+    model.MigrationProgress.ensure_indexes()
     model.Distributor.ensure_indexes()
     model.User.ensure_indexes()
 
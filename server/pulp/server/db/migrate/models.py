@@ -1,15 +1,21 @@
+from datetime import timedelta
 from gettext import gettext as _
 import logging
 import os
+import Queue
 import re
+import sys
+import threading
 import time
 
 import pkg_resources
 
 from mongoengine.queryset import DoesNotExist
+import pymongo
 
 from pulp.common.compat import iter_modules
-from pulp.server.db.model import MigrationTracker
+from pulp.server.db.connection import get_collection
+from pulp.server.db.model import MigrationProgress, MigrationTracker
 import pulp.server.db.migrations
 
 
@@ -18,6 +24,9 @@ _logger = logging.getLogger(__name__)
 
 MIGRATIONS_ENTRY_POINT = 'pulp.server.db.migrations'
 
+# The default number of threads used to apply a chunked migration
+DEFAULT_WORKERS = 4
+
 
 class MigrationRemovedError(Exception):
     def __init__(self, migration_version, component_version, min_component_version,
@@ -95,6 +104,7 @@ class MigrationModule(object):
         if not hasattr(self._module, 'migrate'):
             raise self.__class__.MissingMigrate()
         self.migrate = self._module.migrate
+        self.chunked_migration = getattr(self._module, 'chunked_migration', None)
 
     @property
     def name(self):
@@ -190,10 +200,11 @@ class MigrationPackage(object):
         migration.prepare_reindex_migration()
         self.duration = time.time() - start
 
-    def apply_migration(self, migration, update_current_version=True):
+    def apply_migration(self, migration, update_current_version=True, workers=DEFAULT_WORKERS):
         """
         Apply the migration that is passed in, and update the DB to note the new version that this
-        migration represents.
+        migration represents. If the migration declares a chunked migration, it is applied in
+        chunks before the migration's migrate() function is called.
 
         :param migration:              The migration to apply
         :type  migration:              pulp.server.db.migrate.utils.MigrationModule
@@ -201,8 +212,13 @@ class MigrationPackage(object):
                                        successful application
                                        If False, don't update.
         :type  update_current_version: bool
+        :param workers:                The number of threads used to apply a chunked migration
+        :type  workers:                int
         """
         start = time.time()
+        if getattr(migration, 'chunked_migration', None) is not None:
+            runner = ChunkedMigrationRunner(migration.name, migration.chunked_migration, workers)
+            runner.run()
         migration.migrate()
         if update_current_version:
             self._migration_tracker.version = migration.version
@@ -312,6 +328,180 @@ class MigrationPackage(object):
         return str(self)
 
 
+class ChunkedMigrationRunner(object):
+    """
+    Applies a chunked migration using a pool of threads, keeping a checkpoint of each chunk in
+    the migration_progress collection so that an interrupted migration resumes with the chunks
+    that were not completed. The progress is logged periodically with an estimate of the time
+    remaining.
+    """
+
+    # The number of chunk checkpoints written in each bulk insert
+    INSERT_BATCH_SIZE = 1000
+
+    # The minimum number of seconds between progress messages
+    PROGRESS_INTERVAL = 30
+
+    def __init__(self, name, chunked_migration, workers=DEFAULT_WORKERS):
+        """
+        :param name:              The name of the migration module
+        :type  name:              str
+        :param chunked_migration: The chunked migration declared by the module
+        :type  chunked_migration: pulp.server.db.migrations.lib.utils.ChunkedMigration
+        :param workers:           The number of threads that migrate chunks
+        :type  workers:           int
+        """
+        self.name = name
+        self.chunked_migration = chunked_migration
+        self.workers = max(workers, 1)
+        self.collection = get_collection(chunked_migration.collection_name)
+        self._lock = threading.Lock()
+        self._failure = None
+        self._total = 0
+        self._completed = 0
+        self._completed_at_start = 0
+        self._started = None
+        self._reported = None
+
+    def run(self):
+        """
+        Migrate the chunks that have not been migrated yet, and remove the checkpoints once all
+        of them are.
+
+        :raises Exception: the first exception raised while migrating a chunk, once the chunks
+                           being migrated by the other threads are complete
+        """
+        chunks = self._load_chunks() or self._plan_chunks()
+        pending = [chunk for chunk in chunks if not chunk.done]
+        self._total = len(chunks)
+        self._completed = self._total - len(pending)
+        if self._completed:
+            msg = _('Resuming %(m)s: %(d)d of %(t)d chunks already migrated')
+            _logger.info(msg % {'m': self.name, 'd': self._completed, 't': self._total})
+        elif pending:
+            msg = _('Migrating %(m)s in %(t)d chunks using %(w)d threads')
+            _logger.info(msg % {'m': self.name, 't': self._total, 'w': self.workers})
+
+        work = Queue.Queue()
+        for chunk in pending:
+            work.put(chunk)
+        self._started = self._reported = time.time()
+        self._completed_at_start = self._completed
+        threads = []
+        for i in range(min(self.workers, len(pending))):
+            thread = threading.Thread(target=self._worker, args=(work,))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        if self._failure is not None:
+            raise self._failure[0], self._failure[1], self._failure[2]
+        MigrationProgress.objects(migration=self.name).delete()
+
+    def _load_chunks(self):
+        """
+        Load the checkpoints of an interrupted run. The checkpoints are inserted in order, so if
+        the last chunk is missing the previous run was interrupted while planning, before any
+        chunk was migrated, and the checkpoints are discarded.
+
+        :return: the checkpoints of the chunks in order; an empty list if there are none
+        :rtype:  list of pulp.server.db.model.MigrationProgress
+        """
+        chunks = list(MigrationProgress.objects(migration=self.name).order_by('index'))
+        if chunks and chunks[-1].end is None:
+            return chunks
+        MigrationProgress.objects(migration=self.name).delete()
+        return []
+
+    def _plan_chunks(self):
+        """
+        Split the documents to migrate into chunks of consecutive IDs and store a checkpoint for
+        each of them.
+
+        :return: the checkpoints of the chunks in order
+        :rtype:  list of pulp.server.db.model.MigrationProgress
+        """
+        chunk_size = self.chunked_migration.chunk_size
+        cursor = self.collection.find(self.chunked_migration.query or {}, projection=['_id'])
+        cursor = cursor.sort('_id', pymongo.ASCENDING).batch_size(chunk_size)
+        starts = [document['_id'] for n, document in enumerate(cursor) if n % chunk_size == 0]
+
+        chunks = []
+        for index, start in enumerate(starts):
+            end = starts[index + 1] if index + 1 < len(starts) else None
+            chunks.append(MigrationProgress(migration=self.name, index=index, start=start,
+                                            end=end))
+        for n in xrange(0, len(chunks), self.INSERT_BATCH_SIZE):
+            MigrationProgress.objects.insert(chunks[n:n + self.INSERT_BATCH_SIZE],
+                                             load_bulk=False)
+        return chunks
+
+    def _worker(self, work):
+        """
+        Target of the threads. Migrates chunks taken from the work queue until it is empty or
+        another thread fails.
+
+        :param work: queue of the chunks to migrate
+        :type  work: Queue.Queue
+        """
+        while self._failure is None:
+            try:
+                chunk = work.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                self._migrate_chunk(chunk)
+            except Exception:
+                with self._lock:
+                    if self._failure is None:
+                        self._failure = sys.exc_info()
+                return
+            self._chunk_completed()
+
+    def _migrate_chunk(self, chunk):
+        """
+        Migrate the documents in a chunk and record that the chunk is complete.
+
+        :param chunk: the checkpoint of the chunk
+        :type  chunk: pulp.server.db.model.MigrationProgress
+        """
+        start = time.time()
+        id_range = {'$gte': chunk.start}
+        if chunk.end is not None:
+            id_range['$lt'] = chunk.end
+        spec = {'_id': id_range}
+        if self.chunked_migration.query:
+            spec = {'$and': [self.chunked_migration.query, spec]}
+
+        migrated = 0
+        migrate_document = self.chunked_migration.migrate_document
+        for document in self.collection.find(spec, projection=self.chunked_migration.fields):
+            migrate_document(document, self.collection)
+            migrated += 1
+
+        MigrationProgress.objects(migration=self.name, index=chunk.index).update_one(
+            set__done=True, set__migrated=migrated, set__duration=time.time() - start)
+
+    def _chunk_completed(self):
+        """
+        Count a completed chunk and log the progress if it was not logged in the last
+        PROGRESS_INTERVAL seconds or all chunks are complete.
+        """
+        with self._lock:
+            self._completed += 1
+            now = time.time()
+            if now - self._reported < self.PROGRESS_INTERVAL and self._completed < self._total:
+                return
+            self._reported = now
+            completed = self._completed - self._completed_at_start
+            remaining = (now - self._started) / completed * (self._total - self._completed)
+            msg = _('Migrated %(d)d of %(t)d chunks of %(m)s, about %(r)s remaining')
+            _logger.info(msg % {'d': self._completed, 't': self._total, 'm': self.name,
+                                'r': timedelta(seconds=int(remaining))})
+
+
 def check_package_versions():
     """
     Inspects each migration package returned by get_migration_packages(), and makes sure they have
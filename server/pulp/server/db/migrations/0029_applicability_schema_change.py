@@ -23,12 +23,21 @@ def migrate_applicability_profile(appl_profile, collection):
     collection.update_one({'_id': appl_profile['_id']}, {'$set': delta})
 
 
+chunked_migration = utils.ChunkedMigration('repo_profile_applicability',
+                                           migrate_applicability_profile,
+                                           query={NEW_FIELD: {'$exists': False}},
+                                           fields=['profile_hash'])
+
+
 def migrate(*args, **kwargs):
     """
     Add a new field all_profiles_hash. Create new index and drop the old one.
     It's important to drop the old one since it prevents some duplicated records which are now
     possible.
 
+    The new field is added by chunked_migration before this is called by pulp-manage-db. Any
+    profiles that still lack it are migrated here.
+
     :param args:   unused
     :type  args:   list
     :param kwargs: unused
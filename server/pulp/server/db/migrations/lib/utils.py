@@ -11,6 +11,9 @@ MIGRATION_HEADER_MSG = '* Migrating %s content...'
 MIGRATION_PROGRESS_MSG = '* Migrated units: %s of %s'
 STARS = '*' * 79
 
+# The default number of documents in each chunk of a chunked migration
+DEFAULT_CHUNK_SIZE = 1000
+
 
 class MigrationProgressLog(object):
     """
@@ -64,3 +67,37 @@ class MigrationProgressLog(object):
         Print footer (or delimiter) to indicate the end of the content unit migration.
         """
         _logger.info(STARS)
+
+
+class ChunkedMigration(object):
+    """
+    Declares the part of a migration that migrates the documents of a collection one at a time,
+    so that it can be applied in chunks.
+
+    A migration module declares it by assigning an instance to a module attribute named
+    chunked_migration. Before the module's migrate() function is called, the documents that match
+    the query are split into chunks by ranges of their IDs and the chunks are migrated in
+    parallel. Each chunk is recorded in the migration_progress collection as it is completed, and
+    an interrupted migration resumes with the chunks that were not, so migrate_document may be
+    called more than once for a document in the chunk that was interrupted.
+
+    :ivar collection_name: name of the collection containing the documents
+    :type collection_name: str
+    :ivar migrate_document: function that migrates a document, called with the document and the
+                            collection
+    :type migrate_document: callable
+    :ivar query: spec of the documents to migrate; all documents are migrated when None
+    :type query: dict
+    :ivar fields: the fields of the documents passed to migrate_document; all fields when None
+    :type fields: list
+    :ivar chunk_size: the number of documents in each chunk
+    :type chunk_size: int
+    """
+
+    def __init__(self, collection_name, migrate_document, query=None, fields=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.collection_name = collection_name
+        self.migrate_document = migrate_document
+        self.query = query
+        self.fields = fields
+        self.chunk_size = chunk_size
@@ -10,9 +10,11 @@ from gettext import gettext as _
 from hashlib import sha256
 from hmac import HMAC
 
-from mongoengine import (BooleanField, DictField, Document, DynamicField, IntField,
-                         ListField, StringField, UUIDField, ValidationError, QuerySetNoCache)
+from mongoengine import (BooleanField, DictField, Document, DynamicField, FloatField, IntField,
+                         ListField, ObjectIdField, StringField, UUIDField, ValidationError,
+                         QuerySetNoCache)
 from mongoengine import signals
+from pymongo import ReturnDocument
 from pymongo.errors import DuplicateKeyError
 
 from pulp.common import constants, dateutils, error_codes
@@ -29,7 +31,7 @@ from pulp.server.db.fields import ISO8601StringField, UTCDateTimeField
 from pulp.server.db.model.reaper_base import ReaperMixin
 from pulp.server.db.model import base
 from pulp.server.db.querysets import (CriteriaQuerySet, RepoQuerySet, RepositoryContentUnitQuerySet,
-                                      WorkerQuerySet)
+                                      TaskStatusQuerySet, WorkerQuerySet)
 from pulp.server.managers import factory
 from pulp.server.util import Singleton
 from pulp.server.webservices.views import serializers
@@ -53,10 +55,16 @@ class AutoRetryDocument(Document):
 
     def __init__(self, *args, **kwargs):
         """
-        Initialize a document and decorate the appropriate methods with the retry_decorator.
+        Initialize a document. The first time a document of each class is initialized, the
+        appropriate methods of the class are decorated with the retry_decorator.
+
+        The decoration is deferred until then, rather than done when the class is defined,
+        so the server configuration has been loaded when it is checked.
         """
         super(AutoRetryDocument, self).__init__(*args, **kwargs)
-        UnsafeRetry.decorate_instance(instance=self, full_name=type(self))
+        document_class = type(self)
+        if not UnsafeRetry.is_class_decorated(document_class):
+            UnsafeRetry.decorate_class(klass=document_class, full_name=document_class)
 
     # QuerySetNoCache is used as the default QuerySet to ensure that all sub-classes
     # do not cache query results unless specifically requested by calling ``cache``.
@@ -111,6 +119,12 @@ class Repository(AutoRetryDocument):
     :type last_unit_added: UTCDateTimeField
     :ivar last_unit_removed: Datetime of the most recent occurence of removing a unit from the repo
     :type last_unit_removed: UTCDateTimeField
+    :ivar last_updated: Datetime of the most recent change to the repo, including changes to its
+                        content unit counts
+    :type last_updated: UTCDateTimeField
+    :ivar content_revision: incremented whenever units are associated with or removed from the
+                            repo, or units in it are modified
+    :type content_revision: mongoengine.IntField
     :ivar _ns: (Deprecated) Namespace of repo, included for backwards compatibility.
     :type _is: mongoengine.StringField
     """
@@ -126,6 +140,8 @@ class Repository(AutoRetryDocument):
     content_unit_counts = DictField(default={})
     last_unit_added = UTCDateTimeField()
     last_unit_removed = UTCDateTimeField()
+    last_updated = UTCDateTimeField()
+    content_revision = IntField(default=0)
 
     # For backward compatibility
     _ns = StringField(default='repos')
@@ -170,9 +186,25 @@ class Repository(AutoRetryDocument):
                     self.notes[key] = value
 
         # These keys may not be changed.
-        prohibited = ['content_unit_counts', 'repo_id', 'last_unit_added', 'last_unit_removed']
+        prohibited = ['content_unit_counts', 'repo_id', 'last_unit_added', 'last_unit_removed',
+                      'last_updated', 'content_revision']
         [setattr(self, key, value) for key, value in repo_delta.items() if key not in prohibited]
 
+    @classmethod
+    def pre_save(cls, sender, document, **kwargs):
+        """
+        The signal that is triggered before a repository is saved.
+
+        :param sender:   class of sender (unused)
+        :type sender:    object
+        :param document: mongoengine document being saved
+        :type document:  pulp.server.db.model.Repository
+        """
+        document.last_updated = dateutils.now_utc_datetime_with_tzinfo()
+
+
+signals.pre_save.connect(Repository.pre_save, sender=Repository)
+
 
 class RepositoryContentUnit(AutoRetryDocument):
     """
@@ -459,6 +491,42 @@ class MigrationTracker(AutoRetryDocument):
             'allow_inheritance': False}
 
 
+class MigrationProgress(AutoRetryDocument):
+    """
+    A checkpoint of a chunked migration. The documents a chunked migration migrates are split
+    into chunks by ranges of their IDs, and there is one object for each chunk recording whether
+    it has been migrated, so that an interrupted migration resumes with the chunks that were not.
+    The objects of a migration are removed once it is complete.
+
+    :ivar migration: The name of the migration module
+    :type migration: mongoengine.StringField
+    :ivar index:     The position of the chunk in the migration
+    :type index:     mongoengine.IntField
+    :ivar start:     The ID of the first document in the chunk
+    :type start:     mongoengine.DynamicField
+    :ivar end:       The ID of the first document in the next chunk; None for the last chunk
+    :type end:       mongoengine.DynamicField
+    :ivar done:      Whether the chunk has been migrated
+    :type done:      mongoengine.BooleanField
+    :ivar migrated:  The number of documents migrated in the chunk
+    :type migrated:  mongoengine.IntField
+    :ivar duration:  The number of seconds it took to migrate the chunk
+    :type duration:  mongoengine.FloatField
+    """
+
+    migration = StringField(required=True)
+    index = IntField(required=True)
+    start = DynamicField()
+    end = DynamicField()
+    done = BooleanField(default=False)
+    migrated = IntField(default=0)
+    duration = FloatField()
+
+    meta = {'collection': 'migration_progress',
+            'indexes': [{'fields': ['migration', 'index'], 'unique': True}],
+            'allow_inheritance': False}
+
+
 class TaskStatus(AutoRetryDocument, ReaperMixin):
     """
     Represents a task.
@@ -494,6 +562,14 @@ class TaskStatus(AutoRetryDocument, ReaperMixin):
     :type exception:   None
     :ivar traceback:   Deprecated. This is always None.
     :type traceback:   None
+    :ivar revision:    counter incremented each time the task status is written
+    :type revision:    int
+    :ivar changed_fields: names of the fields modified by the most recent write, or None if
+                          they are not known
+    :type changed_fields: list of str
+    :ivar query_profile: summary of the MongoDB commands issued by the task, if query profiling
+                         is enabled
+    :type query_profile: dict
     """
 
     task_id = StringField(required=True)
@@ -508,6 +584,9 @@ class TaskStatus(AutoRetryDocument, ReaperMixin):
     finish_time = ISO8601StringField()
     result = DynamicField()
     group_id = UUIDField(default=None)
+    revision = IntField(default=0)
+    changed_fields = ListField(StringField(), default=None)
+    query_profile = DictField(default=None)
 
     # These are deprecated, and will always be None
     exception = StringField()
@@ -519,7 +598,47 @@ class TaskStatus(AutoRetryDocument, ReaperMixin):
     meta = {'collection': 'task_status',
             'indexes': ['-tags', '-state', {'fields': ['-task_id'], 'unique': True}, '-group_id'],
             'allow_inheritance': False,
-            'queryset_class': CriteriaQuerySet}
+            'queryset_class': TaskStatusQuerySet}
+
+    def save(self, *args, **kwargs):
+        """
+        Save the task status and increment its revision in the same write.
+
+        A new task status is inserted with its first revision. For one that is already in the
+        database, the modified fields are written together with the revision increment, so no
+        other write can come between them. The fields written by a save are not tracked, so
+        changed_fields is cleared to tell clients waiting for changes that they need to fetch the
+        whole document.
+
+        :return: this task status
+        :rtype:  pulp.server.db.model.TaskStatus
+        """
+        self.changed_fields = None
+        if self.id is None or self._created:
+            self.revision += 1
+            return super(TaskStatus, self).save(*args, **kwargs)
+
+        signals.pre_save.send(self.__class__, document=self)
+        if kwargs.get('validate', True):
+            self.validate(clean=kwargs.get('clean', True))
+
+        updates, removals = self._delta()
+        for field in ('revision', 'changed_fields'):
+            updates.pop(field, None)
+            removals.pop(field, None)
+        updates['changed_fields'] = None
+        update = {'$set': updates, '$inc': {'revision': 1}}
+        if removals:
+            update['$unset'] = removals
+
+        written = TaskStatus._get_collection().find_one_and_update(
+            {'_id': self.id}, update, projection={'revision': True}, upsert=True,
+            return_document=ReturnDocument.AFTER)
+        self.revision = written['revision']
+
+        signals.post_save.send(self.__class__, document=self, created=False)
+        self._clear_changed_fields()
+        return self
 
     def save_with_set_on_insert(self, fields_to_set_on_insert):
         """
@@ -562,8 +681,13 @@ class TaskStatus(AutoRetryDocument, ReaperMixin):
         for internal_field in ('id', '_ns'):
             stuff_to_update.pop(internal_field, None)
 
+        # The revision is always incremented, and which fields were written is not tracked here.
+        stuff_to_update.pop('revision', None)
+        stuff_to_update['changed_fields'] = None
+
         update = {'$set': stuff_to_update,
-                  '$setOnInsert': set_on_insert}
+                  '$setOnInsert': set_on_insert,
+                  '$inc': {'revision': 1}}
 
         try:
             TaskStatus._get_collection().update({'task_id': task_id}, update, upsert=True)
@@ -896,7 +1020,7 @@ class FileContentUnit(ContentUnit):
                 raise ValueError(_('must be relative path'))
         self._storage_path = path
 
-    def import_content(self, path, location=None):
+    def import_content(self, path, location=None, move=False, checksum_type=None, checksum=None):
         """
         Import a content file into platform storage.
         The (optional) *location* may be used to specify a path within the unit
@@ -910,6 +1034,15 @@ class FileContentUnit(ContentUnit):
         :param location: The (optional) location within the unit storage path
             where the content is to be stored.
         :type location: str
+        :param move: The file at *path* is owned by the caller and may be moved into storage.
+        :type move: bool
+        :param checksum_type: The (optional) algorithm of *checksum*.
+        :type checksum_type: str
+        :param checksum: The (optional) expected checksum of the imported file.
+        :type checksum: str
+        :return: The strategy used to place the file into storage.
+            See pulp.server.content.storage.FileStorage.put().
+        :rtype: str
 
         :raises ImportError: if the unit has not been saved.
         :raises PulpCodedException: PLP0037 if *path* is not an existing file.
@@ -920,7 +1053,8 @@ class FileContentUnit(ContentUnit):
         if not os.path.isfile(path):
             raise exceptions.PulpCodedException(error_code=error_codes.PLP0037, path=path)
         with FileStorage() as storage:
-            storage.put(self, path, location)
+            return storage.put(self, path, location, move=move, checksum_type=checksum_type,
+                               checksum=checksum)
 
     def save_and_import_content(self, path, location=None):
         """
@@ -1171,6 +1305,49 @@ class DeferredDownload(AutoRetryDocument):
     _ns = StringField(default='deferred_download')
 
 
+class EventDelivery(AutoRetryDocument):
+    """
+    A pending delivery of a fired event to an event listener. Together these
+    documents form the outbox from which events are delivered to listeners
+    outside of the task or request that fired them.
+
+    :ivar listener_id:  The ID of the event listener to notify.
+    :type listener_id:  bson.ObjectId
+    :ivar event_type:   The type of the event.
+    :type event_type:   str
+    :ivar event_data:   The JSON serialized data of the event as it was when fired.
+    :type event_data:   str
+    :ivar created:      The time at which the event was fired.
+    :type created:      datetime.datetime
+    :ivar available_at: The time at which the delivery may next be attempted. Claimed
+                        deliveries are pushed into the future so other dispatchers skip them.
+    :type available_at: datetime.datetime
+    :ivar claim:        Identifies the batch of the dispatcher that claimed the delivery.
+    :type claim:        str
+    :ivar attempts:     The number of failed attempts to deliver the event.
+    :type attempts:     int
+    :ivar last_error:   Describes why the last attempt failed.
+    :type last_error:   str
+    """
+    meta = {
+        'collection': 'event_outbox',
+        'indexes': ['available_at', 'claim', ('listener_id', 'created')],
+        'allow_inheritance': False,
+    }
+
+    listener_id = ObjectIdField(required=True)
+    event_type = StringField(required=True)
+    event_data = StringField(required=True)
+    created = UTCDateTimeField(default=dateutils.now_utc_datetime_with_tzinfo)
+    available_at = UTCDateTimeField(default=dateutils.now_utc_datetime_with_tzinfo)
+    claim = StringField()
+    attempts = IntField(default=0)
+    last_error = StringField()
+
+    # For backward compatibility
+    _ns = StringField(default='event_outbox')
+
+
 class User(AutoRetryDocument):
     """
     :ivar login: user's login name, must be unique for each user
@@ -1291,6 +1468,11 @@ class User(AutoRetryDocument):
 class Distributor(AutoRetryDocument):
     """
     Defines schema for a Distributor in the 'repo_distributors' collection.
+
+    :ivar last_published_revision: the content revision of the repository that was last published
+    :type last_published_revision: mongoengine.IntField
+    :ivar last_published_config_hash: digest of the configuration that was last published
+    :type last_published_config_hash: mongoengine.StringField
     """
     repo_id = StringField(required=True)
     distributor_id = StringField(required=True, regex=r'^[\-_A-Za-z0-9]+$')
@@ -1300,6 +1482,8 @@ class Distributor(AutoRetryDocument):
     last_publish = UTCDateTimeField()
     last_updated = UTCDateTimeField()
     last_override_config = DictField()
+    last_published_revision = IntField()
+    last_published_config_hash = StringField()
     scratchpad = DictField()
 
     _ns = StringField(default='repo_distributors')
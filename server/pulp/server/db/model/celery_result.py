@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 
 from pulp.server.db.model.base import Model
-from pulp.server.db.model.reaper_base import ReaperMixin
+from pulp.server.db.model.reaper_base import DEFAULT_BATCH_SIZE, ReaperMixin, remove_in_batches
 
 
 class CeleryResult(Model, ReaperMixin):
@@ -13,18 +13,29 @@ class CeleryResult(Model, ReaperMixin):
     unique_indices = tuple()
 
     @classmethod
-    def reap_old_documents(cls, config_days):
+    def reap_old_documents(cls, config_days, batch_size=DEFAULT_BATCH_SIZE, batch_pause=0,
+                           max_rate=0):
         """
         Delete old Celery task results from the celery_taskmeta collection.
 
         This overrides the inherited classmethod provided by ReaperMixin. The default
         functionality is not correct because Celery overrides the use of `_id` in the
-        celery_taskmeta collection.
+        celery_taskmeta collection, so results are removed in batches by `date_done` instead.
 
         :param config_days: Remove all records older than the number of days set by config_days.
         :type config_days: float
+        :param batch_size: the maximum number of documents removed at a time
+        :type batch_size: int
+        :param batch_pause: seconds to wait between batches
+        :type batch_pause: float
+        :param max_rate: the maximum number of documents removed per second; 0 for no limit
+        :type max_rate: float
+
+        :return: the number of documents removed
+        :rtype: int
         """
         # Remove all objects older than the epoch time encoded in last_valid_date_done
         last_valid_date_done = datetime.utcnow() - timedelta(days=config_days)
-        collection = cls.get_collection()
-        collection.remove({'date_done': {'$lt': last_valid_date_done}})
+        return remove_in_batches(cls.get_collection(),
+                                 {'date_done': {'$lt': last_valid_date_done}}, 'date_done',
+                                 batch_size, batch_pause, max_rate)
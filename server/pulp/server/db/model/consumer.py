@@ -172,7 +172,9 @@ class RepoProfileApplicability(Model):
     all_profiles_hash, each individual profile is identified by profile_hash and can be found in
     the consumer_unit_profiles collection.
     The applicability data is a dictionary structure that represents the applicable units for
-    the given set of profiles and repository.
+    the given set of profiles and repository. The repo content revision identifies the content of
+    the repository the applicability data was calculated against, so that it is only regenerated
+    when the repository's content has changed since.
 
     The RepoProfileApplicabilityManager can be accessed through the classlevel "objects" attribute.
     """
@@ -186,7 +188,7 @@ class RepoProfileApplicability(Model):
     )
 
     def __init__(self, profile_hash, repo_id, profile, applicability, _id=None,
-                 all_profiles_hash=None, **kwargs):
+                 all_profiles_hash=None, repo_content_revision=None, **kwargs):
         """
         Construct a RepoProfileApplicability object.
 
@@ -204,6 +206,9 @@ class RepoProfileApplicability(Model):
         :param all_profiles_hash: The hash of the set of the profiles that this applicability
                                   data is for
         :type  all_profiles_hash: basestring
+        :param repo_content_revision: The content revision of the repository that this
+                                      applicability data was calculated against
+        :type  repo_content_revision: int
         :param kwargs:        unused, but collected to allow instantiation from Mongo query results
         :type  kwargs:        dict
         """
@@ -215,6 +220,7 @@ class RepoProfileApplicability(Model):
         self.applicability = applicability
         self._id = _id
         self.all_profiles_hash = all_profiles_hash
+        self.repo_content_revision = repo_content_revision
 
         # The superclass puts an unnecessary (and confusingly named) id attribute on this model.
         # Let's remove it.
@@ -235,7 +241,8 @@ class RepoProfileApplicability(Model):
         # Else, we need to create an object with this object's attributes
         new_document = {'profile_hash': self.profile_hash, 'repo_id': self.repo_id,
                         'profile': self.profile, 'applicability': self.applicability,
-                        'all_profiles_hash': self.all_profiles_hash}
+                        'all_profiles_hash': self.all_profiles_hash,
+                        'repo_content_revision': self.repo_content_revision}
         if self._id is not None:
             self.get_collection().update({'_id': self._id}, new_document)
         else:
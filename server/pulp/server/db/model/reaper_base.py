@@ -1,9 +1,14 @@
 from datetime import timedelta, datetime
+import time
 
 from pulp.common import dateutils
 from pulp.server.compat import ObjectId
 
 
+# The default number of documents removed from a collection at a time
+DEFAULT_BATCH_SIZE = 1000
+
+
 class ReaperMixin(object):
     """
     A Mixin class providing default reaping functionality.
@@ -13,12 +18,28 @@ class ReaperMixin(object):
     """
 
     @classmethod
-    def reap_old_documents(cls, config_days):
+    def reap_old_documents(cls, config_days, batch_size=DEFAULT_BATCH_SIZE, batch_pause=0,
+                           max_rate=0):
         """
         Remove documents from that are older than config_days.
 
+        Documents are removed oldest first, in batches of consecutive _ids, so that no single
+        delete holds up the database for long. Each batch is removed independently, so a run that
+        is interrupted leaves the oldest documents removed and the next run resumes with the
+        oldest ones that remain.
+
         :param config_days: Remove all records older than the number of days set by config_days.
         :type config_days: float
+        :param batch_size: the maximum number of documents removed at a time; values below 1
+                           are treated as 1
+        :type batch_size: int
+        :param batch_pause: seconds to wait between batches
+        :type batch_pause: float
+        :param max_rate: the maximum number of documents removed per second; 0 for no limit
+        :type max_rate: float
+
+        :return: the number of documents removed
+        :rtype: int
         """
         age = timedelta(days=config_days)
         # Generate an ObjectId that we can use to know which objects to remove
@@ -32,7 +53,53 @@ class ReaperMixin(object):
             # and just use mongoengine queryset to delete old documents.
             collection = cls._get_collection()
 
-        collection.remove({'_id': {'$lte': expired_object_id}})
+        return remove_in_batches(collection, {'_id': {'$lte': expired_object_id}}, '_id',
+                                 batch_size, batch_pause, max_rate)
+
+
+def remove_in_batches(collection, spec, sort_field, batch_size=DEFAULT_BATCH_SIZE,
+                      batch_pause=0, max_rate=0):
+    """
+    Remove the documents matching spec from a collection in batches, in ascending order of
+    sort_field. Each batch is removed by the range of sort_field it covers.
+
+    :param collection: the collection to remove documents from
+    :type  collection: pymongo.collection.Collection
+    :param spec:       query matching the documents to remove
+    :type  spec:       dict
+    :param sort_field: the field the documents are removed in order of
+    :type  sort_field: str
+    :param batch_size: the maximum number of documents removed at a time; values below 1 are
+                       treated as 1
+    :type  batch_size: int
+    :param batch_pause: seconds to wait between batches
+    :type  batch_pause: float
+    :param max_rate:   the maximum number of documents removed per second; 0 for no limit
+    :type  max_rate:   float
+    :return: the number of documents removed
+    :rtype:  int
+    """
+    # a limit of 0 would not limit the batch at all
+    batch_size = max(batch_size, 1)
+    removed = 0
+    while True:
+        start = time.time()
+        # the newest document in the batch bounds the range that is removed
+        batch = list(collection.find(spec, projection=[sort_field])
+                     .sort(sort_field, 1).limit(batch_size))
+        if not batch:
+            break
+        result = collection.remove({sort_field: {'$lte': batch[-1][sort_field]}})
+        removed += result['n']
+        if len(batch) < batch_size:
+            break
+
+        pause = batch_pause
+        if max_rate:
+            pause = max(pause, result['n'] / float(max_rate) - (time.time() - start))
+        if pause > 0:
+            time.sleep(pause)
+    return removed
 
 
 def _create_expired_object_id(age):
@@ -0,0 +1,338 @@
+"""
+Profiles the commands Pulp sends to MongoDB.
+
+The profiler is a pymongo command listener. When the mongo_queries option of the profiling
+section of the server config is enabled, commands issued while a profile is active on the
+current thread, such as during a task or a REST API request, are attributed to it. Each
+command is counted against the collection it ran on and the shape of its query, which is the
+query with all of its values replaced, along with the Pulp function that issued it. A summary
+of the profile is stored on the task's status or, for requests, logged.
+
+Independently, commands that take longer than the slow_query_threshold option are logged
+along with the shape of their query.
+"""
+
+from gettext import gettext as _
+import logging
+import sys
+import threading
+
+try:
+    from pymongo import monitoring
+except ImportError:
+    # command monitoring was introduced in pymongo 3.1
+    monitoring = None
+
+from pulp.server.compat import json, json_util
+from pulp.server.config import config
+
+
+# The number of query shapes reported in a profile summary, those that took the longest in total
+SUMMARY_SIZE = 50
+
+# Modules that are skipped when looking for the Pulp function that issued a command
+_PLUMBING_MODULES = ('pymongo', 'mongoengine', 'bson', 'pulp.server.db.connection',
+                     'pulp.server.db.fields', 'pulp.server.db.model', 'pulp.server.db.profiler',
+                     'pulp.server.db.querysets')
+
+# Keys of a command that hold its query, in the order they are looked for
+_QUERY_KEYS = ('filter', 'query', 'pipeline')
+
+# Keys of a write command that hold a list of statements, each with a query in 'q'
+_STATEMENT_KEYS = ('updates', 'deletes')
+
+_logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+_listener = None
+
+
+class QueryProfile(object):
+    """
+    Counts and times the commands issued while the profile is active, per collection and
+    query shape.
+
+    :ivar name:  describes what is being profiled, such as the task ID
+    :type name:  str
+    :ivar stats: statistics for each (collection, command name, shape), each a dict with the
+                 number of commands, their total and maximum durations in milliseconds, and the
+                 number of commands issued by each calling function
+    :type stats: dict
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.stats = {}
+
+    def add(self, collection, command_name, shape, caller, duration):
+        """
+        Count a command.
+
+        :param collection:   the collection the command ran on; None if it was not specific to one
+        :type  collection:   basestring
+        :param command_name: the name of the command, such as 'find'
+        :type  command_name: basestring
+        :param shape:        the shape of the command's query
+        :type  shape:        basestring
+        :param caller:       the function that issued the command
+        :type  caller:       basestring
+        :param duration:     how long the command took in milliseconds
+        :type  duration:     float
+        """
+        key = (collection, command_name, shape)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = {'count': 0, 'duration': 0.0, 'max': 0.0, 'callers': {}}
+        stats['count'] += 1
+        stats['duration'] += duration
+        stats['max'] = max(stats['max'], duration)
+        stats['callers'][caller] = stats['callers'].get(caller, 0) + 1
+
+    def summary(self, limit=SUMMARY_SIZE):
+        """
+        Summarize the profile. Query shapes are listed by the total time their commands took,
+        longest first, each with the functions that issued them.
+
+        :param limit: the maximum number of query shapes listed
+        :type  limit: int
+
+        :return: the number of commands and their total duration in milliseconds, and statistics
+                 for the query shapes that took the longest
+        :rtype:  dict
+        """
+        queries = []
+        for (collection, command_name, shape), stats in self.stats.iteritems():
+            callers = sorted(stats['callers'].iteritems(), key=lambda c: (-c[1], c[0]))
+            queries.append({'collection': collection,
+                            'command': command_name,
+                            'shape': shape,
+                            'count': stats['count'],
+                            'duration_ms': round(stats['duration'], 3),
+                            'max_duration_ms': round(stats['max'], 3),
+                            'callers': [{'caller': c, 'count': n} for c, n in callers]})
+        queries.sort(key=lambda q: q['duration_ms'], reverse=True)
+        return {'commands': sum(s['count'] for s in self.stats.itervalues()),
+                'duration_ms': round(sum(s['duration'] for s in self.stats.itervalues()), 3),
+                'queries': queries[:limit]}
+
+
+if monitoring is not None:
+
+    class CommandProfiler(monitoring.CommandListener):
+        """
+        Listens to the commands pymongo sends to MongoDB, adds them to the active profile of the
+        thread that issued them and logs those that are slow.
+
+        pymongo publishes command events on the thread that runs the command, from within the
+        call that runs it, so the state of a command between its started and finished events is
+        kept per thread and the function that issued it is still on the stack when it finishes.
+
+        :ivar slow_query_threshold: commands that take at least this many milliseconds are
+                                    logged; 0 to log none
+        :type slow_query_threshold: int
+        """
+
+        def __init__(self, slow_query_threshold=0):
+            self.slow_query_threshold = slow_query_threshold
+
+        def started(self, event):
+            """
+            Remember the command along with the profile that is active when it starts.
+
+            :param event: the event published when the command was started
+            :type  event: pymongo.monitoring.CommandStartedEvent
+            """
+            profile = get_active_profile()
+            if profile is not None or self.slow_query_threshold:
+                _pending_commands()[event.request_id] = (profile, event.command)
+
+        def succeeded(self, event):
+            """
+            :param event: the event published when the command succeeded
+            :type  event: pymongo.monitoring.CommandSucceededEvent
+            """
+            self._finished(event)
+
+        def failed(self, event):
+            """
+            :param event: the event published when the command failed
+            :type  event: pymongo.monitoring.CommandFailedEvent
+            """
+            self._finished(event)
+
+        def _finished(self, event):
+            """
+            Add a finished command to the profile that was active when it started, and log it if
+            it was slow.
+
+            :param event: the event published when the command finished
+            :type  event: pymongo.monitoring.CommandSucceededEvent or
+                          pymongo.monitoring.CommandFailedEvent
+            """
+            started = _pending_commands().pop(event.request_id, None)
+            if started is None:
+                return
+            profile, command = started
+            duration = event.duration_micros / 1000.0
+            slow = self.slow_query_threshold and duration >= self.slow_query_threshold
+            if profile is None and not slow:
+                return
+
+            collection = command.get(event.command_name)
+            if not isinstance(collection, basestring):
+                # getMore names its collection separately
+                collection = command.get('collection')
+            shape = query_shape(command)
+            calling_function = caller()
+            if profile is not None:
+                profile.add(collection, event.command_name, shape, calling_function, duration)
+            if slow:
+                msg = _('Slow MongoDB command %(command)s on %(collection)s took %(duration)dms, '
+                        'issued by %(caller)s in %(context)s: %(shape)s')
+                _logger.warning(msg % {'command': event.command_name, 'collection': collection,
+                                       'duration': duration, 'caller': calling_function,
+                                       'context': profile.name if profile else _('no profile'),
+                                       'shape': shape})
+
+
+def install():
+    """
+    Register the command profiler with pymongo if query profiling or the slow query log is
+    enabled. This must be called before the connection to the database is made.
+
+    :return: the registered profiler; None if it is not enabled or not supported
+    :rtype:  CommandProfiler
+    """
+    global _listener
+
+    threshold = config.getint('profiling', 'slow_query_threshold')
+    if not (is_enabled() or threshold) or _listener is not None:
+        return _listener
+    if monitoring is None:
+        _logger.warning(_('MongoDB query profiling requires pymongo 3.1 or later.'))
+        return None
+    _listener = CommandProfiler(threshold)
+    monitoring.register(_listener)
+    return _listener
+
+
+def is_enabled():
+    """
+    :return: True if commands are to be profiled per task and request
+    :rtype:  bool
+    """
+    return config.getboolean('profiling', 'mongo_queries')
+
+
+def start(name):
+    """
+    Start a profile on the current thread, to which the commands the thread issues are
+    attributed until it is stopped. A profile that is already active is replaced.
+
+    :param name: describes what is being profiled, such as the task ID
+    :type  name: str
+
+    :return: the new profile
+    :rtype:  QueryProfile
+    """
+    _local.profile = QueryProfile(name)
+    return _local.profile
+
+
+def stop():
+    """
+    Stop the profile that is active on the current thread.
+
+    :return: the profile that was stopped; None if no profile was active
+    :rtype:  QueryProfile
+    """
+    profile = get_active_profile()
+    _local.profile = None
+    return profile
+
+
+def get_active_profile():
+    """
+    :return: the profile active on the current thread; None if there is none
+    :rtype:  QueryProfile
+    """
+    return getattr(_local, 'profile', None)
+
+
+def _pending_commands():
+    """
+    :return: the commands the current thread has started but which have not yet finished,
+             keyed by request ID
+    :rtype:  dict
+    """
+    try:
+        return _local.pending
+    except AttributeError:
+        _local.pending = {}
+        return _local.pending
+
+
+def query_shape(command):
+    """
+    Describe the query of a command with all of its values replaced by 1, so that commands
+    that differ only in the values they query for have the same shape.
+
+    :param command: a command sent to MongoDB
+    :type  command: dict
+
+    :return: the JSON serialized shape; '{}' if the command has no query
+    :rtype:  str
+    """
+    for key in _QUERY_KEYS:
+        if key in command:
+            shape = _shape(command[key])
+            break
+    else:
+        shape = {}
+        for key in _STATEMENT_KEYS:
+            if key in command:
+                shape = _shape([statement.get('q', {}) for statement in command[key]])
+                break
+    return json.dumps(shape, sort_keys=True, default=json_util.default)
+
+
+def _shape(value):
+    """
+    Replace the values in a query, keeping its keys and operators. Lists are reduced to their
+    distinct shapes, so that an $in query has the same shape however many values it lists.
+
+    :param value: a query or part of one
+    :type  value: object
+
+    :return: the shape of the value
+    :rtype:  object
+    """
+    if isinstance(value, dict):
+        return dict((key, _shape(item)) for key, item in value.iteritems())
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = _shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return 1
+
+
+def caller():
+    """
+    Find the function that issued the command being run on the current thread, which is the
+    innermost function that is not part of pymongo, mongoengine or Pulp's database layer.
+
+    :return: the module and name of the function, such as
+             'pulp.server.controllers.repository:check_publish'
+    :rtype:  str
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(_PLUMBING_MODULES):
+            return '%s:%s' % (module, frame.f_code.co_name)
+        frame = frame.f_back
+    return 'unknown'
@@ -6,6 +6,8 @@ from mongoengine import Q
 from mongoengine.queryset import DoesNotExist, QuerySetNoCache
 from pymongo import ASCENDING
 
+from pulp.common.constants import CALL_STATES
+from pulp.common import dateutils
 from pulp.common.dateutils import ensure_tz
 from pulp.server import exceptions as pulp_exceptions
 from pulp.server.constants import PULP_PROCESS_TIMEOUT_INTERVAL
@@ -96,14 +98,17 @@ class CriteriaQuerySet(QuerySetPreventCache):
         It attempts to call post_save() on each Document in the query set. If
         post_save() does not exist, it will do nothing.
 
+        :return: the number of documents updated, or the full result of the update when
+                 full_result is True
         """
-        super(CriteriaQuerySet, self).update(*args, **kwargs)
+        result = super(CriteriaQuerySet, self).update(*args, **kwargs)
         for doc in self:
             try:
                 doc.post_save(type(doc).__name__, doc)
             except AttributeError:
                 # if post_save() is not defined for this particular document, that's ok
                 pass
+        return result
 
     def get_or_404(self, **kwargs):
         """
@@ -140,11 +145,95 @@ class WorkerQuerySet(CriteriaQuerySet):
         return query_set.filter(last_heartbeat__gte=oldest_heartbeat_time)
 
 
+class TaskStatusQuerySet(CriteriaQuerySet):
+    """
+    Custom queryset for task statuses.
+
+    Every update issued through this queryset also increments the task's revision counter and
+    records which fields were touched, so that clients waiting for changes to a task can detect
+    them with a cheap query and fetch only the fields that changed.
+    """
+
+    # keyword arguments to update() and modify() that are options rather than field updates
+    _UPDATE_OPTIONS = ('upsert', 'multi', 'write_concern', 'full_result', 'full_response',
+                       'remove', 'new')
+
+    # mongoengine update operators that may prefix a field name, as in "set__state"
+    _UPDATE_OPERATORS = ('set', 'unset', 'inc', 'dec', 'push', 'push_all', 'pop', 'pull',
+                         'pull_all', 'add_to_set', 'set_on_insert', 'max', 'min', 'rename')
+
+    def update(self, *args, **kwargs):
+        """
+        Increment the revision and record the changed fields along with the requested update.
+
+        If the caller manages the revision itself, the update is passed through unmodified.
+        """
+        self._track_revision(kwargs)
+        return super(TaskStatusQuerySet, self).update(*args, **kwargs)
+
+    def modify(self, *args, **kwargs):
+        """
+        Increment the revision and record the changed fields along with the requested
+        find-and-modify, unless it removes the task status.
+
+        If the caller manages the revision itself, the update is passed through unmodified.
+        """
+        if not kwargs.get('remove'):
+            self._track_revision(kwargs)
+        return super(TaskStatusQuerySet, self).modify(*args, **kwargs)
+
+    def _track_revision(self, kwargs):
+        """
+        Add the revision increment and the names of the changed fields to update keyword arguments.
+
+        :param kwargs: keyword arguments to update() or modify(), changed in place
+        :type  kwargs: dict
+        """
+        changed_fields = set()
+        for key in kwargs:
+            if key in self._UPDATE_OPTIONS:
+                continue
+            parts = key.split('__')
+            if parts[0] in self._UPDATE_OPERATORS and len(parts) > 1:
+                changed_fields.add(parts[1])
+            else:
+                changed_fields.add(parts[0])
+
+        if changed_fields and not changed_fields & set(['revision', 'changed_fields']):
+            kwargs['inc__revision'] = 1
+            kwargs['set__changed_fields'] = sorted(changed_fields)
+
+    def get_state_summary(self):
+        """
+        Count the task statuses in this queryset by state with a single aggregation.
+
+        :return: mapping of every call state to the number of tasks in that state, plus the
+                 total number of tasks under the key 'total'
+        :rtype:  dict
+        """
+        summary = dict((state, 0) for state in CALL_STATES)
+        for result in self.aggregate({'$group': {'_id': '$state', 'count': {'$sum': 1}}}):
+            summary[result['_id']] = result['count']
+        summary['total'] = sum(summary.values())
+        return summary
+
+
 class RepoQuerySet(CriteriaQuerySet):
     """
     Custom queryset for repositories.
+
+    Every update issued through this queryset also sets the repository's last_updated field, so
+    that it reflects changes made without saving the document, such as to the unit counts.
     """
 
+    def update(self, *args, **kwargs):
+        """
+        Set last_updated along with the requested update, unless the caller sets it.
+        """
+        if not any(key.split('__')[-1] == 'last_updated' for key in kwargs):
+            kwargs['set__last_updated'] = dateutils.now_utc_datetime_with_tzinfo()
+        return super(RepoQuerySet, self).update(*args, **kwargs)
+
     def get_repo_or_missing_resource(self, repo_id):
         """
         Allows a django-like get or 404.
@@ -42,11 +42,38 @@ def reap_expired_documents():
     For each collection in _COLLECTION_TIMEDELTAS, call the class method reap_old_documents().
 
     This method gets the number of days from the pulp_config, and calls reap_old_documents with the
-    number of days as the argument.
+    number of days as the argument, along with the batch size and throttling settings.
+
+    :return: the number of documents removed from each collection, keyed by collection name
+    :rtype:  dict
     """
     _logger.info(_('The reaper task is cleaning out old documents from the database.'))
+    batch_size = pulp_config.config.getint('data_reaping', 'batch_size')
+    batch_pause = pulp_config.config.getfloat('data_reaping', 'batch_pause')
+    max_rate = pulp_config.config.getfloat('data_reaping', 'max_rate')
+    removed = {}
     for model_class, config_name in _COLLECTION_TIMEDELTAS.items():
         # Get the config for how old documents should be before they are reaped.
         config_days = pulp_config.config.getfloat('data_reaping', config_name)
-        model_class.reap_old_documents(config_days)
+        count = model_class.reap_old_documents(config_days, batch_size=batch_size,
+                                               batch_pause=batch_pause, max_rate=max_rate)
+        collection_name = _collection_name(model_class)
+        removed[collection_name] = count
+        _logger.info(_('The reaper task removed %(count)d documents from %(collection)s.') %
+                     {'count': count, 'collection': collection_name})
     _logger.info(_('The reaper task has completed.'))
+    return removed
+
+
+def _collection_name(model_class):
+    """
+    :param model_class: a model that is reaped
+    :type  model_class: pulp.server.db.model.reaper_base.ReaperMixin
+    :return: the name of the model's collection
+    :rtype:  str
+    """
+    try:
+        return model_class.collection_name
+    except AttributeError:
+        # models migrated to mongoengine name their collection in their meta
+        return model_class._get_collection_name()
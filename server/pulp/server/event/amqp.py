@@ -18,4 +18,20 @@ def handle_event(notifier_config, event):
     :return: None
     """
 
-    factory.topic_publish_manager().publish(event, notifier_config.get('exchange'))
+    return factory.topic_publish_manager().publish(event, notifier_config.get('exchange'))
+
+
+def handle_events(notifier_config, events):
+    """
+    Send several events out to an AMQP broker over a single session.
+
+    :param notifier_config: dictionary with an optional 'exchange' key naming the
+                            exchange to publish to
+    :type  notifier_config: dict
+    :param events:  Event instances
+    :type  events:  list
+    :return: False if the events could not be published; None if messaging is disabled and
+             the events were discarded
+    :rtype:  bool or None
+    """
+    return factory.topic_publish_manager().publish_all(events, notifier_config.get('exchange'))
@@ -48,3 +48,29 @@ class Event(object):
              'payload': self.payload,
              'call_report': task_serializer(self.call_report)}
         return d
+
+
+class RecordedEvent(Event):
+    """
+    An event recreated from the data recorded when it was fired, so that it can
+    be delivered to listeners after the task that fired it has finished.
+    """
+
+    def __init__(self, event_type, data):
+        """
+        :param event_type: type of the event
+        :type  event_type: str
+        :param data:       the data generated for the event when it was fired
+        :type  data:       dict
+        """
+        self.event_type = event_type
+        self.payload = data.get('payload')
+        self.call_report = None
+        self._data = data
+
+    def data(self):
+        """
+        :return: the data generated for the event when it was fired
+        :rtype:  dict
+        """
+        return self._data
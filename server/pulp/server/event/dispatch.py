@@ -0,0 +1,342 @@
+"""
+Delivers fired events from the event outbox to their listeners.
+
+Firing an event stores a delivery in the outbox for each interested listener and
+queues the deliver_events task, which celerybeat also runs periodically to pick
+up deliveries that are due to be retried. The task claims due deliveries in
+batches and notifies the listeners concurrently, one thread per listener, so a
+slow or unreachable listener only delays its own deliveries. Each listener is
+sent its events in the order they were fired: a listener's deliveries are not
+claimed while any of its deliveries are claimed by another dispatcher, and once
+a delivery to a listener fails, its later deliveries wait for the retry. Failed
+deliveries are retried with exponential backoff until the configured number of
+attempts is reached, after which they are abandoned. Notifiers that support it,
+such as AMQP, are handed all of a listener's events in the batch at once.
+
+Counts of the deliveries made to each listener are kept in the delivery_stats
+field of the listener.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+from gettext import gettext as _
+import logging
+import Queue
+import threading
+import uuid
+
+from celery import task
+
+from pulp.common import dateutils
+from pulp.server.async.tasks import PulpTask
+from pulp.server.compat import json, json_util
+from pulp.server.config import config
+from pulp.server.db.model import EventDelivery
+from pulp.server.db.model.event import EventListener
+from pulp.server.event import data, notifiers
+
+
+# The number of deliveries claimed at a time
+BATCH_SIZE = 100
+
+# The number of seconds for which claimed deliveries are hidden from other dispatchers. This
+# only matters if a dispatcher dies, since deliveries are released as soon as they are attempted.
+CLAIM_TIMEOUT = 1800
+
+# The longest number of seconds a failed delivery waits before it is retried
+MAX_RETRY_DELAY = 3600
+
+_logger = logging.getLogger(__name__)
+
+
+@task(base=PulpTask)
+def deliver_events():
+    """
+    Deliver all events in the outbox that are due to be delivered.
+
+    :return: the number of deliveries that succeeded, failed, were abandoned
+             after failing too many times, and that were dropped because their
+             listener was deleted
+    :rtype:  dict
+    """
+    totals = _new_stats()
+    while True:
+        batch = _claim_batch()
+        if not batch:
+            break
+        for stats in _deliver_batch(batch):
+            for key in totals:
+                totals[key] += stats[key]
+
+    if any(totals.values()):
+        msg = _('Event deliveries: %(delivered)d delivered, %(failed)d failed, '
+                '%(abandoned)d abandoned, %(dropped)d dropped')
+        _logger.info(msg % totals)
+    return totals
+
+
+def _new_stats():
+    """
+    :return: delivery counters set to zero
+    :rtype:  dict
+    """
+    return {'delivered': 0, 'failed': 0, 'abandoned': 0, 'dropped': 0}
+
+
+def _claim_batch():
+    """
+    Claim a batch of deliveries that are due so no other dispatcher attempts them.
+
+    A listener's deliveries are only claimed while none of its deliveries are waiting to be
+    retried or claimed by another dispatcher, and always starting with its oldest, so each
+    listener is sent its events in the order they were fired across batches and dispatchers.
+
+    :return: the claimed deliveries in the order the events were fired
+    :rtype:  list of pulp.server.db.model.EventDelivery
+    """
+    now = dateutils.now_utc_datetime_with_tzinfo()
+    waiting = EventDelivery.objects(available_at__gt=now).distinct('listener_id')
+    due = EventDelivery.objects(available_at__lte=now, listener_id__nin=waiting)
+    ids = [delivery.id for delivery in due.order_by('created', 'id').only('id').limit(BATCH_SIZE)]
+    if not ids:
+        return []
+
+    claim = str(uuid.uuid4())
+    EventDelivery.objects(id__in=ids, available_at__lte=now).update(
+        set__claim=claim, set__available_at=now + timedelta(seconds=CLAIM_TIMEOUT))
+    batch = list(EventDelivery.objects(claim=claim).order_by('created', 'id'))
+    return _release_out_of_order(batch, claim, now)
+
+
+def _release_out_of_order(batch, claim, now):
+    """
+    Release the claimed deliveries to listeners that have earlier deliveries outside of the
+    claim. Another dispatcher may have claimed, or failed, a listener's earlier deliveries
+    between this dispatcher finding the due deliveries and claiming them.
+
+    :param batch: claimed deliveries in the order the events were fired
+    :type  batch: list of pulp.server.db.model.EventDelivery
+    :param claim: identifies the claim
+    :type  claim: str
+    :param now:   the time at which the deliveries were claimed
+    :type  now:   datetime.datetime
+    :return: the deliveries that remain claimed in the order the events were fired
+    :rtype:  list of pulp.server.db.model.EventDelivery
+    """
+    first = OrderedDict()
+    for delivery in batch:
+        first.setdefault(delivery.listener_id, delivery)
+    if not first:
+        return batch
+
+    earlier = [{'listener_id': d.listener_id,
+                '$or': [{'created': {'$lt': d.created}},
+                        {'created': d.created, '_id': {'$lt': d.id}}]}
+               for d in first.values()]
+    blocked = set(EventDelivery.objects(__raw__={'claim': {'$ne': claim},
+                                                 '$or': earlier}).distinct('listener_id'))
+    if not blocked:
+        return batch
+
+    EventDelivery.objects(claim=claim, listener_id__in=list(blocked)).update(
+        set__available_at=now, unset__claim=True)
+    return [delivery for delivery in batch if delivery.listener_id not in blocked]
+
+
+def _deliver_batch(batch):
+    """
+    Deliver a batch of claimed deliveries, notifying up to dispatch_concurrency
+    listeners at a time.
+
+    :param batch: claimed deliveries in the order the events were fired
+    :type  batch: list of pulp.server.db.model.EventDelivery
+    :return: the delivery counters for each listener
+    :rtype:  list of dict
+    """
+    deliveries_by_listener = OrderedDict()
+    for delivery in batch:
+        deliveries_by_listener.setdefault(delivery.listener_id, []).append(delivery)
+
+    listeners = EventListener.get_collection().find(
+        {'_id': {'$in': deliveries_by_listener.keys()}})
+    listeners = dict((listener['_id'], listener) for listener in listeners)
+
+    work = Queue.Queue()
+    for listener_id, deliveries in deliveries_by_listener.items():
+        work.put((listeners.get(listener_id), deliveries))
+
+    results = []
+    concurrency = max(config.getint('events', 'dispatch_concurrency'), 1)
+    threads = []
+    for i in range(min(concurrency, len(deliveries_by_listener))):
+        thread = threading.Thread(target=_deliver_worker, args=(work, results))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _deliver_worker(work, results):
+    """
+    Target of the delivery threads. Delivers the deliveries of each listener
+    taken from the work queue until it is empty.
+
+    :param work:    queue of (listener, deliveries) tuples
+    :type  work:    Queue.Queue
+    :param results: list to which the delivery counters for each listener are appended
+    :type  results: list
+    """
+    while True:
+        try:
+            listener, deliveries = work.get_nowait()
+        except Queue.Empty:
+            return
+        try:
+            results.append(deliver_to_listener(listener, deliveries))
+        except Exception:
+            # the deliveries become available to another dispatcher once their claim expires
+            _logger.exception(_('Error delivering events to an event listener'))
+
+
+def deliver_to_listener(listener, deliveries):
+    """
+    Deliver events to a single listener in the order they were fired. Deliveries
+    to a listener that no longer exists are dropped.
+
+    :param listener:   the listener to notify; None if it has been deleted
+    :type  listener:   dict
+    :param deliveries: the claimed deliveries to the listener in the order the events were fired
+    :type  deliveries: list of pulp.server.db.model.EventDelivery
+    :return: the delivery counters
+    :rtype:  dict
+    """
+    stats = _new_stats()
+    if listener is None:
+        EventDelivery.objects(id__in=[d.id for d in deliveries]).delete()
+        stats['dropped'] = len(deliveries)
+        return stats
+
+    notifier_type_id = listener['notifier_type_id']
+    notifier_config = listener['notifier_config']
+    batch_function = notifiers.get_batch_notifier_function(notifier_type_id)
+    if batch_function is not None:
+        chunks = [deliveries]
+    else:
+        chunks = [[delivery] for delivery in deliveries]
+
+    error = None
+    for index, chunk in enumerate(chunks):
+        error = _notify(notifier_type_id, notifier_config, batch_function, chunk)
+        if error is None:
+            EventDelivery.objects(id__in=[d.id for d in chunk]).delete()
+            stats['delivered'] += len(chunk)
+            continue
+
+        retry_at = None
+        for delivery in chunk:
+            retry_at = _fail(delivery, error)
+            if retry_at is None:
+                stats['abandoned'] += 1
+            else:
+                stats['failed'] += 1
+
+        # hold the remaining deliveries back so the events stay in order
+        remaining = [d.id for c in chunks[index + 1:] for d in c]
+        if remaining:
+            retry_at = retry_at or dateutils.now_utc_datetime_with_tzinfo()
+            EventDelivery.objects(id__in=remaining).update(set__available_at=retry_at,
+                                                           unset__claim=True)
+        break
+
+    _record_stats(listener['_id'], stats, error)
+    return stats
+
+
+def _notify(notifier_type_id, notifier_config, batch_function, deliveries):
+    """
+    Invoke the notifier for the given deliveries.
+
+    :param notifier_type_id: type of the notifier
+    :type  notifier_type_id: str
+    :param notifier_config:  configuration of the notifier for the listener
+    :type  notifier_config:  dict
+    :param batch_function:   function that delivers several events at once; None to deliver
+                             the single delivery with the notifier's function
+    :type  batch_function:   callable
+    :param deliveries:       deliveries to make
+    :type  deliveries:       list of pulp.server.db.model.EventDelivery
+    :return: description of the failure; None if the events were delivered
+    :rtype:  str
+    """
+    events = [data.RecordedEvent(d.event_type,
+                                 json.loads(d.event_data, object_hook=json_util.object_hook))
+              for d in deliveries]
+    try:
+        if batch_function is not None:
+            delivered = batch_function(notifier_config, events)
+        else:
+            f = notifiers.get_notifier_function(notifier_type_id)
+            delivered = f(notifier_config, events[0])
+    except Exception, e:
+        _logger.exception('Exception from notifier of type [%s]' % notifier_type_id)
+        return str(e) or e.__class__.__name__
+
+    if delivered is False:
+        return _('The notifier of type [%(t)s] failed to deliver the event') % {
+            't': notifier_type_id}
+
+
+def _fail(delivery, error):
+    """
+    Record a failed attempt at a delivery and schedule it to be retried with
+    exponential backoff, or abandon it once max_attempts has been reached.
+
+    :param delivery: the delivery that failed
+    :type  delivery: pulp.server.db.model.EventDelivery
+    :param error:    description of the failure
+    :type  error:    str
+    :return: the time at which the delivery will be retried; None if it was abandoned
+    :rtype:  datetime.datetime
+    """
+    attempts = delivery.attempts + 1
+    if attempts >= config.getint('events', 'max_attempts'):
+        _logger.error(_('Abandoning delivery of event [%(t)s] to event listener [%(l)s] after '
+                        '%(n)d attempts: %(e)s') % {'t': delivery.event_type,
+                                                    'l': delivery.listener_id,
+                                                    'n': attempts, 'e': error})
+        delivery.delete()
+        return None
+
+    delay = min(config.getint('events', 'retry_delay') * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    retry_at = dateutils.now_utc_datetime_with_tzinfo() + timedelta(seconds=delay)
+    EventDelivery.objects(id=delivery.id).update(set__attempts=attempts,
+                                                 set__available_at=retry_at,
+                                                 set__last_error=error,
+                                                 unset__claim=True)
+    return retry_at
+
+
+def _record_stats(listener_id, stats, error):
+    """
+    Add delivery counters to the delivery_stats of a listener.
+
+    :param listener_id: ID of the listener
+    :type  listener_id: bson.ObjectId
+    :param stats:       delivery counters
+    :type  stats:       dict
+    :param error:       description of the last failure; None if the last attempt succeeded
+    :type  error:       str
+    """
+    now = dateutils.format_iso8601_datetime(dateutils.now_utc_datetime_with_tzinfo())
+    increments = dict(('delivery_stats.%s' % key, value) for key, value in stats.items()
+                      if key != 'dropped' and value)
+    if error is None:
+        updates = {'delivery_stats.last_delivered': now}
+    else:
+        updates = {'delivery_stats.last_failed': now, 'delivery_stats.last_error': error}
+    update = {'$set': updates}
+    if increments:
+        update['$inc'] = increments
+    EventListener.get_collection().update({'_id': listener_id}, update)
@@ -27,7 +27,7 @@ def handle_event(notifier_config, event):
     # pulp from blocking or deadlocking due to the tasking subsystem
     json_body = json.dumps(event.data(), default=json_util.default)
     _logger.info(json_body)
-    _send_post(notifier_config, json_body)
+    return _send_post(notifier_config, json_body)
 
 
 def _send_post(notifier_config, json_body):
@@ -40,6 +40,8 @@ def _send_post(notifier_config, json_body):
     :type notifier_config:  dict
     :param json_body:       The POST data that has been serialized to JSON.
     :param json_body:       dict
+    :return:                False if the event was not delivered and should be retried
+    :rtype:                 bool
     """
     if 'url' not in notifier_config or not notifier_config['url']:
         _logger.error(_('HTTP notifier configured without a URL; cannot fire event'))
@@ -65,8 +67,11 @@ def _send_post(notifier_config, json_body):
             timeout=15)
     except Exception:
         _logger.exception("HTTP Notification Failed")
-        return
+        return False
 
     if response.status_code != 200:
         _logger.error(_('Received HTTP {code} from HTTP notifier to {url}.').format(
             code=response.status_code, url=url))
+        return False
+
+    return True
@@ -12,6 +12,7 @@ from pulp.server.event import amqp, http, mail
 
 # Set in the reset() method
 NOTIFIER_FUNCTIONS = None
+BATCH_NOTIFIER_FUNCTIONS = None
 
 
 def is_valid_notifier_type_id(type_id):
@@ -34,6 +35,9 @@ def get_notifier_function(type_id):
     - The configuration to use for the notifier (a JSON document), specified
       when the user wired up this notifier to a particular event type
 
+    The function returns False or raises an exception if the event could not
+    be delivered.
+
     @param type_id: type of notifier to retrieve
     @type  type_id: str
 
@@ -43,18 +47,38 @@ def get_notifier_function(type_id):
     return NOTIFIER_FUNCTIONS[type_id]
 
 
+def get_batch_notifier_function(type_id):
+    """
+    Returns the function to invoke to handle several events at once for
+    notifiers that can deliver them more efficiently together. The function
+    accepts the notifier configuration and a list of events, and returns
+    False or raises an exception if the events could not be delivered.
+
+    @param type_id: type of notifier to retrieve
+    @type  type_id: str
+
+    @return: function to invoke to deliver a batch of events; None if the
+             notifier handles one event at a time
+    @rtype:  callable
+    """
+    return BATCH_NOTIFIER_FUNCTIONS.get(type_id)
+
+
 def reset():
     """
     Initializes the mappings between notifier ID and method to invoke. This
     will automatically be called when the module is first loaded and should
     only need to be called again in unit test cleanup.
     """
-    global NOTIFIER_FUNCTIONS
+    global NOTIFIER_FUNCTIONS, BATCH_NOTIFIER_FUNCTIONS
     NOTIFIER_FUNCTIONS = {
         http.TYPE_ID: http.handle_event,
         mail.TYPE_ID: mail.handle_event,
         amqp.TYPE_ID: amqp.handle_event,
     }
+    BATCH_NOTIFIER_FUNCTIONS = {
+        amqp.TYPE_ID: amqp.handle_events,
+    }
 
 
 # Perform the initial populating of the notifier functions on module load
@@ -152,6 +152,18 @@ class PulpCodedForbiddenException(PulpCodedException):
         super(PulpCodedForbiddenException, self).__init__(error_code=error_code, **kwargs)
 
 
+class PulpCodedConflictException(PulpCodedException):
+    """
+    Class for coded conflict exceptions. Raising this exception results in a
+    409 Conflict code being returned.
+
+    :param error_code: The particular error code that should be used for this conflict exception
+    :type  error_code: pulp.common.error_codes.Error
+    """
+
+    http_status_code = httplib.CONFLICT
+
+
 class MissingResource(PulpExecutionException):
     """"
     Base class for exceptions raised due to requesting a resource that does not
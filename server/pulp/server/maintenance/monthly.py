@@ -2,6 +2,8 @@ from celery import task
 
 from pulp.common.tags import action_tag
 from pulp.server.async.tasks import PulpTask, Task
+from pulp.server.controllers import repository as repo_controller
+from pulp.server.db import model
 from pulp.server.managers.consumer.applicability import RepoProfileApplicabilityManager
 
 
@@ -20,3 +22,5 @@ def monthly_maintenance():
     Perform tasks that should happen on a monthly basis.
     """
     RepoProfileApplicabilityManager().remove_orphans()
+    for repo in model.Repository.objects.only('repo_id'):
+        repo_controller.queue_verify_content_unit_counts(repo.repo_id)
@@ -4,6 +4,7 @@ Contains agent management classes
 
 import sys
 
+from collections import namedtuple
 from logging import getLogger
 from uuid import uuid4
 from gettext import gettext as _
@@ -20,7 +21,7 @@ from pulp.server.agent.direct.pulpagent import PulpAgent
 from pulp.server.async.tasks import Task
 from pulp.server.controllers import distributor as dist_controller
 from pulp.server.db import model
-from pulp.server.db.model.consumer import Bind
+from pulp.server.db.model.consumer import Bind, ConsumerHistoryEvent
 from pulp.server.db.model import TaskStatus
 from pulp.server.exceptions import PulpExecutionException, PulpDataException, MissingResource
 from pulp.server.managers import factory as managers
@@ -31,6 +32,21 @@ QUEUE_DELETE_FAILED = _('queue %(name)s cannot be deleted: %(reason)s')
 QUEUE_DELETED = _('queue %(name)s deleted')
 
 
+# A content operation requested of an agent: the action tag of the task tracking
+# the request, the profiler method that translates the units, the method of the
+# agent content capability and the consumer history event type (None if no event
+# is recorded).
+ContentOperation = namedtuple('ContentOperation',
+                              ['action', 'profiler_method', 'agent_method', 'history_event'])
+
+INSTALL = ContentOperation(
+    tags.ACTION_AGENT_UNIT_INSTALL, 'install_units', 'install', 'content_unit_installed')
+UPDATE = ContentOperation(
+    tags.ACTION_AGENT_UNIT_UPDATE, 'update_units', 'update', None)
+UNINSTALL = ContentOperation(
+    tags.ACTION_AGENT_UNIT_UNINSTALL, 'uninstall_units', 'uninstall', 'content_unit_uninstalled')
+
+
 logger = getLogger(__name__)
 
 
@@ -168,7 +184,7 @@ class AgentManager(object):
         return task
 
     @staticmethod
-    def install_content(consumer_id, units, options):
+    def install_content(consumer_id, units, options, group=None):
         """
         Install content units on a consumer.
         :param consumer_id: The consumer ID.
@@ -178,43 +194,16 @@ class AgentManager(object):
             { type_id:<str>, unit_key:<dict> }
         :param options: Install options; based on unit type.
         :type options: dict
+        :param group: The group of requests this request belongs to when it is
+            one of many sent to the members of a consumer group.
+        :type group: RequestGroup
         :return: A task used to track the agent request.
         :rtype: dict
         """
-        # track agent operations using a pseudo task
-        task_id = str(uuid4())
-        task_tags = [
-            tags.resource_tag(tags.RESOURCE_CONSUMER_TYPE, consumer_id),
-            tags.action_tag(tags.ACTION_AGENT_UNIT_INSTALL)
-        ]
-        task = TaskStatus(task_id=task_id, worker_name='agent', tags=task_tags).save()
-
-        # agent request
-        manager = managers.consumer_manager()
-        consumer = manager.get_consumer(consumer_id)
-        conduit = ProfilerConduit()
-        collated = Units(units)
-        for typeid, units in collated.items():
-            pc = AgentManager._profiled_consumer(consumer_id)
-            profiler, cfg = AgentManager._profiler(typeid)
-            units = AgentManager._invoke_plugin(
-                profiler.install_units,
-                pc,
-                units,
-                options,
-                cfg,
-                conduit)
-            collated[typeid] = units
-        units = collated.join()
-        context = Context(consumer, task_id=task_id, consumer_id=consumer_id)
-        agent = PulpAgent()
-        agent.content.install(context, units, options)
-        history_manager = managers.consumer_history_manager()
-        history_manager.record_event(consumer_id, 'content_unit_installed', {'units': units})
-        return task
+        return AgentManager._content_request(INSTALL, consumer_id, units, options, group)
 
     @staticmethod
-    def update_content(consumer_id, units, options):
+    def update_content(consumer_id, units, options, group=None):
         """
         Update content units on a consumer.
         :param consumer_id: The consumer ID.
@@ -224,41 +213,16 @@ class AgentManager(object):
             { type_id:<str>, unit_key:<dict> }
         :param options: Update options; based on unit type.
         :type options: dict
+        :param group: The group of requests this request belongs to when it is
+            one of many sent to the members of a consumer group.
+        :type group: RequestGroup
         :return: A task used to track the agent request.
         :rtype: dict
         """
-        # track agent operations using a pseudo task
-        task_id = str(uuid4())
-        task_tags = [
-            tags.resource_tag(tags.RESOURCE_CONSUMER_TYPE, consumer_id),
-            tags.action_tag(tags.ACTION_AGENT_UNIT_UPDATE)
-        ]
-        task = TaskStatus(task_id=task_id, worker_name='agent', tags=task_tags).save()
-
-        # agent request
-        manager = managers.consumer_manager()
-        consumer = manager.get_consumer(consumer_id)
-        conduit = ProfilerConduit()
-        collated = Units(units)
-        for typeid, units in collated.items():
-            pc = AgentManager._profiled_consumer(consumer_id)
-            profiler, cfg = AgentManager._profiler(typeid)
-            units = AgentManager._invoke_plugin(
-                profiler.update_units,
-                pc,
-                units,
-                options,
-                cfg,
-                conduit)
-            collated[typeid] = units
-        units = collated.join()
-        context = Context(consumer, task_id=task_id, consumer_id=consumer_id)
-        agent = PulpAgent()
-        agent.content.update(context, units, options)
-        return task
+        return AgentManager._content_request(UPDATE, consumer_id, units, options, group)
 
     @staticmethod
-    def uninstall_content(consumer_id, units, options):
+    def uninstall_content(consumer_id, units, options, group=None):
         """
         Uninstall content units on a consumer.
         :param consumer_id: The consumer ID.
@@ -268,16 +232,45 @@ class AgentManager(object):
             { type_id:<str>, type_id:<dict> }
         :param options: Uninstall options; based on unit type.
         :type options: dict
+        :param group: The group of requests this request belongs to when it is
+            one of many sent to the members of a consumer group.
+        :type group: RequestGroup
         :return: A task ID that may be used to track the agent request.
         :rtype: dict
         """
-        # track agent operations using a pseudo task
-        task_id = str(uuid4())
-        task_tags = [
-            tags.resource_tag(tags.RESOURCE_CONSUMER_TYPE, consumer_id),
-            tags.action_tag(tags.ACTION_AGENT_UNIT_UNINSTALL)
-        ]
-        task = TaskStatus(task_id=task_id, worker_name='agent', tags=task_tags).save()
+        return AgentManager._content_request(UNINSTALL, consumer_id, units, options, group)
+
+    @staticmethod
+    def _content_request(operation, consumer_id, units, options, group=None):
+        """
+        Send a content request to the agent of a consumer.
+        :param operation: The content operation requested.
+        :type operation: ContentOperation
+        :param consumer_id: The consumer ID.
+        :type consumer_id: str
+        :param units: A list of content units.
+        :type units: list of:
+            { type_id:<str>, unit_key:<dict> }
+        :param options: Operation options; based on unit type.
+        :type options: dict
+        :param group: The group of requests this request belongs to, if any.
+            The task tracking the request has already been created by the group
+            and the history event is written by the group.
+        :type group: RequestGroup
+        :return: A task used to track the agent request.
+        :rtype: dict
+        """
+        if group is None:
+            # track agent operations using a pseudo task
+            task_id = str(uuid4())
+            task_tags = [
+                tags.resource_tag(tags.RESOURCE_CONSUMER_TYPE, consumer_id),
+                tags.action_tag(operation.action)
+            ]
+            task = TaskStatus(task_id=task_id, worker_name='agent', tags=task_tags).save()
+        else:
+            task = group.tasks[consumer_id]
+            task_id = task.task_id
 
         # agent request
         manager = managers.consumer_manager()
@@ -288,7 +281,7 @@ class AgentManager(object):
             pc = AgentManager._profiled_consumer(consumer_id)
             profiler, cfg = AgentManager._profiler(typeid)
             units = AgentManager._invoke_plugin(
-                profiler.uninstall_units,
+                getattr(profiler, operation.profiler_method),
                 pc,
                 units,
                 options,
@@ -298,9 +291,14 @@ class AgentManager(object):
         units = collated.join()
         context = Context(consumer, task_id=task_id, consumer_id=consumer_id)
         agent = PulpAgent()
-        agent.content.uninstall(context, units, options)
-        history_manager = managers.consumer_history_manager()
-        history_manager.record_event(consumer_id, 'content_unit_uninstalled', {'units': units})
+        getattr(agent.content, operation.agent_method)(context, units, options)
+        if operation.history_event:
+            if group is None:
+                history_manager = managers.consumer_history_manager()
+                history_manager.record_event(consumer_id, operation.history_event,
+                                             {'units': units})
+            else:
+                group.record_event(consumer_id, operation.history_event, {'units': units})
         return task
 
     def cancel_request(self, consumer_id, task_id):
@@ -484,3 +482,81 @@ class Units(dict):
         :rtype: list
         """
         return [j for i in self.values() for j in i]
+
+
+class RequestGroup(object):
+    """
+    Agent requests for the same operation sent to many consumers, such as the
+    members of a consumer group.  The tasks tracking the requests share a task
+    group ID so the progress of the whole group can be followed using the task
+    group summary.  The database writes are batched: the tasks are inserted in
+    bulk before any request is sent and the consumer history events recorded by
+    the requests are inserted in bulk by flush().
+    :ivar group_id: The task group ID of the tasks.
+    :type group_id: uuid.UUID
+    :ivar tasks: The task tracking the request to each consumer keyed by consumer ID.
+    :type tasks: dict
+    :ivar events: The consumer history events not yet written.
+    :type events: list
+    :ivar originator: The originator of the consumer history events.
+    :type originator: str
+    """
+
+    # The number of documents written in each bulk insert.
+    BATCH_SIZE = 1000
+
+    def __init__(self, action, consumer_ids):
+        """
+        :param action: The action tag of the tasks.
+        :type action: str
+        :param consumer_ids: The IDs of the consumers the requests are sent to.
+        :type consumer_ids: list
+        """
+        self.group_id = uuid4()
+        self.tasks = {}
+        self.events = []
+        self.originator = managers.principal_manager().get_principal().login
+        for consumer_id in consumer_ids:
+            task_tags = [
+                tags.resource_tag(tags.RESOURCE_CONSUMER_TYPE, consumer_id),
+                tags.action_tag(action)
+            ]
+            # created with the revision a saved task would have
+            self.tasks[consumer_id] = TaskStatus(
+                task_id=str(uuid4()), worker_name='agent', tags=task_tags,
+                group_id=self.group_id, revision=1)
+
+    def create_tasks(self):
+        """
+        Insert the tasks in bulk.  This must be done before sending the requests so
+        the replies from the agents can be recorded in the tasks.
+        """
+        tasks = self.tasks.values()
+        for n in xrange(0, len(tasks), self.BATCH_SIZE):
+            batch = tasks[n:n + self.BATCH_SIZE]
+            TaskStatus.objects.insert(batch, load_bulk=False)
+            # bulk inserts do not send the signals sent when a task is saved
+            for task_status in batch:
+                TaskStatus.post_save(TaskStatus, task_status)
+
+    def record_event(self, consumer_id, event_type, details):
+        """
+        Record a consumer history event to be written by flush().
+        :param consumer_id: The consumer ID.
+        :type consumer_id: str
+        :param event_type: The event type.
+        :type event_type: str
+        :param details: The event details.
+        :type details: dict
+        """
+        event = ConsumerHistoryEvent(consumer_id, self.originator, event_type, details)
+        self.events.append(event)
+
+    def flush(self):
+        """
+        Insert the recorded consumer history events in bulk.
+        """
+        events, self.events = self.events, []
+        collection = ConsumerHistoryEvent.get_collection()
+        for n in xrange(0, len(events), self.BATCH_SIZE):
+            collection.insert(events[n:n + self.BATCH_SIZE])
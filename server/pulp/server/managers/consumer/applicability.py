@@ -1,9 +1,13 @@
 """
 Contains content applicability management classes
 """
+from collections import OrderedDict
+import copy
 import hashlib
 import itertools
 import json
+import math
+import threading
 
 from gettext import gettext as _
 from logging import getLogger
@@ -11,8 +15,10 @@ from uuid import uuid4
 
 from celery import task
 from mongoengine import errors as mongo_errors
-from pymongo.errors import DuplicateKeyError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 
+from pulp.common.constants import RESOURCE_MANAGER_WORKER_NAME, SCHEDULER_WORKER_NAME
 from pulp.plugins.conduits.profiler import ProfilerConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
@@ -27,6 +33,23 @@ from pulp.server.managers.consumer.query import ConsumerQueryManager
 
 _logger = getLogger(__name__)
 
+# Bounds on the number of (repo_id, all_profiles_hash) pairs handled by one regeneration task
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 500
+
+# Number of regeneration tasks to aim for per worker, so that a slow task does not hold back the
+# whole regeneration
+BATCHES_PER_WORKER = 4
+
+# Number of applicability records to upsert per bulk write
+BULK_WRITE_SIZE = 1000
+
+# MongoDB error code for a duplicate key
+DUPLICATE_KEY_ERROR = 11000
+
+# Maximum number of applicability reports kept in memory by each process
+REPORT_CACHE_SIZE = 128
+
 
 class ApplicabilityRegenerationManager(object):
     @staticmethod
@@ -64,29 +87,27 @@ class ApplicabilityRegenerationManager(object):
         # Iterate through each unique all_profiles_hash and regenerate applicability,
         # if it doesn't exist.
         for repo_id in repo_consumer_map:
-            seen_hashes = set()
-            for consumer_id in repo_consumer_map[repo_id]:
-                if consumer_id in consumer_profile_map:
-                    all_profiles_hash = consumer_profile_map[consumer_id]['all_profiles_hash']
-                    if all_profiles_hash in seen_hashes:
-                        continue
-                    profiles = consumer_profile_map[consumer_id]['profiles']
-                    seen_hashes.add(all_profiles_hash)
-                    if ApplicabilityRegenerationManager._is_existing_applicability(
-                            repo_id, all_profiles_hash):
-                        continue
-                    # If applicability does not exist, generate applicability data for given
-                    # profiles and repo id.
-                    ApplicabilityRegenerationManager.regenerate_applicability(all_profiles_hash,
-                                                                              profiles, repo_id)
+            profile_sets = ApplicabilityRegenerationManager._get_profile_sets(
+                repo_consumer_map[repo_id], consumer_profile_map)
+            profile_sets = [(all_profiles_hash, profiles)
+                            for all_profiles_hash, profiles in profile_sets
+                            if not ApplicabilityRegenerationManager._is_existing_applicability(
+                                repo_id, all_profiles_hash)]
+            # If applicability does not exist, generate applicability data for given
+            # profiles and repo id.
+            ApplicabilityRegenerationManager.regenerate_applicability_for_repo(repo_id,
+                                                                               profile_sets)
 
     @staticmethod
-    def regenerate_applicability_for_repos(repo_criteria):
+    def regenerate_applicability_for_repos(repo_criteria, force=False):
         """
         Regenerate and save applicability data affected by given updated repositories.
 
         :param repo_criteria: The repo selection criteria
         :type repo_criteria: dict
+        :param force: Regenerate applicability data that was already calculated against the
+                      current content of the repositories
+        :type force: bool
         """
         repo_criteria = Criteria.from_dict(repo_criteria)
         # Process repo criteria
@@ -101,27 +122,25 @@ class ApplicabilityRegenerationManager(object):
             consumer_ids)
 
         for repo_id in repo_consumer_map:
-            seen_hashes = set()
-            for consumer_id in repo_consumer_map[repo_id]:
-                if consumer_id in consumer_profile_map:
-                    all_profiles_hash = consumer_profile_map[consumer_id]['all_profiles_hash']
-                    if all_profiles_hash in seen_hashes:
-                        continue
-                    seen_hashes.add(all_profiles_hash)
-                    profiles = consumer_profile_map[consumer_id]['profiles']
-
-                    # Regenerate applicability data for a given all_profiles_hash and repo id
-                    ApplicabilityRegenerationManager.regenerate_applicability(
-                        all_profiles_hash, profiles, repo_id)
+            profile_sets = ApplicabilityRegenerationManager._get_profile_sets(
+                repo_consumer_map[repo_id], consumer_profile_map)
+
+            # Regenerate applicability data for every all_profiles_hash bound to the repo
+            ApplicabilityRegenerationManager.regenerate_applicability_for_repo(repo_id,
+                                                                               profile_sets,
+                                                                               force=force)
 
     @staticmethod
-    def queue_regenerate_applicability_for_repos(repo_criteria):
+    def queue_regenerate_applicability_for_repos(repo_criteria, force=False):
         """
         Queue a group of tasks to generate and save applicability data affected by given updated
         repositories.
 
         :param repo_criteria: The repo selection criteria
         :type repo_criteria: dict
+        :param force: Regenerate applicability data that was already calculated against the
+                      current content of the repositories
+        :type force: bool
         """
         repo_criteria = Criteria.from_dict(repo_criteria)
         # Process repo criteria
@@ -136,45 +155,43 @@ class ApplicabilityRegenerationManager(object):
             consumer_ids)
 
         task_group_id = uuid4()
-        batch_size = 10
 
-        # list of tuples (repo_id, all_profiles_hash, profiles)
+        # list of tuples (repo_id, all_profiles_hash, profiles), grouped by repo so that each
+        # batch covers as few repos as possible
         profiles_to_process = []
         for repo_id in repo_consumer_map:
-            seen_hashes = set()
-            for consumer_id in repo_consumer_map[repo_id]:
-                if consumer_id in consumer_profile_map:
-                    all_profiles_hash = consumer_profile_map[consumer_id]['all_profiles_hash']
-                    if all_profiles_hash in seen_hashes:
-                        continue
-                    seen_hashes.add(all_profiles_hash)
-                    profiles = consumer_profile_map[consumer_id]['profiles']
-                    profiles_to_process.append((repo_id, all_profiles_hash, profiles))
-                    if len(profiles_to_process) >= batch_size:
-                        batch_regenerate_applicability_task.apply_async(
-                            (profiles_to_process,), **{'group_id': task_group_id})
-                        profiles_to_process = []
-
-        # last few non-processed profiles which didn't make a whole batch
-        if profiles_to_process:
+            profile_sets = ApplicabilityRegenerationManager._get_profile_sets(
+                repo_consumer_map[repo_id], consumer_profile_map)
+            for all_profiles_hash, profiles in profile_sets:
+                profiles_to_process.append((repo_id, all_profiles_hash, profiles))
+
+        batch_size = ApplicabilityRegenerationManager._get_batch_size(len(profiles_to_process))
+        for i in xrange(0, len(profiles_to_process), batch_size):
             batch_regenerate_applicability_task.apply_async(
-                (profiles_to_process,), **{'group_id': task_group_id})
+                (profiles_to_process[i:i + batch_size], force), **{'group_id': task_group_id})
         return task_group_id
 
     @staticmethod
-    def batch_regenerate_applicability(profiles_to_process):
+    def batch_regenerate_applicability(profiles_to_process, force=False):
         """
         Regenerate and save applicability data for a batch of applicabilities
 
         :param profiles_to_process: profile data necessary for applicability calculation,
                                     [(repo_id, all_profiles_hash, profiles), ...]
         :type  profiles_to_process: list of tuples
+        :param force:               regenerate applicability data that was already calculated
+                                    against the current content of the repos
+        :type  force:               bool
         """
+        repo_profile_sets = {}
         for repo_id, all_profiles_hash, profiles in profiles_to_process:
+            repo_profile_sets.setdefault(repo_id, []).append((all_profiles_hash, profiles))
 
-            # Regenerate applicability data for given profiles and repo id
-            ApplicabilityRegenerationManager.regenerate_applicability(all_profiles_hash,
-                                                                      profiles, repo_id)
+        # Regenerate applicability data for given profiles, one repo at a time
+        for repo_id, profile_sets in repo_profile_sets.items():
+            ApplicabilityRegenerationManager.regenerate_applicability_for_repo(repo_id,
+                                                                               profile_sets,
+                                                                               force=force)
 
     @staticmethod
     def regenerate_applicability(all_profiles_hash, profiles, bound_repo_id):
@@ -191,13 +208,37 @@ class ApplicabilityRegenerationManager(object):
                               against the given unit profile
         :type  bound_repo_id: str
         """
-        profiler_conduit = ProfilerConduit()
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo(
+            bound_repo_id, [(all_profiles_hash, profiles)])
+
+    @staticmethod
+    def regenerate_applicability_for_repo(bound_repo_id, profile_sets, force=False):
+        """
+        Regenerate and save applicability data for many sets of profiles bound to one repo.
+
+        The repo's content is read once and shared by every set of profiles, and the results are
+        saved with bulk upserts.
+
+        :param bound_repo_id: repo id to be used to calculate applicability
+                              against the given unit profiles
+        :type  bound_repo_id: str
+
+        :param profile_sets: sets of profiles to calculate applicability for:
+                             [(all_profiles_hash, [(profile_hash, content_type, profile_id), ...])]
+        :type  profile_sets: list of tuples
+
+        :param force: regenerate the applicability of sets of profiles even if it was already
+                      calculated against the repo's current content
+        :type  force: bool
+        """
+        if not profile_sets:
+            return
 
         # Get the profiler for content_type of given profiles.
         # The assumption is that the same profiler is used for all the content types, so different
         # profilers are not supported at the moment.
         # Take the content type from the first profile.
-        content_type = profiles[0][1]
+        content_type = profile_sets[0][1][0][1]
         profiler, profiler_cfg = ApplicabilityRegenerationManager._profiler(content_type)
 
         # Check if the profiler supports applicability, else return
@@ -211,24 +252,50 @@ class ApplicabilityRegenerationManager(object):
             bound_repo_id)
 
         # Get the intersection of existing types in the repo and the types that the profiler
-        # handles. If the intersection is not empty, regenerate applicability
-        if (set(repo_content_types) & set(profiler.metadata()['types'])):
-            profile_ids = [p_id for _, _, p_id in profiles]
-            unit_profiles = UnitProfile.get_collection().find({'id': {'$in': profile_ids}},
-                                                              projection=['profile',
-                                                                          'content_type',
-                                                                          'profile_hash'])
+        # handles. If the intersection is empty, there is nothing to regenerate
+        if not (set(repo_content_types) & set(profiler.metadata()['types'])):
+            return
+
+        # Skip the sets of profiles whose applicability was calculated against the repo's current
+        # content, unless regeneration is forced
+        collection = RepoProfileApplicability.get_collection()
+        revision = ApplicabilityRegenerationManager._get_repo_content_revision(bound_repo_id)
+        if revision is not None and not force:
+            current = collection.find(
+                {'repo_id': bound_repo_id,
+                 'all_profiles_hash': {'$in': [h for h, _ in profile_sets]},
+                 'repo_content_revision': revision},
+                projection=['all_profiles_hash'])
+            current = set(a['all_profiles_hash'] for a in current)
+            profile_sets = [(h, profiles) for h, profiles in profile_sets if h not in current]
+            if not profile_sets:
+                return
+
+        # Fetch the profiles of every set with a single query
+        profile_ids = set(p_id for _, profiles in profile_sets for _, _, p_id in profiles)
+        unit_profiles = UnitProfile.get_collection().find({'id': {'$in': list(profile_ids)}},
+                                                          projection=['id',
+                                                                      'profile',
+                                                                      'content_type',
+                                                                      'profile_hash'])
+        unit_profiles = dict((p['id'], p) for p in unit_profiles)
+
+        # The conduit keeps the repo's units in memory, so that the repo's content is only read
+        # once for all the sets of profiles
+        profiler_conduit = ProfilerConduit(cache_repo_units=True)
+        call_config = PluginCallConfiguration(plugin_config=profiler_cfg,
+                                              repo_plugin_config=None)
+        requests = []
+        for all_profiles_hash, profiles in profile_sets:
             try:
-                profiles = [(p['profile_hash'], p['content_type'], p['profile']) for p in
-                            unit_profiles]
-            except TypeError:
-                # It means that p = None.
+                profiles = [(unit_profiles[p_id]['profile_hash'],
+                             unit_profiles[p_id]['content_type'],
+                             unit_profiles[p_id]['profile']) for _, _, p_id in profiles]
+            except KeyError:
                 # Consumer can be removed during applicability regeneration,
                 # so it is possible that its profile no longer exists. It is harmless.
-                return
+                continue
 
-            call_config = PluginCallConfiguration(plugin_config=profiler_cfg,
-                                                  repo_plugin_config=None)
             try:
                 applicability = profiler.calculate_applicable_units(profiles,
                                                                     bound_repo_id,
@@ -242,28 +309,94 @@ class ApplicabilityRegenerationManager(object):
             # Save applicability results on each of the profiles. The results are duplicated.
             # It's a compromise to have applicability data available in any applicability profile
             # record in the DB.
-            for profile in profiles:
-                profile_hash = profile[0]
-                try:
-                    # Create a new RepoProfileApplicability object and save it in the db
-                    RepoProfileApplicability.objects.create(profile_hash=profile_hash,
-                                                            repo_id=bound_repo_id,
-                                                            # profiles can be large, the one in
-                                                            # repo_profile_applicability collection
-                                                            # is no longer used,
-                                                            # it's a duplicated data
-                                                            # from the consumer_unit_profiles
-                                                            # collection.
-                                                            profile=[],
-                                                            applicability=applicability,
-                                                            all_profiles_hash=all_profiles_hash)
-                except DuplicateKeyError:
-                    applicability_dict = RepoProfileApplicability.get_collection().find_one(
-                        {'repo_id': bound_repo_id, 'all_profiles_hash': all_profiles_hash,
-                         'profile_hash': profile_hash})
-                    existing_applicability = RepoProfileApplicability(**applicability_dict)
-                    existing_applicability.applicability = applicability
-                    existing_applicability.save()
+            for profile_hash, _, _ in profiles:
+                query = {'repo_id': bound_repo_id, 'all_profiles_hash': all_profiles_hash,
+                         'profile_hash': profile_hash}
+                # profiles can be large, the one in repo_profile_applicability collection
+                # is no longer used, it's a duplicated data from the consumer_unit_profiles
+                # collection.
+                update = {'$set': {'applicability': applicability,
+                                   'repo_content_revision': revision},
+                          '$setOnInsert': {'profile': []}}
+                requests.append(UpdateOne(query, update, upsert=True))
+
+            if len(requests) >= BULK_WRITE_SIZE:
+                ApplicabilityRegenerationManager._bulk_upsert(collection, requests)
+                requests = []
+
+        if requests:
+            ApplicabilityRegenerationManager._bulk_upsert(collection, requests)
+
+    @staticmethod
+    def _bulk_upsert(collection, requests):
+        """
+        Perform upserts of applicability records in bulk.
+
+        When two regenerations insert the same new record at the same time, one of them fails
+        with a duplicate key error. Those upserts are retried once, now updating the existing
+        record.
+
+        :param collection: the applicability collection
+        :type  collection: pulp.server.db.connection.PulpCollection
+        :param requests:   upserts to perform
+        :type  requests:   list of pymongo.UpdateOne
+        """
+        try:
+            collection.bulk_write(requests, ordered=False)
+        except BulkWriteError, e:
+            errors = e.details['writeErrors']
+            retry = [requests[error['index']] for error in errors
+                     if error['code'] == DUPLICATE_KEY_ERROR]
+            if len(retry) < len(errors):
+                raise
+            collection.bulk_write(retry, ordered=False)
+
+    @staticmethod
+    def _get_profile_sets(consumer_ids, consumer_profile_map):
+        """
+        Get the unique sets of profiles of the given consumers.
+
+        :param consumer_ids:         consumers bound to a repo
+        :type  consumer_ids:         list
+        :param consumer_profile_map: consumer-profile map, see _get_consumer_profile_map()
+        :type  consumer_profile_map: dict
+
+        :return: sets of profiles: [(all_profiles_hash, profiles), ...]
+        :rtype:  list of tuples
+        """
+        seen_hashes = set()
+        profile_sets = []
+        for consumer_id in consumer_ids:
+            if consumer_id in consumer_profile_map:
+                all_profiles_hash = consumer_profile_map[consumer_id]['all_profiles_hash']
+                if all_profiles_hash in seen_hashes:
+                    continue
+                seen_hashes.add(all_profiles_hash)
+                profile_sets.append((all_profiles_hash,
+                                     consumer_profile_map[consumer_id]['profiles']))
+        return profile_sets
+
+    @staticmethod
+    def _get_batch_size(count):
+        """
+        Choose how many (repo_id, all_profiles_hash) pairs each regeneration task should process.
+
+        The work is spread over all the online workers, within the MIN_BATCH_SIZE and
+        MAX_BATCH_SIZE bounds.
+
+        :param count: total number of (repo_id, all_profiles_hash) pairs to process
+        :type  count: int
+
+        :return: batch size
+        :rtype:  int
+        """
+        worker_count = 0
+        for worker in model.Worker.objects.get_online():
+            if not worker.name.startswith((SCHEDULER_WORKER_NAME, RESOURCE_MANAGER_WORKER_NAME)):
+                worker_count += 1
+        batches = max(worker_count, 1) * BATCHES_PER_WORKER
+        batch_size = int(math.ceil(float(count) / batches))
+        return min(max(batch_size, MIN_BATCH_SIZE), MAX_BATCH_SIZE)
 
     @staticmethod
     def _get_existing_repo_content_types(repo_id):
@@ -288,6 +421,21 @@ class ApplicabilityRegenerationManager(object):
                 repo_content_types_with_non_zero_unit_count.append(content_type)
         return repo_content_types_with_non_zero_unit_count
 
+    @staticmethod
+    def _get_repo_content_revision(repo_id):
+        """
+        Get the content revision of a repo, which changes whenever its content changes.
+
+        :param repo_id: The repo_id for the repository
+        :type  repo_id: basestring
+        :return:        The content revision, or None if the repo does not exist
+        :rtype:         int or None
+        """
+        repo = model.Repository.objects(repo_id=repo_id).only('content_revision').first()
+        if repo is None:
+            return None
+        return repo.content_revision
+
     @staticmethod
     def _is_existing_applicability(repo_id, all_profiles_hash):
         """
@@ -434,7 +582,8 @@ class RepoProfileApplicabilityManager(object):
     """
     This class is useful for querying for RepoProfileApplicability objects in the database.
     """
-    def create(self, profile_hash, repo_id, profile, applicability, all_profiles_hash):
+    def create(self, profile_hash, repo_id, profile, applicability, all_profiles_hash,
+               repo_content_revision=None):
         """
         Create and return a RepoProfileApplicability object.
 
@@ -451,12 +600,16 @@ class RepoProfileApplicabilityManager(object):
         :param all_profiles_hash: The hash of the set of the profiles that this applicability
                                   data is for
         :type  all_profiles_hash: basestring
+        :param repo_content_revision: Identifies the content of the repository that this
+                                      applicability data was calculated against
+        :type  repo_content_revision: basestring
         :return:              A new RepoProfileApplicability object
         :rtype:               pulp.server.db.model.consumer.RepoProfileApplicability
         """
         applicability = RepoProfileApplicability(
             profile_hash=profile_hash, repo_id=repo_id, profile=profile,
-            applicability=applicability, all_profiles_hash=all_profiles_hash)
+            applicability=applicability, all_profiles_hash=all_profiles_hash,
+            repo_content_revision=repo_content_revision)
         applicability.save()
         return applicability
 
@@ -645,6 +798,12 @@ def retrieve_consumer_applicability(consumer_criteria, content_types=None):
     # We don't need the profile_hashes anymore, so let's free some RAM
     del all_profiles_hashes
 
+    # The same report may have been built recently, from the same applicability data
+    cache_key = _get_report_cache_key(consumer_map, applicability_map, content_types)
+    report = _report_cache.get(cache_key)
+    if report is not None:
+        return report
+
     # Now we need to add consumers who match the applicability data to the applicability_map
     _add_consumers_to_applicability_map(consumer_map, applicability_map)
     # We don't need the consumer_map anymore, so let's free it up
@@ -656,7 +815,109 @@ def retrieve_consumer_applicability(consumer_criteria, content_types=None):
     del applicability_map
 
     # Form the data into the expected output format and return
-    return _format_report(consumer_applicability_map)
+    report = _format_report(consumer_applicability_map)
+    _report_cache.put(cache_key, report)
+    return report
+
+
+class ReportCache(object):
+    """
+    A bounded, thread safe cache of applicability reports, evicting the least recently used
+    report when full. Reports are copied in and out of the cache, so callers are free to modify
+    them.
+    """
+
+    def __init__(self, max_size):
+        """
+        :param max_size: The maximum number of reports to keep
+        :type  max_size: int
+        """
+        self.max_size = max_size
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached report.
+
+        :param key: The key the report was cached with, or None
+        :type  key: basestring
+        :return:    A copy of the report, or None if it is not cached
+        :rtype:     list or None
+        """
+        if key is None:
+            return None
+        with self._lock:
+            report = self._reports.pop(key, None)
+            if report is None:
+                return None
+            self._reports[key] = report
+        return copy.deepcopy(report)
+
+    def put(self, key, report):
+        """
+        Cache a report.
+
+        :param key:    The key to cache the report with. Nothing is cached if it is None.
+        :type  key:    basestring
+        :param report: The report
+        :type  report: list
+        """
+        if key is None:
+            return
+        report = copy.deepcopy(report)
+        with self._lock:
+            self._reports.pop(key, None)
+            self._reports[key] = report
+            while len(self._reports) > self.max_size:
+                self._reports.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all cached reports.
+        """
+        with self._lock:
+            self._reports.clear()
+
+
+_report_cache = ReportCache(REPORT_CACHE_SIZE)
+
+
+def _get_report_cache_key(consumer_map, applicability_map, content_types):
+    """
+    Calculate the key an applicability report is cached with. It identifies the consumers, their
+    profiles and bindings, and the revision of the applicability data for them, so that a cached
+    report is never served once any of those have changed.
+
+    :param consumer_map:      A dictionary mapping consumer_ids to dictionaries with keys
+                              'profiles' and 'repo_ids'
+    :type  consumer_map:      dict
+    :param applicability_map: The mapping of (all_profiles_hash, repo_id) to the applicability
+                              data of the consumers, as returned by _get_applicability_map()
+    :type  applicability_map: dict
+    :param content_types:     The content types the report is limited to, or None
+    :type  content_types:     list or None
+    :return:                  The cache key, or None if the report must not be cached because
+                              some of its applicability data has no repo content revision
+    :rtype:                   basestring or None
+    """
+    revisions = set()
+    for (all_profiles_hash, repo_id), data in applicability_map.iteritems():
+        revision = data['repo_content_revision']
+        if revision is None:
+            return None
+        revisions.add((all_profiles_hash, repo_id, revision))
+
+    consumers = []
+    for consumer_id, repo_profile_data in consumer_map.items():
+        profile_hashes = [p['profile_hash'] for p in repo_profile_data['profiles']]
+        consumers.append((consumer_id, _calculate_all_profiles_hash(profile_hashes),
+                          sorted(repo_profile_data['repo_ids'])))
+
+    if content_types is not None:
+        content_types = sorted(content_types)
+    key = json.dumps([sorted(consumers), sorted(revisions), content_types])
+    return hashlib.sha256(key).hexdigest()
 
 
 def _add_consumers_to_applicability_map(consumer_map, applicability_map):
@@ -771,7 +1032,11 @@ def _get_applicability_map(all_profiles_hashes, content_types):
     consumer_ids are just initialized to an empty list, so that a later method can add
     consumers to it. For example, it might look like:
 
-    {('all_profiles_hash_1', 'repo_1'): {'applicability': {<applicability_data>}, 'consumers': []}}
+    {('all_profiles_hash_1', 'repo_1'): {'applicability': {<applicability_data>}, 'consumers': [],
+                                         'repo_content_revision': 3}}
+
+    The repo_content_revision identifies the content the applicability data was calculated
+    against, or is None if it is unknown.
 
     :param all_profiles_hash: A list of all_profiles_hashes that the applicabilities should be
                               queried with. The applicability map is initialized with all
@@ -787,7 +1052,7 @@ def _get_applicability_map(all_profiles_hashes, content_types):
 
     applicabilities = RepoProfileApplicability.get_collection().find(
         {'all_profiles_hash': {'$in': all_profiles_hashes}},
-        projection=['all_profiles_hash', 'repo_id', 'applicability'])
+        projection=['all_profiles_hash', 'repo_id', 'applicability', 'repo_content_revision'])
     return_value = {}
     for a in applicabilities:
         if content_types is not None:
@@ -801,8 +1066,9 @@ def _get_applicability_map(all_profiles_hashes, content_types):
             # If a doesn't have anything worth reporting, move on to the next applicability
             if not a['applicability']:
                 continue
-        return_value[(a['all_profiles_hash'], a['repo_id'])] = {'applicability': a['applicability'],
-                                                                'consumers': []}
+        return_value[(a['all_profiles_hash'], a['repo_id'])] = {
+            'applicability': a['applicability'], 'consumers': [],
+            'repo_content_revision': a.get('repo_content_revision')}
     return return_value
 
 
@@ -1,16 +1,22 @@
 import logging
+import Queue
 import re
 import sys
+import threading
+import time
 
 from celery import task
 from pymongo.errors import DuplicateKeyError
 
-from pulp.common import error_codes
+from pulp.common import constants, error_codes
 from pulp.server import exceptions as pulp_exceptions
-from pulp.server.async.tasks import Task, TaskResult
+from pulp.server.async.tasks import Task, TaskResult, get_current_task_id
+from pulp.server.config import config
+from pulp.server.db.model import TaskStatus
 from pulp.server.db.model.consumer import Consumer, ConsumerGroup
 from pulp.server.exceptions import PulpCodedException, PulpException
 from pulp.server.managers import factory as manager_factory
+from pulp.server.managers.consumer.agent import INSTALL, UNINSTALL, UPDATE, RequestGroup
 from pulp.server.controllers.consumer import bind as bind_task, unbind as unbind_task
 
 
@@ -18,6 +24,10 @@ _logger = logging.getLogger(__name__)
 
 _CONSUMER_GROUP_ID_REGEX = re.compile(r'^[\-_A-Za-z0-9]+$')  # letters, numbers, underscore, hyphen
 
+# The minimum number of seconds between updates to the progress report of a task
+# processing the members of a consumer group.
+PROGRESS_INTERVAL = 2
+
 
 class ConsumerGroupManager(object):
     @staticmethod
@@ -248,15 +258,16 @@ class ConsumerGroupManager(object):
         :type units: list or tuple
         :param options: options to pass to the install manager
         :type options: dict or None
-        :return: Details of the subtasks that were executed
+        :return: Details of the subtasks that were executed; the result contains
+            the ID of the task group the subtasks belong to
         :rtype: TaskResult
         """
         consumer_group = manager_factory.consumer_group_query_manager().get_group(consumer_group_id)
         agent_manager = manager_factory.consumer_agent_manager()
 
-        return ConsumerGroupManager.process_group(consumer_group, error_codes.PLP0020,
-                                                  {'group_id': consumer_group_id},
-                                                  agent_manager.install_content, units, options)
+        return ConsumerGroupManager._process_content(consumer_group, error_codes.PLP0020,
+                                                     {'group_id': consumer_group_id}, INSTALL,
+                                                     agent_manager.install_content, units, options)
 
     @staticmethod
     def update_content(consumer_group_id, units, options):
@@ -268,15 +279,16 @@ class ConsumerGroupManager(object):
         :type units: list or tuple
         :param options: options to pass to the update manager
         :type options: dict or None
-        :return: Details of the subtasks that were executed
+        :return: Details of the subtasks that were executed; the result contains
+            the ID of the task group the subtasks belong to
         :rtype: TaskResult
         """
         consumer_group = manager_factory.consumer_group_query_manager().get_group(consumer_group_id)
         agent_manager = manager_factory.consumer_agent_manager()
 
-        return ConsumerGroupManager.process_group(consumer_group, error_codes.PLP0021,
-                                                  {'group_id': consumer_group_id},
-                                                  agent_manager.update_content, units, options)
+        return ConsumerGroupManager._process_content(consumer_group, error_codes.PLP0021,
+                                                     {'group_id': consumer_group_id}, UPDATE,
+                                                     agent_manager.update_content, units, options)
 
     @staticmethod
     def uninstall_content(consumer_group_id, units, options):
@@ -288,15 +300,17 @@ class ConsumerGroupManager(object):
         :type units: list or tuple
         :param options: options to pass to the uninstall manager
         :type options: dict or None
-        :return: Details of the subtasks that were executed
+        :return: Details of the subtasks that were executed; the result contains
+            the ID of the task group the subtasks belong to
         :rtype: TaskResult
         """
         consumer_group = manager_factory.consumer_group_query_manager().get_group(consumer_group_id)
         agent_manager = manager_factory.consumer_agent_manager()
 
-        return ConsumerGroupManager.process_group(consumer_group, error_codes.PLP0022,
-                                                  {'group_id': consumer_group_id},
-                                                  agent_manager.uninstall_content, units, options)
+        return ConsumerGroupManager._process_content(consumer_group, error_codes.PLP0022,
+                                                     {'group_id': consumer_group_id}, UNINSTALL,
+                                                     agent_manager.uninstall_content,
+                                                     units, options)
 
     @staticmethod
     def bind(group_id, repo_id, distributor_id, notify_agent, binding_config, agent_options):
@@ -322,33 +336,12 @@ class ConsumerGroupManager(object):
         manager = manager_factory.consumer_group_query_manager()
         group = manager.get_group(group_id)
 
-        bind_errors = []
-        additional_tasks = []
-
-        for consumer_id in group['consumer_ids']:
-            try:
-                report = bind_task(consumer_id, repo_id, distributor_id, notify_agent,
-                                   binding_config, agent_options)
-                if report.spawned_tasks:
-                    additional_tasks.extend(report.spawned_tasks)
-            except PulpException, e:
-                # Log a message so that we can debug but don't throw
-                _logger.debug(e)
-                bind_errors.append(e)
-            except Exception, e:
-                _logger.exception(e)
-                # Don't do anything else since we still want to process all the other consumers
-                bind_errors.append(e)
-
-        bind_error = None
-        if len(bind_errors) > 0:
-            bind_error = PulpCodedException(error_codes.PLP0004,
-                                            repo_id=repo_id,
-                                            distributor_id=distributor_id,
-                                            group_id=group_id)
-            bind_error.child_exceptions = bind_errors
-
-        return TaskResult(error=bind_error, spawned_tasks=additional_tasks)
+        return ConsumerGroupManager.process_group(group, error_codes.PLP0004,
+                                                  {'repo_id': repo_id,
+                                                   'distributor_id': distributor_id,
+                                                   'group_id': group_id},
+                                                  bind_task, repo_id, distributor_id,
+                                                  notify_agent, binding_config, agent_options)
 
     @staticmethod
     def unbind(group_id, repo_id, distributor_id, options):
@@ -368,36 +361,66 @@ class ConsumerGroupManager(object):
         manager = manager_factory.consumer_group_query_manager()
         group = manager.get_group(group_id)
 
-        bind_errors = []
-        additional_tasks = []
+        return ConsumerGroupManager.process_group(group, error_codes.PLP0005,
+                                                  {'repo_id': repo_id,
+                                                   'distributor_id': distributor_id,
+                                                   'group_id': group_id},
+                                                  unbind_task, repo_id, distributor_id, options)
 
-        for consumer_id in group['consumer_ids']:
-            try:
-                report = unbind_task(consumer_id, repo_id, distributor_id, options)
-                if report:
-                    additional_tasks.extend(report.spawned_tasks)
-            except PulpException, e:
-                # Log a message so that we can debug but don't throw
-                _logger.warn(e)
-                bind_errors.append(e)
-            except Exception, e:
-                bind_errors.append(e)
-                # Don't do anything else since we still want to process all the other consumers
+    @staticmethod
+    def _process_content(consumer_group, error_code, error_kwargs, operation, process_method,
+                         units, options):
+        """
+        Send a content request to the agents of a group of consumers. The tasks
+        tracking the requests are created in bulk and belong to one task group.
 
-        bind_error = None
-        if len(bind_errors) > 0:
-            bind_error = PulpCodedException(error_codes.PLP0005,
-                                            repo_id=repo_id,
-                                            distributor_id=distributor_id,
-                                            group_id=group_id)
-            bind_error.child_exceptions = bind_errors
-        return TaskResult(error=bind_error, spawned_tasks=additional_tasks)
+        :param consumer_group: A consumer group dictionary
+        :type consumer_group: dict
+        :param error_code: The error code to wrap any consumer failures in
+        :type error_code: pulp.common.error_codes.Error
+        :param error_kwargs: The keyword arguments to pass to the error code when it is instantiated
+        :type error_kwargs: dict
+        :param operation: The content operation requested
+        :type operation: pulp.server.managers.consumer.agent.ContentOperation
+        :param process_method: The agent manager method that sends the request to a consumer
+        :type process_method: function
+        :param units: The content units
+        :type units: list
+        :param options: The options passed to the agent manager
+        :type options: dict
+        :returns: A TaskResult with the overall results of the group; the result
+                  contains the ID of the task group
+        :rtype: TaskResult
+        """
+        group = RequestGroup(operation.action, consumer_group['consumer_ids'])
+        group.create_tasks()
+        try:
+            result = ConsumerGroupManager.process_group(consumer_group, error_code, error_kwargs,
+                                                        process_method, units, options,
+                                                        group=group)
+        finally:
+            group.flush()
+
+        # tasks of requests that could not be sent never leave the waiting state
+        sent = set(spawned['task_id'] for spawned in result.spawned_tasks)
+        unsent = [task.task_id for task in group.tasks.values() if task.task_id not in sent]
+        if unsent:
+            TaskStatus.objects(task_id__in=unsent).update(
+                set__state=constants.CALL_ERROR_STATE)
+
+        result.return_value['group_id'] = str(group.group_id)
+        return result
 
     @staticmethod
-    def process_group(consumer_group, error_code, error_kwargs, process_method, *args):
+    def process_group(consumer_group, error_code, error_kwargs, process_method, *args, **kwargs):
         """
         Process an action over a group of consumers
 
+        The consumers are processed concurrently, up to the agent_concurrency
+        setting of the messaging section of the server configuration at a time.
+        When called from a task, the progress report of the task is updated with
+        the number of consumers processed as they complete.
+
         :param consumer_group: A consumer group dictionary
         :type consumer_group: dict
         :param error_code: The error code to wrap any consumer failures in
@@ -409,29 +432,145 @@ class ConsumerGroupManager(object):
         :param args: any additional arguments passed to this method will be passed to the
                      process method function
         :type args: list of arguments
+        :param kwargs: any keyword arguments passed to this method will be passed to the
+                       process method function
+        :type kwargs: dict
         :returns: A TaskResult with the overall results of the group
         :rtype: TaskResult
         """
+        consumer_ids = consumer_group['consumer_ids']
+        progress = GroupProgress(len(consumer_ids), get_current_task_id())
+        principal = manager_factory.principal_manager().get_principal()
+
+        work = Queue.Queue()
+        for index, consumer_id in enumerate(consumer_ids):
+            work.put((index, consumer_id))
+        # the outcome of each consumer, in the order of the group members
+        outcomes = [None] * len(consumer_ids)
+
+        concurrency = max(config.getint('messaging', 'agent_concurrency'), 1)
+        threads = []
+        for i in range(min(concurrency, len(consumer_ids))):
+            thread = threading.Thread(
+                target=_process_members,
+                args=(work, outcomes, progress, principal, process_method, args, kwargs))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        progress.report()
+
         errors = []
         spawned_tasks = []
-        for consumer_id in consumer_group['consumer_ids']:
+        for report, exception in filter(None, outcomes):
+            if exception is not None:
+                errors.append(exception)
+            elif isinstance(report, TaskResult):
+                spawned_tasks.extend(report.spawned_tasks)
+            elif report:
+                spawned_tasks.append(report)
+
+        error = None
+        if len(errors) > 0:
+            error = PulpCodedException(error_code, **error_kwargs)
+            error.child_exceptions = errors
+        return TaskResult({}, error, spawned_tasks)
+
+
+class GroupProgress(object):
+    """
+    Counts the members of a consumer group that have been processed and
+    periodically writes the counts to the progress report of the task doing
+    the processing.
+
+    :ivar total: The number of members in the group.
+    :type total: int
+    :ivar processed: The number of members processed.
+    :type processed: int
+    :ivar failed: The number of members that could not be processed.
+    :type failed: int
+    :ivar task_id: The ID of the task processing the group; None when not run in a task.
+    :type task_id: str
+    """
+
+    def __init__(self, total, task_id=None):
+        self.total = total
+        self.processed = 0
+        self.failed = 0
+        self.task_id = task_id
+        self._reported = 0
+        self._lock = threading.Lock()
+
+    def member_processed(self, succeeded):
+        """
+        Count a processed member, reporting progress if it has not been reported
+        in the last PROGRESS_INTERVAL seconds.
+
+        :param succeeded: Whether the member was processed successfully.
+        :type succeeded: bool
+        """
+        with self._lock:
+            self.processed += 1
+            if not succeeded:
+                self.failed += 1
+            if time.time() - self._reported >= PROGRESS_INTERVAL:
+                self.report()
+
+    def report(self):
+        """
+        Write the counts to the progress report of the task.
+        """
+        if self.task_id is None:
+            return
+        progress_report = {'total': self.total, 'processed': self.processed,
+                           'failed': self.failed}
+        TaskStatus.objects(task_id=self.task_id).update_one(set__progress_report=progress_report)
+        self._reported = time.time()
+
+
+def _process_members(work, outcomes, progress, principal, process_method, args, kwargs):
+    """
+    Target of the threads processing the members of a consumer group. Processes
+    consumers taken from the work queue until it is empty.
+
+    :param work: queue of (index, consumer_id) tuples
+    :type work: Queue.Queue
+    :param outcomes: list in which the (report, exception) outcome of processing each
+                     consumer is stored at the consumer's index
+    :type outcomes: list
+    :param progress: the progress of the group
+    :type progress: GroupProgress
+    :param principal: the principal of the caller, which is stored per thread
+    :type principal: pulp.server.db.model.User
+    :param process_method: The method to call on each consumer in the group
+    :type process_method: function
+    :param args: additional arguments passed to the process method
+    :type args: tuple
+    :param kwargs: keyword arguments passed to the process method
+    :type kwargs: dict
+    """
+    principal_manager = manager_factory.principal_manager()
+    principal_manager.set_principal(principal)
+    try:
+        while True:
             try:
-                group_task = process_method(consumer_id, *args)
-                spawned_tasks.append(group_task)
+                index, consumer_id = work.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                outcomes[index] = (process_method(consumer_id, *args, **kwargs), None)
             except PulpException, e:
                 # Log a message so that we can debug but don't throw
                 _logger.warn(e)
-                errors.append(e)
+                outcomes[index] = (None, e)
             except Exception, e:
                 _logger.exception(e)
-                errors.append(e)
+                outcomes[index] = (None, e)
                 # Don't do anything else since we still want to process all the other consumers
-
-        error = None
-        if len(errors) > 0:
-            error = PulpCodedException(error_code, **error_kwargs)
-            error.child_exceptions = errors
-        return TaskResult({}, error, spawned_tasks)
+            progress.member_processed(outcomes[index][1] is None)
+    finally:
+        principal_manager.clear_principal()
 
 
 associate = task(ConsumerGroupManager.associate, base=Task, ignore_result=True)
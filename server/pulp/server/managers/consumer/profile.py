@@ -1,13 +1,18 @@
 """
 Contains profile management classes
 """
+from collections import defaultdict
+import json
+
 from celery import task
 
+from pulp.common import error_codes
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
 from pulp.plugins.profiler import Profiler
 from pulp.server.async.tasks import Task
 from pulp.server.db.model.consumer import UnitProfile
-from pulp.server.exceptions import MissingResource, MissingValue
+from pulp.server.exceptions import (InvalidValue, MissingResource, MissingValue,
+                                    PulpCodedConflictException)
 from pulp.server.managers import factory
 
 
@@ -43,12 +48,7 @@ class ProfileManager(object):
         :type  profile:      object
         """
         consumer = factory.consumer_manager().get_consumer(consumer_id)
-        try:
-            profiler, config = plugin_api.get_profiler_by_type(content_type)
-        except plugin_exceptions.PluginNotFound:
-            # Not all profile types have a type specific profiler, so let's use the baseclass
-            # Profiler
-            profiler, config = (Profiler(), {})
+        profiler, config = ProfileManager._get_profiler(content_type)
         # Allow the profiler a chance to update the profile before we save it
         if profile is None:
             raise MissingValue('profile')
@@ -68,6 +68,113 @@ class ProfileManager(object):
             'unit_profile_changed', {'profile_content_type': content_type})
         return p
 
+    @staticmethod
+    def update_delta(consumer_id, content_type, base_hash, added=None, removed=None):
+        """
+        Update a list based unit profile by applying the entries added to and removed from it
+        since it was last sent by the consumer.
+
+        The delta is only applied when the stored profile still has the hash the consumer based
+        it on. Otherwise the consumer and the server disagree about the profile, and the consumer
+        must send the full profile instead.
+
+        :param consumer_id:  uniquely identifies the consumer.
+        :type  consumer_id:  str
+        :param content_type: The profile (content) type ID.
+        :type  content_type: str
+        :param base_hash:    The hash of the stored profile that the delta is based on.
+        :type  base_hash:    basestring
+        :param added:        Entries to add to the profile.
+        :type  added:        list
+        :param removed:      Entries to remove from the profile.
+        :type  removed:      list
+        :return:             The updated profile.
+        :rtype:              dict
+        :raise MissingResource: when the consumer or the profile does not exist.
+        :raise InvalidValue: when the delta or the stored profile is not a list.
+        :raise PulpCodedConflictException: when the stored profile does not match base_hash.
+        """
+        consumer = factory.consumer_manager().get_consumer(consumer_id)
+        if base_hash is None:
+            raise MissingValue('base_hash')
+        added = added or []
+        removed = removed or []
+        invalid = [name for name, value in (('added', added), ('removed', removed))
+                   if not isinstance(value, list)]
+        if invalid:
+            raise InvalidValue(invalid)
+
+        p = ProfileManager.get_profile(consumer_id, content_type)
+        stale = PulpCodedConflictException(error_codes.PLP0050, consumer_id=consumer_id,
+                                           content_type=content_type, base_hash=base_hash)
+        if p['profile_hash'] != base_hash:
+            raise stale
+        if not isinstance(p['profile'], list):
+            raise InvalidValue(['profile'])
+
+        # Match removed entries by value; every one of them must be present in the base profile.
+        pending = defaultdict(int)
+        for entry in removed:
+            pending[ProfileManager._entry_key(entry)] += 1
+        profile = []
+        for entry in p['profile']:
+            key = ProfileManager._entry_key(entry)
+            if pending.get(key):
+                pending[key] -= 1
+                continue
+            profile.append(entry)
+        if any(pending.values()):
+            raise stale
+        profile.extend(added)
+
+        profiler, config = ProfileManager._get_profiler(content_type)
+        profile = profiler.update_profile(consumer, content_type, profile, config)
+        profile_hash = UnitProfile.calculate_hash(profile)
+
+        # Only replace the profile the delta was based on, in case another update got there first.
+        collection = UnitProfile.get_collection()
+        result = collection.update({'_id': p['_id'], 'profile_hash': base_hash},
+                                   {'$set': {'profile': profile, 'profile_hash': profile_hash}})
+        if not result['n']:
+            raise stale
+        p['profile'] = profile
+        p['profile_hash'] = profile_hash
+
+        history_manager = factory.consumer_history_manager()
+        history_manager.record_event(
+            consumer_id,
+            'unit_profile_changed', {'profile_content_type': content_type})
+        return p
+
+    @staticmethod
+    def _get_profiler(content_type):
+        """
+        Get the profiler and its configuration for a content type.
+
+        :param content_type: The profile (content) type ID.
+        :type  content_type: str
+        :return:             tuple of (profiler, config)
+        :rtype:              tuple
+        """
+        try:
+            return plugin_api.get_profiler_by_type(content_type)
+        except plugin_exceptions.PluginNotFound:
+            # Not all profile types have a type specific profiler, so let's use the baseclass
+            # Profiler
+            return Profiler(), {}
+
+    @staticmethod
+    def _entry_key(entry):
+        """
+        Get a hashable representation of a profile entry, used to compare entries by value.
+
+        :param entry: A profile entry.
+        :type  entry: object
+        :return:      The canonical serialization of the entry.
+        :rtype:       str
+        """
+        return json.dumps(entry, separators=(',', ':'), sort_keys=True)
+
     @staticmethod
     def delete(consumer_id, content_type):
         """
@@ -146,3 +253,4 @@ class ProfileManager(object):
 create = task(ProfileManager.create, base=Task)
 delete = task(ProfileManager.delete, base=Task, ignore_result=True)
 update = task(ProfileManager.update, base=Task)
+update_delta = task(ProfileManager.update_delta, base=Task)
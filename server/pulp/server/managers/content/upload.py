@@ -1,8 +1,11 @@
 from errno import ENOENT
 from gettext import gettext as _
+import fcntl
+import json
 import logging
 import os
 import sys
+import zlib
 from uuid import uuid4
 
 from celery import task
@@ -21,6 +24,15 @@ from pulp.server.controllers import repository as repo_controller
 
 logger = logging.getLogger(__name__)
 
+# Suffix of the file stored next to each upload that tracks the ranges received so far
+UPLOAD_STATE_SUFFIX = '.state'
+
+# Type of the rolling checksum calculated over the contiguous prefix of each upload
+UPLOAD_CHECKSUM_TYPE = 'crc32'
+
+# Number of bytes read at a time when the checksum must be extended from the uploaded file
+CHECKSUM_BLOCK_SIZE = 1048576
+
 
 class ContentUploadManager(object):
     def initialize_upload(self):
@@ -79,6 +91,40 @@ class ContentUploadManager(object):
         f.write(data)
         f.close()
 
+        if data:
+            ContentUploadManager._record_range(upload_id, offset, data)
+
+    def get_upload_status(self, upload_id):
+        """
+        Returns which parts of the given upload have been received, allowing
+        an interrupted upload to be resumed by sending only the missing ranges,
+        along with the checksum of the contiguous data received from the
+        start of the file.
+
+        @param upload_id: upload request ID
+        @type  upload_id: str
+
+        @return: dict containing the received ranges as a list of [start, end)
+                 offset pairs, the checksum type and hex digest, and the number
+                 of bytes covered by the checksum
+        @rtype:  dict
+
+        @raise MissingResource: if the upload request ID does not exist
+        """
+        file_path = ContentUploadManager._upload_file_path(upload_id)
+        if not os.path.exists(file_path):
+            raise MissingResource(upload_request=upload_id)
+
+        state = ContentUploadManager._read_state(upload_id) or _empty_state()
+        status = {
+            'upload_id': upload_id,
+            'ranges': state['ranges'],
+            'checksum_type': UPLOAD_CHECKSUM_TYPE,
+            'checksum': _format_checksum(state['crc32']),
+            'checksum_length': state['prefix'],
+        }
+        return status
+
     def delete_upload(self, upload_id):
         """
         Deletes all files associated with the given upload request. If the
@@ -92,11 +138,13 @@ class ContentUploadManager(object):
         """
 
         file_path = ContentUploadManager._upload_file_path(upload_id)
-        try:
-            os.remove(file_path)
-        except OSError as e:
-            if e.errno != ENOENT:
-                raise
+        state_path = ContentUploadManager._upload_state_path(upload_id)
+        for path in (file_path, state_path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                if e.errno != ENOENT:
+                    raise
 
     def read_upload(self, upload_id):
         """
@@ -130,7 +178,7 @@ class ContentUploadManager(object):
         @rtype:  list
         """
         upload_dir = ContentUploadManager._upload_storage_dir()
-        upload_ids = os.listdir(upload_dir)
+        upload_ids = [f for f in os.listdir(upload_dir) if not f.endswith(UPLOAD_STATE_SUFFIX)]
         return upload_ids
 
     @staticmethod
@@ -159,7 +207,7 @@ class ContentUploadManager(object):
 
     @staticmethod
     def import_uploaded_unit(repo_id, unit_type_id, unit_key, unit_metadata, upload_id,
-                             override_config=None):
+                             override_config=None, upload_checksum=None):
         """
         Called to trigger the importer's handling of an uploaded unit. This
         should not be called until the bits have finished uploading. The
@@ -181,6 +229,13 @@ class ContentUploadManager(object):
         :type  unit_metadata: dict
         :param upload_id:     upload being imported
         :type  upload_id:     str
+        :param override_config: importer configuration values that override the importer's
+                                default configuration
+        :type  override_config: dict
+        :param upload_checksum: optional CRC32 hex digest of the complete file calculated by the
+                                client; the import is refused if it does not match the checksum
+                                the server calculated while the file was uploaded
+        :type  upload_checksum: str
         :return:              A dictionary describing the success or failure of the upload. It must
                               contain the following keys:
                                 'success_flag': bool. Indicates whether the upload was successful
@@ -188,12 +243,14 @@ class ContentUploadManager(object):
                                 'details':      json-serializable object, providing details
         :rtype:               dict
         :raises MissingResource: if upload request was for the non-existent repository
+        :raises PulpDataException: if the upload is incomplete or its checksum does not match
         :raises PulpCodedException: if import was unsuccessful and it was handled by the importer
         :raises PulpException: if import was unsuccessful and it was not handled by the importer
         :raises PulpExecutionException: if an unexpected error occured during the upload
         """
         # If it doesn't raise an exception, it's good to go
         ContentUploadManager.is_valid_upload(repo_id, unit_type_id)
+        ContentUploadManager._validate_upload(upload_id, upload_checksum)
         repo_obj = model.Repository.objects.get_repo_or_missing_resource(repo_id)
         repo_importer = model.Importer.objects.get_or_404(repo_id=repo_id)
 
@@ -223,7 +280,6 @@ class ContentUploadManager(object):
                     unit_type=unit_type_id, summary=result['summary'], details=result['details']
                 )
 
-            repo_controller.rebuild_content_unit_counts(repo_obj)
             repo_controller.update_last_unit_added(repo_obj.repo_id)
             return result
         except PulpCodedException:
@@ -242,6 +298,123 @@ class ContentUploadManager(object):
 
         # TODO: Add support for tracking the report as a history entry on the repo
 
+    @staticmethod
+    def _validate_upload(upload_id, upload_checksum=None):
+        """
+        Verifies that the ranges received for the given upload cover the file
+        without any holes and, when the client provided one, that its checksum
+        matches the rolling checksum calculated as the data arrived. Uploads
+        that have no recorded state, such as those containing no data, are
+        not validated.
+
+        :param upload_id:       identifies the upload in question
+        :type  upload_id:       str
+        :param upload_checksum: CRC32 hex digest of the complete file calculated by the client
+        :type  upload_checksum: str
+        :raise PulpDataException: if the upload is incomplete or the checksum does not match
+        """
+        state = ContentUploadManager._read_state(upload_id)
+        if state is None:
+            return
+
+        ranges = state['ranges']
+        if len(ranges) > 1 or (ranges and ranges[0][0] != 0):
+            msg = _('Upload [%(u)s] is incomplete; the following ranges were received: %(r)s')
+            raise PulpDataException(msg % {'u': upload_id, 'r': ranges})
+
+        if upload_checksum is not None:
+            checksum = _format_checksum(state['crc32'])
+            if upload_checksum.lower() != checksum:
+                msg = _('Checksum [%(c)s] of upload [%(u)s] does not match the checksum [%(s)s] '
+                        'of the data received')
+                raise PulpDataException(msg % {'c': upload_checksum, 'u': upload_id,
+                                               's': checksum})
+
+    @staticmethod
+    def _record_range(upload_id, offset, data):
+        """
+        Records that the given data was written to the upload at the given
+        offset. The received ranges are merged and, when the data extends the
+        contiguous prefix of the file, the rolling checksum is extended over
+        the new bytes. Writes that overlap the prefix cause it to be
+        recalculated from the file since the bytes may have changed.
+
+        The state file is locked while it is updated so segments of the same
+        upload may be saved concurrently by separate processes.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :param offset:    offset in the file at which the data was written
+        :type  offset:    int
+        :param data:      data written to the file
+        :type  data:      str
+        """
+        state_path = ContentUploadManager._upload_state_path(upload_id)
+        fd = os.open(state_path, os.O_RDWR | os.O_CREAT, 0644)
+        fp = os.fdopen(fd, 'r+')
+        try:
+            fcntl.flock(fp, fcntl.LOCK_EX)
+            state = _parse_state(fp.read()) or _empty_state()
+
+            end = offset + len(data)
+            ranges = _merge_range(state['ranges'], offset, end)
+
+            prefix = state['prefix']
+            crc = state['crc32']
+            if offset < prefix:
+                prefix = 0
+                crc = 0
+            if ranges[0][0] == 0 and ranges[0][1] > prefix:
+                file_path = ContentUploadManager._upload_file_path(upload_id)
+                crc = _extend_checksum(file_path, crc, prefix, ranges[0][1], offset, data)
+                prefix = ranges[0][1]
+
+            state = {'ranges': ranges, 'prefix': prefix, 'crc32': crc}
+            fp.seek(0)
+            fp.truncate()
+            json.dump(state, fp)
+        finally:
+            # closing the file releases the lock
+            fp.close()
+
+    @staticmethod
+    def _read_state(upload_id):
+        """
+        Returns the recorded state of the given upload.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :return:          the received ranges, the length of the contiguous prefix and its
+                          checksum; None if no state is recorded for the upload
+        :rtype:           dict
+        """
+        state_path = ContentUploadManager._upload_state_path(upload_id)
+        try:
+            fp = open(state_path)
+        except IOError as e:
+            if e.errno != ENOENT:
+                raise
+            return None
+        try:
+            fcntl.flock(fp, fcntl.LOCK_SH)
+            return _parse_state(fp.read())
+        finally:
+            fp.close()
+
+    @staticmethod
+    def _upload_state_path(upload_id):
+        """
+        Returns the full path to the file tracking the ranges received for the given upload.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :return:          full path on the server's filesystem
+        :rtype:           str
+        """
+        upload_storage_dir = ContentUploadManager._upload_storage_dir()
+        path = os.path.join(upload_storage_dir, upload_id + UPLOAD_STATE_SUFFIX)
+        return path
+
     @staticmethod
     def _upload_file_path(upload_id):
         """
@@ -276,4 +449,111 @@ class ContentUploadManager(object):
         return upload_storage_dir
 
 
+def _empty_state():
+    """
+    :return: state of an upload for which no data has been received
+    :rtype:  dict
+    """
+    return {'ranges': [], 'prefix': 0, 'crc32': 0}
+
+
+def _parse_state(content):
+    """
+    Parses the content of an upload state file. A state file left empty or
+    truncated by a failure while it was written is treated as missing.
+
+    :param content: content of the state file
+    :type  content: str
+    :return:        the parsed state; None if there is none
+    :rtype:         dict
+    """
+    try:
+        return json.loads(content)
+    except ValueError:
+        return None
+
+
+def _merge_range(ranges, start, end):
+    """
+    Adds the range [start, end) to a sorted list of disjoint ranges, merging
+    it with any ranges it overlaps or touches.
+
+    :param ranges: sorted list of disjoint [start, end) pairs
+    :type  ranges: list
+    :param start:  start of the range to add
+    :type  start:  int
+    :param end:    end of the range to add
+    :type  end:    int
+    :return:       sorted list of disjoint [start, end) pairs
+    :rtype:        list
+    """
+    merged = []
+    for r_start, r_end in ranges:
+        if r_end < start or r_start > end:
+            merged.append([r_start, r_end])
+        else:
+            start = min(start, r_start)
+            end = max(end, r_end)
+    merged.append([start, end])
+    merged.sort()
+    return merged
+
+
+def _extend_checksum(file_path, crc, start, end, offset, data):
+    """
+    Extends a CRC32 over the bytes [start, end) of an uploaded file. Bytes
+    within the data just written are taken from it directly; only the rest
+    is read back from the file.
+
+    :param file_path: path to the uploaded file
+    :type  file_path: str
+    :param crc:       CRC32 of the bytes preceding start
+    :type  crc:       int
+    :param start:     offset at which to extend the checksum
+    :type  start:     int
+    :param end:       offset at which to stop
+    :type  end:       int
+    :param offset:    offset at which the data was written
+    :type  offset:    int
+    :param data:      data just written to the file
+    :type  data:      str
+    :return:          CRC32 of the bytes preceding end
+    :rtype:           int
+    """
+    data_end = offset + len(data)
+    position = start
+    f = None
+    try:
+        while position < end:
+            if offset <= position < data_end:
+                length = min(end, data_end) - position
+                block = buffer(data, position - offset, length)
+            else:
+                limit = offset if position < offset else end
+                length = min(CHECKSUM_BLOCK_SIZE, limit - position)
+                if f is None:
+                    f = open(file_path, 'rb')
+                f.seek(position)
+                block = f.read(length)
+                if len(block) != length:
+                    raise PulpExecutionException(
+                        _('Upload file [%(f)s] is shorter than expected') % {'f': file_path})
+            crc = zlib.crc32(block, crc)
+            position += length
+    finally:
+        if f is not None:
+            f.close()
+    return crc & 0xffffffff
+
+
+def _format_checksum(crc):
+    """
+    :param crc: CRC32 value
+    :type  crc: int
+    :return:    CRC32 formatted as a hex digest
+    :rtype:     str
+    """
+    return '%08x' % (crc & 0xffffffff)
+
+
 import_uploaded_unit = task(ContentUploadManager.import_uploaded_unit, base=Task)
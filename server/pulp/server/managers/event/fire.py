@@ -3,12 +3,18 @@ Handles the firing of events to any configured listeners. This module is
 responsible for defining what events look like. The specific fire methods for
 each event type require data relevant to that event type and package it up
 in a consistent event format for that type.
+
+Firing an event does not notify the listeners directly. A delivery for each
+interested listener is stored in the event outbox and the listeners are
+notified by the pulp.server.event.dispatch.deliver_events task.
 """
 
 import logging
 
+from pulp.server.compat import json, json_util
+from pulp.server.db.model import EventDelivery
 from pulp.server.db.model.event import EventListener
-from pulp.server.event import data as e, notifiers
+from pulp.server.event import data as e
 
 
 _logger = logging.getLogger(__name__)
@@ -54,25 +60,32 @@ class EventFireManager(object):
 
     def _do_fire(self, event):
         """
-        Performs the actual act of firing an event to all appropriate
-        listeners. This call will log but otherwise suppress any exception
-        that comes out of a notifier.
+        Performs the actual act of firing an event by storing a delivery of it
+        for each appropriate listener in the outbox, then queues a task to
+        deliver them. This call will log but otherwise suppress any exception
+        raised while queuing the task; the deliveries are picked up by the
+        periodic run of the task regardless.
 
         @param event: event object to fire
         @type  event: pulp.server.event.data.Event
         """
         # Determine which listeners should be notified
         listeners = list(EventListener.get_collection().find(
-            {'$or': ({'event_types': event.event_type}, {'event_types': '*'})}))
-
-        # For each listener, retrieve the notifier and invoke it. Be sure that
-        # an exception from a notifier is logged but does not interrupt the
-        # remainder of the firing, nor bubble up.
-        for listener in listeners:
-            notifier_type_id = listener['notifier_type_id']
-            f = notifiers.get_notifier_function(notifier_type_id)
-
-            try:
-                f(listener['notifier_config'], event)
-            except Exception:
-                _logger.exception('Exception from notifier of type [%s]' % notifier_type_id)
+            {'$or': ({'event_types': event.event_type}, {'event_types': '*'})},
+            projection=['_id']))
+        if not listeners:
+            return
+
+        # The data is captured now since it includes the state of the task firing the event
+        event_data = json.dumps(event.data(), default=json_util.default)
+        deliveries = [EventDelivery(listener_id=listener['_id'], event_type=event.event_type,
+                                    event_data=event_data)
+                      for listener in listeners]
+        EventDelivery.objects.insert(deliveries, load_bulk=False)
+
+        # Imported here to avoid a circular import with the tasking subsystem
+        from pulp.server.event.dispatch import deliver_events
+        try:
+            deliver_events.apply_async()
+        except Exception:
+            _logger.exception('Could not queue the delivery of event [%s]' % event.event_type)
@@ -42,9 +42,11 @@ class TopicPublishManager(object):
             try:
                 cls._connection.open()
             except ConnectionError:
-                # log the error, but allow life to go on.
+                # log the error, but allow life to go on. The connection is opened again the
+                # next time it is needed.
                 cls._logger.exception(
                     'could not connect to messaging server %s' % address)
+                cls._connection = None
                 return
 
         return cls._connection
@@ -66,16 +68,60 @@ class TopicPublishManager(object):
                          whatever is setup in the server config.
         :type  exchange: str
         """
+        return cls.publish_all([event], exchange)
+
+    @classmethod
+    def publish_all(cls, events, exchange=None):
+        """
+        Publish several events to a remote exchange using a single session,
+        creating one sender for each distinct subject.
+
+        Failures to publish the messages will be logged but will not prevent
+        execution from continuing.
+
+        :param events: the events that should be published to a remote exchange
+        :type  events: list of pulp.server.event.data.Event
+
+        :param exchange: optional name of an exchange to use. This will override
+                         whatever is setup in the server config.
+        :type  exchange: str
+
+        :return: False if the events could not be published, including when the connection to
+                 the messaging server could not be opened; None if messaging is disabled, in
+                 which case the events are discarded
+        :rtype:  bool or None
+        """
+        if not config.get('messaging', 'url'):
+            # there is nowhere to publish to, so retrying the events would not help
+            cls._disabled_message()
+            return
         connection = cls.connection()
-        if connection:
-            subject = '%s.%s' % (cls.BASE_SUBJECT, event.event_type)
-            destination = (
-                '%s/%s; {create:always, node:{type:topic}, link:{x-declare:{auto-delete:True}}}' % (
-                    exchange or cls.EXCHANGE, subject))
+        if not connection:
+            # the messaging server could not be reached
+            return False
+        session = None
+        try:
+            session = connection.session()
+            senders = {}
+            for event in events:
+                subject = '%s.%s' % (cls.BASE_SUBJECT, event.event_type)
+                if subject not in senders:
+                    destination = (
+                        '%s/%s; {create:always, node:{type:topic}, '
+                        'link:{x-declare:{auto-delete:True}}}' % (
+                            exchange or cls.EXCHANGE, subject))
+                    senders[subject] = session.sender(destination)
 
-            data = json.dumps(event.data(), default=json_util.default)
-            try:
-                cls.connection().session().sender(destination).send(data)
-            except MessagingError, e:
-                # log the error, but allow life to go on.
-                cls._logger.exception('could not publish message: %s' % str(e))
+                data = json.dumps(event.data(), default=json_util.default)
+                senders[subject].send(data)
+        except MessagingError, e:
+            # log the error, but allow life to go on.
+            cls._logger.exception('could not publish message: %s' % str(e))
+            return False
+        finally:
+            if session is not None:
+                try:
+                    session.close()
+                except MessagingError:
+                    cls._logger.exception('could not close messaging session')
+        return True
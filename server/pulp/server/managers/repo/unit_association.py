@@ -76,6 +76,9 @@ class RepoUnitAssociationManager(object):
                                   defaults to True
         @type  update_repo_metadata: bool
 
+        @return: True if the association was created; False if it already existed
+        @rtype:  bool
+
         @raise InvalidType: if the given owner type is not of the valid enumeration
         """
 
@@ -85,21 +88,17 @@ class RepoUnitAssociationManager(object):
                 'unit_type_id': unit_type_id}
         existing_association = RepoContentUnit.get_collection().find_one(spec)
         if existing_association is not None:
-            return
-
-        similar_exists = False
-        if update_repo_metadata:
-            similar_exists = RepoUnitAssociationManager.association_exists(repo_id, unit_id,
-                                                                           unit_type_id)
+            return False
 
         # Create the database entry
         association = RepoContentUnit(repo_id, unit_id, unit_type_id)
         RepoContentUnit.get_collection().save(association)
 
         # update the count and times of associated units on the repo object
-        if update_repo_metadata and not similar_exists:
+        if update_repo_metadata:
             repo_controller.update_unit_count(repo_id, unit_type_id, 1)
             repo_controller.update_last_unit_added(repo_id)
+        return True
 
     def associate_all_by_ids(self, repo_id, unit_type_id, unit_id_list):
         """
@@ -128,9 +127,8 @@ class RepoUnitAssociationManager(object):
 
         unique_count = 0
         for unit_id in unit_id_list:
-            if not RepoUnitAssociationManager.association_exists(repo_id, unit_id, unit_type_id):
+            if self.associate_unit_by_id(repo_id, unit_type_id, unit_id, False):
                 unique_count += 1
-            self.associate_unit_by_id(repo_id, unit_type_id, unit_id, False)
 
         # update the count of associated units on the repo object
         if unique_count:
@@ -274,13 +272,11 @@ class RepoUnitAssociationManager(object):
             if isinstance(copied_units, tuple):
                 suc_units_ids = [u.to_id_dict() for u in copied_units[0] if u is not None]
                 unsuc_units_ids = [u.to_id_dict() for u in copied_units[1]]
-                repo_controller.rebuild_content_unit_counts(dest_repo)
                 if suc_units_ids:
                     repo_controller.update_last_unit_added(dest_repo.repo_id)
                 return {'units_successful': suc_units_ids,
                         'units_failed_signature_filter': unsuc_units_ids}
             unit_ids = [u.to_id_dict() for u in copied_units if u is not None]
-            repo_controller.rebuild_content_unit_counts(dest_repo)
             if unit_ids:
                 repo_controller.update_last_unit_added(dest_repo.repo_id)
             return {'units_successful': unit_ids}
@@ -389,10 +385,10 @@ class RepoUnitAssociationManager(object):
                 'unit_type_id': unit_type_id,
                 'unit_id': {'$in': unit_ids}
             }
-            collection.remove(spec)
+            result = collection.remove(spec)
+            repo_controller.update_unit_count(repo_id, unit_type_id, -result['n'])
 
         repo_controller.update_last_unit_removed(repo_id)
-        repo_controller.rebuild_content_unit_counts(repo)
 
         # Match the return type/format as copy
         serializable_units = [u.to_id_dict() for u in transfer_units]
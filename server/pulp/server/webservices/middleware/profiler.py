@@ -0,0 +1,65 @@
+import logging
+from gettext import gettext as _
+
+from django.core.exceptions import MiddlewareNotUsed
+
+from pulp.server.db import profiler
+
+
+# The number of query shapes logged for each request
+SUMMARY_SIZE = 10
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfileMiddleware(object):
+    """
+    Profile the MongoDB commands issued while handling each request and log a summary of them,
+    if MongoDB query profiling is enabled.
+    """
+
+    def __init__(self):
+        """
+        :raises MiddlewareNotUsed: if MongoDB query profiling is not enabled
+        """
+        if not profiler.is_enabled():
+            raise MiddlewareNotUsed()
+
+    def process_request(self, request):
+        """
+        Start profiling the request.
+
+        :param request: WSGI request object
+        :type request: django.core.handlers.wsgi.WSGIRequest
+        """
+        profiler.start('%s %s' % (request.method, request.path))
+
+    def process_response(self, request, response):
+        """
+        Stop profiling the request and log the summary.
+
+        :param request: WSGI request object
+        :type request: django.core.handlers.wsgi.WSGIRequest
+        :param response: the response to the request
+        :type response: django.http.HttpResponse
+
+        :return: the response, unchanged
+        :rtype: django.http.HttpResponse
+        """
+        query_profile = profiler.stop()
+        if query_profile is None:
+            return response
+
+        summary = query_profile.summary(SUMMARY_SIZE)
+        lines = [_('%(name)s issued %(commands)d MongoDB commands taking %(duration)dms') % {
+            'name': query_profile.name, 'commands': summary['commands'],
+            'duration': summary['duration_ms']}]
+        for query in summary['queries']:
+            callers = ', '.join(c['caller'] for c in query['callers'])
+            lines.append(_('  %(count)d %(command)s on %(collection)s taking %(duration)dms from '
+                           '%(callers)s: %(shape)s') % {
+                'count': query['count'], 'command': query['command'],
+                'collection': query['collection'], 'duration': query['duration_ms'],
+                'callers': callers, 'shape': query['shape']})
+        logger.info('\n'.join(lines))
+        return response
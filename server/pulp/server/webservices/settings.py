@@ -21,6 +21,7 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'pulp.server.webservices.middleware.profiler.QueryProfileMiddleware',
     'django.middleware.http.ConditionalGetMiddleware',
     'pulp.server.webservices.middleware.exception.ExceptionHandlerMiddleware',
     'pulp.server.webservices.middleware.postponed.PostponedOperationMiddleware',
@@ -257,6 +257,8 @@ urlpatterns = [
     url(r'^v2/tasks/$', tasks.TaskCollectionView.as_view(), name='task_collection'),
     url(r'^v2/tasks/search/$', tasks.TaskSearchView.as_view(), name='task_search'),
     url(r'^v2/tasks/(?P<task_id>[^/]+)/$', tasks.TaskResourceView.as_view(), name='task_resource'),
+    url(r'^v2/tasks/(?P<task_id>[^/]+)/changes/$', tasks.TaskChangesView.as_view(),
+        name='task_changes'),
     url(r'^v2/task_groups/(?P<group_id>[^/]+)/$',
         task_groups.TaskGroupView.as_view(), name='task_group'),
     url(r'^v2/task_groups/(?P<group_id>[^/]+)/state_summary/$',
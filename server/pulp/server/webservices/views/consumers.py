@@ -758,6 +758,9 @@ class ConsumerProfileResourceView(View):
         """
         Update the association of a profile with a consumer by content type ID.
 
+        The body either contains the full profile, or a base_hash along with the entries added
+        to and removed from the profile that has that hash.
+
         :param request: WSGI request object
         :type request: django.core.handlers.wsgi.WSGIRequest
         :param consumer_id: A consumer ID.
@@ -770,10 +773,14 @@ class ConsumerProfileResourceView(View):
         """
 
         body = request.body_as_json
-        profile = body.get('profile')
-
         manager = factory.consumer_profile_manager()
-        consumer = manager.update(consumer_id, content_type, profile)
+
+        if 'base_hash' in body:
+            consumer = manager.update_delta(consumer_id, content_type, body['base_hash'],
+                                            body.get('added'), body.get('removed'))
+        else:
+            profile = body.get('profile')
+            consumer = manager.update(consumer_id, content_type, profile)
 
         add_link_profile(consumer)
 
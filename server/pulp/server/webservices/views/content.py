@@ -21,7 +21,8 @@ from pulp.server.managers.content import orphan as content_orphan
 from pulp.server.webservices.views import search
 from pulp.server.webservices.views.decorators import auth_required
 from pulp.server.webservices.views.serializers import content as serial_content
-from pulp.server.webservices.views.util import (generate_json_response,
+from pulp.server.webservices.views.util import (conditional_get,
+                                                generate_json_response,
                                                 generate_json_response_with_pulp_encoder,
                                                 generate_redirect_response,
                                                 parse_json_body)
@@ -304,6 +305,7 @@ class ContentUnitResourceView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get()
     def get(self, request, type_id, unit_id):
         """
         Return a response containing information about the requested content unit.
@@ -336,6 +338,7 @@ class ContentUnitsCollectionView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get()
     def get(self, request, type_id):
         """
         Return a response with a serialized list of the content units of the specified type.
@@ -488,6 +491,24 @@ class UploadResourceView(View):
     View for single upload
     """
 
+    @auth_required(authorization.READ)
+    def get(self, request, upload_id):
+        """
+        Return which ranges of a single upload have been received along with the checksum of
+        the data received from the start of the file.
+
+        :param request: WSGI request object
+        :type  request: django.core.handlers.wsgi.WSGIRequest
+        :param upload_id: id of the upload
+        :type  upload_id: str
+
+        :return: response containing the status of the upload
+        :rtype: django.http.HttpResponse
+        """
+        upload_manager = factory.content_upload_manager()
+        status = upload_manager.get_upload_status(upload_id)
+        return generate_json_response(status)
+
     @auth_required(authorization.DELETE)
     def delete(self, request, upload_id):
         """
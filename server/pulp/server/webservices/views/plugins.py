@@ -4,7 +4,7 @@ from pulp.server.auth import authorization
 from pulp.server.exceptions import MissingResource
 from pulp.server.managers import factory
 from pulp.server.webservices.views.decorators import auth_required
-from pulp.server.webservices.views.util import (generate_json_response,
+from pulp.server.webservices.views.util import (conditional_get, generate_json_response,
                                                 generate_json_response_with_pulp_encoder)
 
 
@@ -14,6 +14,7 @@ class DistributorResourceView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get()
     def get(self, request, distributor_id):
         """
         Return a response contaning serialized data for the specified distributor.
@@ -44,6 +45,7 @@ class DistributorsView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get()
     def get(self, request):
         """
         Return response containing a serialized list of dicts, one for each distributor.
@@ -69,6 +71,7 @@ class ImporterResourceView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get()
     def get(self, request, importer_id):
         """
         Return a response containing serialized data for the specified importer.
@@ -100,6 +103,7 @@ class ImportersView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get()
     def get(self, request):
         """
         Return a response containing a serialized list of importers present in the server.
@@ -124,6 +128,7 @@ class TypeResourceView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get()
     def get(self, request, type_id):
         """
         Return a single type definition.
@@ -152,6 +157,7 @@ class TypesView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get()
     def get(self, request):
         """
         Get all type definitions
@@ -1,3 +1,5 @@
+import hashlib
+
 import isodate
 
 from django.core.urlresolvers import reverse
@@ -6,6 +8,7 @@ from django.views.generic import View
 from pulp.common import constants, dateutils, tags
 from pulp.server import exceptions
 from pulp.server.auth import authorization
+from pulp.server.compat import json, json_util
 from pulp.server.controllers import importer as importer_controller
 from pulp.server.controllers import repository as repo_controller
 from pulp.server.controllers import distributor as dist_controller
@@ -20,7 +23,8 @@ from pulp.server.webservices.views import search, serializers
 from pulp.server.webservices.views.decorators import auth_required
 from pulp.server.webservices.views.schedule import ScheduleResource
 from pulp.server.webservices.views.serializers import content
-from pulp.server.webservices.views.util import (generate_json_response,
+from pulp.server.webservices.views.util import (conditional_get,
+                                                generate_json_response,
                                                 generate_json_response_with_pulp_encoder,
                                                 generate_redirect_response,
                                                 parse_json_body)
@@ -51,6 +55,119 @@ def _merge_related_objects(name, model, repos):
         repo_dict[item['repo_id']][name].append(serialized)
 
 
+def _documents_version(document_model, **query):
+    """
+    Derive a version of the documents that match a query from all of their fields. Every field
+    is included, since some fields, such as scratchpads, are changed with queryset updates that
+    do not touch last_updated.
+
+    :param document_model: mongoengine document
+    :type  document_model: mongoengine.Document
+    :param query:          keyword arguments that select the documents
+
+    :return: a version that changes whenever one of the documents is added, removed or modified,
+             and the most recent time one of them was modified; None for both if no document
+             matches
+    :rtype:  tuple
+    """
+    digest = hashlib.sha1()
+    found = False
+    last_modified = None
+    documents = document_model.objects.filter(**query).order_by('id').as_pymongo()
+    for document in documents:
+        found = True
+        digest.update(json.dumps(document, sort_keys=True, default=json_util.default))
+        updated = document.get('last_updated')
+        if updated is not None and (last_modified is None or updated > last_modified):
+            last_modified = updated
+    if not found:
+        return None, None
+    return digest.hexdigest(), last_modified
+
+
+def _repos_version(request, repo_id=None):
+    """
+    Derive the version of one or all repositories, including the importers and distributors
+    requested by the query parameters.
+
+    The time the repository was last modified is only given for a single repository without
+    importers and distributors, since it does not reflect documents that were removed. No version
+    is given for a single repository with details, which include the units stored locally.
+
+    :param request: WSGI request object
+    :type  request: django.core.handlers.wsgi.WSGIRequest
+    :param repo_id: id of the repository; None for all repositories
+    :type  repo_id: str
+
+    :return: the version, and the time the repository was last modified or None
+    :rtype:  tuple
+    """
+    details = request.GET.get('details', 'false').lower() == 'true'
+    importers = request.GET.get('importers', 'false').lower() == 'true' or details
+    distributors = request.GET.get('distributors', 'false').lower() == 'true' or details
+    query = {}
+    if repo_id is not None:
+        if details:
+            return None, None
+        query['repo_id'] = repo_id
+
+    version, last_modified = _documents_version(model.Repository, **query)
+    if version is None:
+        return None, None
+    if importers:
+        version += str(_documents_version(model.Importer, **query)[0])
+        last_modified = None
+    if distributors:
+        version += str(_documents_version(model.Distributor, **query)[0])
+        last_modified = None
+    if repo_id is None:
+        last_modified = None
+    return version, last_modified
+
+
+def _importers_version(request, repo_id, importer_id=None):
+    """
+    Derive the version of the importers of a repository. The time they were last modified is not
+    given, since it does not reflect syncs.
+
+    :param request:     WSGI request object
+    :type  request:     django.core.handlers.wsgi.WSGIRequest
+    :param repo_id:     id of the repository
+    :type  repo_id:     str
+    :param importer_id: type of a single importer; None for all of the repository's importers
+    :type  importer_id: str
+
+    :return: the version, and None
+    :rtype:  tuple
+    """
+    query = {'repo_id': repo_id}
+    if importer_id is not None:
+        query['importer_type_id'] = importer_id
+    return _documents_version(model.Importer, **query)[0], None
+
+
+def _distributors_version(request, repo_id, distributor_id=None):
+    """
+    Derive the version of the distributors of a repository. The time they were last modified is
+    not given, since it does not reflect publishes.
+
+    :param request:        WSGI request object
+    :type  request:        django.core.handlers.wsgi.WSGIRequest
+    :param repo_id:        id of the repository
+    :type  repo_id:        str
+    :param distributor_id: id of a single distributor; None for all of the repository's
+                           distributors
+    :type  distributor_id: str
+
+    :return: the version, and None
+    :rtype:  tuple
+    """
+    query = {'repo_id': repo_id}
+    if distributor_id is not None:
+        query['distributor_id'] = distributor_id
+    return _documents_version(model.Distributor, **query)[0], None
+
+
 def _process_repos(repo_objs, details, importers, distributors):
     """
     Serialize repository objects and add related importers and distributors if requested.
@@ -85,6 +202,7 @@ class ReposView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get(version=_repos_version, cache=True)
     def get(self, request):
         """
         Return information about all repositories.
@@ -139,6 +257,7 @@ class RepoResourceView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get(version=_repos_version)
     def get(self, request, repo_id):
         """
         Looks for query parameters 'importers' and 'distributors', and will add
@@ -300,6 +419,7 @@ class RepoImportersView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get(version=_importers_version)
     def get(self, request, repo_id):
         """
         Get all importers (only one) associated with a repository.
@@ -350,6 +470,7 @@ class RepoImporterResourceView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get(version=_importers_version)
     def get(self, request, repo_id, importer_id):
         """
         Retrieve the importer for a repo.
@@ -583,6 +704,7 @@ class RepoDistributorsView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get(version=_distributors_version)
     def get(self, request, repo_id):
         """
         Get a list of all distributors associated with a given repository.
@@ -644,6 +766,7 @@ class RepoDistributorResourceView(View):
     """
 
     @auth_required(authorization.READ)
+    @conditional_get(version=_distributors_version)
     def get(self, request, repo_id, distributor_id):
         """
         :param request: WSGI request object
@@ -895,6 +1018,7 @@ class ContentApplicabilityRegenerationView(View):
 
         repo_criteria_body = request.body_as_json.get('repo_criteria', None)
         parallel = request.body_as_json.get('parallel', False)
+        force = request.body_as_json.get('force', False)
 
         if repo_criteria_body is None:
             raise exceptions.MissingValue('repo_criteria')
@@ -905,12 +1029,15 @@ class ContentApplicabilityRegenerationView(View):
             invalid_criteria.add_child_exception(e)
             raise invalid_criteria
 
+        if type(force) is not bool:
+            raise exceptions.InvalidValue('force')
+
         if parallel:
             if type(parallel) is not bool:
                 raise exceptions.InvalidValue('parallel')
 
             async_result = ApplicabilityRegenerationManager.\
-                queue_regenerate_applicability_for_repos(repo_criteria.as_dict())
+                queue_regenerate_applicability_for_repos(repo_criteria.as_dict(), force)
             ret = GroupCallReport()
             ret['group_id'] = str(async_result)
             ret['_href'] = reverse('task_group', kwargs={'group_id': str(async_result)})
@@ -919,7 +1046,7 @@ class ContentApplicabilityRegenerationView(View):
         regeneration_tag = tags.action_tag('content_applicability_regeneration')
         async_result = regenerate_applicability_for_repos.apply_async_with_reservation(
             tags.RESOURCE_REPOSITORY_PROFILE_APPLICABILITY_TYPE, tags.RESOURCE_ANY_ID,
-            (repo_criteria.as_dict(),), tags=[regeneration_tag])
+            (repo_criteria.as_dict(), force), tags=[regeneration_tag])
         raise exceptions.OperationPostponed(async_result)
 
 
@@ -1262,10 +1389,12 @@ class RepoImportUpload(View):
 
         unit_metadata = request.body_as_json.pop('unit_metadata', None)
         override_config = request.body_as_json.pop('override_config', None)
+        upload_checksum = request.body_as_json.pop('upload_checksum', None)
         task_tags = [tags.resource_tag(tags.RESOURCE_REPOSITORY_TYPE, repo_id),
                      tags.action_tag('import_upload')]
         async_result = import_uploaded_unit.apply_async_with_reservation(
             tags.RESOURCE_REPOSITORY_TYPE, repo_id,
-            [repo_id, unit_type_id, unit_key, unit_metadata, upload_id, override_config],
+            [repo_id, unit_type_id, unit_key, unit_metadata, upload_id, override_config,
+             upload_checksum],
             tags=task_tags)
         raise exceptions.OperationPostponed(async_result)
@@ -435,6 +435,7 @@ class Distributor(ModelSerializer):
         """
         Specifies to the base serializer how to properly handle a Distributor Document.
         """
+        exclude_fields = ['last_published_config_hash']
         remapped_fields = {'distributor_id': 'id', 'id': '_id'}
 
     def get_href(self, instance):
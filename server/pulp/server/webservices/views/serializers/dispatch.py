@@ -38,9 +38,11 @@ def task_status(task):
     task_dict = {}
     attributes = ['task_id', 'worker_name', 'tags', 'state', 'error', 'spawned_tasks',
                   'progress_report', 'task_type', 'start_time', 'finish_time', 'result',
-                  'exception', 'traceback', '_ns']
+                  'exception', 'traceback', 'revision', '_ns']
     for attribute in attributes:
         task_dict[attribute] = task[attribute]
+    if task['query_profile'] is not None:
+        task_dict['query_profile'] = task['query_profile']
 
     # This is to preserve backward compatibility for semantic versioning.
     task_dict['_id'] = task['id']
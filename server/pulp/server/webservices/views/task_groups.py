@@ -3,7 +3,6 @@ This module contains views related to Pulp's task groups.
 """
 from django.views.generic import View
 
-from pulp.common.constants import CALL_STATES
 from pulp.server.async import tasks
 from pulp.server.auth import authorization
 from pulp.server.db.model import TaskStatus
@@ -75,10 +74,5 @@ class TaskGroupSummaryView(View):
         :return: Response containing a serialized dict of the task group summary
         :rtype : django.http.HttpResponse
         """
-        tasks = TaskStatus.objects(group_id=group_id)
-        task_group_total = tasks.count()
-
-        summary = {'total': task_group_total}
-        for state in CALL_STATES:
-            summary[state] = tasks.filter(state=state).count()
+        summary = TaskStatus.objects(group_id=group_id).get_state_summary()
         return generate_json_response_with_pulp_encoder(summary)
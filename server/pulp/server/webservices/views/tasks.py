@@ -2,18 +2,20 @@
 This module contains views related to Pulp's task system models.
 """
 from datetime import datetime
+import threading
+import time
 
 from django.views.generic import View
 from django.http import HttpResponse
 from mongoengine.queryset import DoesNotExist
 
-from pulp.common import error_codes
-from pulp.common.constants import CALL_CANCELED_STATE, CALL_COMPLETE_STATES
+from pulp.common import dateutils, error_codes
+from pulp.common.constants import CALL_CANCELED_STATE, CALL_COMPLETE_STATES, CALL_STATES
 from pulp.server import exceptions as pulp_exceptions
 from pulp.server.async import tasks
 from pulp.server.auth import authorization
 from pulp.server.db.model import Worker, TaskStatus
-from pulp.server.exceptions import MissingResource
+from pulp.server.exceptions import InvalidValue, MissingResource
 from pulp.server.webservices.views import search
 from pulp.server.webservices.views.decorators import auth_required
 from pulp.server.webservices.views.serializers import dispatch as serial_dispatch
@@ -24,6 +26,28 @@ from pulp.server.webservices.views.util import (generate_json_response,
 # This constant set is used for deleting the completed tasks from the collection.
 VALID_STATES = set(filter(lambda state: state != CALL_CANCELED_STATE, CALL_COMPLETE_STATES))
 
+# Default and maximum number of seconds a request for task changes will wait for a change.
+DEFAULT_CHANGES_TIMEOUT = 5
+MAX_CHANGES_TIMEOUT = 10
+
+# Number of requests for task changes in each server process that may wait for a change at once.
+# Further requests return immediately, so that waiting clients cannot tie up the server's threads.
+MAX_CHANGES_WAITERS = 4
+_changes_waiters = threading.BoundedSemaphore(MAX_CHANGES_WAITERS)
+
+# Number of seconds to sleep between checks of a task's revision while waiting for a change.
+CHANGES_CHECK_INTERVAL = 0.5
+
+# Fields that are always present in a task changes response.
+CHANGES_REQUIRED_FIELDS = ('task_id', 'state', 'revision')
+
+# Mapping of task list query parameters to the time range filters they apply.
+TIME_FILTERS = (('started_after', 'start_time__gte'), ('started_before', 'start_time__lte'),
+                ('finished_after', 'finish_time__gte'), ('finished_before', 'finish_time__lte'))
+
+# Serialized keys that are always kept when the fields of a task listing are limited.
+LISTING_REQUIRED_KEYS = ('task_id', 'id', '_id', '_href')
+
 
 def task_serializer(task):
     """
@@ -41,6 +65,65 @@ def task_serializer(task):
     return task
 
 
+def _normalize_time_filter(param, value):
+    """
+    Convert an ISO8601 time given as a query parameter into the UTC format task times are
+    stored in, so that they compare correctly.
+
+    :param param: name of the query parameter
+    :type  param: basestring
+    :param value: value of the query parameter
+    :type  value: basestring
+
+    :return: the time formatted as a UTC ISO8601 string
+    :rtype:  basestring
+    :raises InvalidValue: if the value is not an ISO8601 date and time
+    """
+    try:
+        time = dateutils.parse_iso8601_datetime(value)
+    except ValueError:
+        raise InvalidValue(param)
+    return dateutils.format_iso8601_datetime(dateutils.to_utc_datetime(time))
+
+
+def _get_non_negative_int(request, param):
+    """
+    Return the value of an optional integer query parameter.
+
+    :param request: WSGI request object
+    :type  request: django.core.handlers.wsgi.WSGIRequest
+    :param param: name of the query parameter
+    :type  param: basestring
+
+    :return: the value of the parameter, or None if it was not given
+    :rtype:  int or None
+    :raises InvalidValue: if the value is not a non-negative integer
+    """
+    value = request.GET.get(param)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise InvalidValue(param)
+    if value < 0:
+        raise InvalidValue(param)
+    return value
+
+
+def _add_queue_name(task_dict):
+    """
+    Add the name of the queue the task was dispatched to if the task's worker is known.
+
+    :param task_dict: serialized task
+    :type  task_dict: dict
+    """
+    if 'worker_name' in task_dict:
+        queue_name = Worker(name=task_dict['worker_name'],
+                            last_heartbeat=datetime.now()).queue_name
+        task_dict.update({'queue': queue_name})
+
+
 class TaskSearchView(search.SearchView):
     """
     This view provides GET and POST searching on TaskStatus objects.
@@ -58,20 +141,68 @@ class TaskCollectionView(View):
     def get(self, request):
         """
         Return a response containing a list of all tasks or a response containing
-        a list of tasks filtered by the optional GET parameter 'tags'.
+        a list of tasks filtered by the optional GET parameters.
+
+        The optional GET parameters are:
+         * 'tag' - only tasks with all of the given tags are listed
+         * 'state' - only tasks in one of the given states are listed
+         * 'started_after', 'started_before', 'finished_after', 'finished_before' - only tasks
+           started or finished in the given ISO8601 time range are listed
+         * 'field' - only the given fields of each task are returned
+         * 'exclude_field' - the given fields of each task are omitted, e.g. 'progress_report'
+         * 'skip' and 'limit' - paginate the listing, which is then ordered by creation
 
         :param request: WSGI request object
         :type  request: django.core.handlers.wsgi.WSGIRequest
 
         :return: Response containing a serialized list of dicts, one for each task
         :rtype:  django.http.HttpResponse
+        :raises InvalidValue: if some parameters are invalid
         """
+        filters = {'group_id': None}
         tags = request.GET.getlist('tag')
         if tags:
-            raw_tasks = TaskStatus.objects(tags__all=tags, group_id=None)
-        else:
-            raw_tasks = TaskStatus.objects(group_id=None)
-        serialized_task_statuses = [task_serializer(task) for task in raw_tasks]
+            filters['tags__all'] = tags
+        states = request.GET.getlist('state')
+        if states:
+            invalid_states = [state for state in states if state not in CALL_STATES]
+            if invalid_states:
+                raise InvalidValue(invalid_states)
+            filters['state__in'] = states
+        for param, time_filter in TIME_FILTERS:
+            value = request.GET.get(param)
+            if value:
+                filters[time_filter] = _normalize_time_filter(param, value)
+        raw_tasks = TaskStatus.objects(**filters)
+
+        fields = request.GET.getlist('field')
+        exclude_fields = request.GET.getlist('exclude_field')
+        invalid_fields = [f for f in fields + exclude_fields if f not in TaskStatus._fields]
+        if invalid_fields:
+            raise InvalidValue(invalid_fields)
+        if fields:
+            raw_tasks = raw_tasks.only(*(set(fields) | set(['task_id'])))
+        if exclude_fields:
+            raw_tasks = raw_tasks.exclude(*exclude_fields)
+
+        skip = _get_non_negative_int(request, 'skip')
+        limit = _get_non_negative_int(request, 'limit')
+        if skip is not None or limit is not None:
+            raw_tasks = raw_tasks.order_by('id')
+            if skip is not None:
+                raw_tasks = raw_tasks.skip(skip)
+            if limit is not None:
+                raw_tasks = raw_tasks.limit(limit)
+
+        serialized_task_statuses = []
+        for task in raw_tasks:
+            task_dict = task_serializer(task)
+            if fields:
+                task_dict = dict((k, v) for k, v in task_dict.items()
+                                 if k in fields or k in LISTING_REQUIRED_KEYS)
+            for field in exclude_fields:
+                task_dict.pop(field, None)
+            serialized_task_statuses.append(task_dict)
         return generate_json_response_with_pulp_encoder(serialized_task_statuses)
 
     @auth_required(authorization.DELETE)
@@ -125,10 +256,7 @@ class TaskResourceView(View):
             raise MissingResource(task_id)
 
         task_dict = task_serializer(task)
-        if 'worker_name' in task_dict:
-            queue_name = Worker(name=task_dict['worker_name'],
-                                last_heartbeat=datetime.now()).queue_name
-            task_dict.update({'queue': queue_name})
+        _add_queue_name(task_dict)
         return generate_json_response_with_pulp_encoder(task_dict)
 
     @auth_required(authorization.DELETE)
@@ -146,3 +274,86 @@ class TaskResourceView(View):
         """
         tasks.cancel(task_id)
         return generate_json_response(None)
+
+
+class TaskChangesView(View):
+    """
+    View that waits for changes to a single task.
+
+    Instead of repeatedly fetching the full task, clients pass the revision of the task they
+    already know about. The request blocks for a few seconds at most until the task's revision
+    differs from it, then returns the fields that changed since that revision. If the changed
+    fields cannot be determined, the full task is returned. Only MAX_CHANGES_WAITERS requests
+    wait at once; others return the current state of the task immediately.
+    """
+
+    @auth_required(authorization.READ)
+    def get(self, request, task_id):
+        """
+        Return a response containing the fields of a task that changed after a given revision.
+
+        The optional GET parameter 'revision' is the revision of the task known to the client; if
+        omitted, the full task is returned immediately. The optional GET parameter 'timeout' is the
+        maximum number of seconds to wait for a change; it is not waited for if too many other
+        requests are already waiting. If the timeout expires, or if the task is already complete,
+        the response contains only the task's id, state and revision.
+
+        :param request: WSGI request object
+        :type  request: django.core.handlers.wsgi.WSGIRequest
+        :param task_id: The ID of the task to wait on
+        :type  task_id: basestring
+
+        :return: Response containing a serialized dict of the changed fields of the task
+        :rtype : django.http.HttpResponse
+        :raises MissingResource: if task is not found
+        :raises InvalidValue: if the revision or timeout is not a number
+        """
+        try:
+            known_revision = int(request.GET.get('revision', -1))
+        except ValueError:
+            raise InvalidValue('revision')
+        try:
+            timeout = float(request.GET.get('timeout', DEFAULT_CHANGES_TIMEOUT))
+        except ValueError:
+            raise InvalidValue('timeout')
+        timeout = max(0, min(timeout, MAX_CHANGES_TIMEOUT))
+
+        waiting = timeout > 0 and _changes_waiters.acquire(False)
+        if not waiting:
+            timeout = 0
+        try:
+            deadline = time.time() + timeout
+            while True:
+                current = TaskStatus.objects(task_id=task_id).only(
+                    'revision', 'changed_fields', 'state').first()
+                if current is None:
+                    raise MissingResource(task_id)
+                if current.revision != known_revision or \
+                        current.state in CALL_COMPLETE_STATES or time.time() >= deadline:
+                    break
+                time.sleep(CHANGES_CHECK_INTERVAL)
+        finally:
+            if waiting:
+                _changes_waiters.release()
+
+        if current.revision == known_revision:
+            task_dict = {'task_id': task_id, 'state': current.state, 'revision': current.revision}
+            return generate_json_response_with_pulp_encoder(task_dict)
+
+        if current.revision == known_revision + 1 and current.changed_fields:
+            fields = set(current.changed_fields) | set(CHANGES_REQUIRED_FIELDS)
+            task = TaskStatus.objects(task_id=task_id).only(*sorted(fields)).first()
+            if task is not None and task.revision == current.revision:
+                task_dict = task_serializer(task)
+                task_dict = dict((k, v) for k, v in task_dict.items()
+                                 if k in fields or k == '_href')
+                _add_queue_name(task_dict)
+                return generate_json_response_with_pulp_encoder(task_dict)
+
+        try:
+            task = TaskStatus.objects.get(task_id=task_id)
+        except DoesNotExist:
+            raise MissingResource(task_id)
+        task_dict = task_serializer(task)
+        _add_queue_name(task_dict)
+        return generate_json_response_with_pulp_encoder(task_dict)
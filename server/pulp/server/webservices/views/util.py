@@ -1,17 +1,23 @@
+from collections import OrderedDict
 from datetime import datetime
 from functools import wraps
 
+import calendar
 import functools
+import hashlib
 import httplib
 import json
 import sys
+import threading
 
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified
 from django.utils.encoding import iri_to_uri
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
 
 from pulp.common import dateutils, error_codes
 from pulp.common.util import decode_unicode, encode_unicode
 from pulp.server.compat import json_util
+from pulp.server.config import config
 from pulp.server.exceptions import PulpCodedValidationException, InputEncodingError
 
 
@@ -132,6 +138,185 @@ def parse_json_body(allow_empty=False, json_type=None):
     return decorator
 
 
+class ResponseCache(object):
+    """
+    A per-process cache of the responses to GET requests, keyed by the path and query string of
+    the request. Each response is stored with its ETag, and is only returned for a request with
+    the same ETag, so a response is rebuilt as soon as the resource it represents changes,
+    regardless of which process changed it. The least recently used responses are discarded
+    once max_entries are stored.
+
+    :ivar max_entries: the number of responses kept; 0 disables the cache
+    :type max_entries: int
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, etag):
+        """
+        :param key:  path and query string of the request
+        :type  key:  str
+        :param etag: the current ETag of the resource
+        :type  etag: str
+
+        :return: a new response with the stored content; None if there is no response stored for
+                 the current ETag
+        :rtype:  django.http.HttpResponse
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] != etag:
+                return None
+            self._entries[key] = entry
+        return HttpResponse(entry[1], content_type=entry[2])
+
+    def put(self, key, etag, response):
+        """
+        Store a response, replacing any stored for an earlier ETag.
+
+        :param key:      path and query string of the request
+        :type  key:      str
+        :param etag:     the ETag of the response
+        :type  etag:     str
+        :param response: the response to store
+        :type  response: django.http.HttpResponse
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (etag, response.content, response['Content-Type'])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Discard all stored responses.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(config.getint('server', 'response_cache_size'))
+
+
+def conditional_get(version=None, cache=False):
+    """
+    Add a strong ETag to the responses of a view's GET method, and a Last-Modified header when the
+    time the resource was last modified is known, and respond with 304 Not Modified when the
+    client already has the current representation.
+
+    The version function is called with the request and the arguments of the view, and returns a
+    tuple of a string that changes whenever the representation of the resource changes and the
+    time the resource was last modified, or None. The ETag is derived from the version without
+    building the response. When no version function is given, or it returns None for the version,
+    the response is built and the ETag is derived from its content.
+
+    :param version: function that returns the version of the resource
+    :type  version: callable
+    :param cache:   if True, responses are kept in the response cache, which is meant for
+                    collection listings that are expensive to build
+    :type  cache:   bool
+
+    :return: decorator with proper parameters applied.
+    :rtype: function
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            request = args[1]
+            resource_version, last_modified = None, None
+            if version is not None:
+                resource_version, last_modified = version(*args[1:], **kwargs)
+
+            if resource_version is None:
+                response = func(*args, **kwargs)
+                if response.status_code != httplib.OK:
+                    return response
+                etag = quote_etag(hashlib.sha1(response.content).hexdigest())
+                if _is_not_modified(request, etag, last_modified):
+                    return _not_modified_response(etag, last_modified)
+            else:
+                key = request.get_full_path()
+                etag = quote_etag(hashlib.sha1(key + resource_version).hexdigest())
+                if _is_not_modified(request, etag, last_modified):
+                    return _not_modified_response(etag, last_modified)
+                response = response_cache.get(key, etag) if cache else None
+                if response is None:
+                    response = func(*args, **kwargs)
+                    if response.status_code != httplib.OK:
+                        return response
+                    if cache:
+                        response_cache.put(key, etag, response)
+
+            _set_validators(response, etag, last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def _is_not_modified(request, etag, last_modified):
+    """
+    Evaluate the conditional headers of a GET request. If-None-Match takes precedence over
+    If-Modified-Since.
+
+    :param request:       WSGI request object
+    :type  request:       django.core.handlers.wsgi.WSGIRequest
+    :param etag:          the current ETag of the resource
+    :type  etag:          str
+    :param last_modified: the time the resource was last modified; None if it is not known
+    :type  last_modified: datetime.datetime
+
+    :return: True if the client already has the current representation
+    :rtype:  bool
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in [quote_etag(e) for e in etags]
+
+    if_modified_since = request.META.get('HTTP_IF_MODIFIED_SINCE')
+    if if_modified_since and last_modified is not None:
+        if_modified_since = parse_http_date_safe(if_modified_since)
+        return if_modified_since is not None and \
+            calendar.timegm(last_modified.utctimetuple()) <= if_modified_since
+    return False
+
+
+def _not_modified_response(etag, last_modified):
+    """
+    :param etag:          the current ETag of the resource
+    :type  etag:          str
+    :param last_modified: the time the resource was last modified; None if it is not known
+    :type  last_modified: datetime.datetime
+
+    :return: a 304 Not Modified response
+    :rtype:  django.http.HttpResponseNotModified
+    """
+    response = HttpResponseNotModified()
+    _set_validators(response, etag, last_modified)
+    return response
+
+
+def _set_validators(response, etag, last_modified):
+    """
+    Set the ETag and Last-Modified headers of a response.
+
+    :param response:      the response
+    :type  response:      django.http.HttpResponse
+    :param etag:          the current ETag of the resource
+    :type  etag:          str
+    :param last_modified: the time the resource was last modified; None if it is not known
+    :type  last_modified: datetime.datetime
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(calendar.timegm(last_modified.utctimetuple()))
+
+
 def page_not_found(request, *args, **kwargs):
     """
     Returns a HttpResponse with an empty json payload and a httplib.NOT_FOUND response code.
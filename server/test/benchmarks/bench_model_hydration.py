@@ -0,0 +1,75 @@
+"""
+Measure how quickly documents are hydrated from the raw documents returned by mongo, the way
+a queryset builds them, with and without decorating each instance for auto retry.
+
+No database is needed. Run it from the server directory:
+
+    python test/benchmarks/bench_model_hydration.py --count 100000
+"""
+
+import argparse
+import datetime
+import time
+
+from bson.objectid import ObjectId
+
+from pulp.server.config import config
+from pulp.server.db import model
+from pulp.server.db.connection import UnsafeRetry
+
+
+def make_sons(count):
+    """
+    Build raw repository content unit documents, as returned by pymongo.
+
+    :param count: number of documents to build
+    :type  count: int
+    :return: raw documents
+    :rtype:  list of dict
+    """
+    now = datetime.datetime.utcnow()
+    return [{'_id': ObjectId(), 'repo_id': 'repo-%d' % (i % 10), 'unit_id': str(i),
+             'unit_type_id': 'rpm', 'created': now, 'updated': now} for i in xrange(count)]
+
+
+def hydrate(sons, per_instance):
+    """
+    Hydrate the documents and return the time taken.
+
+    :param sons: raw documents
+    :type  sons: list of dict
+    :param per_instance: also decorate every instance, as documents used to be
+    :type  per_instance: bool
+    :return: seconds taken
+    :rtype:  float
+    """
+    document_class = model.RepositoryContentUnit
+    start = time.time()
+    for son in sons:
+        document = document_class._from_son(son)
+        if per_instance:
+            UnsafeRetry.decorate_instance(instance=document, full_name=document_class)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=50000, help='documents to hydrate')
+    parser.add_argument('--autoretry', choices=('true', 'false'), default='true',
+                        help='value of the unsafe_autoretry database setting')
+    options = parser.parse_args()
+
+    config.set('database', 'unsafe_autoretry', options.autoretry)
+    sons = make_sons(options.count)
+    # hydrate once so the class level decoration is not part of the measurement
+    hydrate(sons[:1], False)
+
+    for label, per_instance in (('per-instance decoration', True),
+                                ('class decoration', False)):
+        elapsed = hydrate(sons, per_instance)
+        print '%-24s %8d documents in %6.3fs: %10.0f documents/s' % (
+            label, options.count, elapsed, options.count / elapsed)
+
+
+if __name__ == '__main__':
+    main()
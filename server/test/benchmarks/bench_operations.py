@@ -0,0 +1,295 @@
+"""
+Time Pulp's core repository operations end to end against a synthetic repository.
+
+A repository of synthetic files is served from a local HTTP server and synced with a minimal
+content plugin, then copied, searched, published, unassociated and scanned for orphans, and
+applicability is calculated for a set of bound consumers. Each operation goes through the same
+controllers and managers that the tasks use, and its wall clock and CPU time are written out as
+JSON, along with the commit and parameters of the run, so that runs can be compared across
+commits.
+
+A MongoDB server is needed. The benchmark uses a database of its own, which is dropped before
+and after the run, and keeps content in a temporary directory. Run it from the server directory:
+
+    python test/benchmarks/bench_operations.py --units 5000 --output results.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import mock
+
+from pulp.common.plugins import importer_constants
+from pulp.plugins.loader import api as plugin_api
+from pulp.server.config import config
+from pulp.server.controllers import repository as repo_controller
+from pulp.server.db import connection, manage, model
+from pulp.server.db.model.consumer import Consumer
+from pulp.server.db.model.criteria import Criteria, UnitAssociationCriteria
+from pulp.server.managers import factory as manager_factory
+
+import fake_plugins
+from fake_upstream import FakeUpstream
+
+
+SOURCE_REPO_ID = 'benchmark-source'
+COPY_REPO_ID = 'benchmark-copy'
+DISTRIBUTOR_ID = 'benchmark-distributor'
+
+
+class Benchmark(object):
+    """
+    Runs the operations in order, each building on the state left by the previous ones, and
+    records how long each took.
+
+    :ivar results: the measurements of each operation, keyed by its name
+    :type results: dict
+    """
+
+    def __init__(self, upstream, consumers, seed, temp_dir):
+        """
+        :param upstream:  the repository to sync from, which must be started
+        :type  upstream:  fake_upstream.FakeUpstream
+        :param consumers: number of consumers to calculate applicability for
+        :type  consumers: int
+        :param seed:      seed of the generated consumer profiles
+        :type  seed:      int
+        :param temp_dir:  directory that content, working directories and publishes are kept in
+        :type  temp_dir:  str
+        """
+        self.upstream = upstream
+        self.consumers = consumers
+        self.seed = seed
+        self.temp_dir = temp_dir
+        self.results = {}
+
+    def run(self):
+        """
+        Run every operation.
+        """
+        self.setup()
+        self.measure('sync', self.sync)
+        self.measure('resync', self.sync)
+        self.measure('search', self.search)
+        self.measure('publish', self.publish)
+        self.measure('copy', self.copy)
+        self.setup_consumers()
+        self.measure('applicability', self.applicability)
+        names = [unit['name'] for unit in self.upstream.units[::2]]
+        self.measure('unassociate', self.unassociate, COPY_REPO_ID, names)
+        # the units removed from both repositories are orphaned
+        self.unassociate(SOURCE_REPO_ID, names)
+        self.measure('orphan_scan', self.orphan_scan)
+
+    def measure(self, name, operation, *args):
+        """
+        Time an operation, with a working directory of its own, and record the result.
+
+        :param name:      name the result is recorded under
+        :type  name:      str
+        :param operation: the operation, which returns the number of items it handled
+        :type  operation: callable
+        """
+        working_dir = os.path.join(self.temp_dir, 'working', name)
+        os.makedirs(working_dir)
+        with _working_directory(working_dir):
+            start_cpu = _cpu_time()
+            start = time.time()
+            items = operation(*args)
+            seconds = time.time() - start
+            cpu_seconds = _cpu_time() - start_cpu
+        self.results[name] = {'seconds': round(seconds, 4),
+                              'cpu_seconds': round(cpu_seconds, 4),
+                              'items': items}
+        print >> sys.stderr, '%-14s %8d items in %8.3fs' % (name, items, seconds)
+
+    def setup(self):
+        """
+        Create the repositories.
+        """
+        importer_config = {importer_constants.KEY_FEED: self.upstream.url}
+        distributor = {'distributor_type_id': fake_plugins.DISTRIBUTOR_TYPE_ID,
+                       'distributor_id': DISTRIBUTOR_ID,
+                       'distributor_config': {fake_plugins.PUBLISH_DIR_KEY:
+                                              os.path.join(self.temp_dir, 'published')}}
+        repo_controller.create_repo(SOURCE_REPO_ID,
+                                    importer_type_id=fake_plugins.IMPORTER_TYPE_ID,
+                                    importer_repo_plugin_config=importer_config,
+                                    distributor_list=[distributor])
+        repo_controller.create_repo(COPY_REPO_ID,
+                                    importer_type_id=fake_plugins.IMPORTER_TYPE_ID,
+                                    importer_repo_plugin_config={})
+
+    def setup_consumers(self):
+        """
+        Create consumers bound to the source repository, each with a profile of a random sample
+        of the repository's files, about half of which are installed at a different version.
+        """
+        rand = random.Random(self.seed)
+        profile_manager = manager_factory.consumer_profile_manager()
+        bind_manager = manager_factory.consumer_bind_manager()
+        sample_size = len(self.upstream.units) / 2
+        for i in xrange(self.consumers):
+            consumer_id = 'benchmark-consumer-%d' % i
+            # consumers are inserted directly, as registering them also generates certificates
+            Consumer.get_collection().insert(Consumer(consumer_id, consumer_id))
+            profile = []
+            for unit in rand.sample(self.upstream.units, sample_size):
+                version = unit['version'] if rand.random() < 0.5 else '0.%d' % i
+                profile.append({'name': unit['name'], 'version': version})
+            profile_manager.update(consumer_id, fake_plugins.TYPE_ID, profile)
+            bind_manager.bind(consumer_id, SOURCE_REPO_ID, DISTRIBUTOR_ID, False, {})
+
+    def sync(self):
+        repo_controller.sync(SOURCE_REPO_ID)
+        return model.RepositoryContentUnit.objects(repo_id=SOURCE_REPO_ID).count()
+
+    def search(self):
+        repo = model.Repository.objects.get(repo_id=SOURCE_REPO_ID)
+        return len(list(repo_controller.find_repo_content_units(repo)))
+
+    def publish(self):
+        repo_controller.publish(SOURCE_REPO_ID, DISTRIBUTOR_ID)
+        return model.RepositoryContentUnit.objects(repo_id=SOURCE_REPO_ID).count()
+
+    def copy(self):
+        criteria = UnitAssociationCriteria(type_ids=[fake_plugins.TYPE_ID])
+        result = manager_factory.repo_unit_association_manager().associate_from_repo(
+            SOURCE_REPO_ID, COPY_REPO_ID, criteria.to_dict())
+        return len(result['units_successful'])
+
+    def applicability(self):
+        criteria = Criteria(filters={'id': SOURCE_REPO_ID})
+        manager_factory.applicability_regeneration_manager().regenerate_applicability_for_repos(
+            criteria.as_dict())
+        return self.consumers
+
+    def unassociate(self, repo_id, names):
+        criteria = UnitAssociationCriteria(type_ids=[fake_plugins.TYPE_ID],
+                                           unit_filters={'name': {'$in': names}})
+        result = manager_factory.repo_unit_association_manager().unassociate_by_criteria(
+            repo_id, criteria.to_dict())
+        return len(result.get('units_successful', []))
+
+    def orphan_scan(self):
+        summary = manager_factory.content_orphan_manager().orphans_summary()
+        return summary.get(fake_plugins.TYPE_ID, 0)
+
+
+@contextlib.contextmanager
+def _working_directory(path):
+    """
+    Give the operations run within the context a working directory, as a task does.
+
+    :param path: the working directory
+    :type  path: str
+    """
+    with mock.patch('pulp.server.managers.repo._common._working_directory_path',
+                    return_value=path):
+        yield
+
+
+def _cpu_time():
+    """
+    :return: user and system CPU time used by this process, in seconds
+    :rtype:  float
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _commit():
+    """
+    :return: the commit that is checked out; None if it cannot be determined
+    :rtype:  str
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _drop_database():
+    database = connection.get_database()
+    database.client.drop_database(database.name)
+
+
+def _ensure_indexes():
+    """
+    Create the platform's indexes and those of the benchmark unit model, as pulp-manage-db does.
+    """
+    manage.ensure_database_indexes()
+    unit_model = fake_plugins.BenchmarkFile
+    unit_model._meta['indexes'].append({'fields': unit_model.unit_key_fields, 'unique': True})
+    unit_model._meta['index_specs'] = unit_model._build_index_specs(unit_model._meta['indexes'])
+    unit_model.ensure_indexes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--units', type=int, default=1000, help='files in the repository')
+    parser.add_argument('--size', type=int, default=1024, help='size of each file in bytes')
+    parser.add_argument('--consumers', type=int, default=20,
+                        help='consumers to calculate applicability for')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated data')
+    parser.add_argument('--seeds', default='localhost:27017',
+                        help='MongoDB server to connect to, as in the database config')
+    parser.add_argument('--database', default='pulp_benchmark',
+                        help='database to use, which is dropped before and after the run')
+    parser.add_argument('--output', type=argparse.FileType('w'), default=sys.stdout,
+                        help='file the JSON results are written to; stdout by default')
+    options = parser.parse_args()
+    if options.units < 2 or options.size < 1:
+        parser.error('at least 2 units of at least 1 byte are needed')
+
+    report = {'commit': _commit(),
+              'started': datetime.datetime.utcnow().isoformat() + 'Z',
+              'python': platform.python_version(),
+              'parameters': {'units': options.units, 'size': options.size,
+                             'consumers': options.consumers, 'seed': options.seed},
+              'operations': {}}
+
+    temp_dir = tempfile.mkdtemp(prefix='pulp-benchmark-')
+    config.set('server', 'storage_dir', os.path.join(temp_dir, 'storage'))
+    connection.initialize(name=options.database, seeds=options.seeds)
+    _drop_database()
+    _ensure_indexes()
+    manager_factory.initialize()
+    plugin_api.initialize()
+    fake_plugins.install()
+
+    upstream = FakeUpstream(options.units, options.size, options.seed)
+    upstream.start()
+    benchmark = Benchmark(upstream, options.consumers, options.seed, temp_dir)
+    failed = False
+    try:
+        benchmark.run()
+    except Exception, e:
+        # the operations measured so far are still reported
+        report['error'] = '%s: %s' % (e.__class__.__name__, e)
+        failed = True
+    finally:
+        upstream.stop()
+        _drop_database()
+        shutil.rmtree(temp_dir)
+
+    report['operations'] = benchmark.results
+    json.dump(report, options.output, indent=2, sort_keys=True)
+    options.output.write('\n')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
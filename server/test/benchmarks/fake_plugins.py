@@ -0,0 +1,255 @@
+"""
+Minimal content plugins that the benchmarks run Pulp's operations with.
+
+They are built from the same platform pieces that real plugins use, the sync and publish steps,
+the metadata writers and the unit model, so that the benchmarks measure the platform rather than
+a particular content type. They are registered with the plugin loader in process and are not
+installed.
+"""
+
+from gettext import gettext as _
+import json
+import os
+import urllib2
+import urlparse
+
+import mongoengine
+from nectar.request import DownloadRequest
+
+from pulp.common.plugins import importer_constants
+from pulp.plugins.distributor import Distributor
+from pulp.plugins.importer import Importer
+from pulp.plugins.loader import api as plugin_api
+from pulp.plugins.profiler import Profiler
+from pulp.plugins.util import misc
+from pulp.plugins.util.metadata_writer import JSONArrayFileContext
+from pulp.plugins.util.publish_step import (AtomicDirectoryPublishStep, DownloadStep,
+                                            GetLocalUnitsStep, PluginStep, UnitModelPluginStep)
+from pulp.server.controllers import repository as repo_controller
+from pulp.server.db.model import FileContentUnit
+
+from fake_upstream import MANIFEST
+
+
+TYPE_ID = 'benchmark_file'
+IMPORTER_TYPE_ID = 'benchmark_importer'
+DISTRIBUTOR_TYPE_ID = 'benchmark_distributor'
+PROFILER_TYPE_ID = 'benchmark_profiler'
+
+# the key of the distributor config that holds the directory repositories are published to
+PUBLISH_DIR_KEY = 'publish_dir'
+
+UNITS_FILE = 'units.json'
+
+
+class BenchmarkFile(FileContentUnit):
+    """
+    A file in a benchmark repository.
+    """
+    name = mongoengine.StringField(required=True)
+    version = mongoengine.StringField(required=True)
+    checksum = mongoengine.StringField(required=True)
+    size = mongoengine.IntField()
+    filename = mongoengine.StringField()
+
+    _content_type_id = mongoengine.StringField(required=True, default=TYPE_ID)
+    unit_key_fields = ('name', 'version', 'checksum')
+
+    meta = {'collection': 'units_%s' % TYPE_ID,
+            'allow_inheritance': False}
+
+
+class BenchmarkImporter(Importer):
+    """
+    Syncs benchmark files from a repository served by fake_upstream.FakeUpstream and copies
+    them between repositories.
+    """
+
+    @classmethod
+    def metadata(cls):
+        return {'id': IMPORTER_TYPE_ID, 'display_name': 'Benchmark Importer', 'types': [TYPE_ID]}
+
+    def validate_config(self, repo, config):
+        return True, None
+
+    def sync_repo(self, repo, sync_conduit, config):
+        return SyncStep(repo, sync_conduit, config).process_lifecycle()
+
+    def import_units(self, source_repo, dest_repo, import_conduit, config, units=None):
+        if units is None:
+            units = repo_controller.find_repo_content_units(source_repo.repo_obj,
+                                                            yield_content_unit=True)
+        units = list(units)
+        for unit in units:
+            repo_controller.associate_single_unit(dest_repo.repo_obj, unit)
+        return units
+
+
+class SyncStep(PluginStep):
+    """
+    Reads the upstream manifest, associates the units that are already in Pulp, and downloads
+    and saves the others.
+
+    :ivar available_units: the units listed in the manifest
+    :type available_units: list of BenchmarkFile
+    """
+
+    def __init__(self, repo, conduit, config):
+        super(SyncStep, self).__init__('sync', repo=repo, conduit=conduit, config=config,
+                                       working_dir=repo.working_dir,
+                                       plugin_type=IMPORTER_TYPE_ID)
+        self.description = _('Syncing benchmark repository')
+        self.feed = config.get(importer_constants.KEY_FEED)
+        self.available_units = []
+        self.get_local = GetLocalUnitsStep(IMPORTER_TYPE_ID)
+        self.add_child(ManifestStep())
+        self.add_child(self.get_local)
+        self.add_child(DownloadStep('download_units', downloads=self.generate_downloads(),
+                                    plugin_type=IMPORTER_TYPE_ID))
+        self.add_child(SaveUnitsStep())
+
+    def generate_downloads(self):
+        """
+        :return: a download request for each unit not already in Pulp, with the unit as its data
+        :rtype:  generator of nectar.request.DownloadRequest
+        """
+        for unit in self.get_local.units_to_download:
+            destination = os.path.join(self.get_working_dir(), unit.filename)
+            url = urlparse.urljoin(self.feed, unit.filename)
+            yield DownloadRequest(url, destination, data=unit)
+
+
+class ManifestStep(PluginStep):
+    """
+    Fetch the upstream manifest and build the available units from it.
+    """
+
+    def __init__(self):
+        super(ManifestStep, self).__init__('get_manifest', plugin_type=IMPORTER_TYPE_ID)
+        self.description = _('Downloading manifest')
+
+    def process_main(self, item=None):
+        url = urlparse.urljoin(self.parent.feed, MANIFEST)
+        for entry in json.load(urllib2.urlopen(url)):
+            self.parent.available_units.append(
+                BenchmarkFile(name=entry['name'], version=entry['version'],
+                              checksum=entry['checksum'], size=entry['size'],
+                              filename=entry['path']))
+
+
+class SaveUnitsStep(PluginStep):
+    """
+    Save the downloaded units and associate them with the repository.
+    """
+
+    def __init__(self):
+        super(SaveUnitsStep, self).__init__('save_units', plugin_type=IMPORTER_TYPE_ID)
+        self.description = _('Saving units')
+
+    def get_iterator(self):
+        return iter(self.parent.get_local.units_to_download)
+
+    def get_total(self):
+        return len(self.parent.get_local.units_to_download)
+
+    def process_main(self, item=None):
+        item.set_storage_path(item.filename)
+        item.save_and_import_content(os.path.join(self.get_working_dir(), item.filename))
+        repo_controller.associate_single_unit(self.get_repo().repo_obj, item)
+
+
+class BenchmarkDistributor(Distributor):
+    """
+    Publishes a JSON listing of a repository's units, along with symlinks to their files.
+    """
+
+    @classmethod
+    def metadata(cls):
+        return {'id': DISTRIBUTOR_TYPE_ID, 'display_name': 'Benchmark Distributor',
+                'types': [TYPE_ID]}
+
+    def validate_config(self, repo, config, config_conduit):
+        return True, None
+
+    def publish_repo(self, repo, publish_conduit, config):
+        step = PluginStep('publish', repo=repo, conduit=publish_conduit, config=config,
+                          working_dir=repo.working_dir, plugin_type=DISTRIBUTOR_TYPE_ID)
+        content_dir = os.path.join(repo.working_dir, 'content')
+        publish_dir = config.get(PUBLISH_DIR_KEY)
+        step.add_child(PublishUnitsStep(content_dir))
+        step.add_child(AtomicDirectoryPublishStep(content_dir,
+                                                  [('/', os.path.join(publish_dir, repo.id))],
+                                                  os.path.join(publish_dir, '.master', repo.id)))
+        return step.process_lifecycle()
+
+
+class UnitsFileContext(JSONArrayFileContext):
+    """
+    Writes the unit key and file name of each unit.
+    """
+
+    def add_unit_metadata(self, unit):
+        super(UnitsFileContext, self).add_unit_metadata(unit)
+        self.metadata_file_handle.write(json.dumps(dict(unit.unit_key, filename=unit.filename)))
+
+
+class PublishUnitsStep(UnitModelPluginStep):
+    """
+    Write the units file and link each unit's file into the published content.
+    """
+
+    def __init__(self, content_dir):
+        super(PublishUnitsStep, self).__init__('publish_units', [BenchmarkFile],
+                                               plugin_type=DISTRIBUTOR_TYPE_ID)
+        self.description = _('Publishing units')
+        self.content_dir = content_dir
+        self.context = None
+
+    def initialize(self):
+        misc.mkdir(self.content_dir)
+        self.context = UnitsFileContext(os.path.join(self.content_dir, UNITS_FILE))
+        self.context.initialize()
+
+    def process_main(self, item=None):
+        self.context.add_unit_metadata(item)
+        misc.create_symlink(item._storage_path, os.path.join(self.content_dir, item.filename))
+
+    def finalize(self):
+        if self.context:
+            self.context.finalize()
+
+
+class BenchmarkProfiler(Profiler):
+    """
+    A consumer profile lists the name and version of each installed file. A file in a repository
+    is applicable if a different version of it is installed.
+    """
+
+    @classmethod
+    def metadata(cls):
+        return {'id': PROFILER_TYPE_ID, 'display_name': 'Benchmark Profiler', 'types': [TYPE_ID]}
+
+    def calculate_applicable_units(self, unit_profile, bound_repo_id, config, conduit):
+        installed = {}
+        for _profile_hash, content_type, profile in unit_profile:
+            if content_type == TYPE_ID:
+                installed.update((entry['name'], entry['version']) for entry in profile)
+        applicable = []
+        for unit in conduit.get_repo_units(bound_repo_id, TYPE_ID):
+            version = installed.get(unit.unit_key['name'])
+            if version is not None and version != unit.unit_key['version']:
+                applicable.append(unit.id)
+        return {TYPE_ID: applicable}
+
+
+def install():
+    """
+    Register the unit model and plugins with the plugin loader, which must have been initialized.
+    """
+    plugin_api._MANAGER.unit_models[TYPE_ID] = BenchmarkFile
+    BenchmarkFile.validate_model_definition()
+    BenchmarkFile.attach_signals()
+    plugin_api._MANAGER.importers.add_plugin(IMPORTER_TYPE_ID, BenchmarkImporter, {})
+    plugin_api._MANAGER.distributors.add_plugin(DISTRIBUTOR_TYPE_ID, BenchmarkDistributor, {})
+    plugin_api._MANAGER.profilers.add_plugin(PROFILER_TYPE_ID, BenchmarkProfiler, {},
+                                             types=[TYPE_ID])
@@ -0,0 +1,101 @@
+"""
+A local HTTP server that stands in for an upstream repository, serving a manifest of synthetic
+files and the files themselves from memory.
+"""
+
+import BaseHTTPServer
+import hashlib
+import json
+import random
+import SocketServer
+import threading
+
+
+MANIFEST = 'MANIFEST.json'
+
+
+class _Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serves the files of the server's repository.
+    """
+
+    def do_GET(self):
+        body = self.server.files.get(self.path.lstrip('/'))
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # requests are not logged, so that they do not interfere with the benchmark output
+        pass
+
+
+class FakeUpstream(object):
+    """
+    A repository of synthetic files served over HTTP on localhost.
+
+    The files are generated from a seed, so that the same options always produce the same
+    repository. Each file is listed in the manifest with its name, version, size and checksum.
+
+    :ivar units: the manifest entries, one for each file
+    :type units: list of dict
+    """
+
+    def __init__(self, count, size, seed=0):
+        """
+        :param count: number of files in the repository
+        :type  count: int
+        :param size:  size of each file in bytes
+        :type  size:  int
+        :param seed:  seed of the generated content
+        :type  seed:  int
+        """
+        rand = random.Random(seed)
+        self.units = []
+        self._files = {}
+        for i in xrange(count):
+            body = ('%0*x' % (size * 2, rand.getrandbits(size * 8))).decode('hex')
+            entry = {'name': 'file-%06d' % i,
+                     'version': '%d.%d' % (rand.randint(1, 9), rand.randint(0, 99)),
+                     'size': size,
+                     'checksum': hashlib.sha256(body).hexdigest()}
+            entry['path'] = '%(name)s-%(version)s.bin' % entry
+            self.units.append(entry)
+            self._files[entry['path']] = body
+        self._files[MANIFEST] = json.dumps(self.units)
+        self._server = None
+
+    @property
+    def url(self):
+        """
+        :return: URL of the repository, with a trailing slash
+        :rtype:  str
+        """
+        host, port = self._server.server_address
+        return 'http://%s:%d/' % (host, port)
+
+    def start(self):
+        """
+        Serve the repository on an unused port, on a background thread.
+        """
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.files = self._files
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """
+        Stop serving the repository.
+        """
+        self._server.shutdown()
+        self._server.server_close()
@@ -1,3 +1,5 @@
+import unittest
+
 import mock
 
 from ... import base
@@ -149,3 +151,42 @@ class BaseProfilerConduitTests(base.PulpServerTests):
         for u in units:
             self.assertTrue('key-1' in u.unit_key)
             self.assertTrue('extra_field' in u.metadata)
+
+
+class TestProfilerConduitCache(unittest.TestCase):
+
+    @mock.patch.object(ProfilerConduit, '_get_repo_units')
+    def test_no_cache(self, mock_get_repo_units):
+        conduit = ProfilerConduit()
+
+        conduit.get_repo_units('repo-1', 'type-1')
+        units = conduit.get_repo_units('repo-1', 'type-1')
+
+        self.assertEqual(mock_get_repo_units.call_count, 2)
+        self.assertTrue(units is mock_get_repo_units.return_value)
+
+    @mock.patch.object(ProfilerConduit, '_get_repo_units', return_value=['unit-1'])
+    def test_cache(self, mock_get_repo_units):
+        conduit = ProfilerConduit(cache_repo_units=True)
+
+        units1 = conduit.get_repo_units('repo-1', 'type-1', additional_unit_fields=['a'])
+        units2 = conduit.get_repo_units('repo-1', 'type-1', additional_unit_fields=['a'])
+
+        mock_get_repo_units.assert_called_once_with('repo-1', 'type-1', ['a'], None)
+        self.assertEqual(units1, ['unit-1'])
+        self.assertEqual(units2, ['unit-1'])
+        # callers get their own list
+        self.assertFalse(units1 is units2)
+
+    @mock.patch.object(ProfilerConduit, '_get_repo_units')
+    def test_cache_keyed_by_request(self, mock_get_repo_units):
+        conduit = ProfilerConduit(cache_repo_units=True)
+
+        conduit.get_repo_units('repo-1', 'type-1')
+        conduit.get_repo_units('repo-2', 'type-1')
+        conduit.get_repo_units('repo-1', 'type-2')
+        conduit.get_repo_units('repo-1', 'type-1', additional_unit_fields=['a'])
+        conduit.get_repo_units('repo-1', 'type-1', only_unit_fields=['b'])
+        conduit.get_repo_units('repo-1', 'type-1', only_unit_fields=['b'])
+
+        self.assertEqual(mock_get_repo_units.call_count, 5)
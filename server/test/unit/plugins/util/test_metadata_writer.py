@@ -401,8 +401,10 @@ class FastForwardXmlFileContextTests(unittest.TestCase):
                                             self.tag, 'package', self.attributes)
         context._open_metadata_file_handle()
         self.assertTrue(context.fast_forward)
+        # the compressed file is renamed but not decompressed
         self.assertEquals(context.existing_file,
-                          os.path.join(self.working_dir, 'original.test.xml'))
+                          os.path.join(self.working_dir, 'original.test.xml.gz'))
+        self.assertFalse(os.path.exists(os.path.join(self.working_dir, 'original.test.xml')))
 
     @patch('pulp.plugins.util.metadata_writer.XMLGenerator')
     def test_open_metadata_file_handle_existing_checksum_file(self, mock_generator):
@@ -421,8 +423,9 @@ class FastForwardXmlFileContextTests(unittest.TestCase):
                     os.path.join(self.working_dir, 'bb-test.xml'))
         context._open_metadata_file_handle()
         self.assertTrue(context.fast_forward)
-        self.assertEquals(context.existing_file, os.path.join(self.working_dir,
-                                                              'original.bb-test.xml'))
+        # the file is read in place rather than copied
+        self.assertEquals(context.existing_file, os.path.join(self.working_dir, 'bb-test.xml'))
+        self.assertEquals(len(os.listdir(self.working_dir)), 4)
 
     @patch('pulp.plugins.util.metadata_writer.XMLGenerator')
     def test_open_metadata_file_handle_existing_checksum_gzip_file(self, mock_generator):
@@ -434,7 +437,7 @@ class FastForwardXmlFileContextTests(unittest.TestCase):
         context._open_metadata_file_handle()
         self.assertTrue(context.fast_forward)
         self.assertEquals(context.existing_file,
-                          os.path.join(self.working_dir, 'original.bb-test.xml'))
+                          os.path.join(self.working_dir, 'bb-test.xml.gz'))
 
     @patch('pulp.plugins.util.metadata_writer.BUFFER_SIZE', new=8)
     def test_write_file_header_fast_forward_small_buffer(self):
@@ -528,6 +531,35 @@ class FastForwardXmlFileContextTests(unittest.TestCase):
         test_file_handle.close()
         self.assertEquals(test_content, created_content)
 
+    @patch('pulp.plugins.util.metadata_writer.BUFFER_SIZE', new=3)
+    def test_write_file_header_fast_forward_tags_split_between_reads(self):
+        shutil.copy(os.path.join(self.metadata_dir, 'test.xml'),
+                    os.path.join(self.working_dir, 'test.xml'))
+        self._test_fast_forward('test.xml')
+
+    @patch('pulp.plugins.util.metadata_writer.BUFFER_SIZE', new=8)
+    def test_write_file_header_fast_forward_checksum_gzip(self):
+        existing_file = os.path.join(self.working_dir, 'bb-test.xml.gz')
+        shutil.copy(os.path.join(self.metadata_dir, 'bb-test.xml.gz'), existing_file)
+        test_file = os.path.join(self.working_dir, 'test.xml.gz')
+        test_file_handle = gzip.open(existing_file)
+        existing_content = test_file_handle.read()
+        test_file_handle.close()
+        context = FastForwardXmlFileContext(test_file, self.tag, 'package', self.attributes,
+                                            checksum_type=TYPE_SHA1)
+
+        context._open_metadata_file_handle()
+        context._write_file_header()
+        context._close_metadata_file_handle()
+
+        test_file_handle = gzip.open(test_file)
+        created_content = test_file_handle.read()
+        test_file_handle.close()
+        self.assertEquals(existing_content[:existing_content.rfind('</metadata')],
+                          created_content)
+        # the existing file is read in place and preserved
+        self.assertEquals(sorted(os.listdir(self.working_dir)), ['bb-test.xml.gz', 'test.xml.gz'])
+
     @patch('pulp.plugins.util.metadata_writer.XMLGenerator')
     def test_write_file_header_no_fast_forward(self, mock_generator):
         context = FastForwardXmlFileContext(os.path.join(self.working_dir, 'aa.xml'),
@@ -200,6 +200,60 @@ class StepTests(PublisherBase):
         self.assertFalse(step.status_conduit.report_progress.called)
 
 
+@patch('pulp.plugins.util.publish_step.time.time')
+@patch('pulp.plugins.util.publish_step.resource.getrusage')
+class TestStepMetrics(unittest.TestCase):
+
+    def _usage(self, cpu, blocks_in, blocks_out):
+        return Mock(ru_utime=cpu / 2.0, ru_stime=cpu / 2.0, ru_inblock=blocks_in,
+                    ru_oublock=blocks_out)
+
+    def test_measure(self, mock_getrusage, mock_time):
+        mock_getrusage.side_effect = [self._usage(1.0, 10, 20), self._usage(3.0, 12, 30),
+                                      self._usage(4.0, 12, 30), self._usage(6.0, 13, 30)]
+        mock_time.side_effect = [100.0, 105.0, 200.0, 201.0]
+        metrics = publish_step.StepMetrics()
+
+        metrics.start()
+        metrics.stop()
+        metrics.start()
+        metrics.stop()
+
+        self.assertEqual(metrics.wall_time, 6.0)
+        self.assertEqual(metrics.cpu_time, 4.0)
+        self.assertEqual(metrics.bytes_read, 3 * 512)
+        self.assertEqual(metrics.bytes_written, 10 * 512)
+
+    def test_to_dict_running(self, mock_getrusage, mock_time):
+        mock_getrusage.side_effect = [self._usage(1.0, 0, 0), self._usage(2.0, 1, 1)]
+        mock_time.side_effect = [100.0, 102.0]
+        metrics = publish_step.StepMetrics()
+
+        metrics.start()
+
+        self.assertEqual(metrics.to_dict(), {
+            reporting_constants.METRICS_WALL_TIME_KEY: 2.0,
+            reporting_constants.METRICS_CPU_TIME_KEY: 1.0,
+            reporting_constants.METRICS_BYTES_READ_KEY: 512,
+            reporting_constants.METRICS_BYTES_WRITTEN_KEY: 512,
+        })
+
+    def test_process(self, mock_getrusage, mock_time):
+        """
+        Test that a step is measured while it processes, even if it fails.
+        """
+        mock_getrusage.return_value = self._usage(1.0, 0, 0)
+        mock_time.return_value = 100.0
+        step = publish_step.Step('foo_step', disable_reporting=True)
+        step.metrics = Mock()
+        step.process_main = Mock(side_effect=ValueError)
+
+        self.assertRaises(ValueError, step.process)
+
+        step.metrics.start.assert_called_once_with()
+        step.metrics.stop.assert_called_once_with()
+
+
 class TestStepProcessBlock(unittest.TestCase):
     def test_increments_progress(self):
         step = publish_step.Step('foo_step', disable_reporting=True)
@@ -352,7 +406,14 @@ class PluginStepTests(PluginBase):
             reporting_constants.PROGRESS_ITEMS_TOTAL_KEY: 2,
             reporting_constants.PROGRESS_DESCRIPTION_KEY: '',
             reporting_constants.PROGRESS_DETAILS_KEY: '',
-            reporting_constants.PROGRESS_STEP_UUID: step.uuid
+            reporting_constants.PROGRESS_STEP_UUID: step.uuid,
+            reporting_constants.PROGRESS_METRICS_KEY: {
+                reporting_constants.METRICS_WALL_TIME_KEY: 0.0,
+                reporting_constants.METRICS_CPU_TIME_KEY: 0.0,
+                reporting_constants.METRICS_BYTES_READ_KEY: 0,
+                reporting_constants.METRICS_BYTES_WRITTEN_KEY: 0,
+                reporting_constants.METRICS_ITEMS_PER_SECOND_KEY: None,
+            }
         }
 
         compare_dict(report[0], target_report)
@@ -377,11 +438,49 @@ class PluginStepTests(PluginBase):
             reporting_constants.PROGRESS_ITEMS_TOTAL_KEY: 2,
             reporting_constants.PROGRESS_DESCRIPTION_KEY: 'bar',
             reporting_constants.PROGRESS_DETAILS_KEY: '',
-            reporting_constants.PROGRESS_STEP_UUID: step.uuid
+            reporting_constants.PROGRESS_STEP_UUID: step.uuid,
+            reporting_constants.PROGRESS_METRICS_KEY: {
+                reporting_constants.METRICS_WALL_TIME_KEY: 0.0,
+                reporting_constants.METRICS_CPU_TIME_KEY: 0.0,
+                reporting_constants.METRICS_BYTES_READ_KEY: 0,
+                reporting_constants.METRICS_BYTES_WRITTEN_KEY: 0,
+                reporting_constants.METRICS_ITEMS_PER_SECOND_KEY: None,
+            }
         }
 
         compare_dict(report[0], target_report)
 
+    def test_get_progress_report_metrics(self):
+        """
+        Test that the metrics of a step include those of its children.
+        """
+        root = publish_step.PluginStep('root_step')
+        parent_step = publish_step.PluginStep('parent_step')
+        step = publish_step.PluginStep('foo_step')
+        root.add_child(parent_step)
+        parent_step.add_child(step)
+        parent_step.metrics.wall_time = 2.0
+        parent_step.metrics.cpu_time = 1.0
+        parent_step.metrics.bytes_written = 512
+        parent_step.progress_successes = 1
+        step.metrics.wall_time = 1.0
+        step.metrics.cpu_time = 0.5
+        step.metrics.bytes_read = 1024
+        step.progress_successes = 4
+
+        report = root.get_progress_report()
+
+        self.assertEqual(report[0][reporting_constants.PROGRESS_METRICS_KEY], {
+            reporting_constants.METRICS_WALL_TIME_KEY: 3.0,
+            reporting_constants.METRICS_CPU_TIME_KEY: 1.5,
+            reporting_constants.METRICS_BYTES_READ_KEY: 1024,
+            reporting_constants.METRICS_BYTES_WRITTEN_KEY: 512,
+            reporting_constants.METRICS_ITEMS_PER_SECOND_KEY: 0.5,
+        })
+        child_report = report[0][reporting_constants.PROGRESS_SUB_STEPS_KEY][0]
+        self.assertEqual(child_report[reporting_constants.PROGRESS_METRICS_KEY][
+            reporting_constants.METRICS_ITEMS_PER_SECOND_KEY], 4.0)
+
     def test_get_progress_report_summary(self):
         parent_step = publish_step.PluginStep('parent_step')
         step = publish_step.PluginStep('foo_step')
@@ -1217,7 +1316,7 @@ class TestSaveUnitsStep(unittest.TestCase):
         repo.repo_obj = model.Repository(repo_id=repo.id)
         step = publish_step.SaveUnitsStep('foo_type', repo=repo)
         step.finalize()
-        mock_repo_controller.rebuild_content_unit_counts.assert_called_once_with(repo.repo_obj)
+        self.assertFalse(mock_repo_controller.rebuild_content_unit_counts.called)
 
 
 class TestCreateManifestStep(unittest.TestCase):
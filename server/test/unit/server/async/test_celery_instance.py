@@ -14,6 +14,7 @@ from pulp.server.config import config, _default_values
 from pulp.server.constants import PULP_DJANGO_SETTINGS_MODULE
 from pulp.server.controllers.repository import queue_download_deferred
 from pulp.server.db.reaper import queue_reap_expired_documents
+from pulp.server.event.dispatch import deliver_events
 from pulp.server.maintenance.monthly import queue_monthly_maintenance
 
 
@@ -30,7 +31,7 @@ class TestCelerybeatSchedule(unittest.TestCase):
         """
         # Please read the docblock to this test if you find yourself needing to adjust this
         # assertion.
-        self.assertEqual(len(celery_instance.celery.conf['CELERYBEAT_SCHEDULE']), 3)
+        self.assertEqual(len(celery_instance.celery.conf['CELERYBEAT_SCHEDULE']), 4)
 
     def test_reap_expired_documents(self):
         """
@@ -70,6 +71,18 @@ class TestCelerybeatSchedule(unittest.TestCase):
             expected_download_deferred
         )
 
+    def test_deliver_events(self):
+        """
+        Make sure the event delivery Task is present and properly configured.
+        """
+        expected_deliver_events = {
+            'task': deliver_events.name,
+            'schedule': timedelta(seconds=config.getint('events', 'dispatch_interval')),
+            'args': tuple(),
+        }
+        self.assertEqual(celery_instance.celery.conf['CELERYBEAT_SCHEDULE']['deliver_events'],
+                         expected_deliver_events)
+
     def test_celery_conf_updated(self):
         """
         Make sure the Celery config was updated with our CELERYBEAT_SCHEDULE.
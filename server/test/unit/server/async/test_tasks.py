@@ -587,6 +587,22 @@ class TestTaskOnFailureHandler(ResourceReservationTests):
         self.assertFalse(mock_increment_failure.called)
 
 
+class TestHandleQueryProfile(unittest.TestCase):
+
+    @mock.patch('pulp.server.async.tasks.profiler.stop')
+    def test_profiled(self, mock_stop):
+        task_status = {}
+        tasks.Task()._handle_query_profile(task_status)
+        self.assertEqual(task_status['query_profile'], mock_stop.return_value.summary.return_value)
+
+    @mock.patch('pulp.server.async.tasks.profiler.stop')
+    def test_not_profiled(self, mock_stop):
+        mock_stop.return_value = None
+        task_status = {}
+        tasks.Task()._handle_query_profile(task_status)
+        self.assertEqual(task_status, {})
+
+
 class TestTaskApplyAsync(ResourceReservationTests):
 
     @mock.patch('celery.Task.apply_async')
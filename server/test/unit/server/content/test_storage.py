@@ -1,12 +1,17 @@
+import hashlib
 import os
+import shutil
+import tempfile
 
-from errno import EEXIST, EPERM
+from errno import EACCES, EEXIST, EOPNOTSUPP, EPERM, EXDEV
 from unittest import TestCase
 
 from mock import Mock, patch
 
 from pulp.plugins.util import verification
+from pulp.server.content import storage
 from pulp.server.content.storage import mkdir, ContentStorage, FileStorage, SharedStorage
+from pulp.server.util import InvalidChecksumType, TYPE_SHA256
 
 
 class TestMkdir(TestCase):
@@ -87,9 +92,9 @@ class TestFileStorage(TestCase):
     @patch('os.rename')
     @patch('os.close')
     @patch('pulp.server.content.storage.tempfile')
-    @patch('pulp.server.content.storage.shutil')
+    @patch('pulp.server.content.storage.FileStorage._place')
     @patch('pulp.server.content.storage.mkdir')
-    def test_put_file_correct_size(self, _mkdir, shutil, tempfile, close, rename):
+    def test_put_file_correct_size(self, _mkdir, _place, tempfile, close, rename):
         path_in = '/tmp/test'
         temp_destination = '/some/file/path'
         unit = Mock(id='123', storage_path='/tmp/storage')
@@ -103,7 +108,7 @@ class TestFileStorage(TestCase):
         _mkdir.assert_called_once_with(os.path.dirname(unit.storage_path))
         tempfile.mkstemp.assert_called_once_with(dir=os.path.dirname(unit.storage_path))
         close.assert_called_once_with('fd')
-        shutil.copy.assert_called_once_with(path_in, temp_destination)
+        _place.assert_called_once_with(path_in, temp_destination, False, None, None)
         unit.verify_size.assert_called_once_with(temp_destination)
         rename.assert_called_once_with(temp_destination, unit.storage_path)
 
@@ -111,9 +116,9 @@ class TestFileStorage(TestCase):
     @patch('os.remove')
     @patch('os.close')
     @patch('pulp.server.content.storage.tempfile')
-    @patch('pulp.server.content.storage.shutil')
+    @patch('pulp.server.content.storage.FileStorage._place')
     @patch('pulp.server.content.storage.mkdir')
-    def test_put_file_incorrect_size(self, _mkdir, shutil, tempfile, close, remove, rename):
+    def test_put_file_incorrect_size(self, _mkdir, _place, tempfile, close, remove, rename):
         path_in = '/tmp/test'
         temp_destination = '/some/file/path'
         unit = Mock(id='123', storage_path='/tmp/storage')
@@ -128,7 +133,7 @@ class TestFileStorage(TestCase):
         _mkdir.assert_called_once_with(os.path.dirname(unit.storage_path))
         tempfile.mkstemp.assert_called_once_with(dir=os.path.dirname(unit.storage_path))
         close.assert_called_once_with('fd')
-        shutil.copy.assert_called_once_with(path_in, temp_destination)
+        _place.assert_called_once_with(path_in, temp_destination, False, None, None)
         unit.verify_size.assert_called_once_with(temp_destination)
         remove.assert_called_once_with(temp_destination)
         self.assertFalse(rename.called)
@@ -137,9 +142,9 @@ class TestFileStorage(TestCase):
     @patch('os.remove')
     @patch('os.close')
     @patch('pulp.server.content.storage.tempfile')
-    @patch('pulp.server.content.storage.shutil')
+    @patch('pulp.server.content.storage.FileStorage._place')
     @patch('pulp.server.content.storage.mkdir')
-    def test_put_file_no_verify_size(self, _mkdir, shutil, tempfile, close, remove, rename):
+    def test_put_file_no_verify_size(self, _mkdir, _place, tempfile, close, remove, rename):
         path_in = '/tmp/test'
         temp_destination = '/some/file/path'
         unit = Mock(id='123', storage_path='/tmp/storage')
@@ -154,7 +159,7 @@ class TestFileStorage(TestCase):
         _mkdir.assert_called_once_with(os.path.dirname(unit.storage_path))
         tempfile.mkstemp.assert_called_once_with(dir=os.path.dirname(unit.storage_path))
         close.assert_called_once_with('fd')
-        shutil.copy.assert_called_once_with(path_in, temp_destination)
+        _place.assert_called_once_with(path_in, temp_destination, False, None, None)
         unit.verify_size.assert_called_once_with(temp_destination)
         self.assertFalse(remove.called)
         rename.assert_called_once_with(temp_destination, unit.storage_path)
@@ -162,9 +167,9 @@ class TestFileStorage(TestCase):
     @patch('os.rename')
     @patch('os.close')
     @patch('pulp.server.content.storage.tempfile')
-    @patch('pulp.server.content.storage.shutil')
+    @patch('pulp.server.content.storage.FileStorage._place')
     @patch('pulp.server.content.storage.mkdir')
-    def test_put_file_with_location(self, _mkdir, shutil, tempfile, close, rename):
+    def test_put_file_with_location(self, _mkdir, _place, tempfile, close, rename):
         path_in = '/tmp/test'
         location = '/a/b/'
         temp_destination = '/some/file/path'
@@ -178,13 +183,242 @@ class TestFileStorage(TestCase):
         # validation
         destination = os.path.join(unit.storage_path, location.lstrip('/'))
         _mkdir.assert_called_once_with(os.path.dirname(destination))
-        shutil.copy.assert_called_once_with(path_in, temp_destination)
+        _place.assert_called_once_with(path_in, temp_destination, False, None, None)
         rename.assert_called_once_with(temp_destination, destination)
 
+    @patch('os.rename')
+    @patch('os.remove')
+    @patch('os.path.lexists', Mock(return_value=True))
+    @patch('os.close', Mock())
+    @patch('pulp.server.content.storage.tempfile')
+    @patch('pulp.server.content.storage.FileStorage._place')
+    @patch('pulp.server.content.storage.mkdir', Mock())
+    def test_put_file_place_failed(self, _place, tempfile, remove, rename):
+        temp_destination = '/some/file/path'
+        unit = Mock(id='123', storage_path='/tmp/storage')
+        tempfile.mkstemp.return_value = ('fd', temp_destination)
+        _place.side_effect = verification.VerificationException(22)
+
+        # test
+        self.assertRaises(verification.VerificationException, FileStorage().put, unit, '/tmp/t')
+
+        # validation
+        self.assertFalse(unit.verify_size.called)
+        remove.assert_called_once_with(temp_destination)
+        self.assertFalse(rename.called)
+
+    @patch('os.rename', Mock())
+    @patch('os.close', Mock())
+    @patch('pulp.server.content.storage.tempfile')
+    @patch('pulp.server.content.storage.FileStorage._place')
+    @patch('pulp.server.content.storage.mkdir', Mock())
+    def test_put_file_options(self, _place, tempfile):
+        temp_destination = '/some/file/path'
+        unit = Mock(id='123', storage_path='/tmp/storage')
+        tempfile.mkstemp.return_value = ('fd', temp_destination)
+        _place.return_value = storage.COPY
+
+        # test
+        strategy = FileStorage().put(unit, '/tmp/t', move=True, checksum_type='sha256',
+                                     checksum='abc')
+
+        # validation
+        _place.assert_called_once_with('/tmp/t', temp_destination, True, 'sha256', 'abc')
+        self.assertEqual(strategy, _place.return_value)
+
     def test_get(self):
         storage = FileStorage()
         storage.get(None)  # just for coverage
 
+    @patch('pulp.server.content.storage.config')
+    def test_in_working_directory(self, config):
+        config.get.return_value = '/var/cache/pulp/'
+
+        self.assertTrue(FileStorage._in_working_directory('/var/cache/pulp/worker/task/a.rpm'))
+        self.assertFalse(FileStorage._in_working_directory('/var/cache/pulp-other/a.rpm'))
+        self.assertFalse(FileStorage._in_working_directory('/home/user/a.rpm'))
+        config.get.assert_called_with('server', 'working_directory')
+
+
+@patch('pulp.server.content.storage.selinux')
+class TestFileStoragePut(TestCase):
+
+    CONTENT = 'pulp content\n' * 100
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.working_dir = os.path.join(self.tmp_dir, 'working')
+        os.mkdir(self.working_dir)
+        self.path = os.path.join(self.working_dir, 'source')
+        with open(self.path, 'w') as fp:
+            fp.write(self.CONTENT)
+        self.unit = Mock(spec=['storage_path'],
+                         storage_path=os.path.join(self.tmp_dir, 'storage', 'unit'))
+        self.checksum = hashlib.sha256(self.CONTENT).hexdigest()
+        patcher = patch('pulp.server.content.storage.config')
+        config = patcher.start()
+        config.get.return_value = self.working_dir
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hardlink_checksum(self, selinux):
+        selinux.is_selinux_enabled.return_value = True
+
+        strategy = FileStorage().put(self.unit, self.path, checksum_type=TYPE_SHA256,
+                                     checksum=self.checksum)
+
+        self.assertEqual(strategy, storage.HARDLINK)
+        self.assertEqual(os.stat(self.path).st_ino, os.stat(self.unit.storage_path).st_ino)
+        selinux.restorecon.assert_called_once_with(self.unit.storage_path)
+
+    def test_hardlink_checksum_mismatch(self, selinux):
+        self.assertRaises(verification.VerificationException, FileStorage().put, self.unit,
+                          self.path, checksum_type=TYPE_SHA256, checksum='abc')
+
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(os.listdir(os.path.dirname(self.unit.storage_path)), [])
+
+    def test_rename_checksum_mismatch(self, selinux):
+        self.assertRaises(verification.VerificationException, FileStorage().put, self.unit,
+                          self.path, move=True, checksum_type=TYPE_SHA256, checksum='abc')
+
+        self.assertEqual(os.listdir(os.path.dirname(self.unit.storage_path)), [])
+
+    def test_rename_restores_context(self, selinux):
+        selinux.is_selinux_enabled.return_value = True
+
+        strategy = FileStorage().put(self.unit, self.path, move=True)
+
+        self.assertEqual(strategy, storage.RENAME)
+        self.assertFalse(os.path.exists(self.path))
+        selinux.restorecon.assert_called_once_with(self.unit.storage_path)
+
+    def test_selinux_disabled(self, selinux):
+        selinux.is_selinux_enabled.return_value = False
+
+        FileStorage().put(self.unit, self.path, move=True)
+
+        self.assertFalse(selinux.restorecon.called)
+
+    @patch('fcntl.ioctl', Mock(side_effect=IOError(EOPNOTSUPP, 'unsupported')))
+    def test_copy_outside_working_directory(self, selinux):
+        selinux.is_selinux_enabled.return_value = True
+        path = os.path.join(self.tmp_dir, 'source')
+        shutil.copy(self.path, path)
+
+        strategy = FileStorage().put(self.unit, path, checksum_type=TYPE_SHA256,
+                                     checksum=self.checksum)
+
+        self.assertEqual(strategy, storage.COPY)
+        self.assertNotEqual(os.stat(path).st_ino, os.stat(self.unit.storage_path).st_ino)
+        self.assertFalse(selinux.restorecon.called)
+
+
+class TestFileStoragePlace(TestCase):
+
+    CONTENT = 'pulp content\n' * 100
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'source')
+        with open(self.path, 'w') as fp:
+            fp.write(self.CONTENT)
+        fd, self.temp_destination = tempfile.mkstemp(dir=self.tmp_dir)
+        os.close(fd)
+        self.storage = FileStorage()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def read_destination(self):
+        with open(self.temp_destination) as fp:
+            return fp.read()
+
+    def test_rename(self):
+        strategy = self.storage._place(self.path, self.temp_destination, True, None, None)
+
+        self.assertEqual(strategy, storage.RENAME)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(self.read_destination(), self.CONTENT)
+
+    @patch('pulp.server.content.storage.FileStorage._in_working_directory', Mock(return_value=True))
+    def test_hardlink(self):
+        strategy = self.storage._place(self.path, self.temp_destination, False, None, None)
+
+        self.assertEqual(strategy, storage.HARDLINK)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(os.stat(self.path).st_ino, os.stat(self.temp_destination).st_ino)
+
+    @patch('pulp.server.content.storage.FileStorage._in_working_directory',
+           Mock(return_value=False))
+    @patch('os.link')
+    @patch('fcntl.ioctl', Mock(side_effect=IOError(EOPNOTSUPP, 'unsupported')))
+    def test_no_hardlink_outside_working_directory(self, link):
+        strategy = self.storage._place(self.path, self.temp_destination, False, None, None)
+
+        self.assertEqual(strategy, storage.COPY)
+        self.assertFalse(link.called)
+        self.assertEqual(self.read_destination(), self.CONTENT)
+
+    @patch('os.rename', Mock(side_effect=OSError(EXDEV, 'cross-device')))
+    @patch('os.link', Mock(side_effect=OSError(EXDEV, 'cross-device')))
+    def test_rename_falls_back(self):
+        with patch('fcntl.ioctl', Mock(side_effect=IOError(EOPNOTSUPP, 'unsupported'))):
+            strategy = self.storage._place(self.path, self.temp_destination, True, None, None)
+
+        self.assertEqual(strategy, storage.COPY)
+        self.assertTrue(os.path.exists(self.path))
+        self.assertEqual(self.read_destination(), self.CONTENT)
+
+    @patch('os.link', Mock(side_effect=OSError(EXDEV, 'cross-device')))
+    @patch('fcntl.ioctl')
+    def test_reflink(self, ioctl):
+        strategy = self.storage._place(self.path, self.temp_destination, False, None, None)
+
+        self.assertEqual(strategy, storage.REFLINK)
+        self.assertEqual(ioctl.call_args[0][1], storage.FICLONE)
+
+    @patch('pulp.server.content.storage.FileStorage._in_working_directory', Mock(return_value=True))
+    @patch('os.link', Mock(side_effect=OSError(EACCES, 'denied')))
+    def test_unexpected_error(self):
+        self.assertRaises(OSError, self.storage._place, self.path, self.temp_destination, False,
+                          None, None)
+
+    @patch('os.link', Mock(side_effect=OSError(EXDEV, 'cross-device')))
+    @patch('fcntl.ioctl', Mock(side_effect=IOError(EOPNOTSUPP, 'unsupported')))
+    def test_copy_checksum(self):
+        checksum = hashlib.sha256(self.CONTENT).hexdigest()
+
+        strategy = self.storage._place(self.path, self.temp_destination, False, TYPE_SHA256,
+                                       checksum)
+
+        self.assertEqual(strategy, storage.COPY)
+        self.assertEqual(self.read_destination(), self.CONTENT)
+
+    @patch('os.link', Mock(side_effect=OSError(EXDEV, 'cross-device')))
+    @patch('fcntl.ioctl', Mock(side_effect=IOError(EOPNOTSUPP, 'unsupported')))
+    def test_copy_checksum_mismatch(self):
+        self.assertRaises(verification.VerificationException, self.storage._place, self.path,
+                          self.temp_destination, False, TYPE_SHA256, 'abc')
+
+    @patch('os.link', Mock(side_effect=OSError(EXDEV, 'cross-device')))
+    @patch('fcntl.ioctl', Mock(side_effect=IOError(EOPNOTSUPP, 'unsupported')))
+    def test_copy_invalid_checksum_type(self):
+        self.assertRaises(InvalidChecksumType, self.storage._place, self.path,
+                          self.temp_destination, False, 'sha3000', 'abc')
+
+    def test_copy_size_mismatch(self):
+        source = Mock()
+        source.read.side_effect = ['abc', '']
+        target = Mock()
+
+        with patch('os.fstat', Mock(return_value=Mock(st_size=4))):
+            self.assertRaises(verification.VerificationException, FileStorage._copy, source,
+                              target, None, None)
+        target.write.assert_called_once_with('abc')
+
 
 class TestSharedStorage(TestCase):
 
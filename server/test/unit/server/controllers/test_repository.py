@@ -6,8 +6,9 @@ from mock import call, Mock, MagicMock, patch
 import mock
 import mongoengine
 
-from pulp.common import dateutils, error_codes
+from pulp.common import dateutils, error_codes, tags
 from pulp.common.compat import unittest
+from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import exceptions as plugin_exceptions
 from pulp.plugins.model import PublishReport
 from pulp.server.controllers import repository as repo_controller
@@ -326,8 +327,8 @@ class UpdateRepoUnitCountsTests(unittest.TestCase):
         """
         mock_get_db.return_value.repo_content_units.aggregate.return_value = \
             [{'_id': 'type_1', 'sum': 5}, {'_id': 'type_2', 'sum': 3}]
-        repo = MagicMock(repo_id='foo')
-        repo_controller.rebuild_content_unit_counts(repo)
+        repo = MagicMock(repo_id='foo', content_unit_counts={})
+        drift = repo_controller.rebuild_content_unit_counts(repo)
 
         expected_pipeline = [
             {'$match': {'repo_id': 'foo'}},
@@ -337,15 +338,76 @@ class UpdateRepoUnitCountsTests(unittest.TestCase):
             pipeline=expected_pipeline
         )
         self.assertDictEqual(repo.content_unit_counts, {'type_1': 5, 'type_2': 3})
+        self.assertDictEqual(drift, {'type_1': 5, 'type_2': 3})
         repo.save.assert_called_once_with()
 
+    @patch('pulp.server.controllers.repository._logger')
+    @patch('pulp.server.controllers.repository.connection.get_database')
+    def test_reports_drift(self, mock_get_db, mock_logger):
+        """
+        Test that the difference from the recorded counts is returned and logged.
+        """
+        mock_get_db.return_value.repo_content_units.aggregate.return_value = \
+            [{'_id': 'type_1', 'sum': 5}, {'_id': 'type_2', 'sum': 3}]
+        repo = MagicMock(repo_id='foo',
+                         content_unit_counts={'type_1': 5, 'type_2': 4, 'type_3': 1})
+
+        drift = repo_controller.rebuild_content_unit_counts(repo)
+
+        self.assertDictEqual(drift, {'type_2': -1, 'type_3': -1})
+        self.assertEqual(mock_logger.warning.call_count, 1)
+        self.assertDictEqual(repo.content_unit_counts, {'type_1': 5, 'type_2': 3})
+        repo.save.assert_called_once_with()
+
+    @patch('pulp.server.controllers.repository._logger')
+    @patch('pulp.server.controllers.repository.connection.get_database')
+    def test_correct_counts(self, mock_get_db, mock_logger):
+        """
+        Test that the repository is not saved when the counts are correct.
+        """
+        mock_get_db.return_value.repo_content_units.aggregate.return_value = \
+            [{'_id': 'type_1', 'sum': 5}]
+        repo = MagicMock(repo_id='foo', content_unit_counts={'type_1': 5})
+
+        drift = repo_controller.rebuild_content_unit_counts(repo)
+
+        self.assertDictEqual(drift, {})
+        self.assertFalse(mock_logger.warning.called)
+        self.assertFalse(repo.save.called)
 
+
+class TestVerifyContentUnitCounts(unittest.TestCase):
+
+    @patch('pulp.server.controllers.repository.rebuild_content_unit_counts')
+    @patch('pulp.server.controllers.repository.model.Repository.objects')
+    def test_verify(self, m_repo_objects, mock_rebuild):
+        drift = repo_controller.verify_content_unit_counts('foo')
+
+        m_repo_objects.get_repo_or_missing_resource.assert_called_once_with('foo')
+        mock_rebuild.assert_called_once_with(
+            m_repo_objects.get_repo_or_missing_resource.return_value)
+        self.assertTrue(drift is mock_rebuild.return_value)
+
+    @patch('pulp.server.controllers.repository.verify_content_unit_counts')
+    def test_queue(self, mock_verify):
+        result = repo_controller.queue_verify_content_unit_counts('foo')
+
+        mock_verify.apply_async_with_reservation.assert_called_once_with(
+            tags.RESOURCE_REPOSITORY_TYPE, 'foo', ['foo'],
+            tags=[tags.resource_tag(tags.RESOURCE_REPOSITORY_TYPE, 'foo'),
+                  tags.action_tag('verify_content_unit_counts')])
+        self.assertTrue(result is mock_verify.apply_async_with_reservation.return_value)
+
+
+@patch('pulp.server.controllers.repository.update_unit_count')
 class AssociateSingleUnitTests(unittest.TestCase):
 
     @patch('pulp.server.controllers.repository.model.RepositoryContentUnit.objects')
     @patch('pulp.server.controllers.repository.dateutils.format_iso8601_utc_timestamp')
-    def test_unit_association(self, mock_get_timestamp, mock_rcu_objects):
+    def test_unit_association(self, mock_get_timestamp, mock_rcu_objects, mock_update_count):
         mock_get_timestamp.return_value = 'foo_tstamp'
+        modify = mock_rcu_objects.return_value.only.return_value.modify
+        modify.return_value = None
         test_unit = DemoModel(id='bar', key_field='baz')
         repo = MagicMock(repo_id='foo')
         repo_controller.associate_single_unit(repo, test_unit)
@@ -354,25 +416,64 @@ class AssociateSingleUnitTests(unittest.TestCase):
             unit_id='bar',
             unit_type_id=DemoModel._content_type_id.default
         )
-        mock_rcu_objects.return_value.update_one.assert_called_once_with(
+        modify.assert_called_once_with(
             set_on_insert__created='foo_tstamp',
             set__updated='foo_tstamp',
             upsert=True)
+        mock_update_count.assert_called_once_with('foo', DemoModel._content_type_id.default, 1)
+
+    @patch('pulp.server.controllers.repository.update_content_revision')
+    @patch('pulp.server.controllers.repository.model.RepositoryContentUnit.objects')
+    def test_existing_association_unchanged(self, mock_rcu_objects, mock_update_revision,
+                                            mock_update_count):
+        """
+        Test that associating a unit again that has not changed since it was associated leaves
+        the unit counts and the content revision of the repository alone.
+        """
+        modify = mock_rcu_objects.return_value.only.return_value.modify
+        modify.return_value = Mock(updated='2016-01-01T00:00:10Z')
+        test_unit = DemoModel(id='bar', key_field='baz')
+        test_unit._last_updated = 1451606405
+        repo_controller.associate_single_unit(MagicMock(repo_id='foo'), test_unit)
+        self.assertFalse(mock_update_count.called)
+        self.assertFalse(mock_update_revision.called)
+
+    @patch('pulp.server.controllers.repository.update_content_revision')
+    @patch('pulp.server.controllers.repository.model.RepositoryContentUnit.objects')
+    def test_existing_association_unit_changed(self, mock_rcu_objects, mock_update_revision,
+                                               mock_update_count):
+        """
+        Test that the unit is not counted again when it was already associated, but that the
+        content revision of the repository changes when the unit was saved since.
+        """
+        modify = mock_rcu_objects.return_value.only.return_value.modify
+        modify.return_value = Mock(updated='2016-01-01T00:00:10Z')
+        test_unit = DemoModel(id='bar', key_field='baz')
+        test_unit._last_updated = 1451606420
+        repo_controller.associate_single_unit(MagicMock(repo_id='foo'), test_unit)
+        self.assertFalse(mock_update_count.called)
+        mock_update_revision.assert_called_once_with('foo')
 
 
 class TestDisassociateUnits(unittest.TestCase):
+    @patch('pulp.server.controllers.repository.update_unit_count')
     @patch('pulp.server.controllers.repository.update_last_unit_removed')
     @patch('pulp.server.controllers.repository.model.RepositoryContentUnit.objects')
-    def test_disassociate_units(self, m_rcu_objects, m_update_last_unit_removed):
+    def test_disassociate_units(self, m_rcu_objects, m_update_last_unit_removed,
+                                m_update_unit_count):
         """"
         Test that multiple objects are all deleted and timestamp for units removal updated
         """
+        m_rcu_objects.return_value.delete.return_value = 2
         test_unit1 = DemoModel(id='bar', key_field='baz')
         test_unit2 = DemoModel(id='baz', key_field='baz')
         repo = MagicMock(repo_id='foo')
         repo_controller.disassociate_units(repo, [test_unit1, test_unit2])
-        m_rcu_objects.assert_called_once_with(repo_id='foo', unit_id__in=['bar', 'baz'])
-        m_rcu_objects.return_value.delete.assert_called_once()
+        m_rcu_objects.assert_called_once_with(repo_id='foo',
+                                              unit_type_id=DemoModel._content_type_id.default,
+                                              unit_id__in=['bar', 'baz'])
+        m_rcu_objects.return_value.delete.assert_called_once_with()
+        m_update_unit_count.assert_called_once_with('foo', DemoModel._content_type_id.default, -2)
         m_update_last_unit_removed.assert_called_once_with('foo')
 
     @patch('pulp.server.controllers.repository.update_last_unit_removed')
@@ -791,10 +892,20 @@ class TestUpdateLastUnitAdded(unittest.TestCase):
         """
         Ensure that the last_unit_added field is correctly updated.
         """
-        m_repo = m_repo_qs.get_repo_or_missing_resource.return_value
         repo_controller.update_last_unit_added('m_repo')
-        self.assertEqual(m_repo.last_unit_added, mock_date.now_utc_datetime_with_tzinfo())
-        m_repo.save.assert_called_once_with()
+        m_repo_qs.assert_called_once_with(repo_id='m_repo')
+        m_repo_qs.return_value.update_one.assert_called_once_with(
+            set__last_unit_added=mock_date.now_utc_datetime_with_tzinfo(),
+            inc__content_revision=1)
+
+    @mock.patch('pulp.server.controllers.repository.model.Repository.objects')
+    def test_update_last_unit_added_missing(self, m_repo_qs):
+        """
+        Ensure that MissingResource is raised when the repository does not exist.
+        """
+        m_repo_qs.return_value.update_one.return_value = 0
+        self.assertRaises(pulp_exceptions.MissingResource,
+                          repo_controller.update_last_unit_added, 'm_repo')
 
 
 class TestUpdateLastUnitAddedForUnit(unittest.TestCase):
@@ -823,7 +934,7 @@ class TestUpdateLastUnitAddedForUnit(unittest.TestCase):
 
         # ...and then updated them
         m_repo_qs.return_value.update.assert_called_once_with(
-            last_unit_added=mock_date.now_utc_datetime_with_tzinfo())
+            last_unit_added=mock_date.now_utc_datetime_with_tzinfo(), inc__content_revision=1)
 
 
 class TestUpdateLastUnitRemoved(unittest.TestCase):
@@ -837,10 +948,11 @@ class TestUpdateLastUnitRemoved(unittest.TestCase):
         """
         Ensure that the last_unit_removed field is correctly updated.
         """
-        m_repo = m_repo_qs.get_repo_or_missing_resource.return_value
         repo_controller.update_last_unit_removed('m_repo')
-        self.assertEqual(m_repo.last_unit_removed, mock_date.now_utc_datetime_with_tzinfo())
-        m_repo.save.assert_called_once_with()
+        m_repo_qs.assert_called_once_with(repo_id='m_repo')
+        m_repo_qs.return_value.update_one.assert_called_once_with(
+            set__last_unit_removed=mock_date.now_utc_datetime_with_tzinfo(),
+            inc__content_revision=1)
 
 
 class TestCheckPerformFullSync(unittest.TestCase):
@@ -1058,8 +1170,8 @@ class TestSync(unittest.TestCase):
         sync_func.assert_called_once_with(m_repo.to_transfer_repo(), mock_conduit(),
                                           mock_plug_conf())
 
-        # It is now platform's responsiblity to update plugin content unit counts
-        self.assertTrue(mock_rebuild.called, "rebuild_content_unit_counts must be called")
+        # The content unit counts are updated as units are associated, not rebuilt
+        self.assertFalse(mock_rebuild.called)
 
     @mock.patch('pulp.server.controllers.repository._queue_auto_publish_tasks')
     @mock.patch('pulp.server.controllers.repository.TaskResult')
@@ -1102,8 +1214,8 @@ class TestSync(unittest.TestCase):
         mock_fire_man.fire_repo_sync_finished.assert_called_once_with(mock_result.expected_result())
         self.assertTrue(actual_result is m_task_result.return_value)
 
-        # It is now platform's responsiblity to update plugin content unit counts
-        self.assertTrue(mock_rebuild.called, "rebuild_content_unit_counts must be called")
+        # The content unit counts are updated as units are associated, not rebuilt
+        self.assertFalse(mock_rebuild.called)
 
     @mock.patch('pulp.server.controllers.repository._queue_auto_publish_tasks')
     @mock.patch('pulp.server.controllers.repository.TaskResult')
@@ -1149,8 +1261,8 @@ class TestSync(unittest.TestCase):
         self.assertEqual(mock_imp_inst.id, mock_conduit.call_args_list[0][0][2])
         self.assertTrue(actual_result is m_task_result.return_value)
 
-        # It is now platform's responsiblity to update plugin content unit counts
-        self.assertTrue(mock_rebuild.called, "rebuild_content_unit_counts must be called")
+        # The content unit counts are updated as units are associated, not rebuilt
+        self.assertFalse(mock_rebuild.called)
 
     @mock.patch('pulp.server.controllers.repository.TaskResult')
     def test_sync_failed(self, m_task_result, m_model, mock_plugin_api, mock_plug_conf,
@@ -1192,8 +1304,8 @@ class TestSync(unittest.TestCase):
         mock_result.get_collection().save.assert_called_once_with(mock_result.expected_result())
         mock_fire_man.fire_repo_sync_finished.assert_called_once_with(mock_result.expected_result())
 
-        # It is now platform's responsiblity to update plugin content unit counts
-        self.assertTrue(mock_rebuild.called, "rebuild_content_unit_counts must be called")
+        # The content unit counts are updated as units are associated, not rebuilt
+        self.assertFalse(mock_rebuild.called)
 
     @mock.patch('pulp.server.controllers.repository._queue_auto_publish_tasks')
     @mock.patch('pulp.server.controllers.repository._')
@@ -1227,8 +1339,8 @@ class TestSync(unittest.TestCase):
         mock_fire_man.fire_repo_sync_finished.assert_called_once_with(mock_result.expected_result())
         self.assertTrue(result is m_task_result.return_value)
 
-        # It is now platform's responsiblity to update plugin content unit counts
-        self.assertTrue(mock_rebuild.called, "rebuild_content_unit_counts must be called")
+        # The content unit counts are updated as units are associated, not rebuilt
+        self.assertFalse(mock_rebuild.called)
 
 
 @mock.patch('pulp.server.controllers.repository.model.Distributor.objects')
@@ -1302,6 +1414,7 @@ class TestCheckPublish(unittest.TestCase):
         Test that publish is no op when there were no changes made since last publish.
         """
         mock_call_conf.get.return_value = False
+        mock_call_conf.repo_plugin_config = {}
         mock_call_conf.override_config = {}
         fake_repo = model.Repository(repo_id='repo1')
         mock_objects.return_value.count.return_value = 0
@@ -1309,11 +1422,14 @@ class TestCheckPublish(unittest.TestCase):
         m_dist = m_dist_qs.get_or_404.return_value
         m_dist.last_updated = None
         m_dist.last_override_config = {}
+        m_dist.last_published_revision = None
 
         result = repo_controller.check_publish(fake_repo, 'dist', mock_inst,
                                                fake_repo.to_transfer_repo(), mock_conduit,
                                                mock_call_conf)
-        m_dist_qs.return_value.update.assert_called_once_with(set__last_publish=mock_now())
+        m_dist_qs.return_value.update.assert_called_once_with(
+            set__last_publish=mock_now(), set__last_published_revision=0,
+            set__last_published_config_hash=repo_controller._publish_config_hash(mock_call_conf))
         m_repo_pub_result.skipped_result.assert_called_once_with(
             fake_repo.repo_id, m_dist.distributor_id, m_dist.distributor_type_id, mock_now(),
             mock_now(), m_repo_pub_result.RESULT_SKIPPED, 'Repository content has not changed '
@@ -1336,6 +1452,7 @@ class TestCheckPublish(unittest.TestCase):
         unit_added = dateutils.ensure_tz(dateutils.parse_iso8601_datetime('2020-12-25T01:00'))
 
         mock_call_conf.get.return_value = False
+        mock_call_conf.repo_plugin_config = {}
         mock_call_conf.override_config = {}
         fake_repo = model.Repository(repo_id='repo1', last_unit_added=unit_added)
         mock_transfer = fake_repo.to_transfer_repo()
@@ -1345,6 +1462,7 @@ class TestCheckPublish(unittest.TestCase):
         m_dist = m_dist_qs.get_or_404.return_value
         m_dist.last_updated = dist_updated
         m_dist.last_override_config = {}
+        m_dist.last_published_revision = None
 
         result = repo_controller.check_publish(fake_repo, 'dist', mock_inst,
                                                mock_transfer, mock_conduit,
@@ -1361,12 +1479,15 @@ class TestCheckPublish(unittest.TestCase):
         since last publish.
         """
         mock_call_conf.get.side_effect = [True, None]
+        mock_call_conf.repo_plugin_config = {}
+        mock_call_conf.override_config = {}
         fake_repo = model.Repository(repo_id='repo1')
         mock_transfer = fake_repo.to_transfer_repo()
         mock_objects.return_value.count.return_value = 0
         mock_inst = mock.MagicMock()
         m_dist = m_dist_qs.get_or_404.return_value
         m_dist.last_updated = None
+        m_dist.last_published_revision = None
 
         repo_controller.check_publish(fake_repo, 'dist', mock_inst, mock_transfer,
                                       mock_conduit, mock_call_conf)
@@ -1375,6 +1496,54 @@ class TestCheckPublish(unittest.TestCase):
         mock_do_pub.assert_called_once_with(fake_repo, 'dist', mock_inst, mock_transfer,
                                             mock_conduit, mock_call_conf)
 
+    def _check_revision_publish(self, m_dist_qs, mock_conduit, mock_objects, content_revision,
+                                config):
+        """
+        Check a publish by a distributor that last published revision 3 of the repository with an
+        empty configuration.
+        """
+        call_config = PluginCallConfiguration({}, config)
+        fake_repo = model.Repository(repo_id='repo1', content_revision=content_revision)
+        mock_conduit.last_publish.return_value = dateutils.now_utc_datetime_with_tzinfo()
+        m_dist = m_dist_qs.get_or_404.return_value
+        m_dist.last_override_config = {}
+        m_dist.last_published_revision = 3
+        m_dist.last_published_config_hash = repo_controller._publish_config_hash(
+            PluginCallConfiguration({}, {}))
+        repo_controller.check_publish(fake_repo, 'dist', mock.MagicMock(),
+                                      fake_repo.to_transfer_repo(), mock_conduit, call_config)
+        # the timestamps of the units are not consulted
+        self.assertFalse(mock_objects.called)
+
+    def test_revision_unchanged(self, m_dist_qs, m_repo_pub_result, mock_call_conf, mock_conduit,
+                                mock_objects, mock_do_pub, mock_date, mock_now, mock_log):
+        """
+        Test that publish is skipped when the published revision and config are current.
+        """
+        self._check_revision_publish(m_dist_qs, mock_conduit, mock_objects, 3, {})
+        self.assertTrue(m_repo_pub_result.skipped_result.called)
+        self.assertFalse(mock_do_pub.called)
+
+    def test_revision_changed(self, m_dist_qs, m_repo_pub_result, mock_call_conf, mock_conduit,
+                              mock_objects, mock_do_pub, mock_date, mock_now, mock_log):
+        """
+        Test that publish occurs when the content revision has changed since the last publish.
+        """
+        self._check_revision_publish(m_dist_qs, mock_conduit, mock_objects, 4, {})
+        self.assertFalse(m_repo_pub_result.skipped_result.called)
+        self.assertTrue(mock_do_pub.called)
+
+    def test_revision_config_changed(self, m_dist_qs, m_repo_pub_result, mock_call_conf,
+                                     mock_conduit, mock_objects, mock_do_pub, mock_date, mock_now,
+                                     mock_log):
+        """
+        Test that publish occurs when the config has changed since the last publish.
+        """
+        self._check_revision_publish(m_dist_qs, mock_conduit, mock_objects, 3,
+                                     {'relative_url': 'other'})
+        self.assertFalse(m_repo_pub_result.skipped_result.called)
+        self.assertTrue(mock_do_pub.called)
+
 
 @mock.patch('pulp.server.controllers.repository._')
 @mock.patch('pulp.server.controllers.repository._logger')
@@ -1425,14 +1594,17 @@ class TestDoPublish(unittest.TestCase):
         """
         fake_report = PublishReport(success_flag=True, summary='summary', details='details')
         mock_sig_handler.return_value.return_value = fake_report
-        fake_repo = model.Repository(repo_id='repo1')
+        fake_repo = model.Repository(repo_id='repo1', content_revision=7)
         mock_inst = mock.MagicMock()
         m_dist = m_dist_qs.get_or_404.return_value
+        call_config = PluginCallConfiguration({}, {'a': 1}, {'b': 2})
 
         result = repo_controller._do_publish(fake_repo, 'dist', mock_inst,
                                              fake_repo.to_transfer_repo(), 'conduit',
-                                             'conf')
-        m_dist_qs.return_value.update.assert_called_once_with(set__last_publish=mock_now())
+                                             call_config)
+        m_dist_qs.return_value.update.assert_called_once_with(
+            set__last_publish=mock_now(), set__last_published_revision=7,
+            set__last_published_config_hash=repo_controller._publish_config_hash(call_config))
         m_repo_pub_result.expected_result.assert_called_once_with(
             fake_repo.repo_id, m_dist.distributor_id, m_dist.distributor_type_id, mock_now(),
             mock_now(), 'summary', 'details', m_repo_pub_result.RESULT_SUCCESS
@@ -1610,11 +1782,27 @@ class TestUpdateUnitCount(unittest.TestCase):
     @mock.patch('pulp.server.controllers.repository.model.Repository.objects')
     def test_update_unit_count(self, m_repo_qs):
         """
-        Make sure the correct mongoengine key is used.
+        Make sure the correct mongoengine key is used and the content revision is incremented.
         """
         repo_controller.update_unit_count('m_repo', 'mock_type', 2)
         expected_key = 'inc__content_unit_counts__mock_type'
-        m_repo_qs().update_one.assert_called_once_with(**{expected_key: 2})
+        m_repo_qs().update_one.assert_called_once_with(**{expected_key: 2,
+                                                          'inc__content_revision': 1})
+
+    @mock.patch('pulp.server.controllers.repository.model.Repository.objects')
+    def test_update_unit_count_removed(self, m_repo_qs):
+        """
+        Make sure the count of a type is removed once its last unit is removed.
+        """
+        repo_controller.update_unit_count('m_repo', 'mock_type', -2)
+        self.assertEqual(m_repo_qs.call_args_list[0][1], {'repo_id': 'm_repo'})
+        self.assertEqual(m_repo_qs.call_args_list[1][1],
+                         {'repo_id': 'm_repo', 'content_unit_counts__mock_type__lte': 0})
+        self.assertEqual(m_repo_qs.return_value.update_one.call_args_list[0][1],
+                         {'inc__content_unit_counts__mock_type': -2,
+                          'inc__content_revision': 1})
+        self.assertEqual(m_repo_qs.return_value.update_one.call_args_list[1][1],
+                         {'unset__content_unit_counts__mock_type': True})
 
     @mock.patch('pulp.server.controllers.repository.model.Repository.objects')
     def test_update_unit_count_errror(self, m_repo_qs):
@@ -1625,7 +1813,8 @@ class TestUpdateUnitCount(unittest.TestCase):
         self.assertRaises(pulp_exceptions.PulpExecutionException, repo_controller.update_unit_count,
                           'm_repo', 'mock_type', 2)
         expected_key = 'inc__content_unit_counts__mock_type'
-        m_repo_qs().update_one.assert_called_once_with(**{expected_key: 2})
+        m_repo_qs().update_one.assert_called_once_with(**{expected_key: 2,
+                                                          'inc__content_revision': 1})
 
 
 class TestGetImporterById(unittest.TestCase):
@@ -1739,42 +1928,149 @@ class TestDownloadRepo(unittest.TestCase):
 
     @patch(MODULE + 'LazyUnitDownloadStep')
     @patch(MODULE + '_create_download_requests')
-    @patch(MODULE + 'find_units_not_downloaded')
-    def test_download_repo_no_verify(self, mock_missing_units, mock_create_requests, mock_step):
+    @patch(MODULE + '_find_units_to_download')
+    def test_download_repo_no_verify(self, mock_find_units, mock_create_requests, mock_step):
         """Assert the download step is initialized and called with missing units."""
         repo_controller.download_repo('fake-id')
-        mock_missing_units.assert_called_once_with('fake-id')
-        mock_create_requests.assert_called_once_with(mock_missing_units.return_value)
+        mock_find_units.assert_called_once_with('fake-id', False)
+        mock_create_requests.assert_called_once_with(mock_find_units.return_value)
         mock_step.return_value.start.assert_called_once_with()
 
     @patch(MODULE + 'LazyUnitDownloadStep')
     @patch(MODULE + '_create_download_requests')
-    @patch(MODULE + 'get_mongoengine_unit_querysets')
-    def test_download_repo_verify(self, mock_units_qs, mock_create_requests, mock_step):
+    @patch(MODULE + '_find_units_to_download')
+    def test_download_repo_verify(self, mock_find_units, mock_create_requests, mock_step):
         """Assert the download step is initialized and called with all units."""
-        mock_units_qs.return_value = [['some'], ['lists']]
         repo_controller.download_repo('fake-id', verify_all_units=True)
-        mock_units_qs.assert_called_once_with('fake-id')
-        self.assertEqual(list(mock_create_requests.call_args[0][0]), ['some', 'lists'])
+        mock_find_units.assert_called_once_with('fake-id', True)
+        mock_create_requests.assert_called_once_with(mock_find_units.return_value)
         mock_step.return_value.start.assert_called_once_with()
 
 
+class TestFindUnitsToDownload(unittest.TestCase):
+
+    def setUp(self):
+        file_unit = type('FileContentUnit', (object,), {})
+        patcher = patch(MODULE + 'model.FileContentUnit', file_unit)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.file_model = type('FileModel', (file_unit,), {'objects': MagicMock(),
+                                                           '_content_type_id': Mock()})
+        self.other_model = type('OtherModel', (object,), {'objects': MagicMock(),
+                                                          '_content_type_id': Mock()})
+
+    @patch(MODULE + '_paginate_by_id')
+    @patch(MODULE + 'model.RepositoryContentUnit')
+    @patch(MODULE + 'get_repo_unit_models')
+    def test_not_downloaded(self, mock_models, mock_rcu, mock_paginate):
+        """Assert only file units that are not downloaded are found, a page at a time."""
+        mock_models.return_value = [self.file_model, self.other_model]
+        mock_paginate.return_value = [[Mock(unit_id='a'), Mock(unit_id='b')], [Mock(unit_id='c')]]
+        units_qs = self.file_model.objects.return_value
+        units_qs.side_effect = [['unit-a', 'unit-b'], ['unit-c']]
+
+        units = list(repo_controller._find_units_to_download('repo', False))
+
+        self.assertEqual(units, ['unit-a', 'unit-b', 'unit-c'])
+        self.assertEqual(self.file_model.objects.call_args_list,
+                         [call(id__in=['a', 'b']), call(id__in=['c'])])
+        self.assertEqual(units_qs.call_args_list, [call(downloaded=False)] * 2)
+        self.assertEqual(mock_paginate.call_count, 1)
+        self.assertFalse(self.other_model.objects.called)
+
+    @patch(MODULE + '_paginate_by_id')
+    @patch(MODULE + 'model.RepositoryContentUnit')
+    @patch(MODULE + 'get_repo_unit_models')
+    def test_verify_all(self, mock_models, mock_rcu, mock_paginate):
+        """Assert every unit of every type is found when verifying all units."""
+        mock_models.return_value = [self.file_model, self.other_model]
+        mock_paginate.side_effect = [[[Mock(unit_id='a')]], [[Mock(unit_id='b')]]]
+        self.file_model.objects.return_value = ['unit-a']
+        self.other_model.objects.return_value = ['unit-b']
+
+        units = list(repo_controller._find_units_to_download('repo', True))
+
+        self.assertEqual(units, ['unit-a', 'unit-b'])
+        self.file_model.objects.assert_called_once_with(id__in=['a'])
+        self.other_model.objects.assert_called_once_with(id__in=['b'])
+
+
+class TestPaginateById(unittest.TestCase):
+
+    def test_pages(self):
+        """Assert each page starts after the last ID of the page before it."""
+        queryset = Mock()
+        limit = queryset.filter.return_value.order_by.return_value.limit
+        limit.side_effect = [[Mock(id=1), Mock(id=2)], [Mock(id=3), Mock(id=4)], []]
+
+        pages = list(repo_controller._paginate_by_id(queryset, 2))
+
+        self.assertEqual([[d.id for d in page] for page in pages], [[1, 2], [3, 4]])
+        self.assertEqual(queryset.filter.call_args_list, [call(), call(id__gt=2), call(id__gt=4)])
+        queryset.filter.return_value.order_by.assert_called_with('id')
+        limit.assert_called_with(2)
+
+    def test_partial_page(self):
+        """Assert no further query is made after a partial page."""
+        queryset = Mock()
+        limit = queryset.filter.return_value.order_by.return_value.limit
+        limit.return_value = [Mock(id=1)]
+
+        pages = list(repo_controller._paginate_by_id(queryset, 2))
+
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(limit.call_count, 1)
+
+
 class TestGetDeferredContentUnits(unittest.TestCase):
 
+    def _deferred(self, mock_deferred_download, entries):
+        """
+        Mock the DeferredDownload entries read by _paginate_by_id.
+        """
+        read = [0]
+
+        def limit(size):
+            page = entries[read[0]:read[0] + size]
+            read[0] += size
+            return page
+
+        page_qs = mock_deferred_download.objects.only.return_value.filter.return_value
+        page_qs.order_by.return_value.limit.side_effect = limit
+
     @patch(MODULE + 'plugin_api.get_unit_model_by_id')
     @patch(MODULE + 'model.DeferredDownload')
     def test_get_deferred_content_units(self, mock_qs, mock_get_model):
         # Setup
-        mock_unit = Mock(unit_type_id='abc', unit_id='123')
-        mock_qs.objects.filter.return_value = [mock_unit]
+        mock_deferred = [Mock(unit_type_id='abc', unit_id='123'),
+                         Mock(unit_type_id='abc', unit_id='456')]
+        self._deferred(mock_qs, mock_deferred)
+        mock_units = [Mock(id='123'), Mock(id='456')]
+        mock_get_model.return_value.objects.filter.return_value = mock_units
 
         # Test
         result = list(repo_controller._get_deferred_content_units())
-        self.assertEqual(1, len(result))
+        self.assertEqual(mock_units, result)
         mock_get_model.assert_called_once_with('abc')
         unit_filter = mock_get_model.return_value.objects.filter
-        unit_filter.assert_called_once_with(id='123')
-        unit_filter.return_value.get.assert_called_once_with()
+        self.assertEqual(1, unit_filter.call_count)
+        self.assertEqual(set(['123', '456']), set(unit_filter.call_args[1]['id__in']))
+
+    @patch(MODULE + 'DOWNLOAD_BATCH_SIZE', 1)
+    @patch(MODULE + 'plugin_api.get_unit_model_by_id')
+    @patch(MODULE + 'model.DeferredDownload')
+    def test_get_deferred_content_units_batches(self, mock_qs, mock_get_model):
+        """Assert the units are loaded one batch of deferred entries at a time."""
+        mock_deferred = [Mock(unit_type_id='abc', unit_id='123'),
+                         Mock(unit_type_id='abc', unit_id='456')]
+        self._deferred(mock_qs, mock_deferred)
+        unit_filter = mock_get_model.return_value.objects.filter
+        unit_filter.side_effect = lambda id__in: [Mock(id=unit_id) for unit_id in id__in]
+
+        result = list(repo_controller._get_deferred_content_units())
+        self.assertEqual(['123', '456'], [unit.id for unit in result])
+        self.assertEqual([call(id__in=['123']), call(id__in=['456'])],
+                         unit_filter.call_args_list)
 
     @patch(MODULE + '_logger.error')
     @patch(MODULE + 'plugin_api.get_unit_model_by_id')
@@ -1782,7 +2078,7 @@ class TestGetDeferredContentUnits(unittest.TestCase):
     def test_get_deferred_content_units_no_model(self, mock_qs, mock_get_model, mock_log):
         # Setup
         mock_unit = Mock(unit_type_id='abc', unit_id='123')
-        mock_qs.objects.filter.return_value = [mock_unit]
+        self._deferred(mock_qs, [mock_unit])
         mock_get_model.return_value = None
 
         # Test
@@ -1797,9 +2093,8 @@ class TestGetDeferredContentUnits(unittest.TestCase):
     def test_get_deferred_content_units_no_unit(self, mock_qs, mock_get_model, mock_log):
         # Setup
         mock_unit = Mock(unit_type_id='abc', unit_id='123')
-        mock_qs.objects.filter.return_value = [mock_unit]
-        unit_qs = mock_get_model.return_value.objects.filter.return_value
-        unit_qs.get.side_effect = mongoengine.DoesNotExist()
+        self._deferred(mock_qs, [mock_unit])
+        mock_get_model.return_value.objects.filter.return_value = []
 
         # Test
         result = list(repo_controller._get_deferred_content_units())
@@ -1808,22 +2103,60 @@ class TestGetDeferredContentUnits(unittest.TestCase):
         mock_get_model.assert_called_once_with('abc')
 
 
+class TestGetCatalogEntries(unittest.TestCase):
+
+    @patch(MODULE + 'model.LazyCatalogEntry')
+    def test_get_catalog_entries(self, mock_catalog):
+        """Assert one query is made per type and the lowest revision of each file is used."""
+        content_units = [Mock(id='123', type_id='abc'), Mock(id='456', type_id='abc')]
+        first = Mock(unit_id='123', path='/a', revision=0)
+        second = Mock(unit_id='123', path='/a', revision=1)
+        other = Mock(unit_id='456', path='/b', revision=0)
+        ordered_qs = mock_catalog.objects.filter.return_value.order_by
+        ordered_qs.return_value = [first, other, second]
+
+        result = repo_controller._get_catalog_entries(content_units)
+
+        self.assertEqual({('abc', '123', '/a'): first, ('abc', '456', '/b'): other}, result)
+        self.assertEqual(1, mock_catalog.objects.filter.call_count)
+        kwargs = mock_catalog.objects.filter.call_args[1]
+        self.assertEqual('abc', kwargs['unit_type_id'])
+        self.assertEqual(set(['123', '456']), set(kwargs['unit_id__in']))
+        ordered_qs.assert_called_once_with('revision')
+
+
+class TestDirectDownloadEnabled(unittest.TestCase):
+
+    @patch(MODULE + 'pulp_conf')
+    def test_enabled(self, mock_conf):
+        mock_conf.get.return_value = 'true'
+        self.assertTrue(repo_controller._direct_download_enabled())
+        mock_conf.get.assert_called_once_with('lazy', 'direct_download')
+
+    @patch(MODULE + 'pulp_conf')
+    def test_unparsable(self, mock_conf):
+        mock_conf.get.return_value = 'unsure'
+        self.assertRaises(pulp_exceptions.PulpCodedTaskException,
+                          repo_controller._direct_download_enabled)
+
+
 class TestCreateDownloadRequests(unittest.TestCase):
 
+    @patch(MODULE + '_direct_download_enabled', Mock(return_value=False))
     @patch(MODULE + 'Key.load', Mock())
     @patch(MODULE + 'common_utils.get_working_directory', Mock(return_value='/working/'))
     @patch(MODULE + 'mkdir')
     @patch(MODULE + '_get_streamer_url')
-    @patch(MODULE + 'model.LazyCatalogEntry')
-    def test_create_download_requests(self, mock_catalog, mock_get_url, mock_mkdir):
+    @patch(MODULE + '_get_catalog_entries')
+    def test_create_download_requests(self, mock_get_entries, mock_get_url, mock_mkdir):
         # Setup
         content_units = [Mock(id='123', type_id='abc', list_files=lambda: ['/file/path'])]
-        filtered_qs = mock_catalog.objects.filter.return_value
-        catalog_entry = filtered_qs.order_by.return_value.first.return_value
-        catalog_entry.path = '/storage/123/path'
+        catalog_entry = Mock(path='/storage/123/path')
+        mock_get_entries.return_value = {('abc', '123', '/file/path'): catalog_entry}
         expected_data_dict = {
             repo_controller.TYPE_ID: 'abc',
             repo_controller.UNIT_ID: '123',
+            repo_controller.UNIT: content_units[0],
             repo_controller.UNIT_FILES: {
                 '/working/123/path': {
                     repo_controller.CATALOG_ENTRY: catalog_entry,
@@ -1833,21 +2166,72 @@ class TestCreateDownloadRequests(unittest.TestCase):
         }
 
         # Test
-        requests = repo_controller._create_download_requests(content_units)
+        requests = list(repo_controller._create_download_requests(content_units))
         expected_data_dict[repo_controller.REQUEST] = requests[0]
-        mock_catalog.objects.filter.assert_called_once_with(
-            unit_id='123',
-            unit_type_id='abc',
-            path='/file/path'
-        )
-        filtered_qs.order_by.assert_called_once_with('revision')
-        filtered_qs.order_by.return_value.first.assert_called_once_with()
+        mock_get_entries.assert_called_once_with(tuple(content_units))
+        mock_get_url.assert_called_once_with(catalog_entry, repo_controller.Key.load.return_value)
         mock_mkdir.assert_called_once_with('/working/123')
         self.assertEqual(1, len(requests))
         self.assertEqual(mock_get_url.return_value, requests[0].url)
         self.assertEqual('/working/123/path', requests[0].destination)
         self.assertEqual(expected_data_dict, requests[0].data)
 
+    @patch(MODULE + '_direct_download_enabled', Mock(return_value=False))
+    @patch(MODULE + 'Key.load', Mock())
+    @patch(MODULE + 'common_utils.get_working_directory', Mock(return_value='/working/'))
+    @patch(MODULE + 'mkdir', Mock())
+    @patch(MODULE + '_get_streamer_url', Mock())
+    @patch(MODULE + '_get_catalog_entries')
+    def test_create_download_requests_no_entry(self, mock_get_entries):
+        """Assert files without catalog entries are skipped."""
+        content_units = [Mock(id='123', type_id='abc', list_files=lambda: ['/file/path'])]
+        mock_get_entries.return_value = {}
+
+        requests = list(repo_controller._create_download_requests(content_units))
+        self.assertEqual([], requests)
+
+    @patch(MODULE + 'DOWNLOAD_BATCH_SIZE', 1)
+    @patch(MODULE + '_direct_download_enabled', Mock(return_value=False))
+    @patch(MODULE + 'Key.load', Mock())
+    @patch(MODULE + 'common_utils.get_working_directory', Mock(return_value='/working/'))
+    @patch(MODULE + 'mkdir', Mock())
+    @patch(MODULE + '_get_streamer_url', Mock(return_value='http://streamer/'))
+    @patch(MODULE + '_get_catalog_entries')
+    def test_create_download_requests_streams(self, mock_get_entries):
+        """Assert the units are consumed lazily, a batch at a time."""
+        consumed = []
+
+        def units():
+            for unit_id in ('1', '2'):
+                consumed.append(unit_id)
+                yield Mock(id=unit_id, type_id='abc', list_files=lambda: ['/f'])
+
+        mock_get_entries.side_effect = lambda page: dict(
+            (('abc', unit.id, '/f'), Mock(path='/storage/f')) for unit in page)
+
+        requests = repo_controller._create_download_requests(units())
+        first = next(requests)
+        self.assertEqual('1', first.data[repo_controller.UNIT_ID])
+        self.assertEqual(['1'], consumed)
+        self.assertEqual(['2'], [r.data[repo_controller.UNIT_ID] for r in requests])
+
+    @patch(MODULE + '_direct_download_enabled', Mock(return_value=True))
+    @patch(MODULE + 'Key.load')
+    @patch(MODULE + 'common_utils.get_working_directory', Mock(return_value='/working/'))
+    @patch(MODULE + 'mkdir', Mock())
+    @patch(MODULE + '_get_streamer_url')
+    @patch(MODULE + '_get_catalog_entries')
+    def test_create_download_requests_direct(self, mock_get_entries, mock_get_url, mock_load):
+        """Assert the upstream URL is used when direct downloads are enabled."""
+        content_units = [Mock(id='123', type_id='abc', list_files=lambda: ['/file/path'])]
+        catalog_entry = Mock(path='/storage/123/path', url='http://upstream/path')
+        mock_get_entries.return_value = {('abc', '123', '/file/path'): catalog_entry}
+
+        requests = list(repo_controller._create_download_requests(content_units))
+        self.assertEqual('http://upstream/path', requests[0].url)
+        self.assertEqual(0, mock_get_url.call_count)
+        self.assertEqual(0, mock_load.call_count)
+
 
 class TestGetStreamerUrl(unittest.TestCase):
 
@@ -1922,9 +2306,11 @@ class TestLazyUnitDownloadStep(unittest.TestCase):
             'Test Step',
             [Mock()]
         )
+        self.unit = Mock()
         self.data = {
             repo_controller.TYPE_ID: 'abc',
             repo_controller.UNIT_ID: '1234',
+            repo_controller.UNIT: self.unit,
             repo_controller.REQUEST: Mock(canceled=False),
             repo_controller.UNIT_FILES: {
                 '/no/where': {
@@ -1936,120 +2322,191 @@ class TestLazyUnitDownloadStep(unittest.TestCase):
         self.report = Mock(data=self.data, destination='/no/where')
 
     def test_start(self):
-        """Assert calls to `_process_block` result in calls to the downloader."""
+        """Assert the requests are passed to the downloader and the units finalized."""
         self.step.downloader = Mock()
+        self.step.finalize_units = Mock()
         self.step.start()
         self.step.downloader.download.assert_called_once_with(self.step.download_requests)
+        self.step.finalize_units.assert_called_once_with()
+        self.assertEqual(repo_controller.reporting_constants.STATE_COMPLETE, self.step.state)
+
+    def test_start_failures(self):
+        """Assert the step fails if any of the downloads failed."""
+        self.step.downloader = Mock()
+        self.step.finalize_units = Mock()
+        self.step.progress_failures = 1
+        self.step.start()
+        self.assertEqual(repo_controller.reporting_constants.STATE_FAILED, self.step.state)
+
+    def test_count_requests(self):
+        """Assert the total is counted as the requests are consumed."""
+        requests = [Mock(), Mock()]
+        step = repo_controller.LazyUnitDownloadStep('test_step', 'Test Step', requests)
+        self.assertEqual(0, step.total_units)
+        self.assertEqual(requests, list(step.download_requests))
+        self.assertEqual(2, step.total_units)
+
+    @patch(MODULE + 'get_importer_by_id')
+    @patch(MODULE + 'common_utils.get_working_directory', Mock(return_value='/working/'))
+    def test_start_direct(self, mock_get_importer):
+        """Assert direct downloads use one downloader per importer."""
+        def make_request(importer_id):
+            request = Mock(destination='/no/where', url='http://upstream/' + importer_id)
+            request.data = {repo_controller.UNIT_FILES: {'/no/where': {
+                repo_controller.CATALOG_ENTRY: Mock(importer_id=importer_id)}}}
+            return request
+
+        requests = [make_request('a'), make_request('b'), make_request('a')]
+        importer = Mock()
+        mock_get_importer.return_value = (importer, Mock(), Mock())
+        step = repo_controller.LazyUnitDownloadStep('test_step', 'Test Step', requests)
+        step.direct_download = True
+        step.finalize_units = Mock()
+
+        step.start()
+
+        self.assertEqual(2, mock_get_importer.call_count)
+        downloader = importer.get_downloader_for_db_importer.return_value
+        self.assertEqual(step, downloader.event_listener)
+        downloaded = [c[0][0] for c in downloader.download.call_args_list]
+        self.assertEqual(2, len(downloaded))
+        self.assertTrue([requests[0], requests[2]] in downloaded)
+        self.assertTrue([requests[1]] in downloaded)
+
+    @patch(MODULE + 'get_importer_by_id')
+    def test_start_direct_no_importer(self, mock_get_importer):
+        """Assert requests for missing importers are counted as failures."""
+        request = Mock(destination='/no/where', url='http://upstream/')
+        path_entry = {repo_controller.CATALOG_ENTRY: Mock(importer_id='a')}
+        request.data = {repo_controller.UNIT_FILES: {'/no/where': path_entry}}
+        mock_get_importer.side_effect = plugin_exceptions.PluginNotFound()
+        step = repo_controller.LazyUnitDownloadStep('test_step', 'Test Step', [request])
+        step.direct_download = True
+        step.finalize_units = Mock()
+
+        step.start()
+
+        self.assertEqual(1, step.progress_failures)
+        self.assertFalse(path_entry[repo_controller.PATH_DOWNLOADED])
 
     @patch(MODULE + 'plugin_api.get_unit_model_by_id')
     @patch(MODULE + 'model.DeferredDownload')
-    def test_download_started(self, mock_deferred_download, mock_get_model):
+    def test_finalize_units(self, mock_deferred_download, mock_get_model):
+        """Assert deferred entries are removed and units marked downloaded in bulk."""
+        self.step._started_units = {'abc': set(['1', '2'])}
+        self.step._downloaded_units = {'abc': set(['1'])}
+
+        self.step.finalize_units()
+
+        qs = mock_deferred_download.objects.filter
+        self.assertEqual('abc', qs.call_args[1]['unit_type_id'])
+        self.assertEqual(set(['1', '2']), set(qs.call_args[1]['unit_id__in']))
+        qs.return_value.delete.assert_called_once_with()
+        unit_qs = mock_get_model.return_value.objects.filter
+        unit_qs.assert_called_once_with(id__in=['1'])
+        unit_qs.return_value.update.assert_called_once_with(set__downloaded=True)
+        self.assertEqual({}, self.step._started_units)
+        self.assertEqual({}, self.step._downloaded_units)
+
+    @patch(MODULE + 'FINALIZE_BATCH_SIZE', 1)
+    def test_file_finished_finalizes_batch(self):
+        """Assert the units are finalized once enough of them have been downloaded."""
+        self.step.finalize_units = Mock()
+        self.data[repo_controller.UNIT_FILES]['/no/where'][repo_controller.PATH_DOWNLOADED] = True
+
+        self.step._file_finished(self.data)
+        self.step.finalize_units.assert_called_once_with()
+
+    def test_download_started(self):
         """Assert if validate_file raises an exception, the download is not skipped."""
         self.step.validate_file = Mock(side_effect=IOError)
 
         self.step.download_started(self.report)
-        qs = mock_deferred_download.objects.filter
-        qs.assert_called_once_with(unit_id='1234', unit_type_id='abc')
-        qs.return_value.delete.assert_called_once_with()
+        self.assertFalse(self.report.data[repo_controller.REQUEST].canceled)
+        self.assertEqual({'abc': set(['1234'])}, self.step._started_units)
+        self.assertEqual({}, self.step._downloaded_units)
 
-    @patch(MODULE + 'plugin_api.get_unit_model_by_id')
-    @patch(MODULE + 'model.DeferredDownload')
-    def test_download_started_already_downloaded(self, mock_deferred_download, mock_get_model):
+    def test_download_started_already_downloaded(self):
         """Assert if validate_file doesn't raise an exception, the download is skipped."""
         self.step.validate_file = Mock()
-        model_qs = mock_get_model.return_value
 
         self.step.download_started(self.report)
         self.assertTrue(self.report.data[repo_controller.REQUEST].canceled)
-        qs = mock_deferred_download.objects.filter
-        qs.assert_called_once_with(unit_id='1234', unit_type_id='abc')
-        qs.return_value.delete.assert_called_once_with()
-        self.assertEqual(
-            {'set__downloaded': True},
-            model_qs.objects.filter.return_value.update_one.call_args_list[0][1]
-        )
+        self.assertEqual({'abc': set(['1234'])}, self.step._started_units)
+        self.assertEqual({'abc': set(['1234'])}, self.step._downloaded_units)
 
     @patch(MODULE + 'os.path.relpath', Mock(return_value='filename'))
     @patch(MODULE + 'plugin_api.get_unit_model_by_id')
     def test_download_succeeded(self, mock_get_model):
-        """Assert single file units mark the unit downloaded."""
+        """Assert single file units mark the unit downloaded without reloading it."""
         # Setup
         self.step.validate_file = Mock()
-        model_qs = mock_get_model.return_value
-        unit = model_qs.objects.filter.return_value.only.return_value.get.return_value
 
         # Test
         self.step.download_succeeded(self.report)
-        unit.import_content.assert_called_once_with(self.report.destination)
+        self.unit.import_content.assert_called_once_with(self.report.destination, move=True)
+        self.assertEqual({self.unit.import_content.return_value: 1},
+                         self.step.storage_strategies)
+        self.assertEqual(0, mock_get_model.call_count)
         self.assertEqual(1, self.step.progress_successes)
         self.assertEqual(0, self.step.progress_failures)
-        self.assertEqual(
-            {'set__downloaded': True},
-            model_qs.objects.filter.return_value.update_one.call_args_list[0][1]
-        )
+        self.assertEqual({'abc': set(['1234'])}, self.step._downloaded_units)
 
     @patch(MODULE + 'os.path.relpath', Mock(return_value='a/filename'))
-    @patch(MODULE + 'plugin_api.get_unit_model_by_id')
-    def test_download_succeeded_multifile(self, mock_get_model):
+    def test_download_succeeded_multifile(self):
         """Assert multi-file units are not marked as downloaded on single file completion."""
         # Setup
         self.step.validate_file = Mock()
-        model_qs = mock_get_model.return_value
-        unit = model_qs.objects.filter.return_value.only.return_value.get.return_value
         self.data[repo_controller.UNIT_FILES]['/second/file'] = {
             repo_controller.PATH_DOWNLOADED: None
         }
 
         # Test
         self.step.download_succeeded(self.report)
-        self.assertEqual(0, unit.set_storage_path.call_count)
-        unit.import_content.assert_called_once_with(
+        self.assertEqual(0, self.unit.set_storage_path.call_count)
+        self.unit.import_content.assert_called_once_with(
             self.report.destination,
-            location='a/filename'
+            location='a/filename',
+            move=True
         )
         self.assertEqual(1, self.step.progress_successes)
         self.assertEqual(0, self.step.progress_failures)
-        self.assertEqual(0, model_qs.objects.filter.return_value.update_one.call_count)
+        self.assertEqual({}, self.step._downloaded_units)
 
     @patch(MODULE + 'os.path.relpath', Mock(return_value='a/filename'))
-    @patch(MODULE + 'plugin_api.get_unit_model_by_id')
-    def test_download_succeeded_multifile_last_file(self, mock_get_model):
+    def test_download_succeeded_multifile_last_file(self):
         """Assert multi-file units are marked as downloaded on last file completion."""
         # Setup
         self.step.validate_file = Mock()
-        model_qs = mock_get_model.return_value
-        unit = model_qs.objects.filter.return_value.only.return_value.get.return_value
         self.data[repo_controller.UNIT_FILES]['/second/file'] = {
             repo_controller.PATH_DOWNLOADED: True
         }
 
         # Test
         self.step.download_succeeded(self.report)
-        self.assertEqual(0, unit.set_storage_path.call_count)
-        unit.import_content.assert_called_once_with(
+        self.assertEqual(0, self.unit.set_storage_path.call_count)
+        self.unit.import_content.assert_called_once_with(
             self.report.destination,
-            location='a/filename'
+            location='a/filename',
+            move=True
         )
         self.assertEqual(1, self.step.progress_successes)
         self.assertEqual(0, self.step.progress_failures)
-        model_qs.objects.filter.return_value.update_one.assert_called_once_with(
-            set__downloaded=True)
+        self.assertEqual({'abc': set(['1234'])}, self.step._downloaded_units)
 
     @patch(MODULE + 'os.path.relpath', Mock(return_value='filename'))
-    @patch(MODULE + 'plugin_api.get_unit_model_by_id')
-    def test_download_succeeded_corrupted_download(self, mock_get_model):
+    def test_download_succeeded_corrupted_download(self):
         """Assert corrupted downloads are not copied or marked as downloaded."""
         # Setup
         self.step.validate_file = Mock(side_effect=repo_controller.VerificationException)
-        model_qs = mock_get_model.return_value
-        unit = model_qs.objects.filter.return_value.only.return_value.get.return_value
 
         # Test
         self.step.download_succeeded(self.report)
-        self.assertEqual(0, unit.set_storage_path.call_count)
-        self.assertEqual(0, unit.import_content.call_count)
+        self.assertEqual(0, self.unit.set_storage_path.call_count)
+        self.assertEqual(0, self.unit.import_content.call_count)
         self.assertEqual(0, self.step.progress_successes)
         self.assertEqual(1, self.step.progress_failures)
+        self.assertEqual({}, self.step._downloaded_units)
 
     def test_download_failed(self):
         self.assertEqual(0, self.step.progress_failures)
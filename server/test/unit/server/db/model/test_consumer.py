@@ -38,6 +38,7 @@ class TestRepoProfileApplicability(PulpServerTests):
         self.assertEqual(applicability.repo_id, repo_id)
         self.assertEqual(applicability.profile, profile)
         self.assertEqual(applicability.applicability, applicability_data)
+        self.assertEqual(applicability.repo_content_revision, None)
         # Since we didn't set an _id, it should be None
         self.assertEqual(applicability._id, None)
 
@@ -62,6 +63,16 @@ class TestRepoProfileApplicability(PulpServerTests):
         # Since we didn't set an _id, it should be None
         self.assertEqual(applicability._id, _id)
 
+    def test___init___repo_content_revision(self):
+        """
+        Test the constructor with a repo content revision.
+        """
+        applicability = consumer.RepoProfileApplicability(
+            profile_hash='hash', repo_id='repo_id', profile=[], applicability={},
+            repo_content_revision='revision')
+
+        self.assertEqual(applicability.repo_content_revision, 'revision')
+
     def test_delete(self):
         profile_hash = 'hash'
         repo_id = 'repo_id'
@@ -442,6 +442,85 @@ class TestTaskStatus(unittest.TestCase):
         self.assertEqual(ts['traceback'], None)
         self.assertEqual(ts['exception'], None)
 
+    def test_revision_incremented(self):
+        """
+        Test that every kind of write increments the revision and records the changed fields.
+        """
+        task_id = str(uuid4())
+        ts = TaskStatus(task_id, state=constants.CALL_WAITING_STATE)
+        ts.save_with_set_on_insert(fields_to_set_on_insert=['state'])
+
+        ts = TaskStatus.objects.get(task_id=task_id)
+        self.assertEqual(ts['revision'], 1)
+        self.assertEqual(ts['changed_fields'], None)
+
+        TaskStatus.objects(task_id=task_id).update_one(set__progress_report={'step': 'one'})
+
+        ts = TaskStatus.objects.get(task_id=task_id)
+        self.assertEqual(ts['revision'], 2)
+        self.assertEqual(ts['changed_fields'], ['progress_report'])
+
+        ts.state = constants.CALL_FINISHED_STATE
+        ts.save()
+
+        ts = TaskStatus.objects.get(task_id=task_id)
+        self.assertEqual(ts['revision'], 3)
+        self.assertEqual(ts['changed_fields'], None)
+
+        TaskStatus.objects(task_id=task_id).modify(set__result='done')
+
+        ts = TaskStatus.objects.get(task_id=task_id)
+        self.assertEqual(ts['revision'], 4)
+        self.assertEqual(ts['changed_fields'], ['result'])
+
+
+@mock.patch('pulp.server.db.model.send_taskstatus_message')
+@mock.patch('pulp.server.db.model.TaskStatus._get_collection')
+class TestTaskStatusSave(unittest.TestCase):
+    """
+    Test that TaskStatus.save() increments the revision in the same write as the document.
+    """
+
+    def test_insert(self, mock_get_collection, mock_send):
+        """
+        A new task status should be inserted with its first revision.
+        """
+        ts = TaskStatus(str(uuid4()), state=constants.CALL_WAITING_STATE)
+
+        with mock.patch('mongoengine.Document.save') as mock_save:
+            ts.save()
+
+        mock_save.assert_called_once_with()
+        self.assertEqual(ts.revision, 1)
+        self.assertEqual(ts.changed_fields, None)
+        self.assertFalse(mock_get_collection.return_value.find_one_and_update.called)
+
+    def test_update(self, mock_get_collection, mock_send):
+        """
+        Changes to an existing task status should be written with the revision increment.
+        """
+        collection = mock_get_collection.return_value
+        collection.find_one_and_update.return_value = {'_id': 'abc', 'revision': 5}
+        ts = TaskStatus(str(uuid4()), state=constants.CALL_WAITING_STATE, id=bson.ObjectId(),
+                        revision=4, changed_fields=['state'])
+        ts._created = False
+        ts._clear_changed_fields()
+        ts.state = constants.CALL_RUNNING_STATE
+
+        result = ts.save()
+
+        self.assertTrue(result is ts)
+        self.assertEqual(collection.find_one_and_update.call_count, 1)
+        spec, update = collection.find_one_and_update.call_args[0]
+        self.assertEqual(spec, {'_id': ts.id})
+        self.assertEqual(update, {'$set': {'state': constants.CALL_RUNNING_STATE,
+                                           'changed_fields': None},
+                                  '$inc': {'revision': 1}})
+        self.assertEqual(ts.revision, 5)
+        self.assertEqual(ts.changed_fields, None)
+        self.assertEqual(ts._get_changed_fields(), [])
+        mock_send.assert_called_once_with(ts, routing_key='tasks.%s' % ts.task_id)
+
 
 class TestScheduledCallInit(unittest.TestCase):
     def test_new(self):
@@ -879,6 +879,64 @@ class TestUnsafeRetry(unittest.TestCase):
         self.assertTrue(m_instance.two is m_retry.return_value.return_value)
         self.assertRaises(AttributeError, getattr, m_instance, 'one')
 
+    def test_decorate_class_retry_off(self, m_config):
+        """
+        Class methods should not be wrapped if the feature has not been turned on.
+        """
+        class Doc(object):
+            def one(self):
+                return 1
+
+        m_config.getboolean.return_value = False
+        function = Doc.__dict__['one']
+        connection.UnsafeRetry.decorate_class(Doc, 'test_collection')
+        self.assertTrue(Doc.__dict__['one'] is function)
+        self.assertTrue(connection.UnsafeRetry.is_class_decorated(Doc))
+
+    @patch('pulp.server.db.connection.UnsafeRetry.retry_decorator')
+    def test_decorate_class_retry_on(self, m_retry, m_config):
+        """
+        Plain methods should be wrapped on the class if the feature has been turned on.
+        """
+        class Doc(object):
+            def one(self):
+                return 1
+
+            @classmethod
+            def two(cls):
+                return 2
+
+        m_config.getboolean.return_value = True
+        function = Doc.__dict__['one']
+        connection.UnsafeRetry.decorate_class(Doc, 'test_collection')
+        m_retry.assert_called_once_with('test_collection')
+        m_retry.return_value.assert_called_once_with(function)
+        self.assertTrue(Doc.__dict__['one'] is m_retry.return_value.return_value)
+        self.assertTrue(isinstance(Doc.__dict__['two'], classmethod))
+
+    def test_decorate_class_retry_on_subclass(self, m_config):
+        """
+        Methods inherited from a decorated class should be decorated once, with the name of
+        the subclass.
+        """
+        class Doc(object):
+            def one(self):
+                return 1
+
+        class SubDoc(Doc):
+            pass
+
+        m_config.getboolean.return_value = True
+        function = Doc.__dict__['one']
+        connection.UnsafeRetry.decorate_class(Doc, 'doc')
+        self.assertFalse(connection.UnsafeRetry.is_class_decorated(SubDoc))
+        connection.UnsafeRetry.decorate_class(SubDoc, 'sub_doc')
+
+        self.assertTrue(connection.UnsafeRetry.is_class_decorated(SubDoc))
+        self.assertTrue(SubDoc.__dict__['one']._unsafe_retry_wrapped is function)
+        self.assertTrue(Doc.__dict__['one']._unsafe_retry_wrapped is function)
+        self.assertEqual(SubDoc().one(), 1)
+
     @patch('pulp.server.db.connection._logger')
     def test_retry_decorator(self, m_logger, m_config):
         """
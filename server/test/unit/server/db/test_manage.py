@@ -4,6 +4,7 @@ Test the pulp.server.db.manage module.
 from argparse import Namespace
 from cStringIO import StringIO
 import os
+import unittest
 
 from mock import call, inPy3k, MagicMock, patch
 from mongoengine.queryset import DoesNotExist
@@ -12,6 +13,7 @@ from ... import base
 from pulp.common.compat import all, json
 from pulp.server.db import manage
 from pulp.server.db.migrate import models
+from pulp.server.db.migrations.lib import utils
 from pulp.server.db.model import MigrationTracker
 import pulp.plugins.types.database as types_db
 import migration_packages.a
@@ -501,7 +503,7 @@ class TestManageDB(MigrationTest):
                                 mocked_apply_migration, mock_entry, getLogger, mock_ensure_indexes):
         logger = MagicMock()
         getLogger.return_value = logger
-        mock_args = Namespace(dry_run=True, test=False)
+        mock_args = Namespace(dry_run=True, test=False, workers=models.DEFAULT_WORKERS)
         mock_parse_args.return_value = mock_args
 
         # Test that when dry run is on, it returns 1 if migrations remain
@@ -612,6 +614,19 @@ class TestMigrationPackage(MigrationTest):
         # Now the mp should be at v3
         self.assertEqual(mp.current_version, 3)
 
+    @patch('pulp.server.db.migrate.models.ChunkedMigrationRunner')
+    def test_apply_migration_chunked(self, mock_runner):
+        mp = models.MigrationPackage(migration_packages.z)
+        mm_v1 = mp.migrations[0]
+        mm_v1.migrate = MagicMock(name='migrate')
+        mm_v1.chunked_migration = utils.ChunkedMigration('users', MagicMock())
+
+        mp.apply_migration(mm_v1, workers=8)
+
+        mock_runner.assert_called_once_with(mm_v1.name, mm_v1.chunked_migration, 8)
+        mock_runner.return_value.run.assert_called_once_with()
+        self.assertTrue(mm_v1.migrate.called)
+
     def test_available_versions(self):
         mp = models.MigrationPackage(migration_packages.z)
         self.assertEquals(mp.available_versions, [1, 2, 3])
@@ -794,3 +809,98 @@ class TestMigrationUtils(MigrationTest):
         expected_log_calls = [call('There are two migration modules that share version 2 in '
                               'unit.server.db.migration_packages.duplicate_versions.')]
         log_mock.assert_has_calls(expected_log_calls)
+
+
+def _progress(index, start, end, done=False):
+    chunk = MagicMock()
+    chunk.index = index
+    chunk.start = start
+    chunk.end = end
+    chunk.done = done
+    return chunk
+
+
+@patch('pulp.server.db.migrate.models.MigrationProgress')
+@patch('pulp.server.db.migrate.models.get_collection')
+class TestChunkedMigrationRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.migrate_document = MagicMock()
+        self.chunked_migration = utils.ChunkedMigration(
+            'users', self.migrate_document, query={'migrated': {'$exists': False}},
+            fields=['name'], chunk_size=2)
+
+    def test_plan_chunks(self, mock_get_collection, mock_progress):
+        collection = mock_get_collection.return_value
+        cursor = collection.find.return_value.sort.return_value.batch_size.return_value
+        cursor.__iter__.return_value = iter([{'_id': i} for i in range(5)])
+        runner = models.ChunkedMigrationRunner('0001_test', self.chunked_migration)
+
+        chunks = runner._plan_chunks()
+
+        collection.find.assert_called_once_with({'migrated': {'$exists': False}},
+                                                projection=['_id'])
+        self.assertEqual(mock_progress.call_args_list[0][1],
+                         {'migration': '0001_test', 'index': 0, 'start': 0, 'end': 2})
+        self.assertEqual(mock_progress.call_args_list[1][1],
+                         {'migration': '0001_test', 'index': 1, 'start': 2, 'end': 4})
+        self.assertEqual(mock_progress.call_args_list[2][1],
+                         {'migration': '0001_test', 'index': 2, 'start': 4, 'end': None})
+        mock_progress.objects.insert.assert_called_once_with(chunks, load_bulk=False)
+
+    @patch('pulp.server.db.migrate.models.ChunkedMigrationRunner._plan_chunks')
+    def test_run_resumes(self, mock_plan, mock_get_collection, mock_progress):
+        chunks = [_progress(0, 0, 2, done=True), _progress(1, 2, None)]
+        mock_progress.objects.return_value.order_by.return_value = chunks
+        collection = mock_get_collection.return_value
+        collection.find.return_value = [{'_id': 2, 'name': 'a'}, {'_id': 3, 'name': 'b'}]
+
+        models.ChunkedMigrationRunner('0001_test', self.chunked_migration).run()
+
+        self.assertFalse(mock_plan.called)
+        collection.find.assert_called_once_with(
+            {'$and': [{'migrated': {'$exists': False}}, {'_id': {'$gte': 2}}]},
+            projection=['name'])
+        self.assertEqual(self.migrate_document.call_count, 2)
+        self.migrate_document.assert_called_with({'_id': 3, 'name': 'b'}, collection)
+        update = mock_progress.objects.return_value.update_one.call_args[1]
+        self.assertEqual(update['set__done'], True)
+        self.assertEqual(update['set__migrated'], 2)
+        # the checkpoints are removed once the migration is complete
+        mock_progress.objects.return_value.delete.assert_called_once_with()
+
+    @patch('pulp.server.db.migrate.models.ChunkedMigrationRunner._plan_chunks')
+    def test_run_discards_incomplete_plan(self, mock_plan, mock_get_collection, mock_progress):
+        mock_progress.objects.return_value.order_by.return_value = [_progress(0, 0, 2)]
+        mock_plan.return_value = []
+
+        models.ChunkedMigrationRunner('0001_test', self.chunked_migration).run()
+
+        mock_plan.assert_called_once_with()
+        self.assertEqual(mock_progress.objects.return_value.delete.call_count, 2)
+
+    @patch('pulp.server.db.migrate.models.ChunkedMigrationRunner._plan_chunks')
+    def test_run_failure(self, mock_plan, mock_get_collection, mock_progress):
+        mock_progress.objects.return_value.order_by.return_value = []
+        mock_plan.return_value = [_progress(0, 0, 2), _progress(1, 2, None)]
+        mock_get_collection.return_value.find.return_value = [{'_id': 0}]
+        self.migrate_document.side_effect = ValueError('bad document')
+        runner = models.ChunkedMigrationRunner('0001_test', self.chunked_migration, workers=1)
+
+        self.assertRaises(ValueError, runner.run)
+
+        # the first failure stops the thread, and the checkpoints are kept to resume
+        self.assertEqual(self.migrate_document.call_count, 1)
+        self.assertFalse(mock_progress.objects.return_value.update_one.called)
+        self.assertEqual(mock_progress.objects.return_value.delete.call_count, 1)
+
+    def test_migrate_chunk_without_query(self, mock_get_collection, mock_progress):
+        chunked_migration = utils.ChunkedMigration('users', self.migrate_document)
+        collection = mock_get_collection.return_value
+        collection.find.return_value = []
+        runner = models.ChunkedMigrationRunner('0001_test', chunked_migration)
+
+        runner._migrate_chunk(_progress(3, 6, 8))
+
+        collection.find.assert_called_once_with({'_id': {'$gte': 6, '$lt': 8}}, projection=None)
+        mock_progress.objects.assert_called_once_with(migration='0001_test', index=3)
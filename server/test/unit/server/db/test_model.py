@@ -38,13 +38,28 @@ class TestAutoRetryDocument(unittest.TestCase):
     @patch('pulp.server.db.model.UnsafeRetry')
     def test_decorate_on_init(self, m_retry):
         """
-        Ensure that subclass's of AutoRetryDocuments are decorated on init.
+        Ensure that subclass's of AutoRetryDocuments are decorated on the first init.
         """
         class MockDoc(model.AutoRetryDocument):
             pass
 
-        doc = MockDoc()
-        m_retry.decorate_instance.assert_called_once_with(instance=doc, full_name=type(doc))
+        m_retry.is_class_decorated.return_value = False
+        MockDoc()
+        m_retry.is_class_decorated.assert_called_once_with(MockDoc)
+        m_retry.decorate_class.assert_called_once_with(klass=MockDoc, full_name=MockDoc)
+
+    @patch('pulp.server.db.model.UnsafeRetry')
+    def test_decorate_once_per_class(self, m_retry):
+        """
+        Ensure that the class is not decorated again for each document.
+        """
+        class MockDoc(model.AutoRetryDocument):
+            pass
+
+        m_retry.is_class_decorated.return_value = True
+        MockDoc()
+        self.assertFalse(m_retry.decorate_class.called)
+        self.assertFalse(m_retry.decorate_instance.called)
 
     def test_abstact(self):
         """
@@ -480,7 +495,8 @@ class TestFileContentUnit(unittest.TestCase):
         file_storage.assert_called_once_with()
         storage.__enter__.assert_called_once_with()
         storage.__exit__.assert_called_once_with(None, None, None)
-        storage.put.assert_called_once_with(unit, path, None)
+        storage.put.assert_called_once_with(unit, path, None, move=False, checksum_type=None,
+                                            checksum=None)
 
     @patch('os.path.isfile')
     @patch('pulp.server.db.model.FileStorage')
@@ -502,7 +518,28 @@ class TestFileContentUnit(unittest.TestCase):
         file_storage.assert_called_once_with()
         storage.__enter__.assert_called_once_with()
         storage.__exit__.assert_called_once_with(None, None, None)
-        storage.put.assert_called_once_with(unit, path, location)
+        storage.put.assert_called_once_with(unit, path, location, move=False,
+                                            checksum_type=None, checksum=None)
+
+    @patch('os.path.isfile')
+    @patch('pulp.server.db.model.FileStorage')
+    def test_import_content_move(self, file_storage, isfile):
+        path = '/tmp/working/file'
+        isfile.return_value = True
+        storage = Mock()
+        storage.__enter__ = Mock(return_value=storage)
+        storage.__exit__ = Mock()
+        file_storage.return_value = storage
+
+        # test
+        unit = TestFileContentUnit.TestUnit()
+        unit._last_updated = 1234
+        strategy = unit.import_content(path, move=True, checksum_type='sha256', checksum='abc')
+
+        # validation
+        storage.put.assert_called_once_with(unit, path, None, move=True, checksum_type='sha256',
+                                            checksum='abc')
+        self.assertEqual(strategy, storage.put.return_value)
 
     def test_import_content_unit_not_saved(self):
         try:
@@ -0,0 +1,172 @@
+"""
+This module contains tests for the pulp.server.db.profiler module.
+"""
+import json
+import unittest
+
+import mock
+
+from pulp.server.db import profiler
+
+
+MODULE = 'pulp.server.db.profiler.'
+
+
+def _event(command_name='find', request_id=1, command=None, duration_micros=2500):
+    event = mock.Mock(command_name=command_name, request_id=request_id,
+                      duration_micros=duration_micros)
+    event.command = command or {command_name: 'units', 'filter': {'id': 'abc'}}
+    return event
+
+
+class TestQueryProfile(unittest.TestCase):
+
+    def test_summary(self):
+        profile = profiler.QueryProfile('task-1')
+        profile.add('units', 'find', '{"id": 1}', 'a:f', 2.0)
+        profile.add('units', 'find', '{"id": 1}', 'a:g', 3.0)
+        profile.add('units', 'find', '{"id": 1}', 'a:g', 1.0)
+        profile.add('repos', 'update', '[{"repo_id": 1}]', 'a:h', 4.0)
+
+        summary = profile.summary()
+
+        self.assertEqual(summary['commands'], 4)
+        self.assertEqual(summary['duration_ms'], 10.0)
+        self.assertEqual(summary['queries'], [
+            {'collection': 'units', 'command': 'find', 'shape': '{"id": 1}', 'count': 3,
+             'duration_ms': 6.0, 'max_duration_ms': 3.0,
+             'callers': [{'caller': 'a:g', 'count': 2}, {'caller': 'a:f', 'count': 1}]},
+            {'collection': 'repos', 'command': 'update', 'shape': '[{"repo_id": 1}]', 'count': 1,
+             'duration_ms': 4.0, 'max_duration_ms': 4.0,
+             'callers': [{'caller': 'a:h', 'count': 1}]}])
+
+    def test_summary_limit(self):
+        profile = profiler.QueryProfile('task-1')
+        profile.add('units', 'find', '{}', 'a:f', 2.0)
+        profile.add('repos', 'find', '{}', 'a:f', 1.0)
+
+        summary = profile.summary(limit=1)
+
+        self.assertEqual(summary['commands'], 2)
+        self.assertEqual([q['collection'] for q in summary['queries']], ['units'])
+
+
+class TestQueryShape(unittest.TestCase):
+
+    def test_find(self):
+        query = {'id': {'$in': ['a', 'b', 'c']}, 'type': 'rpm'}
+        shape = profiler.query_shape({'find': 'units', 'filter': query})
+        self.assertEqual(json.loads(shape), {'id': {'$in': [1]}, 'type': 1})
+
+    def test_boolean_operators(self):
+        query = {'$or': [{'a': 1}, {'b': 2}, {'a': 3}]}
+        shape = profiler.query_shape({'count': 'units', 'query': query})
+        self.assertEqual(json.loads(shape), {'$or': [{'a': 1}, {'b': 1}]})
+
+    def test_update(self):
+        shape = profiler.query_shape({'update': 'repos',
+                                      'updates': [{'q': {'repo_id': 'a'}, 'u': {'$inc': {'c': 1}}},
+                                                  {'q': {'repo_id': 'b'}, 'u': {}}]})
+        self.assertEqual(json.loads(shape), [{'repo_id': 1}])
+
+    def test_aggregate(self):
+        shape = profiler.query_shape({'aggregate': 'units',
+                                      'pipeline': [{'$match': {'repo_id': 'a'}}]})
+        self.assertEqual(json.loads(shape), [{'$match': {'repo_id': 1}}])
+
+    def test_no_query(self):
+        self.assertEqual(profiler.query_shape({'insert': 'units', 'documents': [{'a': 1}]}), '{}')
+
+
+class TestCaller(unittest.TestCase):
+
+    def test_caller(self):
+        self.assertEqual(profiler.caller(), '%s:test_caller' % __name__)
+
+
+class TestProfiles(unittest.TestCase):
+
+    def tearDown(self):
+        profiler.stop()
+
+    def test_start_stop(self):
+        self.assertTrue(profiler.get_active_profile() is None)
+        profile = profiler.start('task-1')
+        self.assertEqual(profile.name, 'task-1')
+        self.assertTrue(profiler.get_active_profile() is profile)
+        self.assertTrue(profiler.stop() is profile)
+        self.assertTrue(profiler.get_active_profile() is None)
+        self.assertTrue(profiler.stop() is None)
+
+
+class TestCommandProfiler(unittest.TestCase):
+
+    def tearDown(self):
+        profiler.stop()
+
+    def test_profiled(self):
+        profile = profiler.start('task-1')
+        listener = profiler.CommandProfiler()
+
+        listener.started(_event())
+        listener.succeeded(_event())
+        listener.started(_event(command_name='getMore',
+                                command={'getMore': 12, 'collection': 'units'}))
+        listener.failed(_event(command_name='getMore'))
+
+        self.assertEqual(profile.stats, {
+            ('units', 'find', '{"id": 1}'): {'count': 1, 'duration': 2.5, 'max': 2.5,
+                                             'callers': {'%s:test_profiled' % __name__: 1}},
+            ('units', 'getMore', '{}'): {'count': 1, 'duration': 2.5, 'max': 2.5,
+                                         'callers': {'%s:test_profiled' % __name__: 1}}})
+
+    @mock.patch(MODULE + 'query_shape')
+    def test_not_profiled(self, mock_shape):
+        listener = profiler.CommandProfiler()
+
+        listener.started(_event())
+        listener.succeeded(_event())
+
+        self.assertFalse(mock_shape.called)
+        self.assertEqual(profiler._pending_commands(), {})
+
+    @mock.patch(MODULE + '_logger')
+    def test_slow(self, mock_logger):
+        listener = profiler.CommandProfiler(slow_query_threshold=100)
+
+        listener.started(_event(request_id=1))
+        listener.succeeded(_event(request_id=1, duration_micros=99000))
+        self.assertFalse(mock_logger.warning.called)
+
+        listener.started(_event(request_id=2))
+        listener.succeeded(_event(request_id=2, duration_micros=100000))
+        msg = mock_logger.warning.call_args[0][0]
+        self.assertTrue('find on units took 100ms' in msg)
+        self.assertTrue('test_slow' in msg)
+        self.assertTrue(msg.endswith('{"id": 1}'))
+
+
+@mock.patch(MODULE + 'monitoring.register')
+@mock.patch(MODULE + 'config')
+class TestInstall(unittest.TestCase):
+
+    def tearDown(self):
+        profiler._listener = None
+
+    def _config(self, mock_config, mongo_queries, threshold):
+        mock_config.getboolean.return_value = mongo_queries
+        mock_config.getint.return_value = threshold
+
+    def test_disabled(self, mock_config, mock_register):
+        self._config(mock_config, False, 0)
+        self.assertTrue(profiler.install() is None)
+        self.assertFalse(mock_register.called)
+
+    def test_enabled(self, mock_config, mock_register):
+        self._config(mock_config, False, 200)
+        listener = profiler.install()
+        self.assertEqual(listener.slow_query_threshold, 200)
+        mock_register.assert_called_once_with(listener)
+        # it is only registered once
+        self.assertTrue(profiler.install() is listener)
+        self.assertEqual(mock_register.call_count, 1)
@@ -93,6 +93,80 @@ class TestCriteriaQuerySet(unittest.TestCase):
         mock_get.assert_called_once_with(field='value')
 
 
+class TestTaskStatusQuerySet(unittest.TestCase):
+    """
+    Tests for the task status custom query set.
+    """
+
+    @mock.patch('pulp.server.db.querysets.CriteriaQuerySet.update')
+    def test_update_increments_revision(self, mock_update):
+        """
+        Updates should increment the revision and record the fields that were changed.
+        """
+        qs = querysets.TaskStatusQuerySet(mock.MagicMock(), mock.MagicMock())
+        qs.update(set__state='running', set__start_time='now', worker_name='worker', upsert=True)
+        mock_update.assert_called_once_with(
+            set__state='running', set__start_time='now', worker_name='worker', upsert=True,
+            inc__revision=1, set__changed_fields=['start_time', 'state', 'worker_name'])
+
+    @mock.patch('pulp.server.db.querysets.CriteriaQuerySet.update')
+    def test_update_revision_managed_by_caller(self, mock_update):
+        """
+        If the caller updates the revision itself, the update should be left untouched.
+        """
+        qs = querysets.TaskStatusQuerySet(mock.MagicMock(), mock.MagicMock())
+        qs.update(set__state='running', set__revision=3)
+        mock_update.assert_called_once_with(set__state='running', set__revision=3)
+
+    @mock.patch('pulp.server.db.querysets.CriteriaQuerySet.modify')
+    def test_modify_increments_revision(self, mock_modify):
+        """
+        Find-and-modify updates should also increment the revision and record the changed fields.
+        """
+        qs = querysets.TaskStatusQuerySet(mock.MagicMock(), mock.MagicMock())
+        result = qs.modify(new=True, set__state='finished')
+        self.assertTrue(result is mock_modify.return_value)
+        mock_modify.assert_called_once_with(new=True, set__state='finished', inc__revision=1,
+                                            set__changed_fields=['state'])
+
+    @mock.patch('pulp.server.db.querysets.CriteriaQuerySet.modify')
+    def test_modify_remove(self, mock_modify):
+        """
+        Removing a task status with modify() should not add an update.
+        """
+        qs = querysets.TaskStatusQuerySet(mock.MagicMock(), mock.MagicMock())
+        qs.modify(remove=True)
+        mock_modify.assert_called_once_with(remove=True)
+
+    def test_get_state_summary(self):
+        """
+        The summary should count every state, including those with no tasks, in one aggregation.
+        """
+        qs = querysets.TaskStatusQuerySet(mock.MagicMock(), mock.MagicMock())
+        qs.aggregate = mock.MagicMock(return_value=[{'_id': 'running', 'count': 2},
+                                                    {'_id': 'finished', 'count': 5}])
+
+        summary = qs.get_state_summary()
+
+        qs.aggregate.assert_called_once_with(
+            {'$group': {'_id': '$state', 'count': {'$sum': 1}}})
+        self.assertEqual(summary, {'accepted': 0, 'finished': 5, 'running': 2, 'canceled': 0,
+                                   'waiting': 0, 'skipped': 0, 'suspended': 0, 'error': 0,
+                                   'total': 7})
+
+    def test_get_state_summary_empty(self):
+        """
+        An empty queryset should produce a summary of zeros.
+        """
+        qs = querysets.TaskStatusQuerySet(mock.MagicMock(), mock.MagicMock())
+        qs.aggregate = mock.MagicMock(return_value=[])
+
+        summary = qs.get_state_summary()
+
+        self.assertEqual(summary['total'], 0)
+        self.assertEqual(set(summary.values()), set([0]))
+
+
 class TestReqoQuerySet(unittest.TestCase):
     """
     Tests for the repository custom query set.
@@ -103,6 +177,27 @@ class TestReqoQuerySet(unittest.TestCase):
         qs = querysets.RepoQuerySet(mock.MagicMock(), mock.MagicMock())
         self.assertRaises(NotImplementedError, qs.cache)
 
+    @mock.patch('pulp.server.db.querysets.dateutils.now_utc_datetime_with_tzinfo')
+    @mock.patch('pulp.server.db.querysets.CriteriaQuerySet.update')
+    def test_update_sets_last_updated(self, mock_update, mock_now):
+        """
+        Updates should also set the time the repository was last updated.
+        """
+        qs = querysets.RepoQuerySet(mock.MagicMock(), mock.MagicMock())
+        result = qs.update(inc__content_unit_counts__rpm=1)
+        mock_update.assert_called_once_with(inc__content_unit_counts__rpm=1,
+                                            set__last_updated=mock_now.return_value)
+        self.assertTrue(result is mock_update.return_value)
+
+    @mock.patch('pulp.server.db.querysets.CriteriaQuerySet.update')
+    def test_update_last_updated_set_by_caller(self, mock_update):
+        """
+        If the caller sets last_updated itself, the update should be left untouched.
+        """
+        qs = querysets.RepoQuerySet(mock.MagicMock(), mock.MagicMock())
+        qs.update(set__display_name='repo', set__last_updated='then')
+        mock_update.assert_called_once_with(set__display_name='repo', set__last_updated='then')
+
     def test_get_repo(self):
         """
         get_repo_or_missing_resource should return self.get if the repo exists.
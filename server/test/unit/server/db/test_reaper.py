@@ -130,3 +130,150 @@ class TestReapExpiredDocuments(base.PulpServerTests):
 
         # The event should no longer exist
         self.assertTrue(chec.find({'_id': event['_id']}).count() == 0)
+
+
+@mock.patch('pulp.server.db.model.reaper_base.time')
+class TestReapOldDocuments(unittest.TestCase):
+    """
+    Assert that old documents are removed in batches, with the requested throttling.
+    """
+
+    def _collection(self, batches):
+        """
+        Mock the collection of ConsumerHistoryEvent to return the given batches of documents.
+        """
+        collection = mock.MagicMock()
+        cursor = collection.find.return_value.sort.return_value.limit.return_value
+        cursor.__iter__.side_effect = [iter([{'_id': _id} for _id in batch]) for batch in batches]
+        collection.remove.side_effect = [{'n': len(batch)} for batch in batches if batch]
+        return collection
+
+    def test_batches(self, mock_time):
+        """
+        Assert that each batch is removed by the range of its _ids until a partial batch is found.
+        """
+        ids = [ObjectId() for _ in range(5)]
+        collection = self._collection([ids[:2], ids[2:4], ids[4:]])
+        mock_time.time.return_value = 0
+
+        with mock.patch.object(ConsumerHistoryEvent, 'get_collection', return_value=collection):
+            removed = ConsumerHistoryEvent.reap_old_documents(1, batch_size=2)
+
+        self.assertEqual(removed, 5)
+        expired_object_id = collection.find.call_args[0][0]['_id']['$lte']
+        collection.find.assert_called_with({'_id': {'$lte': expired_object_id}},
+                                           projection=['_id'])
+        collection.find.return_value.sort.assert_called_with('_id', 1)
+        collection.find.return_value.sort.return_value.limit.assert_called_with(2)
+        self.assertEqual(collection.remove.call_args_list,
+                         [mock.call({'_id': {'$lte': ids[1]}}),
+                          mock.call({'_id': {'$lte': ids[3]}}),
+                          mock.call({'_id': {'$lte': ids[4]}})])
+        self.assertFalse(mock_time.sleep.called)
+
+    def test_nothing_expired(self, mock_time):
+        """
+        Assert that nothing is removed when no documents have expired.
+        """
+        collection = self._collection([[]])
+
+        with mock.patch.object(ConsumerHistoryEvent, 'get_collection', return_value=collection):
+            removed = ConsumerHistoryEvent.reap_old_documents(1)
+
+        self.assertEqual(removed, 0)
+        self.assertFalse(collection.remove.called)
+
+    def test_batch_size_below_one(self, mock_time):
+        """
+        Assert that a batch size below 1 removes one document at a time rather than all of them.
+        """
+        ids = [ObjectId() for _ in range(2)]
+        collection = self._collection([ids[:1], ids[1:], []])
+        mock_time.time.return_value = 0
+
+        with mock.patch.object(ConsumerHistoryEvent, 'get_collection', return_value=collection):
+            removed = ConsumerHistoryEvent.reap_old_documents(1, batch_size=0)
+
+        self.assertEqual(removed, 2)
+        collection.find.return_value.sort.return_value.limit.assert_called_with(1)
+        self.assertEqual(collection.remove.call_count, 2)
+
+    def test_batch_pause(self, mock_time):
+        """
+        Assert that the pause is taken between batches, but not after the last one.
+        """
+        ids = [ObjectId() for _ in range(3)]
+        collection = self._collection([ids[:2], ids[2:]])
+        mock_time.time.return_value = 0
+
+        with mock.patch.object(ConsumerHistoryEvent, 'get_collection', return_value=collection):
+            ConsumerHistoryEvent.reap_old_documents(1, batch_size=2, batch_pause=0.5)
+
+        mock_time.sleep.assert_called_once_with(0.5)
+
+    def test_max_rate(self, mock_time):
+        """
+        Assert that batches are slowed down to the maximum rate, less the time taken to remove them.
+        """
+        ids = [ObjectId() for _ in range(3)]
+        collection = self._collection([ids[:2], ids[2:]])
+        mock_time.time.side_effect = [10, 10.25, 11]
+
+        with mock.patch.object(ConsumerHistoryEvent, 'get_collection', return_value=collection):
+            ConsumerHistoryEvent.reap_old_documents(1, batch_size=2, batch_pause=0.1, max_rate=4)
+
+        mock_time.sleep.assert_called_once_with(0.25)
+
+
+class TestReapExpiredDocumentsTask(unittest.TestCase):
+    """
+    Assert that reap_expired_documents() passes on the config and reports what was removed.
+    """
+
+    @mock.patch('pulp.server.db.reaper._COLLECTION_TIMEDELTAS',
+                {mock.Mock(collection_name='repo_sync_results'): 'repo_sync_history'})
+    @mock.patch('pulp.server.db.reaper.pulp_config.config')
+    def test_reap(self, mock_config):
+        mock_config.getint.return_value = 500
+        mock_config.getfloat.side_effect = lambda section, name: {
+            'batch_pause': 0.5, 'max_rate': 100.0, 'repo_sync_history': 60.0}[name]
+        model_class = reaper._COLLECTION_TIMEDELTAS.keys()[0]
+        model_class.reap_old_documents.return_value = 12
+
+        removed = reaper.reap_expired_documents.run()
+
+        self.assertEqual(removed, {'repo_sync_results': 12})
+        mock_config.getint.assert_called_once_with('data_reaping', 'batch_size')
+        model_class.reap_old_documents.assert_called_once_with(60.0, batch_size=500,
+                                                               batch_pause=0.5, max_rate=100.0)
+
+    @mock.patch('pulp.server.db.model.reaper_base.time')
+    @mock.patch.object(model.TaskStatus, '_get_collection')
+    @mock.patch('pulp.server.db.model.base.Model.get_collection')
+    def test_reap_all_collections(self, mock_get_collection, mock_get_task_collection,
+                                  mock_time):
+        """
+        Assert that every model in _COLLECTION_TIMEDELTAS is reaped with the batch settings.
+        """
+        collection = mock.MagicMock()
+        cursor = collection.find.return_value.sort.return_value.limit.return_value
+        cursor.__iter__.side_effect = lambda: iter([{'_id': ObjectId(), 'date_done': 1}])
+        collection.remove.return_value = {'n': 1}
+        mock_get_collection.return_value = collection
+        mock_get_task_collection.return_value = collection
+        mock_time.time.return_value = 0
+
+        removed = reaper.reap_expired_documents.run()
+
+        self.assertEqual(removed, {'task_status': 1, 'consumer_history': 1,
+                                   'repo_sync_results': 1, 'repo_publish_results': 1,
+                                   'repo_group_publish_results': 1, 'celery_taskmeta': 1})
+        self.assertEqual(collection.remove.call_count, 6)
+        self.assertTrue(mock.call({'date_done': {'$lte': 1}}) in collection.remove.call_args_list)
+
+    def test_collection_name(self):
+        """
+        Assert that the results are keyed by the collection names of both kinds of model.
+        """
+        self.assertEqual(reaper._collection_name(ConsumerHistoryEvent), 'consumer_history')
+        self.assertEqual(reaper._collection_name(model.TaskStatus), 'task_status')
@@ -1,7 +1,7 @@
 import mock
 
 from ... import base
-from pulp.server.event.amqp import handle_event
+from pulp.server.event.amqp import handle_event, handle_events
 
 
 class TestAMQPNotifier(base.PulpServerTests):
@@ -20,3 +20,12 @@ class TestAMQPNotifier(base.PulpServerTests):
         handle_event({'exchange': 'pulp'}, event)
 
         mock_publish.assert_called_once_with(event, 'pulp')
+
+    @mock.patch('pulp.server.managers.event.remote.TopicPublishManager.publish_all')
+    def test_handle_events(self, mock_publish_all):
+        events = [mock.MagicMock(), mock.MagicMock()]
+
+        ret = handle_events({'exchange': 'pulp'}, events)
+
+        mock_publish_all.assert_called_once_with(events, 'pulp')
+        self.assertEqual(ret, mock_publish_all.return_value)
@@ -0,0 +1,255 @@
+from datetime import datetime, timedelta
+import json
+import unittest
+
+from bson import ObjectId
+import mock
+
+from ... import base
+from pulp.common import dateutils
+from pulp.server.db.model import EventDelivery
+from pulp.server.db.model.event import EventListener
+from pulp.server.event import amqp, dispatch
+from pulp.server.event.data import RecordedEvent
+from pulp.server.managers.event.remote import TopicPublishManager
+
+
+MODULE_PATH = 'pulp.server.event.dispatch.'
+
+
+def _delivery(attempts=0, event_type='repo.sync.start', payload='payload'):
+    delivery = mock.Mock()
+    delivery.id = ObjectId()
+    delivery.listener_id = ObjectId()
+    delivery.event_type = event_type
+    delivery.event_data = json.dumps({'event_type': event_type, 'payload': payload,
+                                      'call_report': None})
+    delivery.attempts = attempts
+    return delivery
+
+
+@mock.patch(MODULE_PATH + 'EventListener')
+@mock.patch(MODULE_PATH + 'EventDelivery')
+@mock.patch(MODULE_PATH + 'notifiers')
+class TestDeliverToListener(unittest.TestCase):
+
+    def setUp(self):
+        self.listener = {'_id': ObjectId(), 'notifier_type_id': 'http',
+                         'notifier_config': {'url': 'http://localhost/'}}
+
+    def test_delivered(self, mock_notifiers, mock_delivery, mock_listener):
+        mock_notifiers.get_batch_notifier_function.return_value = None
+        notifier = mock_notifiers.get_notifier_function.return_value
+        notifier.return_value = True
+        deliveries = [_delivery(payload=1), _delivery(payload=2)]
+
+        stats = dispatch.deliver_to_listener(self.listener, deliveries)
+
+        self.assertEqual(stats, {'delivered': 2, 'failed': 0, 'abandoned': 0, 'dropped': 0})
+        self.assertEqual(notifier.call_count, 2)
+        config, event = notifier.call_args_list[0][0]
+        self.assertEqual(config, self.listener['notifier_config'])
+        self.assertTrue(isinstance(event, RecordedEvent))
+        self.assertEqual(event.event_type, 'repo.sync.start')
+        self.assertEqual(event.payload, 1)
+        self.assertEqual(notifier.call_args_list[1][0][1].payload, 2)
+        self.assertEqual(mock_delivery.objects.return_value.delete.call_count, 2)
+
+        update = mock_listener.get_collection.return_value.update.call_args[0]
+        self.assertEqual(update[0], {'_id': self.listener['_id']})
+        self.assertEqual(update[1]['$inc'], {'delivery_stats.delivered': 2})
+        self.assertTrue('delivery_stats.last_delivered' in update[1]['$set'])
+
+    def test_batch(self, mock_notifiers, mock_delivery, mock_listener):
+        batch_function = mock_notifiers.get_batch_notifier_function.return_value
+        batch_function.return_value = True
+        deliveries = [_delivery(), _delivery(), _delivery()]
+
+        stats = dispatch.deliver_to_listener(self.listener, deliveries)
+
+        self.assertEqual(stats['delivered'], 3)
+        self.assertEqual(batch_function.call_count, 1)
+        self.assertEqual(len(batch_function.call_args[0][1]), 3)
+        mock_delivery.objects.assert_called_once_with(id__in=[d.id for d in deliveries])
+        self.assertEqual(mock_notifiers.get_notifier_function.call_count, 0)
+
+    @mock.patch(MODULE_PATH + 'dateutils.now_utc_datetime_with_tzinfo')
+    def test_failed_holds_remaining(self, mock_now, mock_notifiers, mock_delivery,
+                                    mock_listener):
+        now = datetime.now(dateutils.utc_tz())
+        mock_now.return_value = now
+        mock_notifiers.get_batch_notifier_function.return_value = None
+        notifier = mock_notifiers.get_notifier_function.return_value
+        notifier.side_effect = [True, False]
+        deliveries = [_delivery(), _delivery(attempts=2), _delivery(), _delivery()]
+
+        stats = dispatch.deliver_to_listener(self.listener, deliveries)
+
+        self.assertEqual(stats, {'delivered': 1, 'failed': 1, 'abandoned': 0, 'dropped': 0})
+        self.assertEqual(notifier.call_count, 2)
+
+        # the failed delivery backs off exponentially and the rest wait for it
+        retry_at = now + timedelta(seconds=30 * 2 ** 2)
+        calls = mock_delivery.objects.call_args_list
+        self.assertEqual(calls[1][1], {'id': deliveries[1].id})
+        self.assertEqual(calls[2][1], {'id__in': [deliveries[2].id, deliveries[3].id]})
+        updates = mock_delivery.objects.return_value.update.call_args_list
+        self.assertEqual(updates[0][1]['set__attempts'], 3)
+        self.assertEqual(updates[0][1]['set__available_at'], retry_at)
+        self.assertEqual(updates[1][1], {'set__available_at': retry_at, 'unset__claim': True})
+
+        update = mock_listener.get_collection.return_value.update.call_args[0][1]
+        self.assertTrue('delivery_stats.last_error' in update['$set'])
+
+    @mock.patch.object(TopicPublishManager, 'connection', return_value=None)
+    @mock.patch('pulp.server.event.amqp.factory.topic_publish_manager',
+                return_value=TopicPublishManager)
+    def test_amqp_connection_failed(self, mock_manager, mock_connection, mock_notifiers,
+                                    mock_delivery, mock_listener):
+        self.listener.update({'notifier_type_id': amqp.TYPE_ID, 'notifier_config': {}})
+        mock_notifiers.get_batch_notifier_function.return_value = amqp.handle_events
+        deliveries = [_delivery(), _delivery()]
+
+        stats = dispatch.deliver_to_listener(self.listener, deliveries)
+
+        # the events were not published, so they are kept to be retried
+        self.assertEqual(stats, {'delivered': 0, 'failed': 2, 'abandoned': 0, 'dropped': 0})
+        self.assertEqual(mock_delivery.objects.return_value.delete.call_count, 0)
+        updates = mock_delivery.objects.return_value.update.call_args_list
+        self.assertEqual([u[1]['set__attempts'] for u in updates], [1, 1])
+
+    def test_exception_abandoned(self, mock_notifiers, mock_delivery, mock_listener):
+        mock_notifiers.get_batch_notifier_function.return_value = None
+        notifier = mock_notifiers.get_notifier_function.return_value
+        notifier.side_effect = ValueError('unreachable')
+        deliveries = [_delivery(attempts=9)]
+
+        stats = dispatch.deliver_to_listener(self.listener, deliveries)
+
+        self.assertEqual(stats['abandoned'], 1)
+        deliveries[0].delete.assert_called_once_with()
+        self.assertEqual(mock_delivery.objects.return_value.update.call_count, 0)
+
+    def test_listener_deleted(self, mock_notifiers, mock_delivery, mock_listener):
+        deliveries = [_delivery(), _delivery()]
+
+        stats = dispatch.deliver_to_listener(None, deliveries)
+
+        self.assertEqual(stats['dropped'], 2)
+        mock_delivery.objects.assert_called_once_with(id__in=[d.id for d in deliveries])
+        mock_delivery.objects.return_value.delete.assert_called_once_with()
+        self.assertEqual(mock_listener.get_collection.return_value.update.call_count, 0)
+
+
+class TestDeliverEvents(unittest.TestCase):
+
+    @mock.patch(MODULE_PATH + 'deliver_to_listener')
+    @mock.patch(MODULE_PATH + 'EventListener')
+    def test_deliver_batch(self, mock_listener, mock_deliver):
+        deliveries = [_delivery(), _delivery(), _delivery()]
+        deliveries[2].listener_id = deliveries[0].listener_id
+        listener = {'_id': deliveries[0].listener_id}
+        mock_listener.get_collection.return_value.find.return_value = [listener]
+        mock_deliver.return_value = dispatch._new_stats()
+
+        results = dispatch._deliver_batch(deliveries)
+
+        self.assertEqual(len(results), 2)
+        calls = dict((c[0][1][0].listener_id, c[0]) for c in mock_deliver.call_args_list)
+        self.assertEqual(calls[deliveries[0].listener_id],
+                         (listener, [deliveries[0], deliveries[2]]))
+        self.assertEqual(calls[deliveries[1].listener_id], (None, [deliveries[1]]))
+
+    @mock.patch(MODULE_PATH + '_deliver_batch')
+    @mock.patch(MODULE_PATH + '_claim_batch')
+    def test_deliver_events(self, mock_claim, mock_deliver_batch):
+        mock_claim.side_effect = [['a'], ['b'], []]
+        mock_deliver_batch.side_effect = [
+            [{'delivered': 2, 'failed': 1, 'abandoned': 0, 'dropped': 0}],
+            [{'delivered': 1, 'failed': 0, 'abandoned': 1, 'dropped': 0},
+             {'delivered': 0, 'failed': 0, 'abandoned': 0, 'dropped': 3}],
+        ]
+
+        totals = dispatch.deliver_events()
+
+        self.assertEqual(totals, {'delivered': 3, 'failed': 1, 'abandoned': 1, 'dropped': 3})
+        self.assertEqual(mock_claim.call_count, 3)
+
+
+class TestClaimBatch(base.PulpServerTests):
+
+    def setUp(self):
+        super(TestClaimBatch, self).setUp()
+        self.now = datetime.now(dateutils.utc_tz())
+        self.listener_id = ObjectId()
+        self.other_listener_id = ObjectId()
+
+    def tearDown(self):
+        super(TestClaimBatch, self).tearDown()
+        EventDelivery.objects.delete()
+
+    def _add(self, listener_id, minutes_ago, **kwargs):
+        created = self.now - timedelta(minutes=minutes_ago)
+        delivery = EventDelivery(listener_id=listener_id, event_type='repo.sync.start',
+                                 event_data='{}', created=created,
+                                 available_at=kwargs.pop('available_at', created), **kwargs)
+        delivery.save()
+        return delivery
+
+    @mock.patch(MODULE_PATH + 'BATCH_SIZE', 2)
+    def test_claimed_listener_skipped(self):
+        deliveries = [self._add(self.listener_id, 4), self._add(self.listener_id, 3),
+                      self._add(self.listener_id, 2), self._add(self.other_listener_id, 1)]
+
+        first = dispatch._claim_batch()
+        second = dispatch._claim_batch()
+
+        # the listener's last delivery waits until its first two have been made
+        self.assertEqual([d.id for d in first], [deliveries[0].id, deliveries[1].id])
+        self.assertEqual([d.id for d in second], [deliveries[3].id])
+        self.assertEqual(dispatch._claim_batch(), [])
+
+    @mock.patch(MODULE_PATH + 'BATCH_SIZE', 2)
+    @mock.patch(MODULE_PATH + 'notifiers')
+    def test_failed_delivery_holds_later_batches(self, mock_notifiers):
+        EventListener.get_collection().insert({'_id': self.listener_id,
+                                               'notifier_type_id': 'http',
+                                               'notifier_config': {}})
+        self.addCleanup(EventListener.get_collection().remove)
+        mock_notifiers.get_batch_notifier_function.return_value = None
+        notifier = mock_notifiers.get_notifier_function.return_value
+        notifier.return_value = False
+        for minutes_ago in (3, 2, 1):
+            self._add(self.listener_id, minutes_ago)
+
+        totals = dispatch.deliver_events()
+
+        # the first delivery failed, so neither the delivery held back with it in the first
+        # batch nor the one in the next batch may be attempted before it is retried
+        self.assertEqual(totals, {'delivered': 0, 'failed': 1, 'abandoned': 0, 'dropped': 0})
+        self.assertEqual(notifier.call_count, 1)
+        self.assertEqual(EventDelivery.objects(attempts=0).count(), 2)
+
+    def test_waiting_listener_skipped(self):
+        self._add(self.listener_id, 2, available_at=self.now + timedelta(minutes=5), attempts=1)
+        self._add(self.listener_id, 1)
+        other = self._add(self.other_listener_id, 1)
+
+        batch = dispatch._claim_batch()
+
+        self.assertEqual([d.id for d in batch], [other.id])
+
+    def test_release_out_of_order(self):
+        # another dispatcher claimed the listener's first delivery after this one found
+        # the listener's deliveries due
+        self._add(self.listener_id, 3, claim='other',
+                  available_at=self.now + timedelta(seconds=dispatch.CLAIM_TIMEOUT))
+        self._add(self.listener_id, 2, claim='mine')
+        mine = self._add(self.other_listener_id, 1, claim='mine')
+        batch = list(EventDelivery.objects(claim='mine').order_by('created', 'id'))
+
+        remaining = dispatch._release_out_of_order(batch, 'mine', self.now)
+
+        self.assertEqual([d.id for d in remaining], [mine.id])
+        released = EventDelivery.objects.get(listener_id=self.listener_id, claim=None)
+        self.assertTrue(released.available_at <= self.now)
@@ -13,7 +13,8 @@ import mock
 
 from pulp.server.compat import json
 from pulp.server.config import config
-from pulp.server.event import data, mail
+from pulp.server.db.model import EventDelivery
+from pulp.server.event import data, dispatch, mail
 from pulp.server.managers import factory
 
 
@@ -115,6 +116,7 @@ class TestSystem(unittest.TestCase):
             'addresses': ['user1@some.domain', 'user2@some.domain']
         }
         self.event_doc = {
+            '_id': _test_objid(),
             'notifier_type_id': mail.TYPE_ID,
             'event_types': data.TYPE_REPO_SYNC_FINISHED,
             'notifier_config': self.notifier_config,
@@ -131,7 +133,11 @@ class TestSystem(unittest.TestCase):
     @mock.patch('ConfigParser.SafeConfigParser.getboolean', return_value=True)
     # inject fake results from the database query
     @mock.patch('pulp.server.db.model.event.EventListener.get_collection')
-    def test_fire(self, mock_get_collection, mock_getbool, mock_smtp, mock_publish, mock_task_ser):
+    # keep the outbox out of the database and deliver from it in the test
+    @mock.patch.object(EventDelivery, 'objects')
+    @mock.patch.object(dispatch.deliver_events, 'apply_async')
+    def test_fire(self, mock_apply_async, mock_objects, mock_get_collection, mock_getbool,
+                  mock_smtp, mock_publish, mock_task_ser):
         # verify that the event system will trigger listeners of this type
         mock_get_collection.return_value.find.return_value = [self.event_doc]
         mock_task_ser.return_value = 'serialized task'
@@ -139,5 +145,15 @@ class TestSystem(unittest.TestCase):
         factory.initialize()
         factory.event_fire_manager()._do_fire(event)
 
+        # the event is queued in the outbox for the listener
+        deliveries = mock_objects.insert.call_args[0][0]
+        self.assertEqual(len(deliveries), 1)
+        self.assertEqual(deliveries[0].listener_id, self.event_doc['_id'])
+        self.assertEqual(deliveries[0].event_type, data.TYPE_REPO_SYNC_FINISHED)
+        mock_apply_async.assert_called_once_with()
+
+        stats = dispatch.deliver_to_listener(self.event_doc, deliveries)
+
         # verify that the mail event handler was called and processed something
+        self.assertEqual(stats['delivered'], 1)
         self.assertEqual(mock_smtp.return_value.sendmail.call_count, 2)
@@ -20,12 +20,13 @@ class TestHTTPNotifierTests(unittest.TestCase):
         event_data = mock_event.data.return_value
 
         # Test
-        http.handle_event(notifier_config, mock_event)
+        ret = http.handle_event(notifier_config, mock_event)
         mock_json.dumps.assert_called_once_with(event_data, default=mock_jutil.default)
         mock_send_post.assert_called_once_with(
             notifier_config,
             mock_json.dumps.return_value
         )
+        self.assertEqual(ret, mock_send_post.return_value)
 
     @mock.patch(MODULE_PATH + 'post')
     def test_send_post_no_auth(self, mock_post):
@@ -105,7 +106,8 @@ class TestHTTPNotifierTests(unittest.TestCase):
         data = {'head': 'feet'}
         mock_post.return_value.status_code = 404
 
-        http._send_post(notifier_config, data)
+        ret = http._send_post(notifier_config, data)
+        self.assertFalse(ret)
         mock_post.assert_called_once_with(
             'https://localhost/api/',
             data=data,
@@ -25,11 +25,28 @@ class TestMain(unittest.TestCase):
     """
     Test the main() function.
     """
+    @mock.patch('pulp.server.maintenance.monthly.model.Repository.objects')
     @mock.patch('pulp.server.maintenance.monthly.RepoProfileApplicabilityManager.remove_orphans')
-    def test_monthly_maintenance_calls_remove_orphans(self, remove_orphans):
+    def test_monthly_maintenance_calls_remove_orphans(self, remove_orphans, mock_repo_objects):
         """
         Assert that the main() function calls remove_orphans.
         """
         monthly.monthly_maintenance()
 
         remove_orphans.assert_called_once_with()
+
+    @mock.patch('pulp.server.maintenance.monthly.repo_controller')
+    @mock.patch('pulp.server.maintenance.monthly.model.Repository.objects')
+    @mock.patch('pulp.server.maintenance.monthly.RepoProfileApplicabilityManager.remove_orphans')
+    def test_monthly_maintenance_verifies_unit_counts(self, remove_orphans, mock_repo_objects,
+                                                      mock_repo_controller):
+        """
+        Assert that the content unit counts of every repository are verified.
+        """
+        mock_repo_objects.only.return_value = [mock.Mock(repo_id='a'), mock.Mock(repo_id='b')]
+
+        monthly.monthly_maintenance()
+
+        mock_repo_objects.only.assert_called_once_with('repo_id')
+        self.assertEqual(mock_repo_controller.queue_verify_content_unit_counts.call_args_list,
+                         [mock.call('a'), mock.call('b')])
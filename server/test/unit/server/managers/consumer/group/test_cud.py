@@ -2,8 +2,9 @@ import traceback
 import unittest
 
 from .....import base
-from mock import patch
+from mock import Mock, patch
 
+from pulp.common import constants, tags
 from pulp.devel.unit.base import PulpCeleryTaskTests
 from pulp.devel.unit.server import util
 from pulp.server import exceptions as pulp_exceptions
@@ -358,11 +359,14 @@ class TestUnbind(PulpCeleryTaskTests):
         self.assertEquals(result.error.child_exceptions[0], side_effect_exception)
 
 
+@patch('pulp.server.managers.factory.principal_manager')
+@patch('pulp.server.managers.consumer.group.cud.RequestGroup')
 class TestInstallContent(unittest.TestCase):
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_install(self, mock_query_manager, mock_agent_manager):
+    def test_install(self, mock_query_manager, mock_agent_manager,
+                     mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -370,14 +374,21 @@ class TestInstallContent(unittest.TestCase):
         mock_task = mock_agent_manager.return_value.install_content
 
         mock_task.return_value = {'task_id': 'foo-request-id'}
+        mock_group = mock_request_group.return_value
+        mock_group.group_id = 'foo-task-group'
         result = cud.ConsumerGroupManager.install_content(group_id, units, agent_options)
 
-        mock_task.assert_called_once_with('foo-consumer', units, agent_options)
+        mock_request_group.assert_called_once_with(tags.ACTION_AGENT_UNIT_INSTALL, ['foo-consumer'])
+        mock_group.create_tasks.assert_called_once_with()
+        mock_task.assert_called_once_with('foo-consumer', units, agent_options, group=mock_group)
+        mock_group.flush.assert_called_once_with()
         self.assertEquals(result.spawned_tasks[0], {'task_id': 'foo-request-id'})
+        self.assertEquals(result.return_value, {'group_id': 'foo-task-group'})
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_install_with_missing_resource_errors(self, mock_query_manager, mock_agent_manager):
+    def test_install_with_missing_resource_errors(self, mock_query_manager, mock_agent_manager,
+                                                  mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -394,7 +405,8 @@ class TestInstallContent(unittest.TestCase):
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_install_with_general_error(self, mock_query_manager, mock_agent_manager):
+    def test_install_with_general_error(self, mock_query_manager, mock_agent_manager,
+                                        mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -409,12 +421,35 @@ class TestInstallContent(unittest.TestCase):
         self.assertEquals(result.error.error_code, error_codes.PLP0020)
         self.assertEquals(result.error.child_exceptions[0], side_effect_exception)
 
+    @patch('pulp.server.managers.consumer.group.cud.TaskStatus')
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_group_query_manager')
+    def test_install_unsent_tasks_failed(self, mock_query_manager, mock_agent_manager,
+                                         mock_task_status, mock_request_group,
+                                         mock_principal_manager):
+        consumer_ids = ['foo-consumer', 'bar-consumer']
+        mock_query_manager.return_value.get_group.return_value = {'consumer_ids': consumer_ids}
+        mock_request_group.return_value.tasks = {'foo-consumer': Mock(task_id='foo-task'),
+                                                 'bar-consumer': Mock(task_id='bar-task')}
+        mock_task = mock_agent_manager.return_value.install_content
+        mock_task.side_effect = [{'task_id': 'foo-task'}, ValueError()]
+
+        result = cud.ConsumerGroupManager.install_content('foo-group', ['foo'], {})
+
+        self.assertEquals(result.spawned_tasks, [{'task_id': 'foo-task'}])
+        mock_task_status.objects.assert_called_once_with(task_id__in=['bar-task'])
+        mock_task_status.objects.return_value.update.assert_called_once_with(
+            set__state=constants.CALL_ERROR_STATE)
 
+
+@patch('pulp.server.managers.factory.principal_manager')
+@patch('pulp.server.managers.consumer.group.cud.RequestGroup')
 class TestUnInstallContent(unittest.TestCase):
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_uninstall(self, mock_query_manager, mock_agent_manager):
+    def test_uninstall(self, mock_query_manager, mock_agent_manager,
+                       mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -422,14 +457,18 @@ class TestUnInstallContent(unittest.TestCase):
         mock_task = mock_agent_manager.return_value.uninstall_content
 
         mock_task.return_value = {'task_id': 'foo-request-id'}
+        mock_group = mock_request_group.return_value
         result = cud.ConsumerGroupManager.uninstall_content(group_id, units, agent_options)
 
-        mock_task.assert_called_once_with('foo-consumer', units, agent_options)
+        mock_request_group.assert_called_once_with(tags.ACTION_AGENT_UNIT_UNINSTALL,
+                                                   ['foo-consumer'])
+        mock_task.assert_called_once_with('foo-consumer', units, agent_options, group=mock_group)
         self.assertEquals(result.spawned_tasks[0], {'task_id': 'foo-request-id'})
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_uninstall_with_missing_resource_errors(self, mock_query_manager, mock_agent_manager):
+    def test_uninstall_with_missing_resource_errors(self, mock_query_manager, mock_agent_manager,
+                                                    mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -446,7 +485,8 @@ class TestUnInstallContent(unittest.TestCase):
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_uninstall_with_general_error(self, mock_query_manager, mock_agent_manager):
+    def test_uninstall_with_general_error(self, mock_query_manager, mock_agent_manager,
+                                          mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -462,11 +502,14 @@ class TestUnInstallContent(unittest.TestCase):
         self.assertEquals(result.error.child_exceptions[0], side_effect_exception)
 
 
+@patch('pulp.server.managers.factory.principal_manager')
+@patch('pulp.server.managers.consumer.group.cud.RequestGroup')
 class TestUpdateContent(unittest.TestCase):
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_update(self, mock_query_manager, mock_agent_manager):
+    def test_update(self, mock_query_manager, mock_agent_manager,
+                    mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -474,14 +517,17 @@ class TestUpdateContent(unittest.TestCase):
         mock_task = mock_agent_manager.return_value.update_content
 
         mock_task.return_value = {'task_id': 'foo-request-id'}
+        mock_group = mock_request_group.return_value
         result = cud.ConsumerGroupManager.update_content(group_id, units, agent_options)
 
-        mock_task.assert_called_once_with('foo-consumer', units, agent_options)
+        mock_request_group.assert_called_once_with(tags.ACTION_AGENT_UNIT_UPDATE, ['foo-consumer'])
+        mock_task.assert_called_once_with('foo-consumer', units, agent_options, group=mock_group)
         self.assertEquals(result.spawned_tasks[0], {'task_id': 'foo-request-id'})
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_update_with_missing_resource_errors(self, mock_query_manager, mock_agent_manager):
+    def test_update_with_missing_resource_errors(self, mock_query_manager, mock_agent_manager,
+                                                 mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -498,7 +544,8 @@ class TestUpdateContent(unittest.TestCase):
 
     @patch('pulp.server.managers.factory.consumer_agent_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_update_with_general_error(self, mock_query_manager, mock_agent_manager):
+    def test_update_with_general_error(self, mock_query_manager, mock_agent_manager,
+                                       mock_request_group, mock_principal_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         group_id = 'foo-group'
         units = ['foo', 'bar']
@@ -512,3 +559,55 @@ class TestUpdateContent(unittest.TestCase):
         self.assertTrue(isinstance(result.error, PulpException))
         self.assertEquals(result.error.error_code, error_codes.PLP0021)
         self.assertEquals(result.error.child_exceptions[0], side_effect_exception)
+
+
+@patch('pulp.server.managers.consumer.group.cud.TaskStatus')
+@patch('pulp.server.managers.factory.principal_manager')
+class TestProcessGroup(unittest.TestCase):
+
+    @patch('pulp.server.managers.consumer.group.cud.config')
+    def test_process_group(self, mock_config, mock_principal_manager, mock_task_status):
+        mock_config.getint.return_value = 3
+        consumer_ids = ['c%d' % n for n in range(10)]
+        principal = mock_principal_manager.return_value.get_principal.return_value
+
+        def process(consumer_id, units, options=None):
+            if consumer_id == 'c4':
+                return None
+            if consumer_id == 'c5':
+                return TaskResult(spawned_tasks=['%s-1' % consumer_id, '%s-2' % consumer_id])
+            if consumer_id == 'c6':
+                raise MissingResource(consumer=consumer_id)
+            return {'task_id': consumer_id}
+
+        result = cud.ConsumerGroupManager.process_group(
+            {'consumer_ids': consumer_ids}, error_codes.PLP0020, {'group_id': 'foo-group'},
+            process, ['foo'], options={})
+
+        mock_config.getint.assert_called_once_with('messaging', 'agent_concurrency')
+        # the outcomes are collected in the order of the group members
+        expected = ['c0', 'c1', 'c2', 'c3', 'c5-1', 'c5-2', 'c7', 'c8', 'c9']
+        self.assertEquals(result.spawned_tasks, [{'task_id': t} for t in expected])
+        self.assertEquals(result.error.error_code, error_codes.PLP0020)
+        self.assertEquals(len(result.error.child_exceptions), 1)
+        # each thread acts on behalf of the caller
+        set_principal = mock_principal_manager.return_value.set_principal
+        self.assertEquals(set_principal.call_count, 3)
+        set_principal.assert_called_with(principal)
+        # not called from a task
+        self.assertEquals(mock_task_status.objects.call_count, 0)
+
+    @patch('pulp.server.managers.consumer.group.cud.get_current_task_id')
+    def test_process_group_progress(self, mock_task_id, mock_principal_manager,
+                                    mock_task_status):
+        mock_task_id.return_value = 'foo-task'
+        process = Mock(side_effect=[{'task_id': 'a'}, ValueError(), {'task_id': 'c'}])
+
+        cud.ConsumerGroupManager.process_group(
+            {'consumer_ids': ['a', 'b', 'c']}, error_codes.PLP0020, {'group_id': 'foo-group'},
+            process)
+
+        mock_task_status.objects.assert_called_with(task_id='foo-task')
+        update = mock_task_status.objects.return_value.update_one
+        self.assertEquals(update.call_args[1],
+                          {'set__progress_report': {'total': 3, 'processed': 3, 'failed': 1}})
@@ -13,7 +13,7 @@ from pulp.server.db.model.consumer import Bind
 from pulp.server.db import model
 from pulp.server.exceptions import PulpExecutionException, PulpDataException, MissingResource
 from pulp.server.managers.consumer.agent import QUEUE_DELETE_DELAY, delete_queue
-from pulp.server.managers.consumer.agent import AgentManager, Units
+from pulp.server.managers.consumer.agent import AgentManager, RequestGroup, Units
 
 
 class TestAgentManager(TestCase):
@@ -341,6 +341,44 @@ class TestAgentManager(TestCase):
         mock_factory.consumer_history_manager().record_event.assert_called_with(
             consumer['id'], 'content_unit_uninstalled', {'units': [unit]})
 
+    @patch('pulp.server.managers.consumer.agent.TaskStatus')
+    @patch('pulp.server.managers.consumer.agent.AgentManager._profiled_consumer')
+    @patch('pulp.server.managers.consumer.agent.AgentManager._profiler')
+    @patch('pulp.server.managers.consumer.agent.managers')
+    @patch('pulp.server.managers.consumer.agent.Context')
+    @patch('pulp.server.agent.direct.pulpagent.Content')
+    def test_install_content_in_group(self, *mocks):
+        mock_agent = mocks[0]
+        mock_context = mocks[1]
+        mock_factory = mocks[2]
+        mock_get_profiler = mocks[3]
+        mock_task_status = mocks[5]
+
+        unit = {'type_id': 'xyz', 'unit_key': {}}
+        consumer = {'id': '1234'}
+        mock_factory.consumer_manager.return_value.get_consumer.return_value = consumer
+        mock_profiler = Mock()
+        mock_profiler.install_units.return_value = [unit]
+        mock_get_profiler.return_value = (mock_profiler, {})
+        group = Mock()
+        group.tasks = {consumer['id']: Mock(task_id='2345')}
+
+        # test manager
+
+        options = {'a': 1}
+        agent_manager = AgentManager()
+        task = agent_manager.install_content(consumer['id'], [unit], options, group=group)
+
+        # validations
+
+        self.assertEqual(task, group.tasks[consumer['id']])
+        self.assertFalse(mock_task_status.called)
+        mock_context.assert_called_with(consumer, task_id='2345', consumer_id=consumer['id'])
+        mock_agent.install.assert_called_with(mock_context.return_value, [unit], options)
+        group.record_event.assert_called_once_with(
+            consumer['id'], 'content_unit_installed', {'units': [unit]})
+        self.assertFalse(mock_factory.consumer_history_manager.called)
+
     @patch('pulp.server.managers.consumer.agent.managers')
     @patch('pulp.server.managers.consumer.agent.Context')
     @patch('pulp.server.managers.consumer.agent.PulpAgent')
@@ -606,3 +644,52 @@ class TestUnits(TestCase):
         type_id = '30'
         self.assertEqual(len(collated[type_id]), 2)
         self.assertEqual(collated[type_id], units[3:])
+
+
+@patch('pulp.server.managers.consumer.agent.managers')
+@patch('pulp.server.managers.consumer.agent.TaskStatus')
+class TestRequestGroup(TestCase):
+
+    def test_init(self, mock_task_status, mock_factory):
+        mock_factory.principal_manager.return_value.get_principal.return_value.login = 'admin'
+
+        group = RequestGroup(tags.ACTION_AGENT_UNIT_INSTALL, ['c1', 'c2'])
+
+        self.assertEqual(sorted(group.tasks), ['c1', 'c2'])
+        self.assertEqual(group.originator, 'admin')
+        kwargs = mock_task_status.call_args[1]
+        self.assertEqual(kwargs['group_id'], group.group_id)
+        self.assertEqual(kwargs['worker_name'], 'agent')
+        self.assertEqual(kwargs['tags'], [
+            tags.resource_tag(tags.RESOURCE_CONSUMER_TYPE, 'c2'),
+            tags.action_tag(tags.ACTION_AGENT_UNIT_INSTALL)])
+        self.assertEqual(len(set(c[1]['task_id'] for c in mock_task_status.call_args_list)), 2)
+
+    def test_create_tasks(self, mock_task_status, mock_factory):
+        mock_task_status.side_effect = lambda **kwargs: Mock(**kwargs)
+        group = RequestGroup(tags.ACTION_AGENT_UNIT_INSTALL, ['c%d' % n for n in range(5)])
+        group.BATCH_SIZE = 2
+
+        group.create_tasks()
+
+        inserts = mock_task_status.objects.insert.call_args_list
+        self.assertEqual([len(c[0][0]) for c in inserts], [2, 2, 1])
+        self.assertEqual(inserts[0][1], {'load_bulk': False})
+        inserted = [task for c in inserts for task in c[0][0]]
+        self.assertEqual(sorted(inserted), sorted(group.tasks.values()))
+        self.assertEqual(mock_task_status.post_save.call_count, 5)
+
+    @patch('pulp.server.managers.consumer.agent.ConsumerHistoryEvent')
+    def test_flush(self, mock_event, mock_task_status, mock_factory):
+        mock_factory.principal_manager.return_value.get_principal.return_value.login = 'admin'
+        group = RequestGroup(tags.ACTION_AGENT_UNIT_INSTALL, ['c1', 'c2'])
+        details = {'units': []}
+
+        group.record_event('c1', 'content_unit_installed', details)
+        group.record_event('c2', 'content_unit_installed', details)
+        group.flush()
+
+        mock_event.assert_called_with('c2', 'admin', 'content_unit_installed', details)
+        mock_event.get_collection.return_value.insert.assert_called_once_with(
+            [mock_event.return_value] * 2)
+        self.assertEqual(group.events, [])
@@ -1,4 +1,7 @@
+import unittest
+
 import mock
+from pymongo.errors import BulkWriteError
 
 from .... import base
 from pulp.devel import mock_plugins
@@ -15,7 +18,8 @@ from pulp.server.managers.consumer.applicability import (
     _add_consumers_to_applicability_map, _add_profiles_to_consumer_map_and_get_hashes,
     _add_repo_ids_to_consumer_map, _format_report, _get_applicability_map,
     _get_consumer_applicability_map, DoesNotExist, MultipleObjectsReturned,
-    retrieve_consumer_applicability, ApplicabilityRegenerationManager)
+    retrieve_consumer_applicability, ApplicabilityRegenerationManager, MAX_BATCH_SIZE,
+    MIN_BATCH_SIZE, ReportCache, _get_report_cache_key)
 from pulp.server.managers.consumer.bind import BindManager
 from pulp.server.managers.consumer.cud import ConsumerManager
 from pulp.server.managers.consumer.profile import ProfileManager
@@ -1470,9 +1474,12 @@ class TestGetApplicabilityMap(base.PulpServerTests):
         a_map = _get_applicability_map(['hash_1', 'hash_2'], None)
 
         expected_a_map = {
-            ('hash_1', 'repo_1'): {'applicability': {'type_1': 'a_1'}, 'consumers': []},
-            ('hash_1', 'repo_2'): {'applicability': {'type_1': 'a_2'}, 'consumers': []},
-            ('hash_2', 'repo_2'): {'applicability': {'type_2': 'a_3'}, 'consumers': []}}
+            ('hash_1', 'repo_1'): {'applicability': {'type_1': 'a_1'}, 'consumers': [],
+                                   'repo_content_revision': None},
+            ('hash_1', 'repo_2'): {'applicability': {'type_1': 'a_2'}, 'consumers': [],
+                                   'repo_content_revision': None},
+            ('hash_2', 'repo_2'): {'applicability': {'type_2': 'a_3'}, 'consumers': [],
+                                   'repo_content_revision': None}}
         self.assertEqual(a_map, expected_a_map)
 
     @skip_broken
@@ -1506,8 +1513,10 @@ class TestGetApplicabilityMap(base.PulpServerTests):
         a_map = _get_applicability_map(['hash_1', 'hash_2'], ['type_1'])
 
         expected_a_map = {
-            ('hash_1', 'repo_1'): {'applicability': {'type_1': 'a_1'}, 'consumers': []},
-            ('hash_1', 'repo_2'): {'applicability': {'type_1': 'a_2'}, 'consumers': []}}
+            ('hash_1', 'repo_1'): {'applicability': {'type_1': 'a_1'}, 'consumers': [],
+                                   'repo_content_revision': None},
+            ('hash_1', 'repo_2'): {'applicability': {'type_1': 'a_2'}, 'consumers': [],
+                                   'repo_content_revision': None}}
         self.assertEqual(a_map, expected_a_map)
 
 
@@ -1542,3 +1551,401 @@ class TestGetConsumerApplicabilityMap(base.PulpServerTests,
             frozenset(['c_1', 'c_2']): {'type_1': ['a_1', 'a_3'], 'type_2': ['a_4']},
             frozenset(['c_2', 'c_3']): {'type_1': ['a_2']}}
         self.assert_equal_ignoring_list_order(c_a_map, expected_c_a_map)
+
+
+class TestRegenerateApplicabilityForRepo(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = mock.MagicMock()
+        self.profiler.metadata.return_value = {'types': ['rpm', 'erratum']}
+        self.profiler.calculate_applicable_units.side_effect = \
+            lambda profiles, repo_id, config, conduit: {'rpm': [p[0] for p in profiles]}
+        patchers = [
+            mock.patch.object(ApplicabilityRegenerationManager, '_profiler',
+                              return_value=(self.profiler, {})),
+            mock.patch.object(ApplicabilityRegenerationManager, '_get_existing_repo_content_types',
+                              return_value=['rpm']),
+            mock.patch.object(ApplicabilityRegenerationManager, '_get_repo_content_revision',
+                              return_value='rev-1'),
+            mock.patch('pulp.server.managers.consumer.applicability.UnitProfile.get_collection'),
+            mock.patch('pulp.server.managers.consumer.applicability.'
+                       'RepoProfileApplicability.get_collection'),
+            mock.patch('pulp.server.managers.consumer.applicability.ProfilerConduit'),
+        ]
+        mocks = []
+        for patcher in patchers:
+            mocks.append(patcher.start())
+            self.addCleanup(patcher.stop)
+        self.mock_conduit = mocks[-1]
+        self.unit_profiles = UnitProfile.get_collection.return_value
+        self.unit_profiles.find.return_value = [
+            {'id': 'p1', 'profile_hash': 'h1', 'content_type': 'rpm', 'profile': ['a']},
+            {'id': 'p2', 'profile_hash': 'h2', 'content_type': 'rpm', 'profile': ['b']},
+        ]
+        self.applicability = RepoProfileApplicability.get_collection.return_value
+        self.applicability.find.return_value = []
+
+    def test_shared_conduit_and_bulk_upsert(self):
+        profile_sets = [('all-1', [('h1', 'rpm', 'p1')]),
+                        ('all-2', [('h1', 'rpm', 'p1'), ('h2', 'rpm', 'p2')])]
+
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo('repo-1', profile_sets)
+
+        # the profiles are fetched once, and the repo units are cached across profile sets
+        self.assertEqual(self.unit_profiles.find.call_count, 1)
+        self.mock_conduit.assert_called_once_with(cache_repo_units=True)
+        conduits = [c[0][3] for c in self.profiler.calculate_applicable_units.call_args_list]
+        self.assertEqual(conduits, [self.mock_conduit.return_value] * 2)
+
+        self.applicability.bulk_write.assert_called_once_with(mock.ANY, ordered=False)
+        requests = self.applicability.bulk_write.call_args[0][0]
+        self.assertEqual(
+            [(r._filter, r._doc, r._upsert) for r in requests],
+            [({'repo_id': 'repo-1', 'all_profiles_hash': 'all-1', 'profile_hash': 'h1'},
+              {'$set': {'applicability': {'rpm': ['h1']}, 'repo_content_revision': 'rev-1'},
+               '$setOnInsert': {'profile': []}},
+              True),
+             ({'repo_id': 'repo-1', 'all_profiles_hash': 'all-2', 'profile_hash': 'h1'},
+              {'$set': {'applicability': {'rpm': ['h1', 'h2']}, 'repo_content_revision': 'rev-1'},
+               '$setOnInsert': {'profile': []}},
+              True),
+             ({'repo_id': 'repo-1', 'all_profiles_hash': 'all-2', 'profile_hash': 'h2'},
+              {'$set': {'applicability': {'rpm': ['h1', 'h2']}, 'repo_content_revision': 'rev-1'},
+               '$setOnInsert': {'profile': []}},
+              True)])
+
+    def test_current_revision_skipped(self):
+        self.applicability.find.return_value = [{'all_profiles_hash': 'all-1'}]
+        profile_sets = [('all-1', [('h1', 'rpm', 'p1')]), ('all-2', [('h2', 'rpm', 'p2')])]
+
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo('repo-1', profile_sets)
+
+        self.applicability.find.assert_called_once_with(
+            {'repo_id': 'repo-1', 'all_profiles_hash': {'$in': ['all-1', 'all-2']},
+             'repo_content_revision': 'rev-1'}, projection=['all_profiles_hash'])
+        self.assertEqual(self.profiler.calculate_applicable_units.call_count, 1)
+        requests = self.applicability.bulk_write.call_args[0][0]
+        self.assertEqual([r._filter['all_profiles_hash'] for r in requests], ['all-2'])
+
+    def test_current_revision_forced(self):
+        self.applicability.find.return_value = [{'all_profiles_hash': 'all-1'}]
+        profile_sets = [('all-1', [('h1', 'rpm', 'p1')]), ('all-2', [('h2', 'rpm', 'p2')])]
+
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo('repo-1', profile_sets,
+                                                                           force=True)
+
+        self.assertFalse(self.applicability.find.called)
+        self.assertEqual(self.profiler.calculate_applicable_units.call_count, 2)
+        requests = self.applicability.bulk_write.call_args[0][0]
+        self.assertEqual([r._filter['all_profiles_hash'] for r in requests], ['all-1', 'all-2'])
+        self.assertEqual([r._doc['$set']['repo_content_revision'] for r in requests],
+                         ['rev-1', 'rev-1'])
+
+    def test_all_current(self):
+        self.applicability.find.return_value = [{'all_profiles_hash': 'all-1'}]
+
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo(
+            'repo-1', [('all-1', [('h1', 'rpm', 'p1')])])
+
+        self.assertFalse(self.unit_profiles.find.called)
+        self.assertFalse(self.profiler.calculate_applicable_units.called)
+        self.assertFalse(self.applicability.bulk_write.called)
+
+    def test_no_revision(self):
+        ApplicabilityRegenerationManager._get_repo_content_revision.return_value = None
+
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo(
+            'repo-1', [('all-1', [('h1', 'rpm', 'p1')])])
+
+        self.assertFalse(self.applicability.find.called)
+        requests = self.applicability.bulk_write.call_args[0][0]
+        self.assertEqual(requests[0]._doc['$set']['repo_content_revision'], None)
+
+    def test_missing_profile_skipped(self):
+        profile_sets = [('all-1', [('h3', 'rpm', 'p3')]), ('all-2', [('h2', 'rpm', 'p2')])]
+
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo('repo-1', profile_sets)
+
+        self.assertEqual(self.profiler.calculate_applicable_units.call_count, 1)
+        requests = self.applicability.bulk_write.call_args[0][0]
+        self.assertEqual([r._filter['all_profiles_hash'] for r in requests], ['all-2'])
+
+    def test_no_applicable_types(self):
+        ApplicabilityRegenerationManager._get_existing_repo_content_types.return_value = ['iso']
+
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo(
+            'repo-1', [('all-1', [('h1', 'rpm', 'p1')])])
+
+        self.assertFalse(self.profiler.calculate_applicable_units.called)
+        self.assertFalse(self.applicability.bulk_write.called)
+
+    def test_not_implemented(self):
+        self.profiler.calculate_applicable_units.side_effect = NotImplementedError()
+
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo(
+            'repo-1', [('all-1', [('h1', 'rpm', 'p1')])])
+
+        self.assertFalse(self.applicability.bulk_write.called)
+
+    def test_nothing_to_do(self):
+        ApplicabilityRegenerationManager.regenerate_applicability_for_repo('repo-1', [])
+
+        self.assertFalse(ApplicabilityRegenerationManager._profiler.called)
+
+    def test_regenerate_applicability(self):
+        ApplicabilityRegenerationManager.regenerate_applicability(
+            'all-1', [('h1', 'rpm', 'p1')], 'repo-1')
+
+        requests = self.applicability.bulk_write.call_args[0][0]
+        self.assertEqual([r._filter['all_profiles_hash'] for r in requests], ['all-1'])
+
+
+class TestBulkUpsert(unittest.TestCase):
+
+    def test_retry_duplicates(self):
+        collection = mock.MagicMock()
+        requests = ['r0', 'r1', 'r2']
+        error = BulkWriteError({'writeErrors': [{'index': 1, 'code': 11000}]})
+        collection.bulk_write.side_effect = [error, None]
+
+        ApplicabilityRegenerationManager._bulk_upsert(collection, requests)
+
+        self.assertEqual(collection.bulk_write.call_args_list,
+                         [mock.call(requests, ordered=False), mock.call(['r1'], ordered=False)])
+
+    def test_other_errors_raised(self):
+        collection = mock.MagicMock()
+        error = BulkWriteError({'writeErrors': [{'index': 0, 'code': 11000},
+                                                {'index': 1, 'code': 2}]})
+        collection.bulk_write.side_effect = error
+
+        self.assertRaises(BulkWriteError, ApplicabilityRegenerationManager._bulk_upsert,
+                          collection, ['r0', 'r1'])
+        self.assertEqual(collection.bulk_write.call_count, 1)
+
+
+class TestBatchRegenerateApplicability(unittest.TestCase):
+
+    @mock.patch.object(ApplicabilityRegenerationManager, 'regenerate_applicability_for_repo')
+    def test_grouped_by_repo(self, mock_regenerate):
+        profiles_to_process = [('repo-1', 'all-1', ['p1']), ('repo-2', 'all-1', ['p1']),
+                               ('repo-1', 'all-2', ['p2'])]
+
+        ApplicabilityRegenerationManager.batch_regenerate_applicability(profiles_to_process)
+
+        self.assertEqual(mock_regenerate.call_count, 2)
+        mock_regenerate.assert_any_call('repo-1', [('all-1', ['p1']), ('all-2', ['p2'])],
+                                        force=False)
+        mock_regenerate.assert_any_call('repo-2', [('all-1', ['p1'])], force=False)
+
+    @mock.patch.object(ApplicabilityRegenerationManager, 'regenerate_applicability_for_repo')
+    def test_forced(self, mock_regenerate):
+        ApplicabilityRegenerationManager.batch_regenerate_applicability(
+            [('repo-1', 'all-1', ['p1'])], True)
+
+        mock_regenerate.assert_called_once_with('repo-1', [('all-1', ['p1'])], force=True)
+
+
+class TestQueueRegenerateApplicabilityForRepos(unittest.TestCase):
+
+    @mock.patch('pulp.server.managers.consumer.applicability.batch_regenerate_applicability_task')
+    @mock.patch.object(ApplicabilityRegenerationManager, '_get_batch_size', return_value=2)
+    @mock.patch.object(ApplicabilityRegenerationManager, '_get_consumer_profile_map')
+    @mock.patch.object(ApplicabilityRegenerationManager, '_get_repo_consumer_map')
+    @mock.patch('pulp.server.managers.consumer.applicability.model.Repository.objects')
+    def test_batches(self, mock_repo_qs, mock_repo_consumer_map, mock_consumer_profile_map,
+                     mock_batch_size, mock_task):
+        mock_repo_consumer_map.return_value = {'repo-1': ['c1', 'c2', 'c3']}
+        mock_consumer_profile_map.return_value = {
+            'c1': {'all_profiles_hash': 'all-1', 'profiles': ['p1']},
+            'c2': {'all_profiles_hash': 'all-2', 'profiles': ['p2']},
+            'c3': {'all_profiles_hash': 'all-3', 'profiles': ['p3']},
+        }
+
+        group_id = ApplicabilityRegenerationManager.queue_regenerate_applicability_for_repos(
+            Criteria().as_dict(), True)
+
+        mock_batch_size.assert_called_once_with(3)
+        self.assertEqual(mock_task.apply_async.call_args_list, [
+            mock.call(([('repo-1', 'all-1', ['p1']), ('repo-1', 'all-2', ['p2'])], True),
+                      group_id=group_id),
+            mock.call(([('repo-1', 'all-3', ['p3'])], True), group_id=group_id)])
+
+
+class TestGetBatchSize(unittest.TestCase):
+
+    @mock.patch('pulp.server.managers.consumer.applicability.model.Worker.objects')
+    def test_spread_over_workers(self, mock_worker_qs):
+        names = ['scheduler@h', 'resource_manager@h', 'reserved_resource_worker-0@h',
+                 'reserved_resource_worker-1@h']
+        mock_worker_qs.get_online.return_value = [mock.Mock(name=n) for n in names]
+        for worker, name in zip(mock_worker_qs.get_online.return_value, names):
+            worker.name = name
+
+        # 2 workers, 4 batches each
+        self.assertEqual(ApplicabilityRegenerationManager._get_batch_size(800), 100)
+
+    @mock.patch('pulp.server.managers.consumer.applicability.model.Worker.objects')
+    def test_bounds(self, mock_worker_qs):
+        mock_worker_qs.get_online.return_value = []
+
+        self.assertEqual(ApplicabilityRegenerationManager._get_batch_size(5), MIN_BATCH_SIZE)
+        self.assertEqual(ApplicabilityRegenerationManager._get_batch_size(100000), MAX_BATCH_SIZE)
+
+
+class TestGetRepoContentRevision(unittest.TestCase):
+
+    @mock.patch('pulp.server.managers.consumer.applicability.model.Repository.objects')
+    def test_revision(self, mock_repo_qs):
+        repo = mock_repo_qs.return_value.only.return_value.first.return_value
+        repo.content_revision = 7
+
+        revision = ApplicabilityRegenerationManager._get_repo_content_revision('repo-1')
+
+        mock_repo_qs.assert_called_once_with(repo_id='repo-1')
+        mock_repo_qs.return_value.only.assert_called_once_with('content_revision')
+        self.assertEqual(revision, 7)
+
+    @mock.patch('pulp.server.managers.consumer.applicability.model.Repository.objects')
+    def test_no_repo(self, mock_repo_qs):
+        mock_repo_qs.return_value.only.return_value.first.return_value = None
+
+        self.assertEqual(ApplicabilityRegenerationManager._get_repo_content_revision('r'), None)
+
+
+class TestReportCache(unittest.TestCase):
+
+    def test_get_put(self):
+        cache = ReportCache(2)
+        report = [{'consumers': ['c1'], 'applicability': {'rpm': ['u1']}}]
+
+        cache.put('key', report)
+        cached = cache.get('key')
+
+        self.assertEqual(cached, report)
+        # the cache holds its own copy
+        self.assertFalse(cached is report)
+        cached[0]['consumers'].append('c2')
+        self.assertEqual(cache.get('key'), report)
+
+    def test_none_key(self):
+        cache = ReportCache(2)
+
+        cache.put(None, [])
+
+        self.assertEqual(cache.get(None), None)
+        self.assertEqual(len(cache._reports), 0)
+
+    def test_evict_least_recently_used(self):
+        cache = ReportCache(2)
+        cache.put('a', [1])
+        cache.put('b', [2])
+        cache.get('a')
+
+        cache.put('c', [3])
+
+        self.assertEqual(cache.get('a'), [1])
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), [3])
+
+    def test_clear(self):
+        cache = ReportCache(2)
+        cache.put('a', [1])
+
+        cache.clear()
+
+        self.assertEqual(cache.get('a'), None)
+
+
+class TestGetReportCacheKey(unittest.TestCase):
+
+    def setUp(self):
+        self.applicability_map = {
+            ('h1', 'repo-1'): {'applicability': {'rpm': ['u1']}, 'consumers': [],
+                               'repo_content_revision': 1}}
+        self.consumer_map = {'c1': {'profiles': [{'profile_hash': 'h1'}],
+                                    'repo_ids': ['repo-1']}}
+
+    @mock.patch('pulp.server.managers.consumer.applicability.RepoProfileApplicability')
+    def test_stable(self, mock_applicability):
+        key1 = _get_report_cache_key(self.consumer_map, self.applicability_map, ['rpm', 'erratum'])
+        key2 = _get_report_cache_key(self.consumer_map, self.applicability_map, ['erratum', 'rpm'])
+
+        self.assertTrue(key1 is not None)
+        self.assertEqual(key1, key2)
+        # The revisions are taken from the applicability data that was already loaded
+        self.assertFalse(mock_applicability.get_collection.called)
+
+    def test_changes(self):
+        key = _get_report_cache_key(self.consumer_map, self.applicability_map, None)
+
+        self.assertNotEqual(key, _get_report_cache_key(self.consumer_map, self.applicability_map,
+                                                       ['rpm']))
+
+        self.consumer_map['c1']['repo_ids'].append('repo-2')
+        self.assertNotEqual(key, _get_report_cache_key(self.consumer_map, self.applicability_map,
+                                                       None))
+        self.consumer_map['c1']['repo_ids'].pop()
+
+        self.applicability_map[('h1', 'repo-1')]['repo_content_revision'] = 2
+        self.assertNotEqual(key, _get_report_cache_key(self.consumer_map, self.applicability_map,
+                                                       None))
+
+    def test_no_revision(self):
+        self.applicability_map[('h1', 'repo-2')] = {'applicability': {'rpm': ['u2']},
+                                                    'consumers': [],
+                                                    'repo_content_revision': None}
+
+        self.assertEqual(
+            _get_report_cache_key(self.consumer_map, self.applicability_map, None), None)
+
+
+class TestRetrieveConsumerApplicabilityCache(unittest.TestCase):
+
+    @mock.patch('pulp.server.managers.consumer.applicability._report_cache')
+    @mock.patch('pulp.server.managers.consumer.applicability._get_applicability_map')
+    @mock.patch('pulp.server.managers.consumer.applicability._get_report_cache_key',
+                return_value='key')
+    @mock.patch('pulp.server.managers.consumer.applicability._add_repo_ids_to_consumer_map')
+    @mock.patch('pulp.server.managers.consumer.applicability.'
+                '_add_profiles_to_consumer_map_and_get_hashes', return_value=['h1'])
+    @mock.patch('pulp.server.managers.consumer.applicability.ConsumerQueryManager')
+    def test_cached(self, mock_query_manager, mock_add_profiles, mock_add_repo_ids, mock_key,
+                    mock_get_applicability_map, mock_cache):
+        mock_query_manager.find_by_criteria.return_value = [{'id': 'c1'}]
+
+        report = retrieve_consumer_applicability({}, ['rpm'])
+
+        mock_get_applicability_map.assert_called_once_with(['h1'], ['rpm'])
+        mock_key.assert_called_once_with({'c1': {'profiles': [], 'repo_ids': []}},
+                                         mock_get_applicability_map.return_value, ['rpm'])
+        mock_cache.get.assert_called_once_with('key')
+        self.assertEqual(report, mock_cache.get.return_value)
+        self.assertFalse(mock_cache.put.called)
+
+    @mock.patch('pulp.server.managers.consumer.applicability._report_cache')
+    @mock.patch('pulp.server.managers.consumer.applicability._get_applicability_map')
+    @mock.patch('pulp.server.managers.consumer.applicability._get_report_cache_key',
+                return_value='key')
+    @mock.patch('pulp.server.managers.consumer.applicability._add_repo_ids_to_consumer_map')
+    @mock.patch('pulp.server.managers.consumer.applicability.'
+                '_add_profiles_to_consumer_map_and_get_hashes', return_value=['h1'])
+    @mock.patch('pulp.server.managers.consumer.applicability.ConsumerQueryManager')
+    def test_not_cached(self, mock_query_manager, mock_add_profiles, mock_add_repo_ids,
+                        mock_key, mock_get_applicability_map, mock_cache):
+        mock_query_manager.find_by_criteria.return_value = [{'id': 'c1'}]
+        mock_cache.get.return_value = None
+        mock_get_applicability_map.return_value = {
+            ('h1', 'repo-1'): {'applicability': {'rpm': ['u1']}, 'consumers': [],
+                               'repo_content_revision': 1}}
+
+        def add_repo_ids(consumer_ids, consumer_map):
+            consumer_map['c1']['profiles'].append({'profile_hash': 'h1'})
+            consumer_map['c1']['repo_ids'].append('repo-1')
+        mock_add_repo_ids.side_effect = add_repo_ids
+
+        report = retrieve_consumer_applicability({}, None)
+
+        expected = [{'consumers': ['c1'], 'applicability': {'rpm': ['u1']}}]
+        self.assertEqual(report, expected)
+        mock_cache.put.assert_called_once_with('key', expected)
@@ -5,7 +5,7 @@ from .... import base
 from pulp.devel import mock_plugins
 from pulp.plugins.profiler import Profiler
 from pulp.server.db.model.consumer import Consumer, ConsumerHistoryEvent, UnitProfile
-from pulp.server.exceptions import MissingResource
+from pulp.server.exceptions import InvalidValue, MissingResource, PulpCodedConflictException
 from pulp.server.managers import factory
 from pulp.server.managers.consumer.cud import ConsumerManager
 from pulp.server.managers.consumer.profile import ProfileManager
@@ -186,6 +186,88 @@ class ProfileManagerTests(base.PulpServerTests):
         update_profile.assert_called_once_with(profiler, consumer, untype,
                                                self.PROFILE_1, {})
 
+    def test_update_delta(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        base = manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1, self.PROFILE_3])
+        # Test
+        p = manager.update_delta(self.CONSUMER_ID, self.TYPE_1, base['profile_hash'],
+                                 added=[self.PROFILE_2], removed=[self.PROFILE_1])
+        # Verify
+        expected = [self.PROFILE_3, self.PROFILE_2]
+        expected_hash = UnitProfile.calculate_hash(expected)
+        self.assertEqual(p['profile'], expected)
+        self.assertEqual(p['profile_hash'], expected_hash)
+        stored = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEqual(stored['profile'], expected)
+        self.assertEqual(stored['profile_hash'], expected_hash)
+
+    def test_update_delta_calls_profiler_update_profile(self):
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        base = manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1])
+        mock_plugins.MOCK_PROFILER.update_profile.reset_mock()
+
+        manager.update_delta(self.CONSUMER_ID, self.TYPE_1, base['profile_hash'],
+                             added=[self.PROFILE_2])
+
+        consumer = ConsumerManager().get_consumer(self.CONSUMER_ID)
+        mock_plugins.MOCK_PROFILER.update_profile.assert_called_once_with(
+            consumer, self.TYPE_1, [self.PROFILE_1, self.PROFILE_2], {})
+
+    def test_update_delta_stale_base(self):
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1])
+
+        self.assertRaises(PulpCodedConflictException, manager.update_delta, self.CONSUMER_ID,
+                          self.TYPE_1, 'stale', added=[self.PROFILE_2])
+        stored = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEqual(stored['profile'], [self.PROFILE_1])
+
+    def test_update_delta_removed_not_in_base(self):
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        base = manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1])
+
+        self.assertRaises(PulpCodedConflictException, manager.update_delta, self.CONSUMER_ID,
+                          self.TYPE_1, base['profile_hash'], removed=[self.PROFILE_2])
+
+    def test_update_delta_changed_concurrently(self):
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        base = manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1])
+
+        # another update replaces the profile after the delta has been applied to the base
+        def update_profile(consumer, content_type, profile, config):
+            UnitProfile.get_collection().update({'_id': base['_id']},
+                                                {'$set': {'profile_hash': 'other'}})
+            return profile
+        mock_plugins.MOCK_PROFILER.update_profile.side_effect = update_profile
+
+        self.assertRaises(PulpCodedConflictException, manager.update_delta, self.CONSUMER_ID,
+                          self.TYPE_1, base['profile_hash'], added=[self.PROFILE_2])
+        stored = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEqual(stored['profile'], [self.PROFILE_1])
+
+    def test_update_delta_not_a_list(self):
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        base = manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+
+        self.assertRaises(InvalidValue, manager.update_delta, self.CONSUMER_ID, self.TYPE_1,
+                          base['profile_hash'], added=[self.PROFILE_2])
+        self.assertRaises(InvalidValue, manager.update_delta, self.CONSUMER_ID, self.TYPE_1,
+                          base['profile_hash'], added=self.PROFILE_2)
+
+    def test_update_delta_missing_profile(self):
+        self.populate()
+        manager = factory.consumer_profile_manager()
+
+        self.assertRaises(MissingResource, manager.update_delta, self.CONSUMER_ID, self.TYPE_1,
+                          'abc', added=[self.PROFILE_2])
+
     def test_multiple_types(self):
         # Setup
         self.populate()
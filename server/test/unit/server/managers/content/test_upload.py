@@ -1,6 +1,8 @@
 import errno
 import os
 import shutil
+import tempfile
+import zlib
 
 import unittest
 import mock
@@ -197,8 +199,8 @@ class ContentUploadManagerTests(base.PulpServerTests):
         self.assertTrue(isinstance(conduit, UploadConduit))
         self.assertEqual(call_args[5].repo_id, 'repo-u')
 
-        # It is now platform's responsibility to update plugin content unit counts
-        self.assertTrue(mock_rebuild.called, "rebuild_content_unit_counts must be called")
+        # The content unit counts are updated as units are associated, not rebuilt
+        self.assertFalse(mock_rebuild.called)
 
         # Make sure that the last_unit_added timestamp was updated
         self.assertTrue(mock_repo.last_unit_added > timestamp_pre_upload)
@@ -258,13 +260,18 @@ class ContentUploadManagerTests(base.PulpServerTests):
 
 class TestContentUploadManager(unittest.TestCase):
 
+    @mock.patch.object(ContentUploadManager, '_upload_state_path')
     @mock.patch.object(ContentUploadManager, '_upload_file_path')
     @mock.patch('pulp.server.managers.content.upload.os')
-    def test_delete_upload_removes_file(self, mock_os, mock__upload_file_path):
+    def test_delete_upload_removes_file(self, mock_os, mock__upload_file_path,
+                                        mock__upload_state_path):
         my_upload_id = 'asdf'
         ContentUploadManager().delete_upload(my_upload_id)
         mock__upload_file_path.assert_called_once_with(my_upload_id)
-        mock_os.remove.assert_called_once_with(mock__upload_file_path.return_value)
+        mock__upload_state_path.assert_called_once_with(my_upload_id)
+        self.assertEqual(mock_os.remove.call_args_list,
+                         [mock.call(mock__upload_file_path.return_value),
+                          mock.call(mock__upload_state_path.return_value)])
 
     @mock.patch.object(ContentUploadManager, '_upload_file_path')
     @mock.patch('pulp.server.managers.content.upload.os')
@@ -290,3 +297,92 @@ class TestContentUploadManager(unittest.TestCase):
         my_upload_id = 'asdf'
         mock_os.remove.side_effect = ValueError()
         self.assertRaises(ValueError, ContentUploadManager().delete_upload, my_upload_id)
+
+
+class TestUploadState(unittest.TestCase):
+    """
+    Tests for the tracking of the ranges received for an upload and their checksum.
+    """
+
+    def setUp(self):
+        self.storage_dir = tempfile.mkdtemp()
+        patcher = mock.patch.object(ContentUploadManager, '_upload_storage_dir',
+                                    return_value=self.storage_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.storage_dir)
+        self.manager = ContentUploadManager()
+        self.upload_id = self.manager.initialize_upload()
+
+    def test_status_no_data(self):
+        status = self.manager.get_upload_status(self.upload_id)
+
+        self.assertEqual(status['upload_id'], self.upload_id)
+        self.assertEqual(status['ranges'], [])
+        self.assertEqual(status['checksum_type'], 'crc32')
+        self.assertEqual(status['checksum'], '00000000')
+        self.assertEqual(status['checksum_length'], 0)
+
+    def test_status_missing_upload(self):
+        self.assertRaises(MissingResource, self.manager.get_upload_status, 'foo')
+
+    def test_ranges_out_of_order(self):
+        data = 'abcdefghijklmnopqrstuvwxyz'
+        self.manager.save_data(self.upload_id, 20, data[20:])
+        self.manager.save_data(self.upload_id, 5, data[5:10])
+
+        status = self.manager.get_upload_status(self.upload_id)
+        self.assertEqual(status['ranges'], [[5, 10], [20, 26]])
+        self.assertEqual(status['checksum_length'], 0)
+
+        self.manager.save_data(self.upload_id, 0, data[0:5])
+        self.manager.save_data(self.upload_id, 10, data[10:20])
+
+        status = self.manager.get_upload_status(self.upload_id)
+        self.assertEqual(status['ranges'], [[0, 26]])
+        self.assertEqual(status['checksum_length'], 26)
+        self.assertEqual(status['checksum'], '%08x' % (zlib.crc32(data) & 0xffffffff))
+        self.assertEqual(self.manager.read_upload(self.upload_id), data)
+
+    def test_overlapping_write_recalculates_checksum(self):
+        self.manager.save_data(self.upload_id, 0, 'abcdef')
+        self.manager.save_data(self.upload_id, 2, 'XY')
+
+        status = self.manager.get_upload_status(self.upload_id)
+        self.assertEqual(status['ranges'], [[0, 6]])
+        self.assertEqual(status['checksum'], '%08x' % (zlib.crc32('abXYef') & 0xffffffff))
+
+    def test_list_upload_ids_excludes_state(self):
+        self.manager.save_data(self.upload_id, 0, 'abc')
+
+        self.assertEqual(self.manager.list_upload_ids(), [self.upload_id])
+
+    def test_delete_upload_removes_state(self):
+        self.manager.save_data(self.upload_id, 0, 'abc')
+
+        self.manager.delete_upload(self.upload_id)
+
+        self.assertEqual(os.listdir(self.storage_dir), [])
+
+    def test_validate_complete(self):
+        self.manager.save_data(self.upload_id, 0, 'abc')
+        checksum = '%08x' % (zlib.crc32('abc') & 0xffffffff)
+
+        ContentUploadManager._validate_upload(self.upload_id)
+        ContentUploadManager._validate_upload(self.upload_id, checksum.upper())
+
+    def test_validate_incomplete(self):
+        self.manager.save_data(self.upload_id, 0, 'abc')
+        self.manager.save_data(self.upload_id, 4, 'e')
+
+        self.assertRaises(PulpDataException, ContentUploadManager._validate_upload,
+                          self.upload_id)
+
+    def test_validate_checksum_mismatch(self):
+        self.manager.save_data(self.upload_id, 0, 'abc')
+
+        self.assertRaises(PulpDataException, ContentUploadManager._validate_upload,
+                          self.upload_id, '00000000')
+
+    def test_validate_no_state(self):
+        ContentUploadManager._validate_upload(self.upload_id, '00000000')
@@ -1,8 +1,9 @@
 import mock
 
 from .... import base
+from pulp.server.db.model import EventDelivery
 from pulp.server.db.model.event import EventListener
-from pulp.server.event import data as event_data, notifiers
+from pulp.server.event import data as event_data, dispatch, notifiers
 from pulp.server.managers import factory as manager_factory
 
 
@@ -14,12 +15,28 @@ class EventFireManagerTests(base.PulpServerTests):
         self.manager = manager_factory.event_fire_manager()
         self.event_manager = manager_factory.event_listener_manager()
 
+        patcher = mock.patch.object(dispatch.deliver_events, 'apply_async')
+        self.mock_apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
     def tearDown(self):
         super(EventFireManagerTests, self).tearDown()
 
         EventListener.get_collection().remove()
+        EventDelivery.objects.delete()
         notifiers.reset()
 
+    def _fire(self, event):
+        """
+        Fire the event and deliver it as the queued task would.
+        """
+        self.manager._do_fire(event)
+        dispatch.deliver_events()
+
+    def assert_event(self, expected, delivered):
+        self.assertEqual(expected.event_type, delivered.event_type)
+        self.assertEqual(expected.payload, delivered.payload)
+
     def test_do_fire(self):
         # Setup
         notifiers.NOTIFIER_FUNCTIONS.clear()
@@ -42,16 +59,32 @@ class EventFireManagerTests(base.PulpServerTests):
         event = event_data.Event(event_data.TYPE_REPO_SYNC_STARTED, 'payload')
         self.manager._do_fire(event)
 
-        # Verify
+        # Verify the deliveries are stored without notifying the listeners
+        self.assertEqual(0, notifier_1.fire.call_count)
+        self.assertEqual(2, EventDelivery.objects.count())
+        self.mock_apply_async.assert_called_once_with()
+
+        dispatch.deliver_events()
+
         self.assertEqual(1, notifier_1.fire.call_count)
         self.assertEqual(1, notifier_2.fire.call_count)
         self.assertEqual(0, notifier_3.fire.call_count)
+        self.assertEqual(0, EventDelivery.objects.count())
 
         self.assertEqual({'1': '1'}, notifier_1.fire.call_args[0][0])
-        self.assertEqual(event, notifier_1.fire.call_args[0][1])
+        self.assert_event(event, notifier_1.fire.call_args[0][1])
 
         self.assertEqual({'2': '2'}, notifier_2.fire.call_args[0][0])
-        self.assertEqual(event, notifier_2.fire.call_args[0][1])
+        self.assert_event(event, notifier_2.fire.call_args[0][1])
+
+    def test_do_fire_no_listeners(self):
+        # Test
+        event = event_data.Event(event_data.TYPE_REPO_SYNC_STARTED, 'payload')
+        self.manager._do_fire(event)
+
+        # Verify
+        self.assertEqual(0, EventDelivery.objects.count())
+        self.assertEqual(0, self.mock_apply_async.call_count)
 
     def test_do_fire_with_star(self):
         # Setup
@@ -65,7 +98,7 @@ class EventFireManagerTests(base.PulpServerTests):
 
         # Test
         event = event_data.Event(event_data.TYPE_REPO_SYNC_STARTED, 'payload')
-        self.manager._do_fire(event)
+        self._fire(event)
 
         # Verify
         self.assertEqual(1, notifier_1.fire.call_count)
@@ -87,7 +120,7 @@ class EventFireManagerTests(base.PulpServerTests):
 
         # Test
         event = event_data.Event(event_data.TYPE_REPO_SYNC_STARTED, 'payload')
-        self.manager._do_fire(event)
+        self._fire(event)
 
         # Verify
 
@@ -98,10 +131,15 @@ class EventFireManagerTests(base.PulpServerTests):
         self.assertEqual(1, notifier_2.fire.call_count)
 
         self.assertEqual({'1': '1'}, notifier_1.fire.call_args[0][0])
-        self.assertEqual(event, notifier_1.fire.call_args[0][1])
+        self.assert_event(event, notifier_1.fire.call_args[0][1])
 
         self.assertEqual({'2': '2'}, notifier_2.fire.call_args[0][0])
-        self.assertEqual(event, notifier_2.fire.call_args[0][1])
+        self.assert_event(event, notifier_2.fire.call_args[0][1])
+
+        # The failed delivery is kept to be retried
+        delivery = EventDelivery.objects.get()
+        self.assertEqual(1, delivery.attempts)
+        self.assertEqual('Exception from notifier fire', delivery.last_error)
 
     def test_fire_repo_sync_started(self):
         # Setup
@@ -113,6 +151,7 @@ class EventFireManagerTests(base.PulpServerTests):
         # Test
         repo_id = 'test-repo'
         self.manager.fire_repo_sync_started(repo_id)
+        dispatch.deliver_events()
 
         # Verify
         self.assertEqual(1, notifier.fire.call_count)
@@ -134,6 +173,7 @@ class EventFireManagerTests(base.PulpServerTests):
         # so make up a fake dict here to simulate that.
         result = {'repo_id': 'test-repo', 'result': 'success'}
         self.manager.fire_repo_sync_finished(result)
+        dispatch.deliver_events()
 
         # Verify
         self.assertEqual(1, notifier.fire.call_count)
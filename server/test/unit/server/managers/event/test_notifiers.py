@@ -1,6 +1,6 @@
 import unittest
 
-from pulp.server.event import mail, notifiers, http
+from pulp.server.event import amqp, mail, notifiers, http
 
 
 class TestNotifiers(unittest.TestCase):
@@ -14,6 +14,13 @@ class TestNotifiers(unittest.TestCase):
         self.assertTrue(callable(ret))
         self.assertEqual(ret, mail.handle_event)
 
+    def test_amqp_batch_function(self):
+        ret = notifiers.get_batch_notifier_function(amqp.TYPE_ID)
+        self.assertEqual(ret, amqp.handle_events)
+
+    def test_no_batch_function(self):
+        self.assertTrue(notifiers.get_batch_notifier_function(http.TYPE_ID) is None)
+
     def test_validator(self):
         self.assertTrue(notifiers.is_valid_notifier_type_id(mail.TYPE_ID))
         self.assertTrue(notifiers.is_valid_notifier_type_id(http.TYPE_ID))
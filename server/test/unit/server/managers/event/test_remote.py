@@ -108,6 +108,69 @@ class TestTopicPublishManager(unittest.TestCase):
         self.assertEqual(sender.call_count, 1)
         self.assertTrue(sender.call_args[0][0].startswith(expected_destination))
 
+    @mock.patch.object(TopicPublishManager, 'connection')
+    def test_publish_all(self, mock_connection):
+        events = []
+        for event_type in (data.TYPE_REPO_SYNC_STARTED, data.TYPE_REPO_SYNC_FINISHED,
+                           data.TYPE_REPO_SYNC_STARTED):
+            mock_event = mock.MagicMock()
+            mock_event.data.return_value = {'type': event_type}
+            mock_event.event_type = event_type
+            events.append(mock_event)
+
+        ret = self.manager.publish_all(events, 'pulp')
+
+        self.assertTrue(ret)
+        session = mock_connection.return_value.session
+        self.assertEqual(session.call_count, 1)
+        # one sender for each subject
+        self.assertEqual(session.return_value.sender.call_count, 2)
+        self.assertEqual(session.return_value.sender.return_value.send.call_count, 3)
+        session.return_value.close.assert_called_once_with()
+
+    @mock.patch.object(TopicPublishManager, 'connection')
+    @mock.patch.object(TopicPublishManager._logger, 'exception')
+    def test_publish_all_failed(self, mock_error, mock_connection):
+        mock_connection.return_value.session.side_effect = MessagingError
+        mock_event = mock.MagicMock()
+        mock_event.data.return_value = {}
+        mock_event.event_type = data.TYPE_REPO_PUBLISH_FINISHED
+
+        ret = self.manager.publish_all([mock_event])
+
+        self.assertFalse(ret)
+        self.assertEqual(mock_error.call_count, 1)
+
+    @mock.patch.object(TopicPublishManager, 'connection', return_value=None)
+    @mock.patch.object(config, 'get', return_value='tcp://localhost:5672')
+    def test_publish_all_no_connection(self, mock_config_get, mock_connection):
+        # the events were not published, so they must not be counted as delivered
+        self.assertTrue(self.manager.publish_all([mock.MagicMock()]) is False)
+
+    @mock.patch.object(TopicPublishManager, 'connection')
+    @mock.patch.object(TopicPublishManager._logger, 'debug')
+    @mock.patch.object(config, 'get', return_value='')
+    def test_publish_all_disabled(self, mock_config_get, mock_debug, mock_connection):
+        # messaging is disabled, so the events are discarded rather than retried
+        self.assertTrue(self.manager.publish_all([mock.MagicMock()]) is None)
+        mock_config_get.assert_called_once_with('messaging', 'url')
+        self.assertFalse(mock_connection.called)
+        self.assertEqual(mock_debug.call_count, 1)
+
+    @mock.patch.object(TopicPublishManager, 'connection')
+    @mock.patch.object(TopicPublishManager._logger, 'exception')
+    def test_publish_all_send_failed(self, mock_error, mock_connection):
+        session = mock_connection.return_value.session.return_value
+        session.sender.return_value.send.side_effect = MessagingError
+        mock_event = mock.MagicMock()
+        mock_event.data.return_value = {}
+        mock_event.event_type = data.TYPE_REPO_PUBLISH_FINISHED
+
+        ret = self.manager.publish_all([mock_event])
+
+        self.assertFalse(ret)
+        session.close.assert_called_once_with()
+
     # test for bz 1099945
     @mock.patch.object(TopicPublishManager, 'connection')
     def test_publish_serialize_objectid(self, mock_connection):
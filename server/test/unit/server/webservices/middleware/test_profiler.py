@@ -0,0 +1,57 @@
+import unittest
+
+from django.core.exceptions import MiddlewareNotUsed
+import mock
+
+from pulp.server.db import profiler as db_profiler
+from pulp.server.webservices.middleware import profiler
+
+
+@mock.patch('pulp.server.webservices.middleware.profiler.profiler.is_enabled')
+class TestQueryProfileMiddleware(unittest.TestCase):
+    """
+    Tests for profiling the MongoDB commands issued by requests.
+    """
+
+    def tearDown(self):
+        db_profiler.stop()
+
+    def test_disabled(self, mock_enabled):
+        """
+        Test that the middleware is not used unless query profiling is enabled.
+        """
+        mock_enabled.return_value = False
+        self.assertRaises(MiddlewareNotUsed, profiler.QueryProfileMiddleware)
+
+    @mock.patch('pulp.server.webservices.middleware.profiler.logger')
+    def test_request(self, mock_logger, mock_enabled):
+        """
+        Test that a summary of the commands issued by a request is logged.
+        """
+        mock_enabled.return_value = True
+        middleware = profiler.QueryProfileMiddleware()
+        request = mock.Mock(method='GET', path='/pulp/api/v2/repositories/')
+        response = mock.Mock()
+
+        middleware.process_request(request)
+        profile = db_profiler.get_active_profile()
+        self.assertEqual(profile.name, 'GET /pulp/api/v2/repositories/')
+        profile.add('repos', 'find', '{}', 'views:get', 12.0)
+        result = middleware.process_response(request, response)
+
+        self.assertTrue(result is response)
+        self.assertTrue(db_profiler.get_active_profile() is None)
+        self.assertEqual(mock_logger.info.call_args[0][0],
+                         'GET /pulp/api/v2/repositories/ issued 1 MongoDB commands taking 12ms\n'
+                         '  1 find on repos taking 12ms from views:get: {}')
+
+    @mock.patch('pulp.server.webservices.middleware.profiler.logger')
+    def test_not_started(self, mock_logger, mock_enabled):
+        """
+        Test that nothing is logged for a response to a request that was not profiled.
+        """
+        mock_enabled.return_value = True
+        response = mock.Mock()
+        result = profiler.QueryProfileMiddleware().process_response(mock.Mock(), response)
+        self.assertTrue(result is response)
+        self.assertFalse(mock_logger.info.called)
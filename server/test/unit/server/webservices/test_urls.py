@@ -559,6 +559,14 @@ class TestDjangoTasksUrls(unittest.TestCase):
         url_name = 'task_resource'
         assert_url_match(url, url_name, task_id='test-task')
 
+    def test_match_task_changes(self):
+        """
+        Test the matching for task_changes.
+        """
+        url = '/v2/tasks/test-task/changes/'
+        url_name = 'task_changes'
+        assert_url_match(url, url_name, task_id='test-task')
+
     def test_match_task_search(self):
         """
         Test the matching for task_resource.
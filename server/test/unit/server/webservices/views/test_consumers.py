@@ -1129,6 +1129,33 @@ class TestConsumerProfileResourceView(unittest.TestCase):
         mock_resp.assert_called_once_with(expected_cont)
         self.assertTrue(response is mock_resp.return_value)
 
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
+                new=assert_auth_UPDATE())
+    @mock.patch(
+        'pulp.server.webservices.views.consumers.generate_json_response_with_pulp_encoder')
+    @mock.patch('pulp.server.webservices.views.consumers.factory.consumer_profile_manager')
+    def test_update_consumer_profile_delta(self, mock_profile, mock_resp):
+        """
+        Test update consumer profile with the changes against a base profile hash
+        """
+        resp = {'profile': ['new_info'], 'consumer_id': 'test-consumer', 'content_type': 'rpm'}
+        mock_profile.return_value.update_delta.return_value = resp
+
+        request = mock.MagicMock()
+        request.body = json.dumps({'base_hash': 'abc', 'added': ['new_info'],
+                                   'removed': ['old_info']})
+        consumer_profile = ConsumerProfileResourceView()
+        response = consumer_profile.put(request, 'test-consumer', 'rpm')
+
+        mock_profile.return_value.update_delta.assert_called_once_with(
+            'test-consumer', 'rpm', 'abc', ['new_info'], ['old_info'])
+        self.assertFalse(mock_profile.return_value.update.called)
+        expected_cont = {'consumer_id': 'test-consumer', 'profile': ['new_info'],
+                         '_href': '/v2/consumers/test-consumer/profiles/rpm/',
+                         'content_type': 'rpm'}
+        mock_resp.assert_called_once_with(expected_cont)
+        self.assertTrue(response is mock_resp.return_value)
+
     @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
                 new=assert_auth_DELETE())
     @mock.patch(
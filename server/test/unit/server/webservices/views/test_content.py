@@ -673,6 +673,25 @@ class TestUploadResourceView(unittest.TestCase):
     Tests for views of a single upload.
     """
 
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.content.generate_json_response')
+    @mock.patch('pulp.server.webservices.views.content.factory')
+    def test_get_upload_resource_view(self, mock_factory, mock_resp):
+        """
+        View should return the status of an upload.
+        """
+        mock_upload_manager = mock.MagicMock()
+        mock_factory.content_upload_manager.return_value = mock_upload_manager
+        request = mock.MagicMock()
+
+        upload_resource_view = UploadResourceView()
+        response = upload_resource_view.get(request, 'mock_unit')
+
+        mock_upload_manager.get_upload_status.assert_called_once_with('mock_unit')
+        mock_resp.assert_called_once_with(mock_upload_manager.get_upload_status.return_value)
+        self.assertTrue(response is mock_resp.return_value)
+
     @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
                 new=assert_auth_DELETE())
     @mock.patch('pulp.server.webservices.views.content.generate_json_response')
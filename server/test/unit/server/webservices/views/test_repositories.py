@@ -1,3 +1,4 @@
+from datetime import datetime
 from operator import itemgetter
 import json
 
@@ -83,6 +84,76 @@ class TestMergeRelatedObjects(unittest.TestCase):
         self.assertEqual(mock2_importers, [])
 
 
+class TestDocumentsVersion(unittest.TestCase):
+    """
+    Tests for deriving the versions of REST resources from their documents.
+    """
+
+    def test_documents_version(self):
+        """
+        The version should change with the documents, and the most recent update is returned.
+        """
+        document_model = mock.MagicMock()
+        documents = [{'_id': 1, 'last_updated': datetime(2016, 1, 2)},
+                     {'_id': 2, 'last_updated': datetime(2016, 1, 3), 'last_sync': 'then'}]
+        query_set = document_model.objects.filter.return_value
+        query_set.order_by.return_value.as_pymongo.return_value = documents
+
+        version, last_modified = repositories._documents_version(document_model, repo_id='repo')
+
+        document_model.objects.filter.assert_called_once_with(repo_id='repo')
+        self.assertEqual(last_modified, datetime(2016, 1, 3))
+
+        documents[1]['last_sync'] = 'now'
+        self.assertNotEqual(repositories._documents_version(document_model)[0], version)
+
+    def test_documents_version_all_fields(self):
+        """
+        Fields changed without updating last_updated, such as a scratchpad, change the version.
+        """
+        document_model = mock.MagicMock()
+        documents = [{'_id': 1, 'last_updated': datetime(2016, 1, 2), 'scratchpad': {'a': 1}}]
+        query_set = document_model.objects.filter.return_value
+        query_set.order_by.return_value.as_pymongo.return_value = documents
+        version = repositories._documents_version(document_model)[0]
+
+        documents[0]['scratchpad'] = {'a': 2}
+
+        self.assertNotEqual(repositories._documents_version(document_model)[0], version)
+
+    def test_no_documents(self):
+        document_model = mock.MagicMock()
+        query_set = document_model.objects.filter.return_value
+        query_set.order_by.return_value.as_pymongo.return_value = []
+        self.assertEqual(repositories._documents_version(document_model), (None, None))
+
+    @mock.patch('pulp.server.webservices.views.repositories._documents_version')
+    def test_single_repo(self, mock_version):
+        mock_version.return_value = ('1', 'then')
+        request = mock.MagicMock(GET={})
+        self.assertEqual(repositories._repos_version(request, 'repo'), ('1', 'then'))
+        mock_version.assert_called_once_with(model.Repository, repo_id='repo')
+
+    @mock.patch('pulp.server.webservices.views.repositories._documents_version')
+    def test_single_repo_details(self, mock_version):
+        """
+        Details include the units stored locally, so no version can be derived.
+        """
+        request = mock.MagicMock(GET={'details': 'true'})
+        self.assertEqual(repositories._repos_version(request, 'repo'), (None, None))
+        self.assertFalse(mock_version.called)
+
+    @mock.patch('pulp.server.webservices.views.repositories._documents_version')
+    def test_all_repos_with_importers(self, mock_version):
+        """
+        Collections and related objects do not have a reliable modification time.
+        """
+        mock_version.side_effect = [('1', 'then'), ('2', None)]
+        request = mock.MagicMock(GET={'importers': 'true'})
+        self.assertEqual(repositories._repos_version(request), ('12', None))
+        self.assertEqual(mock_version.call_args_list[1][0], (model.Importer,))
+
+
 class TestReposView(unittest.TestCase):
     """
     Tests for ReposView.
@@ -1425,7 +1496,37 @@ class TestContentApplicabilityRegenerationView(unittest.TestCase):
             raise AssertionError('OperationPostponed should be raised for a regenerate task')
 
         self.assertEqual(response.http_status_code, 202)
-        mock_regen.assert_called_once_with(mock_crit.return_value.as_dict())
+        mock_regen.assert_called_once_with(mock_crit.return_value.as_dict(), False)
+
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth', new=assert_auth_CREATE())
+    @mock.patch('pulp.server.webservices.views.repositories.regenerate_applicability_for_repos')
+    @mock.patch('pulp.server.webservices.views.repositories.tags')
+    @mock.patch('pulp.server.webservices.views.repositories.Criteria.from_client_input')
+    def test_post_force(self, mock_crit, mock_tags, mock_regen):
+        """
+        Test that forced regeneration is passed on to the task.
+        """
+        mock_request = mock.MagicMock()
+        mock_request.body = json.dumps({'repo_criteria': {}, 'force': True})
+        mock_regen.apply_async_with_reservation.return_value = {}
+        content_app_regen = ContentApplicabilityRegenerationView()
+
+        self.assertRaises(exceptions.OperationPostponed, content_app_regen.post, mock_request)
+
+        args = mock_regen.apply_async_with_reservation.call_args[0]
+        self.assertEqual(args[2], (mock_crit.return_value.as_dict(), True))
+
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth', new=assert_auth_CREATE())
+    @mock.patch('pulp.server.webservices.views.repositories.Criteria.from_client_input')
+    def test_post_invalid_force(self, mock_crit):
+        """
+        Test that force must be a boolean.
+        """
+        mock_request = mock.MagicMock()
+        mock_request.body = json.dumps({'repo_criteria': {}, 'force': 'yes'})
+        content_app_regen = ContentApplicabilityRegenerationView()
+
+        self.assertRaises(exceptions.InvalidValue, content_app_regen.post, mock_request)
 
     @mock.patch('pulp.server.webservices.views.decorators._verify_auth', new=assert_auth_CREATE())
     @mock.patch('pulp.server.webservices.views.repositories.Criteria.from_client_input')
@@ -1994,11 +2095,35 @@ class TestRepoImportUpload(unittest.TestCase):
         task_tags = [mock_tags.resource_tag(), mock_tags.action_tag()]
         mock_import.apply_async_with_reservation.assert_called_once_with(
             mock_tags.RESOURCE_REPOSITORY_TYPE, 'mock_repo',
-            ['mock_repo', 'mock_type', 'mock_key', None, 'mock_id', None],
+            ['mock_repo', 'mock_type', 'mock_key', None, 'mock_id', None, None],
             tags=task_tags
         )
         self.assertEqual(response.http_status_code, 202)
 
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
+                new=assert_auth_UPDATE())
+    @mock.patch('pulp.server.webservices.views.repositories.tags')
+    @mock.patch('pulp.server.webservices.views.repositories.import_uploaded_unit')
+    def test_post_with_upload_checksum(self, mock_import, mock_tags):
+        """
+        Test that the checksum of the upload calculated by the client is passed to the task.
+        """
+
+        mock_request = mock.MagicMock()
+        mock_request.body = json.dumps({'upload_id': 'mock_id', 'unit_type_id': 'mock_type',
+                                        'unit_key': 'mock_key', 'upload_checksum': '0a1b2c3d'})
+        repo_import = RepoImportUpload()
+
+        self.assertRaises(exceptions.OperationPostponed, repo_import.post, mock_request,
+                          'mock_repo')
+
+        task_tags = [mock_tags.resource_tag(), mock_tags.action_tag()]
+        mock_import.apply_async_with_reservation.assert_called_once_with(
+            mock_tags.RESOURCE_REPOSITORY_TYPE, 'mock_repo',
+            ['mock_repo', 'mock_type', 'mock_key', None, 'mock_id', None, '0a1b2c3d'],
+            tags=task_tags
+        )
+
     @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
                 new=assert_auth_UPDATE())
     def test_post_missing_required_params(self):
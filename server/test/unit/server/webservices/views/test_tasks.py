@@ -1,6 +1,7 @@
 """
 This module contains tests for the pulp.server.webservices.views.tasks module.
 """
+from django import http
 import mock
 
 from mongoengine.queryset import DoesNotExist
@@ -9,10 +10,11 @@ from .base import assert_auth_DELETE, assert_auth_READ
 from pulp.common.compat import unittest
 from pulp.server import exceptions as pulp_exceptions
 from pulp.server.db import model
-from pulp.server.exceptions import MissingResource
-from pulp.server.webservices.views import util
-from pulp.server.webservices.views.tasks import (TaskCollectionView, TaskResourceView,
-                                                 TaskSearchView, task_serializer)
+from pulp.server.exceptions import InvalidValue, MissingResource
+from pulp.server.webservices.views import tasks, util
+from pulp.server.webservices.views.tasks import (TaskChangesView, TaskCollectionView,
+                                                 TaskResourceView, TaskSearchView,
+                                                 task_serializer)
 
 
 @mock.patch('pulp.server.webservices.views.tasks.serial_dispatch')
@@ -66,7 +68,7 @@ class TestTaskCollection(unittest.TestCase):
         """
 
         mock_request = mock.MagicMock()
-        mock_request.GET.getlist.return_value = ['mock_tag_1', 'mock_tag_2']
+        mock_request.GET = http.QueryDict('tag=mock_tag_1&tag=mock_tag_2')
         mock_task_status.objects.return_value = ['mock_1', 'mock_2']
         mock_task_serializer.side_effect = lambda x: x
 
@@ -90,7 +92,7 @@ class TestTaskCollection(unittest.TestCase):
         """
 
         mock_request = mock.MagicMock()
-        mock_request.GET.getlist.return_value = []
+        mock_request.GET = http.QueryDict('')
         mock_task_status.objects.return_value = ['mock_1', 'mock_2']
         mock_task_serializer.side_effect = lambda x: x
 
@@ -102,6 +104,96 @@ class TestTaskCollection(unittest.TestCase):
         mock_task_serializer.assert_has_calls([mock.call('mock_1'), mock.call('mock_2')])
         self.assertTrue(response is mock_resp.return_value)
 
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.tasks.task_serializer')
+    @mock.patch('pulp.server.webservices.views.tasks.TaskStatus')
+    @mock.patch('pulp.server.webservices.views.tasks.generate_json_response_with_pulp_encoder')
+    def test_get_task_collection_filters(self, mock_resp, mock_task_status,
+                                         mock_task_serializer):
+        """
+        Test that state and time filters are pushed into the query.
+        """
+        mock_request = mock.MagicMock()
+        mock_request.GET = http.QueryDict(
+            'state=running&state=waiting&started_after=2016-01-01T05:00:00%2B02:00'
+            '&finished_before=2016-01-02T00:00:00Z')
+        mock_task_status.objects.return_value = []
+
+        TaskCollectionView().get(mock_request)
+
+        mock_task_status.objects.assert_called_once_with(
+            group_id=None, state__in=['running', 'waiting'],
+            start_time__gte='2016-01-01T03:00:00Z', finish_time__lte='2016-01-02T00:00:00Z')
+        mock_resp.assert_called_once_with([])
+
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.tasks.task_serializer')
+    @mock.patch('pulp.server.webservices.views.tasks.TaskStatus')
+    @mock.patch('pulp.server.webservices.views.tasks.generate_json_response_with_pulp_encoder')
+    def test_get_task_collection_paginated(self, mock_resp, mock_task_status,
+                                           mock_task_serializer):
+        """
+        Test that skip and limit paginate the query in creation order and that excluded fields
+        are neither loaded nor returned.
+        """
+        mock_request = mock.MagicMock()
+        mock_request.GET = http.QueryDict(
+            'skip=10&limit=5&exclude_field=progress_report&exclude_field=result')
+        mock_task_status._fields = model.TaskStatus._fields
+        query_set = mock_task_status.objects.return_value.exclude.return_value
+        query_set.order_by.return_value.skip.return_value.limit.return_value = ['mock_1']
+        mock_task_serializer.return_value = {'task_id': 'mock_1', 'state': 'running',
+                                             'progress_report': None, 'result': None}
+
+        TaskCollectionView().get(mock_request)
+
+        mock_task_status.objects.return_value.exclude.assert_called_once_with(
+            'progress_report', 'result')
+        query_set.order_by.assert_called_once_with('id')
+        query_set.order_by.return_value.skip.assert_called_once_with(10)
+        query_set.order_by.return_value.skip.return_value.limit.assert_called_once_with(5)
+        mock_resp.assert_called_once_with([{'task_id': 'mock_1', 'state': 'running'}])
+
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.tasks.task_serializer')
+    @mock.patch('pulp.server.webservices.views.tasks.TaskStatus')
+    @mock.patch('pulp.server.webservices.views.tasks.generate_json_response_with_pulp_encoder')
+    def test_get_task_collection_fields(self, mock_resp, mock_task_status,
+                                        mock_task_serializer):
+        """
+        Test that only the requested fields are loaded and returned.
+        """
+        mock_request = mock.MagicMock()
+        mock_request.GET = http.QueryDict('field=state')
+        mock_task_status._fields = model.TaskStatus._fields
+        mock_task_status.objects.return_value.only.return_value = ['mock_1']
+        mock_task_serializer.return_value = {'task_id': 'mock_1', 'state': 'running', 'id': '1',
+                                             '_href': '/mock/path/', 'progress_report': None}
+
+        TaskCollectionView().get(mock_request)
+
+        only_args = mock_task_status.objects.return_value.only.call_args[0]
+        self.assertEqual(set(only_args), set(['state', 'task_id']))
+        mock_resp.assert_called_once_with([{'task_id': 'mock_1', 'state': 'running', 'id': '1',
+                                            '_href': '/mock/path/'}])
+
+    @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.tasks.TaskStatus')
+    def test_get_task_collection_invalid_params(self, mock_task_status):
+        """
+        Test that invalid states, fields, times and pagination values are rejected.
+        """
+        mock_task_status._fields = model.TaskStatus._fields
+        for query in ('state=sleeping', 'field=not_a_field', 'started_after=yesterday',
+                      'limit=-1', 'skip=many'):
+            mock_request = mock.MagicMock()
+            mock_request.GET = http.QueryDict(query)
+            self.assertRaises(InvalidValue, TaskCollectionView().get, mock_request)
+
     @mock.patch('pulp.server.webservices.views.decorators._verify_auth',
                 new=assert_auth_DELETE())
     @mock.patch('pulp.server.webservices.views.tasks.TaskStatus')
@@ -203,3 +295,134 @@ class TestTaskResource(unittest.TestCase):
         mock_task.cancel.assert_called_once_with('mock_task_id')
         mock_resp.assert_called_once_with(None)
         self.assertTrue(response is mock_resp.return_value)
+
+
+@mock.patch('pulp.server.webservices.views.decorators._verify_auth', new=assert_auth_READ())
+@mock.patch('pulp.server.webservices.views.tasks.time')
+@mock.patch('pulp.server.webservices.views.tasks.task_serializer')
+@mock.patch('pulp.server.webservices.views.tasks.TaskStatus')
+@mock.patch('pulp.server.webservices.views.tasks.generate_json_response_with_pulp_encoder')
+class TestTaskChanges(unittest.TestCase):
+    """
+    Tests for TaskChangesView.
+    """
+
+    def setUp(self):
+        self.current = mock.MagicMock(revision=4, changed_fields=['progress_report'],
+                                      state='running')
+        self.request = mock.MagicMock()
+        self.request.GET = {'revision': '3'}
+
+    def test_get_changed_fields(self, mock_resp, mock_task_status, mock_task_serial, mock_time):
+        """
+        When the task is one revision ahead, only the changed fields are returned.
+        """
+        changed = mock.MagicMock(revision=4)
+        mock_task_status.objects.return_value.only.return_value.first.side_effect = [
+            self.current, changed]
+        mock_task_serial.return_value = {'task_id': 'mock_task', 'state': 'running',
+                                         'revision': 4, 'progress_report': {'a': 1},
+                                         'result': None, '_href': '/mock/path/'}
+
+        TaskChangesView().get(self.request, 'mock_task')
+
+        mock_task_status.objects.return_value.only.assert_called_with(
+            'progress_report', 'revision', 'state', 'task_id')
+        mock_task_serial.assert_called_once_with(changed)
+        mock_resp.assert_called_once_with({'task_id': 'mock_task', 'state': 'running',
+                                           'revision': 4, 'progress_report': {'a': 1},
+                                           '_href': '/mock/path/'})
+
+    def test_get_waits_for_change(self, mock_resp, mock_task_status, mock_task_serial,
+                                  mock_time):
+        """
+        The view should keep checking the revision until it changes.
+        """
+        unchanged = mock.MagicMock(revision=3, state='running')
+        self.current.revision = 6
+        mock_task_status.objects.return_value.only.return_value.first.side_effect = [
+            unchanged, unchanged, self.current]
+        mock_time.time.return_value = 0
+
+        TaskChangesView().get(self.request, 'mock_task')
+
+        self.assertEqual(mock_time.sleep.call_count, 2)
+        # more than one revision behind, so the full task is returned
+        mock_task_serial.assert_called_once_with(mock_task_status.objects.get.return_value)
+        mock_resp.assert_called_once_with(mock_task_serial.return_value)
+
+    def test_get_timeout(self, mock_resp, mock_task_status, mock_task_serial, mock_time):
+        """
+        If nothing changes before the timeout, only the task's identity and state are returned.
+        """
+        unchanged = mock.MagicMock(revision=3, state='running')
+        mock_task_status.objects.return_value.only.return_value.first.return_value = unchanged
+        mock_time.time.side_effect = [0, 5, 100]
+        self.request.GET['timeout'] = '50'
+
+        TaskChangesView().get(self.request, 'mock_task')
+
+        self.assertEqual(mock_time.sleep.call_count, 1)
+        self.assertFalse(mock_task_serial.called)
+        mock_resp.assert_called_once_with({'task_id': 'mock_task', 'state': 'running',
+                                           'revision': 3})
+
+    def test_get_timeout_capped(self, mock_resp, mock_task_status, mock_task_serial, mock_time):
+        """
+        The wait should not exceed MAX_CHANGES_TIMEOUT, however long the client asks for.
+        """
+        unchanged = mock.MagicMock(revision=3, state='running')
+        mock_task_status.objects.return_value.only.return_value.first.return_value = unchanged
+        mock_time.time.side_effect = [0, tasks.MAX_CHANGES_TIMEOUT]
+        self.request.GET['timeout'] = '3600'
+
+        TaskChangesView().get(self.request, 'mock_task')
+
+        self.assertFalse(mock_time.sleep.called)
+
+    @mock.patch('pulp.server.webservices.views.tasks._changes_waiters')
+    def test_get_too_many_waiters(self, mock_waiters, mock_resp, mock_task_status,
+                                  mock_task_serial, mock_time):
+        """
+        When too many requests are already waiting, the current state is returned at once.
+        """
+        mock_waiters.acquire.return_value = False
+        unchanged = mock.MagicMock(revision=3, state='running')
+        mock_task_status.objects.return_value.only.return_value.first.return_value = unchanged
+        mock_time.time.return_value = 0
+
+        TaskChangesView().get(self.request, 'mock_task')
+
+        mock_waiters.acquire.assert_called_once_with(False)
+        self.assertFalse(mock_waiters.release.called)
+        self.assertFalse(mock_time.sleep.called)
+        mock_resp.assert_called_once_with({'task_id': 'mock_task', 'state': 'running',
+                                           'revision': 3})
+
+    @mock.patch('pulp.server.webservices.views.tasks._changes_waiters')
+    def test_get_releases_waiter(self, mock_waiters, mock_resp, mock_task_status,
+                                 mock_task_serial, mock_time):
+        """
+        A waiting request gives up its place even if the task is missing.
+        """
+        mock_waiters.acquire.return_value = True
+        mock_task_status.objects.return_value.only.return_value.first.return_value = None
+
+        self.assertRaises(MissingResource, TaskChangesView().get, self.request, 'mock_task')
+
+        mock_waiters.release.assert_called_once_with()
+
+    def test_get_missing_task(self, mock_resp, mock_task_status, mock_task_serial, mock_time):
+        """
+        A missing task should raise a MissingResource.
+        """
+        mock_task_status.objects.return_value.only.return_value.first.return_value = None
+        self.assertRaises(MissingResource, TaskChangesView().get, self.request, 'mock_task')
+
+    def test_get_invalid_revision(self, mock_resp, mock_task_status, mock_task_serial,
+                                  mock_time):
+        """
+        A revision that is not a number should raise an InvalidValue.
+        """
+        self.request.GET = {'revision': 'not-a-number'}
+        self.assertRaises(InvalidValue, TaskChangesView().get, self.request, 'mock_task')
@@ -1,3 +1,5 @@
+from datetime import datetime
+import hashlib
 import httplib
 import json
 import mock
@@ -275,3 +277,123 @@ class TestPageNotFound(unittest.TestCase):
         returned_obj = page_not_found(mock.Mock())
         mock_generate_json_response.assert_called_once_with()
         self.assertTrue(returned_obj is mock_generate_json_response.return_value)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_get_matching_etag(self):
+        cache = util.ResponseCache(2)
+        cache.put('/a/', '"1"', HttpResponse('content', content_type='application/json'))
+        response = cache.get('/a/', '"1"')
+        self.assertEqual(response.content, 'content')
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_get_stale_etag(self):
+        cache = util.ResponseCache(2)
+        cache.put('/a/', '"1"', HttpResponse('content'))
+        self.assertTrue(cache.get('/a/', '"2"') is None)
+        # the stale response is discarded
+        self.assertTrue(cache.get('/a/', '"1"') is None)
+
+    def test_least_recently_used_evicted(self):
+        cache = util.ResponseCache(2)
+        cache.put('/a/', '"1"', HttpResponse('a'))
+        cache.put('/b/', '"1"', HttpResponse('b'))
+        cache.get('/a/', '"1"')
+        cache.put('/c/', '"1"', HttpResponse('c'))
+        self.assertTrue(cache.get('/b/', '"1"') is None)
+        self.assertEqual(cache.get('/a/', '"1"').content, 'a')
+        self.assertEqual(cache.get('/c/', '"1"').content, 'c')
+
+    def test_disabled(self):
+        cache = util.ResponseCache(0)
+        cache.put('/a/', '"1"', HttpResponse('a'))
+        self.assertTrue(cache.get('/a/', '"1"') is None)
+
+
+class TestConditionalGet(unittest.TestCase):
+
+    def setUp(self):
+        self.request = mock.Mock()
+        self.request.META = {}
+        self.request.get_full_path.return_value = '/v2/repositories/'
+        self.view = mock.Mock(return_value=HttpResponse('content'), __name__='get')
+        self.last_modified = datetime(2016, 1, 1, 12, 0, 0)
+
+    def _call(self, version=None, cache=False):
+        wrapped = util.conditional_get(version=version, cache=cache)(self.view)
+        return wrapped(mock.Mock(), self.request, 'repo1')
+
+    def test_content_etag(self):
+        response = self._call()
+        self.assertEqual(response.status_code, httplib.OK)
+        self.assertEqual(response['ETag'], '"%s"' % hashlib.sha1('content').hexdigest())
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_content_etag_not_modified(self):
+        self.request.META['HTTP_IF_NONE_MATCH'] = \
+            '"other", "%s"' % hashlib.sha1('content').hexdigest()
+        response = self._call()
+        self.assertEqual(response.status_code, httplib.NOT_MODIFIED)
+        self.assertEqual(response.content, '')
+
+    def test_error_passed_through(self):
+        self.view.return_value = HttpResponseNotFound('missing')
+        response = self._call()
+        self.assertEqual(response.status_code, httplib.NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_version(self):
+        version = mock.Mock(return_value=('1', self.last_modified))
+        response = self._call(version)
+        version.assert_called_once_with(self.request, 'repo1')
+        self.assertEqual(response.content, 'content')
+        self.assertEqual(response['ETag'],
+                         '"%s"' % hashlib.sha1('/v2/repositories/1').hexdigest())
+        self.assertEqual(response['Last-Modified'], 'Fri, 01 Jan 2016 12:00:00 GMT')
+
+    def test_version_not_modified(self):
+        """
+        A matching ETag is answered without building the response.
+        """
+        self.request.META['HTTP_IF_NONE_MATCH'] = \
+            '"%s"' % hashlib.sha1('/v2/repositories/1').hexdigest()
+        response = self._call(mock.Mock(return_value=('1', None)))
+        self.assertEqual(response.status_code, httplib.NOT_MODIFIED)
+        self.assertFalse(self.view.called)
+
+    def test_if_none_match_takes_precedence(self):
+        self.request.META['HTTP_IF_NONE_MATCH'] = '"other"'
+        self.request.META['HTTP_IF_MODIFIED_SINCE'] = 'Fri, 01 Jan 2016 12:00:00 GMT'
+        response = self._call(mock.Mock(return_value=('1', self.last_modified)))
+        self.assertEqual(response.status_code, httplib.OK)
+
+    def test_if_modified_since(self):
+        self.request.META['HTTP_IF_MODIFIED_SINCE'] = 'Fri, 01 Jan 2016 12:00:00 GMT'
+        response = self._call(mock.Mock(return_value=('1', self.last_modified)))
+        self.assertEqual(response.status_code, httplib.NOT_MODIFIED)
+        self.assertFalse(self.view.called)
+
+        self.request.META['HTTP_IF_MODIFIED_SINCE'] = 'Fri, 01 Jan 2016 11:59:59 GMT'
+        response = self._call(mock.Mock(return_value=('1', self.last_modified)))
+        self.assertEqual(response.status_code, httplib.OK)
+
+    def test_if_modified_since_unknown(self):
+        self.request.META['HTTP_IF_MODIFIED_SINCE'] = 'Fri, 01 Jan 2016 12:00:00 GMT'
+        response = self._call(mock.Mock(return_value=('1', None)))
+        self.assertEqual(response.status_code, httplib.OK)
+
+    @mock.patch('pulp.server.webservices.views.util.response_cache', util.ResponseCache(10))
+    def test_cache(self):
+        version = mock.Mock(return_value=('1', None))
+        self._call(version, cache=True)
+        response = self._call(version, cache=True)
+        self.assertEqual(self.view.call_count, 1)
+        self.assertEqual(response.content, 'content')
+        self.assertEqual(response['ETag'],
+                         '"%s"' % hashlib.sha1('/v2/repositories/1').hexdigest())
+
+        # a new version of the resource is built again
+        version.return_value = ('2', None)
+        self._call(version, cache=True)
+        self.assertEqual(self.view.call_count, 2)
@@ -1,5 +1,6 @@
 import sys
 
+from collections import OrderedDict
 from gettext import gettext as _
 from logging import getLogger
 from threading import RLock
@@ -8,6 +9,13 @@ from datetime import datetime, timedelta
 log = getLogger(__name__)
 
 
+# The number of objects cached before the least recently requested are evicted.
+MAX_ENTRIES = 1000
+
+# How often (in seconds) unrequested objects should be evicted.
+EVICTION_INTERVAL = 60
+
+
 class NotCached(Exception):
     """
     Requested object is not found in the cache.
@@ -19,22 +27,39 @@ class Cache(object):
     """
     Generic object cache.
 
+    The inventory is kept in least recently requested order, so objects are
+    added and looked up in constant time and eviction only visits the objects
+    it evicts.  Unrequested objects are evicted by evict(), which is meant to
+    be called periodically (see: EVICTION_INTERVAL), and the least recently
+    requested objects are evicted as soon as the cache holds more than
+    max_entries objects.  Busy objects are never evicted.
+
     Attributes:
         eviction_threshold (timedelta): How long an unrequested item will be cached.
+        max_entries (int): The number of objects cached before the least
+            recently requested are evicted.
+        hits (int): The number of objects found in the cache.
+        misses (int): The number of objects not found in the cache.
+        evictions (int): The number of objects evicted.
         _lock (RLock): The object mutex.
-        _inventory (dict): The inventory of cached objects.
-            Each value is an Item.
+        _inventory (OrderedDict): The inventory of cached objects.
+            Each value is an Item.  Ordered from least to most recently requested.
     """
 
-    def __init__(self, eviction_threshold=None):
+    def __init__(self, eviction_threshold=None, max_entries=MAX_ENTRIES):
         """
         Args:
             eviction_threshold (timedelta): How long an unrequested item will be cached.
-
+            max_entries (int): The number of objects cached before the least
+                recently requested are evicted.
         """
         self.eviction_threshold = eviction_threshold or timedelta(hours=4)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
         self._lock = RLock()
-        self._inventory = {}
+        self._inventory = OrderedDict()
 
     def add(self, key, object_):
         """
@@ -45,7 +70,10 @@ class Cache(object):
             object_ (object): An object to be cached.
         """
         with self._lock:
+            self._inventory.pop(key, None)
             self._inventory[key] = Item(object_)
+            if len(self._inventory) > self.max_entries:
+                self._evict_excess()
 
     def purge(self, key):
         """
@@ -72,11 +100,13 @@ class Cache(object):
         """
         with self._lock:
             try:
-                item = self._inventory[key]
+                item = self._inventory.pop(key)
             except KeyError:
+                self.misses += 1
                 raise NotCached()
+            self._inventory[key] = item
+            self.hits += 1
             item.touch()
-            self.evict()
             return item.object
 
     def evict(self):
@@ -90,27 +120,68 @@ class Cache(object):
         evicted = []
         now = Item.now()
         with self._lock:
-            for key, item in self._inventory.items():
-                duration = (now - item.last_requested)
+            expired = []
+            for key, item in self._inventory.iteritems():
                 if item.busy:
                     busy.append(item.object)
                     continue
+                duration = (now - item.last_requested)
                 if duration < self.eviction_threshold:
-                    continue
-                self.purge(key)
-                evicted.append(item.object)
+                    # the rest were requested more recently
+                    break
+                expired.append(key)
+            for key in expired:
+                evicted.append(self.purge(key).object)
+            self.evictions += len(evicted)
         log.debug(
-            _('Cache.evict(): %(t)d total, %(e)d evicted, %(b)d busy'),
+            _('Cache.evict(): %(t)d total, %(e)d evicted, %(b)d busy, '
+              '%(h)d hits, %(m)d misses'),
             {
                 't': len(self._inventory),
                 'e': len(evicted),
-                'b': len(busy)
+                'b': len(busy),
+                'h': self.hits,
+                'm': self.misses
             })
         return evicted
 
+    def stats(self):
+        """
+        Get the cache statistics.
+
+        Returns:
+            dict: The number of cached objects, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._inventory),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _evict_excess(self):
+        """
+        Evict the least recently requested objects that are not busy until
+        no more than max_entries objects are cached.
+        """
+        excess = len(self._inventory) - self.max_entries
+        idle = []
+        for key, item in self._inventory.iteritems():
+            if len(idle) >= excess:
+                break
+            if not item.busy:
+                idle.append(key)
+        for key in idle:
+            self.purge(key)
+        self.evictions += len(idle)
+
     def __contains__(self, key):
         return key in self._inventory
 
+    def __len__(self):
+        return len(self._inventory)
+
 
 class Item(object):
     """
@@ -66,6 +66,18 @@ class TestCache(TestCase):
         self.assertFalse('t1' in cache)
         self.assertEqual([obj.key for obj in evicted], [key])
 
+    @patch(MODULE + '.Item.now')
+    def test_evict_stops_at_recent(self, now):
+        now.side_effect = [1, 2, 3, 4]
+        cache = Cache(3)
+        cache.add('t1', Mock())
+        cache.add('t2', Mock())
+        cache.add('t3', Mock())
+        evicted = cache.evict()
+        self.assertEqual(len(evicted), 1)
+        self.assertEqual(cache._inventory.keys(), ['t2', 't3'])
+        self.assertEqual(cache.evictions, 1)
+
     @patch(MODULE + '.Item.now')
     def test_evict_busy(self, now):
         now.side_effect = [1, 2, 3, 4]
@@ -76,6 +88,42 @@ class TestCache(TestCase):
         cache.evict()
         self.assertTrue('t1' in cache)
 
+    def test_get_moves_to_end(self):
+        cache = Cache()
+        cache.add('t1', Mock())
+        cache.add('t2', Mock())
+        cache.get('t1')
+        self.assertEqual(cache._inventory.keys(), ['t2', 't1'])
+
+    def test_add_existing(self):
+        cache = Cache()
+        cache.add('t1', Mock())
+        cache.add('t2', Mock())
+        t1 = Mock()
+        cache.add('t1', t1)
+        self.assertEqual(cache._inventory.keys(), ['t2', 't1'])
+        self.assertEqual(cache.get('t1'), t1)
+
+    def test_max_entries(self):
+        t1 = Mock()  # hold ref to make it busy.
+        cache = Cache(max_entries=2)
+        cache.add('t1', t1)
+        cache.add('t2', Mock())
+        cache.add('t3', Mock())
+        cache.add('t4', Mock())
+        self.assertEqual(cache._inventory.keys(), ['t1', 't4'])
+        self.assertEqual(cache.evictions, 2)
+
+    def test_stats(self):
+        cache = Cache(max_entries=1)
+        cache.add('t1', Mock())
+        cache.get('t1')
+        cache.get('t1')
+        self.assertRaises(NotCached, cache.get, 't2')
+        cache.add('t2', Mock())
+        self.assertEqual(cache.stats(), {'entries': 1, 'hits': 2, 'misses': 1, 'evictions': 1})
+        self.assertEqual(len(cache), 1)
+
 
 class TestItem(TestCase):
 